@@ -0,0 +1,14 @@
+"""
+End-to-end benchmarks of the pipelines on synthetic inputs, CPU-only and offline.
+
+    python -m benchmarks list
+    python -m benchmarks run                          # all, results in dataset/.bench/results/<commit>.json
+    python -m benchmarks run slicers music_beats --scale 0.2 --repeat 5
+    python -m benchmarks run --baseline dataset/.bench/results/<old commit>.json
+    python -m benchmarks compare BASELINE.json CURRENT.json
+
+Inputs are generated by fixtures.py (ffmpeg test patterns, tone and noise
+wavs, MIDI, text); the LLM and the large models are replaced by stubs.py.
+Benchmarks whose dependencies are missing are reported as skipped.
+`run --baseline` and `compare` exit with status 1 when a stage regresses.
+"""
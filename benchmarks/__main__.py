@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+
+from . import cases  # noqa: F401  (registers the benchmarks)
+from .harness import (BENCHMARKS, PROJECT_ROOT, compare, environment_info, format_comparison, load_results,
+                      run_all, save_results)
+
+
+def _report(baseline, current, threshold, min_seconds):
+    rows = compare(baseline, current, threshold=threshold, min_seconds=min_seconds)
+    print(format_comparison(rows, baseline, current))
+    regressions = [row for row in rows if row[2] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} stage(s) regressed by more than {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Pipeline benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='List the benchmarks and whether they can run here')
+
+    run = commands.add_parser('run', help='Run benchmarks and save the results')
+    run.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+    run.add_argument('--repeat', type=int, default=3, help='Measured runs per benchmark')
+    run.add_argument('--warmup', type=int, default=1, help='Unmeasured runs before them')
+    run.add_argument('--scale', type=float, default=1.0, help='Multiplier on fixture durations and counts')
+    run.add_argument('--out', help='Result file (default: dataset/.bench/results/<commit>.json)')
+    run.add_argument('--workdir', help='Fixtures and job workspaces (default: dataset/.bench)')
+    run.add_argument('--keep', action='store_true', help='Keep the job workspaces for inspection')
+    run.add_argument('--baseline', help='Result file to compare against')
+
+    cmp = commands.add_parser('compare', help='Compare two result files')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+
+    for sub in (run, cmp):
+        sub.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown counted as regression')
+        sub.add_argument('--min-seconds', type=float, default=0.02,
+                         help='Ignore changes smaller than this, in seconds')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for name, bench in BENCHMARKS.items():
+            missing = bench.missing()
+            state = f"skipped (missing: {', '.join(missing)})" if missing else "ready"
+            print(f"{name:<18} {state:<40} {bench.description}")
+        return 0
+
+    if args.command == 'compare':
+        return _report(load_results(args.baseline), load_results(args.current), args.threshold, args.min_seconds)
+
+    workdir = args.workdir or os.path.join(PROJECT_ROOT, 'dataset', '.bench')
+    document = run_all(args.names or None, workdir=workdir, repeat=args.repeat, warmup=args.warmup,
+                       scale=args.scale, keep=args.keep)
+    commit = (environment_info()["commit"] or 'nogit')[:10]
+    path = save_results(document, args.out or os.path.join(workdir, 'results', f"{commit}.json"))
+    print(f"Results saved to {path}")
+
+    status = 0
+    if any(result["status"] == 'error' for result in document["benchmarks"].values()):
+        status = 1
+    if args.baseline:
+        status = max(status, _report(load_results(args.baseline), document, args.threshold, args.min_seconds))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+One benchmark per subsystem. Each runs the repo's own code on synthetic
+fixtures, with the models and the LLM replaced by the stubs in stubs.py.
+"""
+import json
+import os
+import shutil
+import sys
+
+from environment.utils.feature_store import PROJECT_ROOT
+
+from . import stubs
+from .harness import benchmark
+
+
+@benchmark("videorag", requires=("torch", "moviepy", "transformers", "tiktoken", "nano_vectordb",
+                                 "imagebind", "sentence_transformers", "ffmpeg"))
+def bench_videorag(ctx):
+    """VideoRAG insert (split, segment encode, index) and scene query on a test-pattern video."""
+    tools_dir = os.path.join(PROJECT_ROOT, 'tools')
+    if tools_dir not in sys.path:
+        sys.path.append(tools_dir)
+    from videorag import _opcontent, videoragcontent
+    from videorag._storage import vdb_nanovectordb
+    from videorag.base import QueryParam
+
+    seconds = ctx.fixtures.seconds(180)
+    video = ctx.fixtures.video("ragvideo", seconds)
+    scenes = ctx.fixtures.scenes(ctx.fixtures.count(4))
+
+    with stubs.patched(videoragcontent, speech_to_text=stubs.stub_speech_to_text,
+                       segment_caption=stubs.stub_segment_caption), \
+            stubs.patched(_opcontent, compute_text_similarity=stubs.text_similarity):
+        rag = videoragcontent.VideoRAG(
+            working_dir=ctx.job.index_dir,
+            scene_output_dir=ctx.job.scene_output_dir,
+            vs_vector_db_storage_cls=stubs.make_vector_storage(vdb_nanovectordb),
+        )
+        with ctx.stage("insert", units=seconds, unit="video_s"):
+            rag.insert_video(video_path_list=[video])
+        with ctx.stage("query", units=len(scenes), unit="scenes"):
+            rag.query(query="/////\n".join(scenes), param=QueryParam(mode="videoragcontent"))
+
+
+@benchmark("music_beats", requires=("librosa", "matplotlib", "soundfile"))
+def bench_music_beats(ctx):
+    """MusicAgent rhythm point detection in each mode, in memory and streaming."""
+    from environment.roles.vid_rhythm import music_filter
+
+    seconds = ctx.fixtures.seconds(180)
+    audio, _ = ctx.fixtures.music("music", seconds)
+    # the per-file analysis cache would turn every repeat after the first into a lookup
+    music_filter._ANALYSIS_CACHE.clear()
+
+    agent = music_filter.MusicAgent()
+    with ctx.stage("load", units=seconds, unit="audio_s"):
+        agent.load_audio(audio)
+    for mode in music_filter.DETECTION_MODES:
+        with ctx.stage(f"detect_{mode}", units=seconds, unit="audio_s"):
+            agent.detect_rhythm_points(mode=mode)
+    with ctx.stage("stream_rms", units=seconds, unit="audio_s"):
+        for _ in agent.stream_rhythm_points(audio):
+            pass
+
+
+def _editor_inputs(ctx, seconds, beat_interval=2.0):
+    """Index, retrieved segments, storyboard, cut points and music for the editors, in the job's layout."""
+    job = ctx.job
+    video = ctx.fixtures.video("editvideo", seconds)
+    # the editors look clips up by segment name under video_source/
+    source = os.path.join(job.video_source_dir, "editvideo.mp4")
+    if not os.path.exists(source):
+        shutil.copyfile(video, source)
+
+    segment_length = 10
+    segments = {str(i): {"time": f"{i * segment_length}-{(i + 1) * segment_length}"}
+                for i in range(int(seconds // segment_length))}
+    with open(os.path.join(job.index_dir, 'kv_store_video_segments.json'), 'w', encoding='utf-8') as f:
+        json.dump({"editvideo": segments}, f)
+
+    cuts = [round(beat_interval * (i + 1), 3) for i in range(int(seconds * 0.8 / beat_interval))]
+    with open(job.path('scene_output', 'visual_retrieved_segments.json'), 'w', encoding='utf-8') as f:
+        json.dump([f"editvideo_{i % len(segments)}" for i in range(len(cuts))], f)
+    scenes = ctx.fixtures.scenes(len(cuts))
+    storyboard = {"segment_scene": "/////".join(f"Scene {i + 1}\n{scene}" for i, scene in enumerate(scenes))}
+    with open(job.path('scene_output', 'video_scene.json'), 'w', encoding='utf-8') as f:
+        json.dump(storyboard, f)
+
+    music, _ = ctx.fixtures.music("editmusic", seconds)
+    return cuts, music
+
+
+@benchmark("editor_render", requires=("torch", "moviepy", "transformers", "PIL", "ffmpeg"))
+def bench_editor_render(ctx):
+    """Rhythm and commentary editors: clip selection from the EDL, concatenation and encode."""
+    from environment.roles.vid_comm.vid_editor import VideoEditor as CommentaryEditor
+    from environment.roles.vid_rhythm.vid_editor import VideoEditor as RhythmEditor
+
+    seconds = ctx.fixtures.seconds(120)
+    cuts, music = _editor_inputs(ctx, seconds)
+    rendered = cuts[-1]
+    storyboard = ctx.job.path('scene_output', 'video_scene.json')
+
+    rhythm_points = ctx.job.path('music_analysis', 'rhythm_points.json')
+    with open(rhythm_points, 'w', encoding='utf-8') as f:
+        json.dump({"beat_data": {"beats": [{"id": i + 1, "timestamp": t} for i, t in enumerate(cuts)]}}, f)
+    editor = RhythmEditor(job=ctx.job, model=stubs.StubVLM())
+    with ctx.stage("render_rhythm", units=rendered, unit="video_s"):
+        editor.process_video(rhythm_points, storyboard, music,
+                             output_file=ctx.job.path('video_output', 'rhythm.mp4'))
+
+    sentence_cuts = ctx.job.path('voice_gen', 'gen_audio_timestamps.json')
+    with open(sentence_cuts, 'w', encoding='utf-8') as f:
+        json.dump({"sentence_data": {"chunks": [{"id": i + 1, "timestamp": t} for i, t in enumerate(cuts)]}}, f)
+    editor = CommentaryEditor(job=ctx.job, model=stubs.StubVLM())
+    with ctx.stage("render_commentary", units=rendered, unit="video_s"):
+        editor.process_video(sentence_cuts, storyboard, music, keep_original_audio=True,
+                             output_file=ctx.job.path('video_output', 'commentary.mp4'))
+
+
+@benchmark("slicers", requires=("numpy", "soundfile"))
+def bench_slicers(ctx):
+    """fap's silence slicer in memory and streaming from the file, and MadTTSSlicer on top of it."""
+    import soundfile as sf
+
+    from environment.roles.audio_preprocessor import import_fap
+
+    slicer_module = import_fap("utils.slicer")
+    seconds = ctx.fixtures.seconds(600)
+    path = ctx.fixtures.speech("speech", seconds)
+
+    with ctx.stage("read", units=seconds, unit="audio_s"):
+        audio, rate = sf.read(path, dtype='float32', always_2d=True)
+        audio = audio.T
+    slicer = slicer_module.Slicer(sr=rate, threshold=-40, min_length=5000, min_interval=300,
+                                  hop_size=10, max_sil_kept=500)
+    with ctx.stage("slice_ranges", units=seconds, unit="audio_s"):
+        slicer.slice_ranges(audio)
+    with ctx.stage("iter_file_slices", units=seconds, unit="audio_s"):
+        for _ in slicer_module.iter_file_slices(path):
+            pass
+
+    if ctx.has("librosa"):
+        from environment.roles.mad_tts.mad_tts_slicer import MadTTSSlicer
+        with ctx.stage("mad_tts_slice", units=seconds, unit="audio_s"):
+            for _ in MadTTSSlicer().slice(audio, rate):
+                pass
+
+
+@benchmark("subtitles", requires=("torch", "transformers", "moviepy", "tenacity", "ffmpeg"))
+def bench_subtitles(ctx):
+    """Commentary subtitles: audio extraction and segmentation, LLM refinement, SRT and burn-in."""
+    from environment.roles.vid_comm import vid_subtitler
+
+    seconds = ctx.fixtures.seconds(120)
+    video = ctx.fixtures.video("subvideo", seconds)
+    transcriber = stubs.make_transcriber(vid_subtitler)
+
+    with ctx.stage("transcribe", units=seconds, unit="video_s"):
+        result = transcriber.transcribe_video(video)
+    transcript = "\n".join(f"{segment['start']:.2f} --> {segment['end']:.2f}: {segment['text']}"
+                           for segment in result['segments'])
+    with stubs.StubLLM(stubs.echo_transcript).install():
+        with ctx.stage("refine", units=len(result['segments']), unit="segments"):
+            vid_subtitler.LLMClient().refine_subtitles(transcript, "\n".join(ctx.fixtures.scenes(6)))
+    srt = ctx.job.path('writing_data', 'subtitles.srt')
+    with ctx.stage("srt", units=len(result['segments']), unit="segments"):
+        transcriber.create_srt(result, srt)
+    with ctx.stage("burn", units=seconds, unit="video_s"):
+        transcriber.add_subtitles_with_ffmpeg(video, srt, ctx.job.path('video_output', 'subtitled.mp4'))
+
+
+@benchmark("midi_annotation", requires=("mido",))
+def bench_midi_annotation(ctx):
+    """MIDI note/duration annotation aligned to lyrics for DiffSinger."""
+    from environment.roles.mad_svc.mad_svc_annotator import analyze_midi
+
+    midi, notes = ctx.fixtures.midi("melody", ctx.fixtures.count(2000))
+    output = ctx.job.path('writing_data', 'annotation.json')
+    with ctx.stage("analyze_midi", units=notes, unit="notes"):
+        result = analyze_midi(midi, ctx.fixtures.lyrics(notes), output)
+    if result is None:
+        raise RuntimeError("analyze_midi found no track matching the lyrics")
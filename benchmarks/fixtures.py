@@ -0,0 +1,170 @@
+import os
+import shutil
+import subprocess
+
+import numpy as np
+
+LYRIC_CHARS = "春风吹过山岗明月照着大江星光落在肩上我们一起歌唱"
+SCENES = (
+    "A red car drives along a coastal road at sunset",
+    "Two friends laugh together in a crowded market",
+    "Rain falls on a quiet city street at night",
+    "A child runs through a field of tall grass",
+    "An old man reads a letter by the window",
+    "Fireworks light up the sky above the harbor",
+)
+
+
+def has_ffmpeg():
+    return shutil.which('ffmpeg') is not None
+
+
+class Fixtures:
+    """
+    Synthetic benchmark inputs, generated locally and deterministically.
+
+    Files are written once under `root` and reused by every benchmark and
+    repeat of a run. Durations and counts are multiplied by `scale`, so
+    `--scale 0.1` gives a quick smoke run and `--scale 4` a long-job profile.
+    """
+
+    def __init__(self, root, scale=1.0, seed=0):
+        self.root = root
+        self.scale = scale
+        self.seed = seed
+        os.makedirs(root, exist_ok=True)
+
+    def seconds(self, seconds):
+        return max(1.0, round(seconds * self.scale, 3))
+
+    def count(self, count):
+        return max(1, int(round(count * self.scale)))
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _rng(self, name):
+        return np.random.default_rng([self.seed, sum(name.encode('utf-8'))])
+
+    def _write_wav(self, name, audio, sr):
+        import soundfile as sf
+        path = self._path(name)
+        if not os.path.exists(path):
+            sf.write(path, np.clip(audio, -1.0, 1.0).astype(np.float32), sr)
+        return path
+
+    def video(self, name, seconds, size='320x240', rate=24):
+        """
+        Test-pattern video with a sine tone track, encoded with ffmpeg's lavfi sources.
+
+        Args:
+            name (str): File stem; VideoRAG derives segment ids from it, so no '_'
+            seconds (float): Duration
+            size (str): Frame size
+            rate (int): Frame rate
+
+        Returns:
+            str: Path of the .mp4
+        """
+        path = self._path(f"{name}.mp4")
+        if os.path.exists(path):
+            return path
+        cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate={rate}:duration={seconds}",
+            '-f', 'lavfi', '-i', f"sine=frequency=440:beep_factor=4:sample_rate=44100:duration={seconds}",
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-shortest',
+            path,
+        ]
+        subprocess.run(cmd, check=True)
+        return path
+
+    def music(self, name, seconds, bpm=120, sr=44100):
+        """
+        Drum-like track: decaying low tones on every beat, noise hits on the off-beats, a quiet pad.
+
+        Returns:
+            tuple: (path, beat times in seconds)
+        """
+        rng = self._rng(name)
+        n = int(seconds * sr)
+        t = np.arange(n) / sr
+        audio = 0.05 * np.sin(2 * np.pi * 220.0 * t)
+
+        beat = 60.0 / bpm
+        beats = np.arange(0.0, seconds - beat, beat)
+        hit = int(0.15 * sr)
+        envelope = np.exp(-np.arange(hit) / (0.03 * sr))
+        kick = 0.8 * np.sin(2 * np.pi * 60.0 * np.arange(hit) / sr) * envelope
+        for start in beats:
+            i = int(start * sr)
+            audio[i:i + hit] += kick[:n - i]
+            j = int((start + beat / 2) * sr)
+            if j < n:
+                audio[j:j + hit] += 0.2 * rng.standard_normal(min(hit, n - j)) * envelope[:min(hit, n - j)]
+        return self._write_wav(f"{name}.wav", audio, sr), beats
+
+    def speech(self, name, seconds, sr=44100):
+        """
+        Speech-like audio: harmonic bursts of 0.5-4 s separated by 0.2-1.2 s of near silence.
+
+        Returns:
+            str: Path of the .wav
+        """
+        rng = self._rng(name)
+        n = int(seconds * sr)
+        audio = 0.001 * rng.standard_normal(n)
+        position = 0
+        while position < n:
+            length = int(rng.uniform(0.5, 4.0) * sr)
+            t = np.arange(min(length, n - position)) / sr
+            pitch = rng.uniform(100.0, 250.0)
+            voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+            voiced *= 0.3 * (0.6 + 0.4 * np.sin(2 * np.pi * 4.0 * t)) * np.hanning(len(t))
+            audio[position:position + len(t)] += voiced
+            position += length + int(rng.uniform(0.2, 1.2) * sr)
+        return self._write_wav(f"{name}.wav", audio, sr)
+
+    def noise(self, name, seconds, sr=44100, level=0.1):
+        return self._write_wav(f"{name}.wav", level * self._rng(name).standard_normal(int(seconds * sr)), sr)
+
+    def midi(self, name, notes, bpm=100, ticks_per_beat=480):
+        """
+        Single-voice melody with a rest every 8 notes and a tempo change halfway through.
+
+        Returns:
+            tuple: (path, number of notes)
+        """
+        import mido
+
+        path = self._path(f"{name}.mid")
+        if os.path.exists(path):
+            return path, notes
+
+        rng = self._rng(name)
+        mid = mido.MidiFile(ticks_per_beat=ticks_per_beat)
+        track = mido.MidiTrack()
+        track.name = "melody"
+        mid.tracks.append(track)
+        track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(bpm), time=0))
+
+        pitches = rng.integers(60, 72, notes)
+        lengths = rng.choice([ticks_per_beat // 2, ticks_per_beat, ticks_per_beat * 2], notes)
+        for i, (pitch, length) in enumerate(zip(pitches, lengths)):
+            gap = ticks_per_beat if i and i % 8 == 0 else 0
+            if i == notes // 2:
+                track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(bpm * 1.25), time=gap))
+                gap = 0
+            track.append(mido.Message('note_on', note=int(pitch), velocity=80, time=int(gap)))
+            track.append(mido.Message('note_off', note=int(pitch), velocity=0, time=int(length)))
+        mid.save(path)
+        return path, notes
+
+    @staticmethod
+    def lyrics(count):
+        return (LYRIC_CHARS * (count // len(LYRIC_CHARS) + 1))[:count]
+
+    @staticmethod
+    def scenes(count):
+        return [SCENES[i % len(SCENES)] for i in range(count)]
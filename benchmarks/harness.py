@@ -0,0 +1,299 @@
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import time
+import traceback
+
+from environment.utils.feature_store import PROJECT_ROOT
+from environment.utils.job_context import JobContext
+from environment.utils.tracing import span, trace_job
+
+from .fixtures import Fixtures, has_ffmpeg
+
+RESULTS_VERSION = 1
+
+# benchmark name -> Benchmark, in registration order
+BENCHMARKS = {}
+
+
+class Benchmark:
+    """
+    One subsystem benchmark.
+
+    Args:
+        name (str): Name used on the command line and in result files
+        fn (callable): Called with a BenchContext once per repeat
+        requires (tuple): Importable modules it needs; 'ffmpeg' means the ffmpeg binary
+    """
+
+    def __init__(self, name, fn, requires=()):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+        self.description = (fn.__doc__ or '').strip().split('\n')[0]
+
+    def missing(self):
+        missing = []
+        for requirement in self.requires:
+            if requirement == 'ffmpeg':
+                if not has_ffmpeg():
+                    missing.append(requirement)
+            elif importlib.util.find_spec(requirement) is None:
+                missing.append(requirement)
+        return missing
+
+
+def benchmark(name, requires=()):
+    """Register a benchmark function: @benchmark("slicers", requires=("soundfile",))."""
+
+    def decorate(fn):
+        if name in BENCHMARKS:
+            raise ValueError(f"Duplicate benchmark: {name}")
+        BENCHMARKS[name] = Benchmark(name, fn, requires)
+        return fn
+
+    return decorate
+
+
+class BenchContext:
+    """
+    What a benchmark function gets for one repeat: fixtures, a fresh job workspace and stage timing.
+
+    Stages are tracing spans, so the roles, model loads and LLM calls they
+    run are recorded as nested spans of the same job.
+    """
+
+    def __init__(self, name, workdir, fixtures, repeat):
+        self.name = name
+        self.fixtures = fixtures
+        self.repeat = repeat
+        self.job = JobContext.create(f"{name}-{repeat}", jobs_dir=os.path.join(workdir, 'jobs'),
+                                     shared_dir=os.path.join(workdir, 'shared', name))
+
+    def stage(self, name, units=None, unit=None):
+        """
+        Time a stage. `units` of work per run (audio seconds, notes, ...) give its throughput.
+
+            with ctx.stage("detect_rms", units=duration, unit="audio_s"):
+                agent.detect_rhythm_points(mode="rms")
+        """
+        return span(name, category='stage', units=units, unit=unit)
+
+    @staticmethod
+    def has(module):
+        return importlib.util.find_spec(module) is not None
+
+
+def _aggregate(runs):
+    """Per stage statistics over the spans of all repeats."""
+    stages = {}
+    for spans in runs:
+        for s in spans:
+            if s["cat"] != 'stage':
+                continue
+            entry = stages.setdefault(s["name"], {
+                "runs": [], "cpu": [], "rss_peak_mb": None, "cuda_peak_mb": None,
+                "units": s["args"].get("units"), "unit": s["args"].get("unit"), "errors": 0,
+            })
+            entry["runs"].append(s["seconds"])
+            entry["cpu"].append(s["cpu_seconds"] + (s["child_cpu_seconds"] or 0.0))
+            entry["errors"] += s["status"] != 'ok'
+            for key in ("rss_peak_mb", "cuda_peak_mb"):
+                if s[key] is not None:
+                    entry[key] = max(entry[key] or 0.0, s[key])
+
+    results = {}
+    for name, entry in stages.items():
+        runs = entry["runs"]
+        median = statistics.median(runs)
+        result = {
+            "median": round(median, 6),
+            "min": round(min(runs), 6),
+            "max": round(max(runs), 6),
+            "stdev": round(statistics.stdev(runs), 6) if len(runs) > 1 else 0.0,
+            "runs": [round(r, 6) for r in runs],
+            "cpu_seconds": round(statistics.median(entry["cpu"]), 6),
+            "rss_peak_mb": entry["rss_peak_mb"],
+            "cuda_peak_mb": entry["cuda_peak_mb"],
+            "errors": entry["errors"],
+        }
+        if entry["units"]:
+            result["units"] = entry["units"]
+            result["unit"] = entry["unit"]
+            result["throughput"] = round(entry["units"] / median, 3) if median > 0 else None
+        results[name] = result
+    return results
+
+
+def _detail(spans):
+    """Nested role / model_load / llm spans of the last repeat, totalled by name."""
+    detail = {}
+    for s in spans:
+        if s["cat"] == 'stage':
+            continue
+        entry = detail.setdefault(s["name"], {"cat": s["cat"], "count": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["seconds"] = round(entry["seconds"] + s["seconds"], 6)
+    return detail
+
+
+def run_benchmark(bench, workdir, fixtures, repeat=3, warmup=0):
+    """
+    Run one benchmark `warmup + repeat` times; only the last `repeat` runs are kept.
+
+    Returns:
+        dict: status ('ok', 'skipped' or 'error') and per stage statistics
+    """
+    missing = bench.missing()
+    if missing:
+        return {"status": "skipped", "reason": f"missing: {', '.join(missing)}"}
+
+    runs = []
+    start = time.perf_counter()
+    try:
+        for i in range(warmup + repeat):
+            ctx = BenchContext(bench.name, workdir, fixtures, i)
+            with trace_job(ctx.job):
+                bench.fn(ctx)
+            if i >= warmup:
+                runs.append(list(ctx.job.spans))
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+
+    return {
+        "status": "ok",
+        "seconds": round(time.perf_counter() - start, 3),
+        "stages": _aggregate(runs),
+        "detail": _detail(runs[-1]) if runs else {},
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info():
+    return {
+        "commit": _git('rev-parse', 'HEAD'),
+        "dirty": bool(_git('status', '--porcelain', '--untracked-files=no')),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": has_ffmpeg(),
+    }
+
+
+def run_all(names=None, workdir=None, repeat=3, warmup=0, scale=1.0, keep=False):
+    """
+    Run the selected benchmarks (all by default).
+
+    Returns:
+        dict: result document, see save_results
+    """
+    unknown = [name for name in names or () if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)} (available: {', '.join(BENCHMARKS)})")
+
+    workdir = workdir or os.path.join(PROJECT_ROOT, 'dataset', '.bench')
+    fixtures = Fixtures(os.path.join(workdir, 'fixtures', f"scale{scale:g}"), scale=scale)
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "environment": environment_info(),
+        "settings": {"repeat": repeat, "warmup": warmup, "scale": scale},
+        "benchmarks": {},
+    }
+    try:
+        for name in names or BENCHMARKS:
+            print(f"[{name}] running...")
+            result = run_benchmark(BENCHMARKS[name], workdir, fixtures, repeat, warmup)
+            document["benchmarks"][name] = result
+            if result["status"] == 'ok':
+                for stage, stats in result["stages"].items():
+                    rate = f", {stats['throughput']} {stats['unit']}/s" if stats.get("throughput") else ""
+                    print(f"[{name}] {stage}: {stats['median'] * 1000:.1f} ms median{rate}")
+            else:
+                print(f"[{name}] {result['status']}: {result.get('reason') or result.get('error')}")
+    finally:
+        if not keep:
+            shutil.rmtree(os.path.join(workdir, 'jobs'), ignore_errors=True)
+            shutil.rmtree(os.path.join(workdir, 'shared'), ignore_errors=True)
+    return document
+
+
+def save_results(document, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.10, min_seconds=0.02):
+    """
+    Compare two result documents stage by stage.
+
+    A stage regresses when its median cost grows by more than `threshold`
+    (relative) and by more than `min_seconds` (absolute, against timer noise
+    on very short stages). Costs are per unit of work when the stage declares
+    units, so baselines taken at another --scale still compare.
+
+    Returns:
+        list: rows of (benchmark, stage, verdict, baseline median, current median, ratio);
+              verdict is 'regression', 'improvement', 'same', 'new' or 'missing'
+    """
+    rows = []
+    base_benchmarks = baseline.get("benchmarks", {})
+    for name, result in current.get("benchmarks", {}).items():
+        base = base_benchmarks.get(name)
+        if result.get("status") != 'ok' or not base or base.get("status") != 'ok':
+            continue
+        for stage, stats in result["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if base_stats is None:
+                rows.append((name, stage, 'new', None, stats["median"], None))
+                continue
+            per_unit = bool(stats.get("units") and base_stats.get("units"))
+            base_cost = base_stats["median"] / base_stats["units"] if per_unit else base_stats["median"]
+            cost = stats["median"] / stats["units"] if per_unit else stats["median"]
+            ratio = cost / base_cost if base_cost > 0 else None
+            # absolute change at the current run's size
+            delta = (cost - base_cost) * (stats["units"] if per_unit else 1.0)
+            if ratio is not None and ratio > 1.0 + threshold and delta > min_seconds:
+                verdict = 'regression'
+            elif ratio is not None and ratio < 1.0 / (1.0 + threshold) and -delta > min_seconds:
+                verdict = 'improvement'
+            else:
+                verdict = 'same'
+            rows.append((name, stage, verdict, base_stats["median"], stats["median"], ratio))
+        for stage in base["stages"]:
+            if stage not in result["stages"]:
+                rows.append((name, stage, 'missing', base["stages"][stage]["median"], None, None))
+    return rows
+
+
+def format_comparison(rows, baseline=None, current=None):
+    lines = []
+    if baseline is not None and current is not None:
+        lines.append(f"baseline {baseline['environment'].get('commit') or '?'} "
+                     f"-> current {current['environment'].get('commit') or '?'}")
+    for name, stage, verdict, base, cur, ratio in rows:
+        base_ms = f"{base * 1000:.1f} ms" if base is not None else "-"
+        cur_ms = f"{cur * 1000:.1f} ms" if cur is not None else "-"
+        change = f"{(ratio - 1.0) * 100:+.1f}%" if ratio is not None else ""
+        marker = "!!" if verdict == 'regression' else "  "
+        lines.append(f"{marker} {name}/{stage}: {base_ms} -> {cur_ms} {change} {verdict}")
+    return "\n".join(lines)
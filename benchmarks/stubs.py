@@ -0,0 +1,216 @@
+"""
+Local stand-ins for the LLM API and the large models, so benchmarks run CPU-only without network.
+
+The stubs keep the interfaces the pipelines call (chat completions, the
+whisper pipeline result, MiniCPM-V's chat, VideoRAG's vector storage), and
+replace the model with something tiny: fixed answers or a seeded random
+projection. What is measured is everything around the model: decoding,
+framing, storage, subprocesses and encoding.
+"""
+import asyncio
+import os
+import re
+import time
+import zlib
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+
+EMBEDDING_DIM = 1024
+
+
+class StubLLM:
+    """
+    Chat completion client answering locally; installed into the LLM gateway.
+
+        with StubLLM(responder).install():
+            gpt(user="...")  # answered by responder(model, messages)
+
+    The gateway's response cache is bypassed while installed, so every repeat does the same work.
+    """
+
+    def __init__(self, responder=None, latency=0.0):
+        self.responder = responder or (lambda model, messages: "OK")
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, **params):
+        from openai.types.chat import ChatCompletion
+
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatCompletion.model_validate({
+            "id": f"stub-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": self.responder(model, messages)},
+            }],
+        })
+
+    @contextmanager
+    def install(self, gateway=None):
+        if gateway is None:
+            from environment.config.llm import gateway
+        gateway._ensure_loop()
+        saved = gateway._client, gateway.cache
+        gateway._client, gateway.cache = self, None
+        try:
+            yield self
+        finally:
+            gateway._client, gateway.cache = saved
+
+
+class StubVLM:
+    """MiniCPM-V's chat() answering with the first frame, for the editors' clip selection."""
+
+    def chat(self, image=None, msgs=None, tokenizer=None, **params):
+        return "0"
+
+
+class StubASRPipeline:
+    """
+    transformers ASR pipeline stand-in: one chunk of fixed text every `chunk_seconds` of the input.
+    """
+
+    def __init__(self, chunk_seconds=2.5, text="the quick brown fox jumps over the lazy dog, again and again"):
+        self.chunk_seconds = chunk_seconds
+        self.text = text
+
+    def __call__(self, audio_path, **kwargs):
+        import soundfile as sf
+
+        duration = sf.info(audio_path).duration
+        starts = np.arange(0.0, duration, self.chunk_seconds)
+        chunks = [
+            {"timestamp": (round(float(start), 2), round(float(min(start + self.chunk_seconds, duration)), 2)),
+             "text": self.text}
+            for start in starts
+        ]
+        return {"text": " ".join(chunk["text"] for chunk in chunks), "chunks": chunks}
+
+
+def make_transcriber(vid_subtitler, pipe=None):
+    """VideoTranscriber using `pipe` instead of loading Whisper."""
+
+    class StubTranscriber(vid_subtitler.VideoTranscriber):
+        def __init__(self):
+            self.device = "cpu"
+            self.torch_dtype = None
+            self.punctuation = vid_subtitler.string.punctuation + '，。？！；：""''（）【】《》「」『』、'
+            self.pipe = pipe or StubASRPipeline()
+
+    return StubTranscriber()
+
+
+def _projection(rows, seed):
+    """Fixed random weights of the stub embedders."""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((rows, EMBEDDING_DIM)).astype(np.float32) / np.sqrt(rows)
+
+
+_BYTE_WEIGHTS = None
+_TEXT_WEIGHTS = None
+
+
+def embed_bytes(data):
+    """Unit vector from the byte histogram of a file, through a random projection."""
+    global _BYTE_WEIGHTS
+    if _BYTE_WEIGHTS is None:
+        _BYTE_WEIGHTS = _projection(256, 1)
+    histogram = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256).astype(np.float32)
+    vector = (histogram / max(histogram.sum(), 1.0)) @ _BYTE_WEIGHTS
+    return vector / max(np.linalg.norm(vector), 1e-12)
+
+
+def embed_text(text, buckets=4096):
+    """Unit vector from hashed character trigrams, through a random projection."""
+    global _TEXT_WEIGHTS
+    if _TEXT_WEIGHTS is None:
+        _TEXT_WEIGHTS = _projection(buckets, 2)
+    text = f"  {text.lower()}  "
+    histogram = np.zeros(buckets, dtype=np.float32)
+    for i in range(len(text) - 2):
+        histogram[zlib.crc32(text[i:i + 3].encode('utf-8')) % buckets] += 1.0
+    vector = histogram @ _TEXT_WEIGHTS
+    return vector / max(np.linalg.norm(vector), 1e-12)
+
+
+def text_similarity(text1, text2):
+    """Stand-in for VideoRAG's sentence-transformers similarity."""
+    return float(embed_text(text1) @ embed_text(text2))
+
+
+def stub_speech_to_text(video_name, working_dir, segment_index2name, audio_output_format):
+    """VideoRAG ASR stand-in: reads each segment's audio file and returns a fixed transcript."""
+    cache_path = os.path.join(working_dir, '_cache', video_name)
+    transcripts = {}
+    for index, segment_name in segment_index2name.items():
+        audio_file = os.path.join(cache_path, f"{segment_name}.{audio_output_format}")
+        with open(audio_file, 'rb') as f:
+            size = len(f.read())
+        transcripts[index] = f"[0.00s -> 30.00s] segment {index} ({size} bytes of audio)"
+    return transcripts
+
+
+def stub_segment_caption(video_name, video_path, segment_index2name, transcripts, segment_times_info,
+                         caption_result, error_queue):
+    """VideoRAG caption stand-in; runs in a child process like the real one."""
+    try:
+        from benchmarks.fixtures import SCENES
+        for index in segment_index2name:
+            caption_result[index] = SCENES[int(index) % len(SCENES)]
+    except Exception as e:
+        error_queue.put(f"Error in segment_caption:\n {str(e)}")
+        raise RuntimeError
+
+
+def make_vector_storage(vdb_module):
+    """VideoRAG segment storage embedding with the stub embedders instead of ImageBind."""
+
+    class RandomProjectionVectorStorage(vdb_module.NanoVectorDBVideoSegmentStorage):
+        async def upsert(self, video_name, segment_index2name, video_output_format):
+            cache_path = os.path.join(self.global_config["working_dir"], '_cache', video_name)
+            list_data = []
+            for index, segment_name in segment_index2name.items():
+                with open(os.path.join(cache_path, f"{segment_name}.{video_output_format}"), 'rb') as f:
+                    vector = embed_bytes(f.read())
+                list_data.append({
+                    "__id__": f"{video_name}_{index}",
+                    "__video_name__": video_name,
+                    "__index__": index,
+                    "__vector__": vector,
+                })
+            return self._client.upsert(datas=list_data)
+
+        async def query(self, query):
+            results = self._client.query(query=embed_text(query), top_k=self.top_k, better_than_threshold=-1)
+            return [{**dp, "id": dp["__id__"], "distance": dp["__metrics__"]} for dp in results]
+
+    return RandomProjectionVectorStorage
+
+
+@contextmanager
+def patched(module, **attributes):
+    """Temporarily replace module attributes (the names a pipeline looks up at call time)."""
+    saved = {name: getattr(module, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(module, name, value)
+    try:
+        yield module
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def echo_transcript(model, messages):
+    """Responder for the subtitle refiner: returns the transcribed part of the prompt unchanged."""
+    prompt = messages[-1]["content"]
+    match = re.search(r"And here's what was transcribed:\s*(.*?)\s*Only correct", prompt, re.S)
+    return match.group(1) if match else prompt
@@ -2,9 +2,17 @@ from abc import ABC, abstractmethod
 from typing import List, Dict
 from queue import Queue
 from ..communication.message import Message
+from ..utils.tracing import traced
 
 
 class BaseAgent(ABC):
+    def __init_subclass__(cls, **kwargs):
+        # every role's process_message is a tracing span of the job running it
+        super().__init_subclass__(**kwargs)
+        process_message = cls.__dict__.get('process_message')
+        if process_message is not None and not getattr(process_message, '__traced__', False):
+            cls.process_message = traced(f"{cls.__name__}.process_message", category='role')(process_message)
+
     def __init__(self):
         self.message_queue = Queue()
 
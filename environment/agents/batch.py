@@ -0,0 +1,168 @@
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from environment.utils.job_context import DEFAULT_JOBS_DIR, JobContext
+from environment.utils.model_pool import get_model_pool
+from environment.utils.tracing import summarize
+
+
+def load_jobs(jobs_path):
+    """
+    Read a JSONL job file, one job per line:
+
+        {"id": "nezha-01", "function": "gen_rhy_vid", "config": "jobs/nezha-01.yml"}
+        {"intent": "make a commentary video of the novel", "config": {"comm_agent": {"idea": "..."}}}
+
+    "function" names a MultiAgent function; otherwise "intent" is routed like an
+    interactive request. "config" is a YAML/JSON overrides file (relative to the
+    job file) or an inline dict, merged over the agent's environment/config yml.
+
+    Returns:
+        list: job dicts with "id", "function", "intent" and "overrides"
+    """
+    base_dir = os.path.dirname(os.path.abspath(jobs_path))
+    jobs = []
+    with open(jobs_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            spec = json.loads(line)
+            if not spec.get("function") and not spec.get("intent"):
+                raise ValueError(f"{jobs_path}:{line_no}: job needs a 'function' or an 'intent'")
+
+            overrides = spec.get("config") or {}
+            if isinstance(overrides, str):
+                config_path = overrides if os.path.isabs(overrides) else os.path.join(base_dir, overrides)
+                with open(config_path, 'r', encoding='utf-8') as cf:
+                    overrides = yaml.safe_load(cf) or {}
+            if not isinstance(overrides, dict):
+                raise ValueError(f"{jobs_path}:{line_no}: 'config' must be a mapping or a path to one")
+
+            jobs.append({
+                "id": str(spec.get("id") or f"job{line_no:04d}"),
+                "function": spec.get("function"),
+                "intent": spec.get("intent"),
+                "overrides": overrides,
+            })
+
+    ids = [job["id"] for job in jobs]
+    duplicates = sorted({job_id for job_id in ids if ids.count(job_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job ids in {jobs_path}: {', '.join(duplicates)}")
+    return jobs
+
+
+def _status(result):
+    if result is None:
+        return "failed"
+    if isinstance(result, dict) and result.get("status") == "error":
+        return "error"
+    return "success"
+
+
+class BatchRunner:
+    """
+    Runs many MultiAgent jobs in one process without prompting.
+
+    Every job gets its own workspace under `jobs_dir` and up to `max_jobs` run
+    at once. Their stages queue on the process-wide gpu/llm/cpu resource slots
+    (stage_graph.configure_resources), so e.g. one job's video encode overlaps
+    another job's TTS, and models are loaded once in the shared model pool.
+    Each job writes `<workspace>/manifest.json` with its result, stage
+    timings and trace summary (the full trace is `<workspace>/trace.json`);
+    the whole run is summarized in one batch manifest.
+    """
+
+    def __init__(self, multi_agent, jobs_dir=DEFAULT_JOBS_DIR, max_jobs=4):
+        self.multi_agent = multi_agent
+        self.jobs_dir = jobs_dir
+        self.max_jobs = max_jobs
+
+    def route(self, jobs):
+        """Fill in "function" for free-text jobs with one batched intent classification."""
+        pending = [job for job in jobs if not job["function"]]
+        if pending:
+            print(f"Routing {len(pending)} free-text jobs...")
+            for job, func in zip(pending, self.multi_agent.classify_intents([job["intent"] for job in pending])):
+                job["function"] = func
+        return jobs
+
+    def run_job(self, job):
+        context = JobContext.create(job["id"], jobs_dir=self.jobs_dir, overrides=job["overrides"])
+        manifest = {
+            "id": job["id"],
+            "function": job["function"],
+            "intent": job["intent"],
+            "workspace": context.workspace,
+            "overrides": job["overrides"],
+            "started_at": time.time(),
+        }
+        start = time.perf_counter()
+        try:
+            if job["function"] is None:
+                result = {"status": "error", "message": f"Could not route intent: {job['intent']!r}"}
+            else:
+                print(f"[{job['id']}] running {job['function']}")
+                result = self.multi_agent.execute_function(job["function"], job=context)
+        except Exception as e:
+            result = {"status": "error", "message": str(e), "traceback": traceback.format_exc()}
+
+        manifest.update({
+            "status": _status(result),
+            "finished_at": time.time(),
+            "seconds": round(time.perf_counter() - start, 3),
+            "stages": context.stages,
+            "profile": summarize(context.spans),
+            "trace": os.path.join(context.workspace, 'trace.json'),
+            "result": result,
+        })
+        manifest_path = os.path.join(context.workspace, 'manifest.json')
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+        print(f"[{job['id']}] {manifest['status']} in {manifest['seconds']:.1f}s, manifest: {manifest_path}")
+        manifest["manifest"] = manifest_path
+        return manifest
+
+    def run(self, jobs, manifest_path=None):
+        """
+        Run all jobs and write the batch manifest.
+
+        Returns:
+            dict: the batch manifest
+        """
+        started_at = time.time()
+        start = time.perf_counter()
+        self.route(jobs)
+
+        with ThreadPoolExecutor(max_workers=self.max_jobs) as pool:
+            manifests = list(pool.map(self.run_job, jobs))
+
+        counts = {}
+        for manifest in manifests:
+            counts[manifest["status"]] = counts.get(manifest["status"], 0) + 1
+        summary = {
+            "started_at": started_at,
+            "finished_at": time.time(),
+            "seconds": round(time.perf_counter() - start, 3),
+            "counts": counts,
+            "models": [str(key) for key in get_model_pool().loaded()],
+            "jobs": [{key: manifest[key] for key in ("id", "function", "status", "seconds", "manifest")}
+                     for manifest in manifests],
+        }
+
+        manifest_path = manifest_path or os.path.join(self.jobs_dir, f"batch_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Batch finished: {counts}, manifest: {manifest_path}")
+        return summary
+
+
+def run_batch(multi_agent, jobs_path, max_jobs=4, jobs_dir=DEFAULT_JOBS_DIR, manifest_path=None):
+    return BatchRunner(multi_agent, jobs_dir=jobs_dir, max_jobs=max_jobs).run(load_jobs(jobs_path), manifest_path)
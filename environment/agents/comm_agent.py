@@ -9,11 +9,15 @@ from environment.roles.vid_comm.voice_maker import voice_main
 from environment.roles.vid_comm.vid_searcher import video_search_main
 from environment.roles.vid_comm.vid_editor import main
 from environment.roles.vid_comm.vid_subtitler import subtitler_main
+from environment.utils.job_context import resolve_job
+from environment.utils.stage_graph import StageError, StageGraph
 
 class CommAgent:
-    def __init__(self, config):
+    def __init__(self, config, job=None):
         # Store the config
         self.config = config
+        # Workspace for this run's intermediate files
+        self.job = resolve_job(job)
         
         # Get the project root path for resolving relative paths
         self.project_root = self._get_project_root()
@@ -36,10 +40,12 @@ class CommAgent:
         self.logger = logging.getLogger(__name__)
         logging_handler = logging.StreamHandler()
         logging_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(logging_handler)
+        if not self.logger.handlers:  # one handler however many agents run in the process
+            self.logger.addHandler(logging_handler)
         self.logger.setLevel(logging.INFO)
         
         self.logger.info(f"Initialized with project root: {self.project_root}")
+        self.logger.info(f"Job workspace: {self.job.workspace}")
         self.logger.info(f"Commentary idea: {self.idea}")
         self.logger.info(f"Output file: {self.output}")
         if self.video_source_dir:
@@ -71,7 +77,7 @@ class CommAgent:
         
         try:
             # Initialize Pre_Loader
-            loader = Pre_Loader()
+            loader = Pre_Loader(job=self.job)
             
             # If custom video source directory is specified in config, update the loader
             if self.video_source_dir:
@@ -110,7 +116,7 @@ class CommAgent:
             }
             
             # Run the async function in the synchronous context
-            content_results = asyncio.run(content_main(config=content_config))
+            content_results = asyncio.run(content_main(config=content_config, job=self.job))
             
             self.logger.info("Content processing completed successfully")
             return content_results
@@ -125,7 +131,7 @@ class CommAgent:
         self.logger.info("Starting voice generation")
         try:
             # Run voice_main (synchronous function)
-            voice_results = voice_main()
+            voice_results = voice_main(job=self.job)
             self.logger.info("Voice generation completed successfully")
             return voice_results
         except Exception as e:
@@ -137,7 +143,7 @@ class CommAgent:
         self.logger.info("Starting video searching")
         try:
             # Call video_search_main
-            search_results = video_search_main()
+            search_results = video_search_main(job=self.job)
             self.logger.info("Video searching completed successfully")
             return search_results
         except Exception as e:
@@ -152,7 +158,8 @@ class CommAgent:
             # Call main function from vid_editer with our parameters
             editing_result = main(
                 input_path=self.video_source_dir,  # Use custom video source directory if specified
-                keep_original_audio=False
+                keep_original_audio=False,
+                job=self.job
             )
             
             self.logger.info(f"Video editing completed successfully.")
@@ -172,7 +179,8 @@ class CommAgent:
             
             # Call subtitler_main with our parameters
             subtitle_result = subtitler_main(
-                output_path=self.output
+                output_path=self.output,
+                job=self.job
             )
             
             self.logger.info(f"Video subtitle processing completed successfully. Output saved to: {self.output}")
@@ -184,38 +192,46 @@ class CommAgent:
     
     def orchestrator(self):
         """Main orchestration method."""
-        try:
-            preload_result  = self.preload_video()
-
-
-            content_result = self.process_content()
-            if not content_result:
-                self.logger.error("Content processing failed. Stopping the pipeline.")
-                return None
-                
-
-            voice_result = self.generate_voice()
-            
-
-            search_result = self.search_video()
-            
-
-            edit_result = self.process_edit()
+        video_source_dir = self.video_source_dir or self.job.video_source_dir
+        working_dir = self.job.index_dir
+        scene_output_dir = self.job.scene_output_dir
+        voice_gen_dir = self.job.voice_gen_dir
+        scene_path = os.path.join(scene_output_dir, "video_scene.json")
 
+        # indexing runs alongside the script; voice synthesis and the search both need the GPU,
+        # so with the default single gpu slot they run one after the other (see --gpu-workers)
+        graph = StageGraph(logger=self.logger, job=self.job)
+        graph.add("preload", self.preload_video, resource="gpu", inputs=[video_source_dir], outputs=[working_dir])
+        graph.add("content", self.process_content, resource="llm", check=bool, params={"idea": self.idea},
+                  inputs=[self.source_text, self.job.input_path('writing_data', "source_text.txt"),
+                          self.job.input_path('writing_data', "present_style.txt")],
+                  outputs=[scene_path])
+        graph.add("voice", self.generate_voice, resource="gpu", deps=["content"],
+                  inputs=[scene_path, self.job.voice_data_dir],
+                  outputs=[os.path.join(voice_gen_dir, 'gen_audio.wav'),
+                           os.path.join(voice_gen_dir, 'gen_audio_timestamps.json')])
+        graph.add("search", self.search_video, resource="gpu", deps=["preload", "content"],
+                  inputs=[scene_path, working_dir],
+                  outputs=[os.path.join(scene_output_dir, "visual_retrieved_segments.json")])
+        graph.add("edit", self.process_edit, resource="cpu", deps=["voice", "search"], cache=False)
+        graph.add("subtitle", self.process_subtitle, resource="gpu", deps=["edit"], cache=False)
 
-            subtitle_result = self.process_subtitle()
+        try:
+            results = graph.run()
 
-            
             self.logger.info("All processing completed successfully")
             
             return {
-                "content_result": content_result,
-                "voice_result": voice_result,
-                "search_result": search_result,
-                "edit_result": edit_result,
-                "process_subtitle": subtitle_result
+                "content_result": results["content"],
+                "voice_result": results["voice"],
+                "search_result": results["search"],
+                "edit_result": results["edit"],
+                "process_subtitle": results["subtitle"]
             }
             
+        except StageError:
+            self.logger.error("Content processing failed. Stopping the pipeline.")
+            return None
         except Exception as e:
             self.logger.error(f"Error in orchestration: {str(e)}")
             import traceback
@@ -223,7 +239,7 @@ class CommAgent:
             return None
 
 
-def gen_comm_vid():
+def gen_comm_vid(job=None):
     """Main entry point for the comm agent."""
     print("Welcome to the Commentary Generator")
     
@@ -244,7 +260,7 @@ def gen_comm_vid():
         return None
     
     with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+        config = resolve_job(job).apply_overrides(yaml.safe_load(f))
     
-    agent = CommAgent(config)
+    agent = CommAgent(config, job=job)
     return agent.orchestrator()
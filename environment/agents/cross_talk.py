@@ -3,24 +3,26 @@ import yaml
 import logging
 from environment.roles.vid_preloader import Pre_Loader
 from environment.communication.message import Message
+from environment.roles.audio_preprocessor import AudioPreprocessor
 from environment.roles.cross_talk.cross_talk_adapter import CrossTalkAdapter
 from environment.roles.cross_talk.cross_talk_subtitle import CrossTalkSubtitle
 from environment.roles.cross_talk.cross_talk_synth import CrossTalkSynth
 from environment.roles.cross_talk.cross_talk_translator import CrossTalkTranslator
-from environment.roles.loudness_normalizer import LoudnessNormalizer
-from environment.roles.resampler import Resampler
-from environment.roles.separator import Separator
 from environment.roles.transcriber import Transcriber
 from environment.roles.vid_adapter import VideoAdapter
 from environment.roles.vid_comm.vid_searcher import video_search_main
 from environment.roles.vid_comm.vid_editor import main
+from environment.utils.job_context import resolve_job
+from environment.utils.stage_graph import StageGraph
 
 from environment.roles.transcriber import Transcriber
 
 
 class CrossTalkAgent:
-    def __init__(self, config):
+    def __init__(self, config, job=None):
         self.config = config
+        # Workspace for this run's intermediate files
+        self.job = resolve_job(job)
 
         # Get the project root path for resolving relative paths
         self.project_root = self._get_project_root()
@@ -36,10 +38,12 @@ class CrossTalkAgent:
         self.logger = logging.getLogger(__name__)
         logging_handler = logging.StreamHandler()
         logging_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(logging_handler)
+        if not self.logger.handlers:  # one handler however many agents run in the process
+            self.logger.addHandler(logging_handler)
         self.logger.setLevel(logging.INFO)
 
         self.logger.info(f"Initialized with project root: {self.project_root}")
+        self.logger.info(f"Job workspace: {self.job.workspace}")
         self.logger.info(f"Output file: {self.output}")
         if self.video_source_dir:
             self.logger.info(f"Custom video source: {self.video_source_dir}")
@@ -49,14 +53,12 @@ class CrossTalkAgent:
         self.dou_gen = config["cross_talk"]["dou_gen"]
         self.peng_gen = config["cross_talk"]["peng_gen"]
 
-        self.seperator = Separator()
-        self.normalizer = LoudnessNormalizer()
-        self.resampler = Resampler()
+        self.preprocessor = AudioPreprocessor()
         self.transcriber = Transcriber()
-        self.adapter = CrossTalkAdapter()
-        self.synth = CrossTalkSynth()
+        self.adapter = CrossTalkAdapter(job=self.job)
+        self.synth = CrossTalkSynth(job=self.job)
         self.subtitle = CrossTalkSubtitle()
-        self.translator = CrossTalkTranslator()
+        self.translator = CrossTalkTranslator(job=self.job)
 
     def _get_project_root(self):
         """Get the absolute path to the project root directory."""
@@ -82,7 +84,7 @@ class CrossTalkAgent:
 
         try:
             # Initialize Pre_Loader
-            loader = Pre_Loader()
+            loader = Pre_Loader(job=self.job)
 
             # If custom video source directory is specified in config, update the loader
             if self.video_source_dir:
@@ -109,7 +111,7 @@ class CrossTalkAgent:
         self.logger.info("Starting video adapting")
         try:
 
-            adapter = VideoAdapter()
+            adapter = VideoAdapter(job=self.job)
             adapt_results = adapter.extract_content_scenes()
             self.logger.info("Video adapting completed successfully")
             return adapt_results
@@ -122,7 +124,7 @@ class CrossTalkAgent:
         self.logger.info("Starting video searching")
         try:
             # Call video_search_main
-            search_results = video_search_main()
+            search_results = video_search_main(job=self.job)
             self.logger.info("Video searching completed successfully")
             return search_results
         except Exception as e:
@@ -141,6 +143,7 @@ class CrossTalkAgent:
                 keep_original_audio=False,
                 audio_mix_ratio=0.3,
                 output_file=self.output,
+                job=self.job
             )
 
             self.logger.info(f"Video editing completed successfully.")
@@ -150,26 +153,27 @@ class CrossTalkAgent:
             raise
 
     def orchestrator(self):
-        preload_result = self.preload_video()
-        pre_msg = Message(content={"audio_dir": os.path.dirname(self.audio_path)})
-        dou_gen_msg = Message(content={"audio_dir": self.dou_gen})
-        peng_gen_msg = Message(content={"audio_dir": self.peng_gen})
-
-        separator_result = self.seperator.process_message(pre_msg)
-        normalizer_result = self.normalizer.process_message(pre_msg)
-        resampler_result = self.resampler.process_message(pre_msg)
-        transcriber_result = self.transcriber.process_message(pre_msg)
-        transcriber_dou_gen_res = self.transcriber.process_message(dou_gen_msg)
-        transcriber_peng_gen_res = self.transcriber.process_message(peng_gen_msg)
-
-        lab_path = os.path.splitext(self.audio_path)[0] + '.lab'
-        adapter_msg = Message(
-            content={"reqs": self.reqs, "lab_path": lab_path, "dou_gen": self.dou_gen, "peng_gen": self.peng_gen})
-        adapter_result = self.adapter.process_message(adapter_msg)
-
-        synth_msg = Message(content={"script": adapter_result.content.get('script'), "dou_gen": self.dou_gen,
-                                     "peng_gen": self.peng_gen})
-        synth_result = self.synth.process_message(synth_msg)
+        video_source_dir = self.video_source_dir or self.job.video_source_dir
+        working_dir = self.job.index_dir
+        # 预处理结果写到任务目录，数据集里的原始音频保持不变
+        processed_path = self.job.path('writing_data', os.path.basename(self.audio_path))
+        lab_path = os.path.splitext(processed_path)[0] + '.lab'
+
+        def preprocess():
+            # 分离、响度匹配、重采样、转录在内存中一次完成
+            return self.preprocessor.process_message(
+                Message(content={"audio_path": self.job.project_path(self.audio_path), "output_path": processed_path}))
+
+        def transcribe(audio_dir):
+            return lambda: self.transcriber.process_message(Message(content={"audio_dir": audio_dir}))
+
+        def adapt(preprocess_result, transcriber_dou_gen_res, transcriber_peng_gen_res):
+            return self.adapter.process_message(Message(
+                content={"reqs": self.reqs, "lab_path": lab_path, "dou_gen": self.dou_gen, "peng_gen": self.peng_gen}))
+
+        def synth(adapter_result):
+            return self.synth.process_message(Message(content={"script": adapter_result.content.get('script'),
+                                                               "dou_gen": self.dou_gen, "peng_gen": self.peng_gen}))
 
         # video_path = synth_result.content.get("video_path")
         # output_path = synth_result.content.get("output_path")
@@ -180,28 +184,43 @@ class CrossTalkAgent:
         # subtitle_msg = Message(content={"video_path": video_path, "output_path": output_path, "audio_dir": audio_dir, "json_path": json_path})
         # subtitle_result = self.subtitle.process_message(subtitle_msg)
 
-        translator_result = self.translator.process_message()
-
-        adapt_result = self.adapt_video()
-
-        search_result = self.search_video()
-
-        edit_result = self.process_edit()
+        # VideoRAG 建索引与音频处理、改写并行；显存阶段与其他任务一起按 gpu 资源排队
+        graph = StageGraph(logger=self.logger, job=self.job)
+        graph.add("preload", self.preload_video, resource="gpu", inputs=[video_source_dir], outputs=[working_dir])
+        graph.add("preprocess", preprocess, resource="gpu", inputs=[self.job.project_path(self.audio_path)],
+                  outputs=[processed_path, lab_path])
+        graph.add("transcribe_dou_gen", transcribe(self.dou_gen), resource="gpu", deps=["preprocess"],
+                  params={"audio_dir": self.dou_gen}, outputs=[self.dou_gen])
+        graph.add("transcribe_peng_gen", transcribe(self.peng_gen), resource="gpu",
+                  deps=["transcribe_dou_gen"],
+                  params={"audio_dir": self.peng_gen}, outputs=[self.peng_gen])
+        graph.add("adapter", adapt, resource="llm",
+                  args=["preprocess", "transcribe_dou_gen", "transcribe_peng_gen"],
+                  params={"reqs": self.reqs}, inputs=[lab_path])
+        graph.add("synth", synth, resource="gpu", args=["adapter"],
+                  inputs=[self.dou_gen, self.peng_gen, os.path.join(os.path.dirname(self.dou_gen), "reaction")],
+                  outputs=[os.path.join(self.job.voice_gen_dir, 'gen_audio.wav'),
+                           os.path.join(self.job.voice_gen_dir, 'ct.json')])
+        graph.add("translator", self.translator.process_message, deps=["synth"], cache=False)
+        graph.add("adapt", self.adapt_video, resource="llm", deps=["translator", "preload"], cache=False)
+        graph.add("search", self.search_video, resource="gpu", deps=["adapt"], cache=False)
+        graph.add("edit", self.process_edit, resource="cpu", deps=["search"], cache=False)
+        results = graph.run()
 
         self.logger.info("All processing completed successfully")
 
         return {
             "status": "success",
-            "adapt_result": adapt_result,
-            "search_result": search_result,
-            "edit_result": edit_result
+            "adapt_result": results["adapt"],
+            "search_result": results["search"],
+            "edit_result": results["edit"]
         }
 
 
-def gen_cross_talk():
+def gen_cross_talk(job=None):
     print("Welcome to the Cross Talk Generator")
-    with open('environment/config/cross_talk.yml', 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    with open(resolve_job(job).project_path('environment', 'config', 'cross_talk.yml'), 'r', encoding='utf-8') as f:
+        config = resolve_job(job).apply_overrides(yaml.safe_load(f))
     print(config)
-    agent = CrossTalkAgent(config)
+    agent = CrossTalkAgent(config, job=job)
     return agent.orchestrator()
@@ -14,12 +14,16 @@ from environment.roles.mad_svc.mad_svc_translator import MadSVCTranslator
 from environment.roles.vid_adapter import VideoAdapter
 from environment.roles.vid_comm.vid_searcher import video_search_main
 from environment.roles.vid_comm.vid_editor import main
+from environment.utils.job_context import resolve_job
+from environment.utils.stage_graph import StageGraph
 
 
 class MadSVCAgent:
-    def __init__(self, config):
+    def __init__(self, config, job=None):
         # Store the config
         self.config = config
+        # Workspace for this run's intermediate files
+        self.job = resolve_job(job)
 
         # Get the project root path for resolving relative paths
         self.project_root = self._get_project_root()
@@ -35,10 +39,12 @@ class MadSVCAgent:
         self.logger = logging.getLogger(__name__)
         logging_handler = logging.StreamHandler()
         logging_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(logging_handler)
+        if not self.logger.handlers:  # one handler however many agents run in the process
+            self.logger.addHandler(logging_handler)
         self.logger.setLevel(logging.INFO)
 
         self.logger.info(f"Initialized with project root: {self.project_root}")
+        self.logger.info(f"Job workspace: {self.job.workspace}")
         self.logger.info(f"Output file: {self.output}")
         if self.video_source_dir:
             self.logger.info(f"Custom video source: {self.video_source_dir}")
@@ -50,11 +56,12 @@ class MadSVCAgent:
         self.bgm = config["mad_svc"]["bgm"]
         self.normalizer = LoudnessNormalizer()
         self.mixer = MadSVCMixer()
-        self.annotator = MadSVCAnnotator()
-        self.analyzer = MadSVCAnalyzer()
+        self.annotator = MadSVCAnnotator(job=self.job)
+        self.analyzer = MadSVCAnalyzer(job=self.job)
+        self.single = MadSVCSingle(job=self.job)
         self.spliter = MadSVCSpliter()
-        self.cover = MadSVCCoverist()
-        self.translator = MadSVCTranslator()
+        self.cover = MadSVCCoverist(job=self.job)
+        self.translator = MadSVCTranslator(job=self.job)
         self.subtitle = MadSVCSubtitle()
 
     def _get_project_root(self):
@@ -81,7 +88,7 @@ class MadSVCAgent:
 
         try:
             # Initialize Pre_Loader
-            loader = Pre_Loader()
+            loader = Pre_Loader(job=self.job)
 
             # If custom video source directory is specified in config, update the loader
             if self.video_source_dir:
@@ -108,7 +115,7 @@ class MadSVCAgent:
         self.logger.info("Starting video adapting")
         try:
 
-            adapter = VideoAdapter()
+            adapter = VideoAdapter(job=self.job)
             adapt_results = adapter.extract_content_scenes()
             self.logger.info("Video adapting completed successfully")
             return adapt_results
@@ -121,7 +128,7 @@ class MadSVCAgent:
         self.logger.info("Starting video searching")
         try:
             # Call video_search_main
-            search_results = video_search_main()
+            search_results = video_search_main(job=self.job)
             self.logger.info("Video searching completed successfully")
             return search_results
         except Exception as e:
@@ -140,6 +147,7 @@ class MadSVCAgent:
                 keep_original_audio=False,
                 audio_mix_ratio=0.3,
                 output_file=self.output,
+                job=self.job
             )
 
             self.logger.info(f"Video editing completed successfully.")
@@ -150,47 +158,72 @@ class MadSVCAgent:
 
     def orchestrator(self):
         """Main orchestration method."""
-        try:
-            preload_result = self.preload_video()
+        video_source_dir = self.video_source_dir or self.job.video_source_dir
+        working_dir = self.job.index_dir
+
+        def normalize():
+            return self.normalizer.process_message(Message(content={"audio_dir": os.path.dirname(self.target)}))
 
-            pre_msg = Message(content={"audio_dir": os.path.dirname(self.target)})
-            loudness_result = self.normalizer.process_message(pre_msg)
-            annotator_msg = Message(content={"midi": self.midi, "lyrics": self.lyrics})
-            annotator_result = self.annotator.process_message(annotator_msg)
+        def annotate():
+            return self.annotator.process_message(Message(content={"midi": self.midi, "lyrics": self.lyrics}))
 
-            analyzer_msg = Message(content={"annotator_result": annotator_result.content, "reqs": self.reqs})
-            analyzer_result = self.analyzer.process_message(analyzer_msg)
+        def analyze(annotator_result):
+            return self.analyzer.process_message(
+                Message(content={"annotator_result": annotator_result.content, "reqs": self.reqs}))
 
-            single_msg = Message(content={"annotator_result": annotator_result, "analyzer_result": analyzer_result})
-            single_result = self.single.process_message(single_msg)
+        def sing(annotator_result, analyzer_result):
+            return self.single.process_message(
+                Message(content={"annotator_result": annotator_result, "analyzer_result": analyzer_result}))
 
+        def translate():
             name = os.path.basename(self.midi)
             pure_name = os.path.splitext(name)[0]
-            trans_msg = Message(content={"name": pure_name})
-            trans_result = self.translator.process_message(trans_msg)
+            return self.translator.process_message(Message(content={"name": pure_name}))
 
+        def cover(annotator_result):
             new_name = annotator_result.content.get('name') + '_cover'
-            cover_msg = Message(content={"source": f"dataset/mad_svc/cover/{new_name}.wav", "target": self.target})
-            cover_result = self.cover.process_message(cover_msg)
+            return self.cover.process_message(
+                Message(content={"source": os.path.join(self.single.cover_dir, f"{new_name}.wav"),
+                                 "target": self.target}))
 
+        def mix(cover_result):
             mixer_message = Message(content={"bgm": self.bgm, "output_dir": cover_result.content.get('output_dir')})
             mixer_result = self.mixer.process_message(mixer_message)
             print(mixer_result)
+            return mixer_result
+
+        # VideoRAG 建索引、目标音色响度匹配与歌词改写三路并行；建索引与歌声合成都按 gpu 资源排队
+        graph = StageGraph(logger=self.logger, job=self.job)
+        graph.add("preload", self.preload_video, resource="gpu", inputs=[video_source_dir], outputs=[working_dir])
+        graph.add("normalize", normalize, resource="cpu", params={"target": self.target},
+                  outputs=[os.path.dirname(self.target)])
+        annotation_dir = self.job.path("writing_data", "lyrics_annotation")
+        lyrics_name = os.path.splitext(os.path.basename(self.lyrics))[0]
+        graph.add("annotator", annotate, inputs=[self.midi, self.lyrics],
+                  outputs=[os.path.join(annotation_dir, f"{lyrics_name}.json")])
+        graph.add("analyzer", analyze, resource="llm", args=["annotator"], params={"reqs": self.reqs},
+                  outputs=[self.job.path("writing_data", "script.txt"),
+                           os.path.join(annotation_dir, f"{lyrics_name}_cover.json")])
+        graph.add("single", sing, resource="gpu", args=["annotator", "analyzer"],
+                  outputs=[self.single.cover_dir])
+        graph.add("translator", translate, deps=["single"], cache=False)
+        # 混音会原地覆盖转换结果，两步都不缓存
+        graph.add("cover", cover, resource="gpu", args=["annotator"], deps=["single", "normalize"], cache=False)
+        graph.add("mixer", mix, resource="cpu", args=["cover"], cache=False)
+        graph.add("adapt", self.adapt_video, resource="llm", deps=["mixer", "translator", "preload"], cache=False)
+        graph.add("search", self.search_video, resource="gpu", deps=["adapt"], cache=False)
+        graph.add("edit", self.process_edit, resource="cpu", deps=["search"], cache=False)
 
-
-            adapt_result = self.adapt_video()
-
-            search_result = self.search_video()
-
-            edit_result = self.process_edit()
+        try:
+            results = graph.run()
 
             self.logger.info("All processing completed successfully")
 
             return {
                 "status": "success",
-                "adapt_result": adapt_result,
-                "search_result": search_result,
-                "edit_result": edit_result
+                "adapt_result": results["adapt"],
+                "search_result": results["search"],
+                "edit_result": results["edit"]
             }
 
         except Exception as e:
@@ -198,7 +231,7 @@ class MadSVCAgent:
         return None
 
 
-def gen_mad_svc():
+def gen_mad_svc(job=None):
     print("Welcome to the Mad SVC Generator")
 
     # Get the directory of the current script
@@ -218,7 +251,7 @@ def gen_mad_svc():
         return None
 
     with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+        config = resolve_job(job).apply_overrides(yaml.safe_load(f))
 
-    agent = MadSVCAgent(config)
+    agent = MadSVCAgent(config, job=job)
     return agent.orchestrator()
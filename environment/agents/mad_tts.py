@@ -4,37 +4,37 @@ import subprocess
 import yaml
 
 from environment.communication.message import Message
-from environment.roles.loudness_normalizer import LoudnessNormalizer
+from environment.roles.audio_preprocessor import AudioPreprocessor
 from environment.roles.mad_tts.mad_tts_combiner import MadTTSCombiner
 from environment.roles.mad_tts.mad_tts_infer import MadTTSInfer
 from environment.roles.mad_tts.mad_tts_slicer import MadTTSSlicer
 from environment.roles.mad_tts.mad_tts_subtitle import MadTTSSubtitleV1,MadTTSSubtitleV2
 from environment.roles.mad_tts.mad_tts_writer import MadTTSWriter
-from environment.roles.resampler import Resampler
-from environment.roles.separator import Separator
-from environment.roles.transcriber import Transcriber
+from environment.utils.job_context import resolve_job
+from environment.utils.stage_graph import StageGraph
 
 
 
 class MadTTSAgent:
-    def __init__(self, config):
-        self.video_path = config["mad_tts"]["video_path"]
+    def __init__(self, config, job=None):
+        self.job = resolve_job(job)
+        self.video_path = self.job.project_path(config["mad_tts"]["video_path"])
         self.reqs = config["mad_tts"]["reqs"]
         self.audio_path = self.extract_audio()
 
-        self.separator = Separator()
-        self.normalizer = LoudnessNormalizer()
-        self.resampler = Resampler()
         self.slicer = MadTTSSlicer()
-        self.transcriber = Transcriber()
+        self.preprocessor = AudioPreprocessor(slicer=self.slicer)
         self.writer = MadTTSWriter()
-        self.infer = MadTTSInfer()
+        self.infer = MadTTSInfer(job=self.job)
         self.combiner = MadTTSCombiner()
         self.subtitle_v1 = MadTTSSubtitleV1()
         self.subtitle_v2 = MadTTSSubtitleV2()
 
     def extract_audio(self):
-        audio_path = os.path.splitext(self.video_path)[0] + ".wav"
+        # 抽取的音频、切片与合成结果都放在任务目录，同一视频的多个任务互不覆盖
+        name = os.path.splitext(os.path.basename(self.video_path))[0]
+        audio_path = self.job.path("voice_gen", name + ".wav")
+        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
 
         ffmpeg_cmd = [
             "ffmpeg",
@@ -59,30 +59,36 @@ class MadTTSAgent:
             print("Error: FFmpeg not found. Please install FFmpeg and add it to the system PATH")
 
     def orchestrator(self):
-        pre_msg = Message(content={"audio_dir": os.path.dirname(self.audio_path)})
-
-        separator_result = self.separator.process_message(pre_msg)
-
-        normalizer_result = self.normalizer.process_message(pre_msg)
-
-        resampler_result = self.resampler.process_message(pre_msg)
-
-        transcriber_result = self.transcriber.process_message(pre_msg)
-
-        slicer_msg = Message(content={"audio_path": self.audio_path, "output_dir": os.path.splitext(self.audio_path)[0]})
-        slicer_result = self.slicer.process_message(slicer_msg)
-
-        msg = Message(content={"audio_dir": os.path.splitext(self.audio_path)[0]})
-        transcriber_result = self.transcriber.process_message(msg)
-
+        slice_dir = os.path.splitext(self.audio_path)[0]
         lab_path = os.path.splitext(self.audio_path)[0] + ".lab"
-        writer_msg = Message(content={"lab_path": lab_path, "reqs": self.reqs})
-        writer_result = self.writer.process_message(writer_msg)
-
-        infer_result = self.infer.process_message(msg)
-
-        combiner_msg = Message(content={"video_path": self.video_path, "audio_dir": os.path.splitext(self.audio_path)[0]})
-        combiner_result = self.combiner.process_message(combiner_msg)
+        metadata_path = os.path.join(slice_dir, "metadata.json")
+        speech_path = self.job.path("writing_data", "speech.txt")
+        raw_speech_path = self.job.path("writing_data", "raw_speech.txt")
+
+        def preprocess():
+            # 分离、响度匹配、重采样、切片、转录在内存中一次完成
+            return self.preprocessor.process_message(Message(content={"audio_path": self.audio_path, "slice_dir": slice_dir}))
+
+        def write():
+            return self.writer.process_message(
+                Message(content={"lab_path": lab_path, "reqs": self.reqs, "output_dir": self.job.writing_data_dir}))
+
+        def infer():
+            return self.infer.process_message(Message(content={"audio_dir": slice_dir, "speech_path": speech_path}))
+
+        def combine():
+            return self.combiner.process_message(Message(content={"video_path": self.video_path, "audio_dir": slice_dir}))
+
+        # 每次都会重新抽取音频，因此预处理以视频内容为准；只改需求时跳过预处理
+        graph = StageGraph(job=self.job)
+        graph.add("preprocess", preprocess, resource="gpu", inputs=[self.video_path], outputs=[lab_path, metadata_path])
+        graph.add("writer", write, resource="llm", deps=["preprocess"], params={"reqs": self.reqs},
+                  inputs=[lab_path, metadata_path],
+                  outputs=[speech_path, raw_speech_path])
+        graph.add("infer", infer, resource="gpu", deps=["writer"], inputs=[speech_path, metadata_path],
+                  outputs=[os.path.join(slice_dir, "derivative")])
+        graph.add("combiner", combine, resource="cpu", deps=["infer"], cache=False)
+        graph.run()
 
         # derivative_dir = os.path.join(os.path.splitext(self.audio_path)[0], "derivative")
         # txt_path = os.path.join(os.path.dirname(self.audio_path), "speech.txt")
@@ -92,10 +98,11 @@ class MadTTSAgent:
         # subtitle_result = self.subtitle_v2.process_message(subtitle_msg)
         return 1
 
-def gen_mad_tts():
+def gen_mad_tts(job=None):
     print("Welcome to the Mad Generator TTS")
-    with open('environment/config/mad_tts.yml', 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    job = resolve_job(job)
+    with open(job.project_path('environment', 'config', 'mad_tts.yml'), 'r', encoding='utf-8') as f:
+        config = job.apply_overrides(yaml.safe_load(f))
     print(config)
-    agent = MadTTSAgent(config)
+    agent = MadTTSAgent(config, job=job)
     return agent.orchestrator()
@@ -1,4 +1,4 @@
-from environment.config.llm import gpt
+from environment.config.llm import gateway, gpt
 from environment.agents.cross_talk import gen_cross_talk
 from environment.agents.mad_svc import gen_mad_svc
 from environment.agents.mad_tts import gen_mad_tts
@@ -6,22 +6,11 @@ from environment.agents.talk_show import gen_talk_show
 from environment.agents.rhythm_agent import gen_rhy_vid
 from environment.agents.comm_agent import gen_comm_vid
 from environment.agents.news_agent import gen_news_vid
+from environment.utils.job_context import JobContext
+from environment.utils.tracing import span, trace_job, write_trace
 
-
-class MultiAgent:
-    def __init__(self, api_key, base_url):
-        self.functions = {
-            "gen_mad_tts": gen_mad_tts,
-            "gen_mad_svc": gen_mad_svc,
-            "gen_talk_show": gen_talk_show,
-            "gen_cross_talk": gen_cross_talk,
-            "gen_rhy_vid": gen_rhy_vid,
-            "gen_comm_vid": gen_comm_vid,
-            "gen_news_vid": gen_news_vid
-        }
-
-    def intent_analysis(self, user_input):
-        system_content = """
+INTENT_MODEL = "gpt-4o-mini"
+INTENT_SYSTEM_PROMPT = """
         You are an AI Function Router specialized in analyzing user requirements and matching them to the most appropriate function. 
 
         Available Functions:
@@ -52,8 +41,23 @@ class MultiAgent:
         - DO NOT output any other characters, punctuation, explanation or text
         - DO NOT include quotes, periods, spaces or any other symbols
         - Example valid output: gen_mad_tts"""
+
+
+class MultiAgent:
+    def __init__(self, api_key, base_url):
+        self.functions = {
+            "gen_mad_tts": gen_mad_tts,
+            "gen_mad_svc": gen_mad_svc,
+            "gen_talk_show": gen_talk_show,
+            "gen_cross_talk": gen_cross_talk,
+            "gen_rhy_vid": gen_rhy_vid,
+            "gen_comm_vid": gen_comm_vid,
+            "gen_news_vid": gen_news_vid
+        }
+
+    def intent_analysis(self, user_input):
         try:
-            response = gpt("gpt-4o-mini", system_content, user_input)
+            response = gpt(INTENT_MODEL, INTENT_SYSTEM_PROMPT, user_input, use_cache=True)
 
             func = response.choices[0].message.content.lower()
             print(func)
@@ -61,8 +65,34 @@ class MultiAgent:
         except Exception as e:
             print(e)
 
-    def execute_function(self, func):
-
+    def classify_intents(self, user_inputs):
+        """
+        Route many requests at once. Identical texts are asked once, all prompts run
+        concurrently through the LLM gateway, and answers come from its response cache
+        when the same text was routed before.
+
+        Returns:
+            list: function name per input, or None when the answer is not a known function
+        """
+        texts = list(dict.fromkeys(text.strip() for text in user_inputs))
+        responses = gateway.map_prompts(texts, INTENT_MODEL, system=INTENT_SYSTEM_PROMPT, use_cache=True,
+                                       return_exceptions=True)
+
+        routes = {}
+        for text, response in zip(texts, responses):
+            if isinstance(response, Exception):
+                print(f"Intent analysis failed for {text!r}: {response}")
+                routes[text] = None
+                continue
+            func = response.choices[0].message.content.strip().strip('"\'`.').lower()
+            routes[text] = func if func in self.functions else None
+        return [routes[text.strip()] for text in user_inputs]
+
+    def execute_function(self, func, job=None):
+        """
+        Run one generator. Each call gets its own workspace under dataset/jobs unless a
+        JobContext is given, so several requests can run at the same time.
+        """
         if func not in self.functions:
             return {
                 "status": "error",
@@ -70,13 +100,36 @@ class MultiAgent:
             }
 
         try:
-            result = self.functions[func]()
+            job = job or JobContext.create()
+            print(f"Job {job.job_id} workspace: {job.workspace}")
+            with trace_job(job), span(func, category='job'):
+                result = self.functions[func](job=job)
             return result
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Error executing {func}: {str(e)}"
             }
+        finally:
+            if job is not None:
+                self.report_trace(job)
+
+    def report_trace(self, job):
+        """Write the job's trace.json and print where the time went."""
+        try:
+            trace_path, summary = write_trace(job)
+        except Exception as e:
+            print(f"Could not write trace for job {job.job_id}: {e}")
+            return
+        stages = [(name, entry) for name, entry in summary["spans"].items() if entry["cat"] == 'stage']
+        slowest = ", ".join(
+            f"{name} {entry['seconds']:.1f}s"
+            + (f" (load {entry['load_seconds']:.1f}s)" if entry['load_seconds'] else "")
+            for name, entry in stages[:5]
+        )
+        if slowest:
+            print(f"Slowest stages: {slowest}")
+        print(f"Trace: {trace_path}")
 
     def process_request(self):
         try:
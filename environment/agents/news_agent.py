@@ -10,11 +10,15 @@ from environment.roles.vid_news.voice_maker import voice_main
 from environment.roles.vid_news.vid_searcher import video_search_main
 from environment.roles.vid_news.vid_editor import main
 from environment.roles.vid_news.vid_subtitler import subtitler_main
+from environment.utils.job_context import resolve_job
+from environment.utils.stage_graph import StageError, StageGraph
 
 class NewsAgent:
-    def __init__(self, config):
+    def __init__(self, config, job=None):
         # Store the config
         self.config = config
+        # Workspace for this run's intermediate files
+        self.job = resolve_job(job)
         
         # Get the project root path for resolving relative paths
         self.project_root = self._get_project_root()
@@ -33,10 +37,12 @@ class NewsAgent:
         self.logger = logging.getLogger(__name__)
         logging_handler = logging.StreamHandler()
         logging_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(logging_handler)
+        if not self.logger.handlers:  # one handler however many agents run in the process
+            self.logger.addHandler(logging_handler)
         self.logger.setLevel(logging.INFO)
         
         self.logger.info(f"Initialized with project root: {self.project_root}")
+        self.logger.info(f"Job workspace: {self.job.workspace}")
         self.logger.info(f"Commentary idea: {self.idea}")
         self.logger.info(f"Output file: {self.output}")
         if self.video_source_dir:
@@ -67,7 +73,7 @@ class NewsAgent:
         
         try:
             # Initialize Pre_Loader
-            loader = Pre_Loader()
+            loader = Pre_Loader(job=self.job)
             
             # If custom video source directory is specified in config, update the loader
             if self.video_source_dir:
@@ -104,7 +110,7 @@ class NewsAgent:
                 self.logger.info(f"Using custom video source directory for transcription: {self.video_source_dir}")
             
             # Create the transcriber instance with our config
-            transcriber = transcribe_main(config=config)
+            transcriber = transcribe_main(config=config, job=self.job)
             
             # Run the transcription process with force_overwrite=True to ensure it always runs
             transcript_results = transcriber.run(force_overwrite=True)
@@ -129,7 +135,7 @@ class NewsAgent:
             }
             
             # Run the async function in the synchronous context
-            content_results = asyncio.run(content_main(config=content_config))
+            content_results = asyncio.run(content_main(config=content_config, job=self.job))
             
             self.logger.info("Content processing completed successfully")
             return content_results
@@ -144,7 +150,7 @@ class NewsAgent:
         self.logger.info("Starting voice generation")
         try:
             # Run voice_main (synchronous function)
-            voice_results = voice_main()
+            voice_results = voice_main(job=self.job)
             self.logger.info("Voice generation completed successfully")
             return voice_results
         except Exception as e:
@@ -156,7 +162,7 @@ class NewsAgent:
         self.logger.info("Starting video searching")
         try:
             # Call video_search_main
-            search_results = video_search_main()
+            search_results = video_search_main(job=self.job)
             self.logger.info("Video searching completed successfully")
             return search_results
         except Exception as e:
@@ -171,7 +177,8 @@ class NewsAgent:
             # Call main function from vid_editer with our parameters
             editing_result = main(
                 input_path=self.video_source_dir,  # Use custom video source directory if specified
-                keep_original_audio=False
+                keep_original_audio=False,
+                job=self.job
             )
             
             self.logger.info(f"Video editing completed successfully. ")
@@ -190,7 +197,8 @@ class NewsAgent:
             
             # Call subtitler_main with our parameters
             subtitle_result = subtitler_main(
-                output_path=self.output
+                output_path=self.output,
+                job=self.job
             )
             
             self.logger.info(f"Video subtitle processing completed successfully. Output saved to: {self.output}")
@@ -201,43 +209,53 @@ class NewsAgent:
     
     def orchestrator(self):
         """Main orchestration method."""
-        try:
+        video_source_dir = self.video_source_dir or self.job.video_source_dir
+        working_dir = self.job.index_dir
+        scene_output_dir = self.job.scene_output_dir
+        writing_data_dir = self.job.writing_data_dir
+        voice_gen_dir = self.job.voice_gen_dir
+        transcript_path = os.path.join(writing_data_dir, "audio_transcript.txt")
+        scene_path = os.path.join(scene_output_dir, "video_scene.json")
 
-            preload_result  = self.preload_video()
+        # indexing, transcription, voice synthesis and the search all need the GPU, so with the default
+        # single gpu slot they take turns (see --gpu-workers); the script (llm) overlaps with indexing
+        graph = StageGraph(logger=self.logger, job=self.job)
+        graph.add("preload", self.preload_video, resource="gpu", inputs=[video_source_dir], outputs=[working_dir])
+        graph.add("transcript", self.process_transcript, resource="gpu", inputs=[video_source_dir],
+                  outputs=[transcript_path])
+        graph.add("content", self.process_content, resource="llm", deps=["transcript"], check=bool,
+                  params={"idea": self.idea},
+                  inputs=[transcript_path, self.job.input_path('writing_data', "news_present_style.txt")],
+                  outputs=[scene_path])
+        graph.add("voice", self.generate_voice, resource="gpu", deps=["content"],
+                  inputs=[scene_path, self.job.voice_data_dir],
+                  outputs=[os.path.join(voice_gen_dir, 'gen_news_audio.wav'),
+                           os.path.join(voice_gen_dir, 'gen_news_audio_timestamps.json')])
+        graph.add("search", self.search_video, resource="gpu", deps=["preload", "content"],
+                  inputs=[scene_path, working_dir],
+                  outputs=[os.path.join(scene_output_dir, "visual_retrieved_segments.json")])
+        graph.add("edit", self.process_edit, resource="cpu", deps=["voice", "search"], cache=False)
+        graph.add("subtitle", self.process_subtitle, resource="gpu", deps=["edit"], cache=False)
 
-            transcript_result = self.process_transcript()
-            if not transcript_result:
+        try:
+            results = graph.run()
+            if not results["transcript"]:
                 self.logger.error("Transcription processing failed but continuing...")
-            
-
-            content_result = self.process_content()
-            if not content_result:
-                self.logger.error("Content processing failed. Stopping the pipeline.")
-                return None
-            
-
-            voice_result = self.generate_voice()
-            
-
-            search_result = self.search_video()
-            
 
-            edit_result = self.process_edit()
-
-
-            subtitle_result = self.process_subtitle()
-            
             self.logger.info("All processing completed successfully")
-            
+
             return {
-                "transcript_result": transcript_result,
-                "content_result": content_result,
-                "voice_result": voice_result,
-                "search_result": search_result,
-                "edit_result": edit_result,
-                "process_subtitle": subtitle_result
+                "transcript_result": results["transcript"],
+                "content_result": results["content"],
+                "voice_result": results["voice"],
+                "search_result": results["search"],
+                "edit_result": results["edit"],
+                "process_subtitle": results["subtitle"]
             }
-            
+
+        except StageError:
+            self.logger.error("Content processing failed. Stopping the pipeline.")
+            return None
         except Exception as e:
             self.logger.error(f"Error in orchestration: {str(e)}")
             import traceback
@@ -245,7 +263,7 @@ class NewsAgent:
             return None
 
 
-def gen_news_vid():
+def gen_news_vid(job=None):
     """Main entry point for the news agent."""
     print("Welcome to the News Generator")
     
@@ -266,7 +284,7 @@ def gen_news_vid():
         return None
     
     with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+        config = resolve_job(job).apply_overrides(yaml.safe_load(f))
     
-    agent = NewsAgent(config)
+    agent = NewsAgent(config, job=job)
     return agent.orchestrator()
\ No newline at end of file
@@ -7,12 +7,16 @@ from environment.roles.vid_rhythm.music_filter import music_main
 from environment.roles.vid_rhythm.story_editor import story_main
 from environment.roles.vid_rhythm.vid_searcher import video_search_main
 from environment.roles.vid_rhythm.vid_editor import main
+from environment.utils.job_context import resolve_job
+from environment.utils.stage_graph import StageError, StageGraph
 
 
 class RhythmAgent:
-    def __init__(self, config):
+    def __init__(self, config, job=None):
         # Store the config
         self.config = config
+        # Workspace for this run's intermediate files
+        self.job = resolve_job(job)
         
         # Get the project root path for resolving relative paths
         self.project_root = self._get_project_root()
@@ -31,10 +35,12 @@ class RhythmAgent:
         self.logger = logging.getLogger(__name__)
         logging_handler = logging.StreamHandler()
         logging_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(logging_handler)
+        if not self.logger.handlers:  # one handler however many agents run in the process
+            self.logger.addHandler(logging_handler)
         self.logger.setLevel(logging.INFO)
         
         self.logger.info(f"Initialized with project root: {self.project_root}")
+        self.logger.info(f"Job workspace: {self.job.workspace}")
         self.logger.info(f"Audio file: {self.audio}")
         self.logger.info(f"Output file: {self.output}")
         if self.video_source_dir:
@@ -64,7 +70,7 @@ class RhythmAgent:
         
         try:
             # Initialize Pre_Loader
-            loader = Pre_Loader()
+            loader = Pre_Loader(job=self.job)
             
             # If custom video source directory is specified in config, update the loader
             if self.video_source_dir:
@@ -97,7 +103,12 @@ class RhythmAgent:
             return 1
         
         # Pass the absolute path to music_main
-        result = music_main(self.audio)
+        result = music_main(
+            self.audio,
+            streaming=self.config["rhythm_agent"].get("streaming_analysis", False),
+            plot=self.config["rhythm_agent"].get("plot_analysis", False),
+            job=self.job
+        )
         
         if result == 0:
             self.logger.info("Music processing completed successfully")
@@ -108,15 +119,14 @@ class RhythmAgent:
     def process_story(self):
         # Pass the parameters to story_main function
         self.logger.info(f"Starting story creation with idea: {self.idea}")
-        result = story_main(user_idea=self.idea)
+        result = story_main(user_idea=self.idea, job=self.job)
         self.logger.info("Story creation completed")
         return result
 
     def process_video(self):
         self.logger.info("Starting video searching")
         try:
-            # Call video_search_main without parameters
-            self.search_results = video_search_main()
+            self.search_results = video_search_main(job=self.job)
             self.logger.info("Video searching completed successfully")
             return self.search_results
         except Exception as e:
@@ -136,7 +146,8 @@ class RhythmAgent:
                 keep_original_audio=False,
                 audio_mix_ratio=0.3,
                 output_file=self.output,
-                audio_file=self.audio  # Pass our custom audio file
+                audio_file=self.audio,  # Pass our custom audio file
+                job=self.job
             )
             
             self.logger.info(f"Video editing completed successfully. Output saved to: {self.output}")
@@ -147,32 +158,45 @@ class RhythmAgent:
 
 
     def orchestrator(self):
-        try:
-
-            preload_result  = self.preload_video()
-
-            music_result = self.process_music()
-            if music_result != 0:
-                self.logger.error("Music processing failed. Stopping the pipeline.")
-                return None
-                
-            story_result = self.process_story()
-            
-
-            search_result = self.process_video()
+        video_source_dir = self.video_source_dir or self.job.video_source_dir
+        working_dir = self.job.index_dir
+        music_analysis_dir = self.job.music_analysis_dir
+        scene_output_dir = self.job.scene_output_dir
+
+        # VideoRAG indexing and music analysis are independent; only the story needs both
+        graph = StageGraph(logger=self.logger, job=self.job)
+        graph.add("preload", self.preload_video, resource="gpu", inputs=[video_source_dir], outputs=[working_dir])
+        graph.add("music", self.process_music, resource="cpu", executor="process", check=lambda result: result == 0,
+                  inputs=[self.audio],
+                  params={"streaming": self.config["rhythm_agent"].get("streaming_analysis", False),
+                          "plot": self.config["rhythm_agent"].get("plot_analysis", False)},
+                  outputs=[music_analysis_dir])
+        graph.add("story", self.process_story, resource="llm", deps=["preload", "music"], params={"idea": self.idea},
+                  inputs=[os.path.join(working_dir, "kv_store_video_segments.json"),
+                          os.path.join(music_analysis_dir, "rhythm_points.json")],
+                  outputs=[os.path.join(scene_output_dir, "video_summary.json"),
+                           os.path.join(scene_output_dir, "video_scene.json")])
+        graph.add("search", self.process_video, resource="gpu", deps=["story"],
+                  inputs=[os.path.join(scene_output_dir, "video_scene.json"), working_dir],
+                  outputs=[os.path.join(scene_output_dir, "visual_retrieved_segments.json")])
+        graph.add("edit", self.process_edit, resource="cpu", deps=["search"], cache=False)
 
+        try:
+            results = graph.run()
+            self.search_results = results["search"]
 
-            edit_result = self.process_edit()
-            
             self.logger.info("All processing completed successfully")
             return {
-                "preload_result": preload_result,
-                "music_result": music_result,
-                "story_result": story_result,
-                "search_result": search_result,
-                "edit_result": edit_result
+                "preload_result": results["preload"],
+                "music_result": results["music"],
+                "story_result": results["story"],
+                "search_result": results["search"],
+                "edit_result": results["edit"]
             }
-            
+
+        except StageError as e:
+            self.logger.error(f"{e}. Stopping the pipeline.")
+            return None
         except Exception as e:
             self.logger.error(f"Error in orchestration: {str(e)}")
             import traceback
@@ -180,7 +204,7 @@ class RhythmAgent:
             return None
 
 
-def gen_rhy_vid():
+def gen_rhy_vid(job=None):
     print("Welcome to the Rhythm Video Generator")
     
     # Get the directory of the current script
@@ -200,9 +224,9 @@ def gen_rhy_vid():
         return None
     
     with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+        config = resolve_job(job).apply_overrides(yaml.safe_load(f))
     
-    agent = RhythmAgent(config)
+    agent = RhythmAgent(config, job=job)
     return agent.orchestrator()
 
 
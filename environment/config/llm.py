@@ -1,54 +1,230 @@
-from openai import OpenAI
-from environment.config.config import config
+import asyncio
+import hashlib
+import json
+import os
+import threading
 
-client = OpenAI(api_key='<KEY>')
+import httpx
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from environment.config.config import config
+from environment.utils.tracing import span
 
 llm_api_key = config['llm']['api_key']
 llm_base_url = config['llm']['base_url']
-client.api_key = llm_api_key
-client.base_url = llm_base_url
+llm_max_concurrency = config['llm'].get('max_concurrency') or 8
+llm_cache_dir = config['llm'].get('cache_dir') or 'dataset/.llm_cache'
+if not os.path.isabs(llm_cache_dir):
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    llm_cache_dir = os.path.join(project_root, llm_cache_dir)
+llm_enable_cache = config['llm'].get('enable_cache', True) is not False
 
 
-def deepseek(model="deepseek-v3", system=None, user=None):
-    messages = []
-    if system is not None:
-        messages.append({"role": "system", "content": system})
-    if user is not None:
-        messages.append({"role": "user", "content": user})
+class ResponseCache:
+    """Content-addressed on-disk cache of chat completions keyed by (model, messages, params)."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(model, messages, params):
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return ChatCompletion.model_validate(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable LLM cache entry {path}: {e}")
+            return None
+
+    def put(self, key, response):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(response.model_dump(mode='json'), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class LLMGateway:
+    """
+    Shared asynchronous access point to the chat completion API.
+
+    All requests run on one background event loop that owns a pooled HTTP
+    client, so synchronous callers, coroutines on other loops and batch calls
+    share the same connections. A semaphore bounds the number of requests in
+    flight. Calls made with use_cache=True also share an on-disk cache keyed
+    by (model, messages, params such as temperature), and identical concurrent
+    requests among them are coalesced into a single call.
+
+    Caching is off by default: most prompts ask for creative writing, where a
+    rerun should produce a new answer and a retry after a rejected answer must
+    not get the same one back. Only deterministic calls (intent routing,
+    per-line annotation) opt in.
+    """
+
+    def __init__(self, api_key, base_url, max_concurrency=8, cache_dir=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._inflight = {}
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._init_client(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _init_client(self):
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency
+        )
+        self._client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(600.0, connect=10.0))
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def _request(self, model, messages, params, cache_key):
+        async with self._semaphore:
+            response = await self._client.chat.completions.create(model=model, messages=messages, **params)
+        if cache_key is not None:
+            # 缓存读写是阻塞的文件 I/O，放到线程池里，不占用事件循环
+            await asyncio.to_thread(self.cache.put, cache_key, response)
+        return response
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages
-    )
-    return response
+    async def _chat(self, model, messages, use_cache, params):
+        if not use_cache or self.cache is None:
+            return await self._request(model, messages, params, None)
 
+        key = ResponseCache.key(model, messages, params)
+        future = self._inflight.get(key)
+        if future is None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+            # 读缓存期间可能已有相同请求发出
+            future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._request(model, messages, params, key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
 
-def claude(model="claude-3-7-sonnet-20250219", system=None, user=None):
+    def chat(self, model, messages, use_cache=False, **params):
+        """Blocking chat completion."""
+        with span(f"llm:{model}", category='llm', model=model):
+            return self._submit(self._chat(model, messages, use_cache, params)).result()
+
+    async def achat(self, model, messages, use_cache=False, **params):
+        """Chat completion awaitable from any event loop."""
+        return await asyncio.wrap_future(self._submit(self._chat(model, messages, use_cache, params)))
+
+    def submit(self, model, messages, use_cache=False, **params):
+        """Start a chat completion and return a concurrent.futures.Future for its response."""
+        return self._submit(self._chat(model, messages, use_cache, params))
+
+    def submit_prompts(self, prompts, model, system=None, use_cache=False, **params):
+        """Start many independent prompts at once; returns one future per prompt, in order."""
+        return [
+            self.submit(model, _build_messages(system, prompt), use_cache, **params)
+            for prompt in prompts
+        ]
+
+    async def _map(self, prompts, model, system, use_cache, return_exceptions, params):
+        tasks = [
+            self._chat(model, _build_messages(system, prompt), use_cache, params)
+            for prompt in prompts
+        ]
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    def map_prompts(self, prompts, model, system=None, use_cache=False, return_exceptions=False, **params):
+        """
+        Run many independent prompts concurrently and return responses in prompt order.
+
+        Args:
+            prompts (list): User prompts (str) or full message lists
+            model (str): Model name
+            system (str): Optional system prompt prepended to string prompts
+            use_cache (bool): Read and write the response cache (deterministic prompts only)
+            return_exceptions (bool): Return failures in place instead of raising
+
+        Returns:
+            list: One response (or exception) per prompt
+        """
+        prompts = list(prompts)
+        coro = self._map(prompts, model, system, use_cache, return_exceptions, params)
+        with span(f"llm:{model}", category='llm', model=model, prompts=len(prompts)):
+            return self._submit(coro).result()
+
+    async def amap_prompts(self, prompts, model, system=None, use_cache=False, return_exceptions=False, **params):
+        """Awaitable variant of map_prompts."""
+        coro = self._map(list(prompts), model, system, use_cache, return_exceptions, params)
+        return await asyncio.wrap_future(self._submit(coro))
+
+
+def _build_messages(system=None, user=None):
+    if isinstance(user, list):
+        return user
     messages = []
     if system is not None:
         messages.append({"role": "system", "content": system})
     if user is not None:
         messages.append({"role": "user", "content": user})
+    return messages
+
+
+gateway = LLMGateway(
+    api_key=llm_api_key,
+    base_url=llm_base_url,
+    max_concurrency=llm_max_concurrency,
+    cache_dir=llm_cache_dir if llm_enable_cache else None
+)
+
+
+def deepseek(model="deepseek-v3", system=None, user=None, use_cache=False):
+    return gateway.chat(model, _build_messages(system, user), use_cache=use_cache)
+
+
+def claude(model="claude-3-7-sonnet-20250219", system=None, user=None, use_cache=False):
+    return gateway.chat(model, _build_messages(system, user), use_cache=use_cache)
+
+
+def gpt(model="gpt-4o-mini", system=None, user=None, messages=None, use_cache=False):
+    if messages is None:
+        messages = _build_messages(system, user)
+    return gateway.chat(model, messages, use_cache=use_cache)
+
+
+def map_prompts(prompts, model="deepseek-v3", system=None, return_exceptions=False, use_cache=False):
+    return gateway.map_prompts(prompts, model, system=system, use_cache=use_cache,
+                               return_exceptions=return_exceptions)
+
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages
-    )
-    return response
-
-
-def gpt(model="gpt-4o-mini", system=None, user=None, messages=None):
-    if messages is not None:
-        pass
-    else:
-        messages = []
-        if system is not None:
-            messages.append({"role": "system", "content": system})
-        if user is not None:
-            messages.append({"role": "user", "content": user})
-
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages
-    )
-    return response
+def submit_prompts(prompts, model="deepseek-v3", system=None, use_cache=False):
+    return gateway.submit_prompts(prompts, model, system=system, use_cache=use_cache)
@@ -0,0 +1,97 @@
+import importlib
+import os
+import sys
+
+from ..agents.base import BaseAgent
+from ..communication.message import Message
+from ..utils.feature_store import DEFAULT_FEATURE_DIR, PROJECT_ROOT
+from ..utils.model_pool import get_model_pool
+
+
+def import_fap(name):
+    """导入 fish_audio_preprocess 的子模块，未安装 fap 时从 tools/audio-preprocess 导入"""
+    module = f"fish_audio_preprocess.{name}"
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        fap_dir = os.path.join(PROJECT_ROOT, "tools", "audio-preprocess")
+        if fap_dir not in sys.path:
+            sys.path.append(fap_dir)
+        return importlib.import_module(module)
+
+
+def get_preprocess_pipeline():
+    """进程内共享的 fap 预处理流水线，分离/识别模型只加载一次"""
+    def load():
+        PreprocessPipeline = import_fap("utils.pipeline").PreprocessPipeline
+        # 转录结果按音频哈希缓存，未改动的切片重复运行时不再识别
+        return PreprocessPipeline(
+            asr_model_type="funasr",
+            transcript_cache=os.path.join(DEFAULT_FEATURE_DIR, "transcripts.json"),
+        )
+
+    return get_model_pool().get('fap_pipeline', load)
+
+
+def run_stages(audio_dir, stages, recursive=False):
+    """在进程内对目录下的音频原地执行指定阶段，替代逐个调用 fap 子进程"""
+    if not os.path.isabs(audio_dir):
+        abs_audio_dir = os.path.abspath(audio_dir)
+        print(f"转换为绝对路径: {abs_audio_dir}")
+    else:
+        abs_audio_dir = audio_dir
+
+    print(f"音频路径存在: {os.path.exists(abs_audio_dir)}")
+    print(f"执行阶段: {' -> '.join(stages)}")
+    return get_preprocess_pipeline().process_dir(abs_audio_dir, recursive=recursive, stages=stages)
+
+
+class AudioPreprocessor(BaseAgent):
+    """
+    分离 -> 响度匹配 -> 重采样 -> (切片) -> 转录，一次解码、一次写出
+
+    消息内容:
+        audio_dir: 原地处理该目录下的所有音频
+        audio_path, slice_dir (可选): 处理单个音频，并把处理后的音频切片到 slice_dir，切片逐个转录
+        output_path (可选): 处理后的音频与 .lab 写到这里，不改动 audio_path；默认原地覆盖
+    """
+
+    def __init__(self, slicer=None):
+        super().__init__()
+        self.slicer = slicer
+
+    def process_message(self, message):
+        audio_dir = message.content.get("audio_dir")
+        audio_path = message.content.get("audio_path")
+        slice_dir = message.content.get("slice_dir")
+        output_path = message.content.get("output_path")
+
+        try:
+            pipeline = get_preprocess_pipeline()
+            if audio_path is not None:
+                print(f"原始音频路径: {audio_path}")
+                result = pipeline.process_file(
+                    os.path.abspath(audio_path),
+                    output_file=os.path.abspath(output_path) if output_path else None,
+                    slicer=self.slicer.slice if self.slicer is not None and slice_dir else None,
+                    slice_dir=slice_dir,
+                )
+                print(f"预处理完成: {result['file']}")
+                content = {"status": "success", "message": "Audio preprocess completed successfully",
+                           "text": result["text"], "metadata": result.get("slices")}
+            else:
+                print(f"原始音频路径: {audio_dir}")
+                results = run_stages(audio_dir, ("separate", "loudness_norm", "resample", "transcribe"))
+                print(f"预处理完成，共 {len(results)} 个文件")
+                content = {"status": "success", "message": "Audio preprocess completed successfully",
+                           "results": results}
+            return Message(content=content)
+
+        except Exception as e:
+            print(f"预处理出错: {str(e)}")
+            return Message(
+                content={
+                    "status": "error",
+                    "message": f"Audio preprocess failed: {str(e)}"
+                }
+            )
@@ -1,13 +1,14 @@
-from pathlib import Path
 import os
 from environment.config.llm import claude
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
+from environment.utils.job_context import resolve_job
 
 
 class CrossTalkAdapter(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def process_message(self, message):
         reqs = message.content.get("reqs")
@@ -18,7 +19,6 @@ class CrossTalkAdapter(BaseAgent):
         dou_gen_name = os.path.basename(dou_gen)
         peng_gen_name = os.path.basename(peng_gen)
 
-        path = Path(lab_path)
         with open(lab_path, 'r', encoding='utf-8') as f:
             en_script = f.read().strip()
 
@@ -58,7 +58,9 @@ class CrossTalkAdapter(BaseAgent):
             response = claude(user=user_prompt)
             res = response.choices[0].message.content
 
-            output_path = os.path.join(path.parent, 'ct.txt')
+            # 改写稿属于本次任务，写到任务目录而不是共享的数据集目录
+            output_path = self.job.path('writing_data', 'ct.txt')
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(res)
 
@@ -2,39 +2,99 @@ import re
 import os
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
-from environment.config.llm import deepseek
+from environment.config.llm import submit_prompts
 
-from cosyvoice.cli.cosyvoice import CosyVoice2
 from cosyvoice.utils.file_utils import load_wav
-import torchaudio
 import json
-from pydub import AudioSegment
+from environment.utils.audio_timeline import AudioTimeline, load_samples
+from environment.utils.model_pool import get_cosyvoice2
+from environment.utils.job_context import resolve_job
+
+CROSS_TALK_TONES = ("natural", "emphatic", "confused")
 
 
 class CrossTalkSynth(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
-    def concatenate_audio_files(self, base_path, cnt):
-        combined_audio = AudioSegment.silent(duration=0)
-
-        for i in range(cnt):
-            audio_file_path = f"{base_path}/exp/{i}.wav"
-            try:
-                audio_segment = AudioSegment.from_file(audio_file_path)
-                combined_audio += audio_segment
-                print(f"Successfully added {audio_file_path} to the combined audio.")
-            except Exception as e:
-                print(f"Error loading {audio_file_path}: {str(e)}")
-
-        output_file_dir = "../../dataset/video_edit/voice_gen"
+    def export_audio(self, timeline):
+        output_file_dir = self.job.voice_gen_dir
         output_file_path = os.path.join(output_file_dir,"gen_audio.wav")
         os.makedirs(output_file_dir, exist_ok=True)
-        combined_audio.export(output_file_path, format="wav")
+        timeline.write(output_file_path)
         print(f"Final audio saved to {os.path.abspath(output_file_path)}")
 
         return os.path.abspath(output_file_path)
 
+    @staticmethod
+    def _load_voice_prompts(cosyvoice, base_path, roles):
+        """Precompute zero-shot prompt features for every available (role, tone) sample."""
+        voice_prompts = {}
+        for role in roles:
+            for tone in CROSS_TALK_TONES:
+                lab_path = f'{base_path}/{role}/{tone}.lab'
+                wav_path = f'{base_path}/{role}/{tone}.wav'
+                if not (os.path.exists(lab_path) and os.path.exists(wav_path)):
+                    continue
+                with open(lab_path, 'r', encoding='utf-8') as f:
+                    prompt_text = f.read().strip()
+                prompt_input = cosyvoice.prepare_zero_shot_prompt(prompt_text, load_wav(wav_path, 16000))
+                voice_prompts[(role, tone)] = (prompt_text, prompt_input)
+        return voice_prompts
+
+    @staticmethod
+    def _load_reaction(reactions, reaction_path, sample_rate):
+        if reaction_path not in reactions:
+            reactions[reaction_path] = load_samples(reaction_path, sample_rate)
+        return reactions[reaction_path]
+
+    @staticmethod
+    def _strip_json_fence(res):
+        if res.startswith("```json"):
+            res = res[len("```json"):]
+        elif res.startswith("```"):
+            res = res[len("```"):]
+        if res.endswith("```"):
+            res = res[:-3]
+        return res.strip()
+
+    @staticmethod
+    def _analysis_prompt(line, dou_gen_name, peng_gen_name):
+        return f"""
+        Analyze the following crosstalk dialogue line for performer role, tone, text content and audience reaction:
+        {line}
+
+        Output JSON format with STRICT rules:
+        1. "role" field must be either {dou_gen_name} or {peng_gen_name}
+        2. "tone" field must be "Natural", "Emphatic" or "Confused"
+        3. "text" field contains the dialogue content
+        4. Add "reaction" field ONLY if [Laughter] or [Cheers] exists (value must be "Laughter" or "Cheers")
+        5. No extra characters before/after JSON
+
+        Example 1:
+        {{
+            "role": "{dou_gen_name}",
+            "tone": "Natural",
+            "text": "...",
+            "reaction": "Cheers"
+        }}
+
+        Example 2:
+        {{
+            "role": "{peng_gen_name}",
+            "tone": "Emphatic",
+            "text": "..."
+        }}
+
+        Strictly ensure:
+        - Valid JSON syntax
+        - Double quotes for strings
+        - Do not add any characters before or after the JSON structure
+
+        Output ONLY the JSON object!
+        """
+
     def process_message(self, message):
         script = message.content.get("script")
         dou_gen = message.content.get("dou_gen")
@@ -43,18 +103,19 @@ class CrossTalkSynth(BaseAgent):
         dou_gen_name = os.path.basename(dou_gen)
         peng_gen_name = os.path.basename(peng_gen)
 
-        current_dir = os.getcwd()
-        os.chdir(os.path.join(current_dir, "tools", "CosyVoice"))
+        model_dir = self.job.project_path("tools", "CosyVoice", "pretrained_models", "CosyVoice2-0.5B")
         try:
-            cosyvoice = CosyVoice2('pretrained_models/CosyVoice2-0.5B', load_jit=False, load_trt=False, fp16=False)
+            # 模型在进程内共享，批量任务只加载一次
+            cosyvoice = get_cosyvoice2(model_dir)
         except Exception as e:
             print('cosyvoice issue:', e)
         results = []
         text_list = []
         cnt = 0
         first_line = True
-        base_path = '../../' + os.path.dirname(dou_gen)
+        base_path = self.job.project_path(os.path.dirname(dou_gen))
 
+        lines = []
         for line in script.split('\n'):
             if not line.strip():
                 continue
@@ -67,52 +128,22 @@ class CrossTalkSynth(BaseAgent):
                 title = cleaned_line
                 continue
 
-            user_prompt = f"""
-            Analyze the following crosstalk dialogue line for performer role, tone, text content and audience reaction:
-            {line}
-
-            Output JSON format with STRICT rules:
-            1. "role" field must be either {dou_gen_name} or {peng_gen_name}
-            2. "tone" field must be "Natural", "Emphatic" or "Confused"
-            3. "text" field contains the dialogue content
-            4. Add "reaction" field ONLY if [Laughter] or [Cheers] exists (value must be "Laughter" or "Cheers")
-            5. No extra characters before/after JSON
-
-            Example 1:
-            {{
-                "role": "{dou_gen_name}",
-                "tone": "Natural",
-                "text": "...",
-                "reaction": "Cheers"
-            }}
-
-            Example 2:
-            {{
-                "role": "{peng_gen_name}",
-                "tone": "Emphatic",
-                "text": "..."
-            }}
-
-            Strictly ensure:
-            - Valid JSON syntax
-            - Double quotes for strings
-            - Do not add any characters before or after the JSON structure
-
-            Output ONLY the JSON object!
-            """
+            lines.append(line)
 
+        # Annotate every line concurrently; synthesis below consumes the annotations in order,
+        # so the LLM keeps running ahead while the GPU synthesizes earlier lines
+        annotations = submit_prompts([self._analysis_prompt(line, dou_gen_name, peng_gen_name) for line in lines],
+                                     use_cache=True)
+        voice_prompts = self._load_voice_prompts(cosyvoice, base_path, [dou_gen_name, peng_gen_name])
+
+        # The whole dialogue is assembled in memory and written once
+        timeline = AudioTimeline(cosyvoice.sample_rate, capacity_seconds=10.0 * max(len(lines), 1))
+        reactions = {}
+        for line, annotation in zip(lines, annotations):
+            line_start = timeline.cursor
+            result = {"role": None, "text": line.strip()}
             try:
-                # 调用 OpenAI API
-                response = deepseek(user=user_prompt)
-                res = response.choices[0].message.content
-
-                if res.startswith("```json"):
-                    res = res[len("```json"):]
-                elif res.startswith("```"):
-                    res = res[len("```"):]
-                if res.endswith("```"):
-                    res = res[:-3]
-                res = res.strip()
+                res = self._strip_json_fence(annotation.result().choices[0].message.content)
 
                 print(cnt, ":", res)
                 result = json.loads(res)
@@ -121,42 +152,33 @@ class CrossTalkSynth(BaseAgent):
                 text = result['text'].strip()
                 text_list.append(text)
 
-                with open(f'{base_path}/{role}/{tone}.lab', 'r', encoding='utf-8') as f:
-                    prompt_text = f.read().strip()
-
-                os.makedirs(f"{base_path}/exp", exist_ok=True)
-
-                prompt_speech_16k = load_wav(f'{base_path}/{role}/{tone}.wav', 16000)
-                for i, j in enumerate(cosyvoice.inference_zero_shot(
+                prompt_text, prompt_input = voice_prompts[(role, tone)]
+                for j in cosyvoice.inference_zero_shot(
                         text,
-                        prompt_text, prompt_speech_16k, stream=False)):
-                    torchaudio.save(f'{base_path}/exp/{cnt}.wav', j['tts_speech'], cosyvoice.sample_rate)
+                        prompt_text, None, stream=False, prompt_input=prompt_input):
+                    timeline.append(j['tts_speech'])
 
                 if 'reaction' in result:
                     reaction = result['reaction']
                     reaction_path = os.path.join(base_path, "reaction", f"{reaction}.wav")
 
                     try:
-                        original_audio = AudioSegment.from_file(f"{base_path}/exp/{cnt}.wav")
-                        reaction_audio = AudioSegment.from_file(reaction_path)
-
-                        combined_audio = original_audio + reaction_audio
-
-                        combined_audio.export(f"{base_path}/exp/{cnt}.wav", format="wav")
+                        timeline.append(self._load_reaction(reactions, reaction_path, cosyvoice.sample_rate))
                         print(f"Successfully combined reaction audio for line {cnt}.")
                     except Exception as e:
                         print(f"Error combining reaction audio for line {cnt}: {str(e)}")
 
-                results.append(result)
-                cnt += 1
             except Exception as e:
                 print(f"Error processing line: {line}. Error: {str(e)}")
-                continue
+                result['error'] = str(e)
+            # 失败的句子也保留一项（时长为已写入的音频），时间轴与脚本逐句对齐
+            result['duration'] = (timeline.cursor - line_start) / cosyvoice.sample_rate
+            results.append(result)
+            cnt += 1
 
-        output_file_path = self.concatenate_audio_files(base_path, cnt)
+        output_file_path = self.export_audio(timeline)
         print(f"Final combined audio saved at: {output_file_path}")
-        os.chdir(current_dir)
-        with open(os.path.join(os.path.dirname(dou_gen), 'ct.json'), 'w', encoding='utf-8') as f:
+        with open(os.path.join(self.job.voice_gen_dir, 'ct.json'), 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
 
         return Message(
@@ -1,41 +1,37 @@
 import os
 from environment.agents.base import BaseAgent
-import soundfile as sf
 import json
+from environment.utils.job_context import resolve_job
 
 
 class CrossTalkTranslator(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def process_message(self, message=None):
-        json_path = 'dataset/cross_talk/ct.json'
+        json_path = os.path.join(self.job.voice_gen_dir, 'ct.json')
         chunks = []
         current_time = 0.0
         with open(json_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
 
+        # 合成阶段为每句（包括失败的句子）记录时长；缺少时长说明ct.json来自旧版本，直接报错
         for idx, item in enumerate(data):
-            wav_path = os.path.join("dataset/cross_talk/exp", f"{idx}.wav")
-            try:
-                data, samplerate = sf.read(wav_path)
-                duration = len(data) / samplerate
-                end_time = current_time + duration
+            if 'duration' not in item:
+                raise ValueError(f"{json_path} line {idx + 1} has no duration; synthesize the dialogue again")
+            end_time = current_time + item['duration']
 
-                # 在content开头添加[role]
-                content = f"[{item['role']}] {item['text']}"  # 假设role字段存在
+            # 在content开头添加[role]，合成失败的句子没有role
+            content = f"[{item['role']}] {item['text']}" if item.get('role') else item['text']
 
-                chunks.append({
-                    "id": idx + 1,
-                    "timestamp": round(end_time, 3),
-                    "content": content  # 使用添加了role的content
-                })
+            chunks.append({
+                "id": idx + 1,
+                "timestamp": round(end_time, 3),
+                "content": content  # 使用添加了role的content
+            })
 
-                current_time = end_time
-
-            except Exception as e:
-                print(f"无法读取 {wav_path}: {str(e)}")
-                continue
+            current_time = end_time
 
         result = {
             "sentence_data": {
@@ -44,7 +40,7 @@ class CrossTalkTranslator(BaseAgent):
             }
         }
 
-        video_gen = 'dataset/video_edit/voice_gen'
+        video_gen = self.job.voice_gen_dir
         os.makedirs(video_gen, exist_ok=True)
         with open(os.path.join(video_gen, 'gen_audio_timestamps.json'), 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
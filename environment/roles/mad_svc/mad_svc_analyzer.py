@@ -3,10 +3,12 @@ import json
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
 from environment.config.llm import claude, deepseek
+from environment.utils.job_context import resolve_job
 
 class MadSVCAnalyzer(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def parse_lyrics_structure(self, lyrics):
         """解析歌词结构，返回包含AP和歌词的list，以及LYRICS部分的原歌词"""
@@ -225,10 +227,10 @@ class MadSVCAnalyzer(BaseAgent):
                 extract_index += 1
 
         result = "".join(lyrics_structure)
-        with open('dataset/mad_svc/script.txt', 'w', encoding='utf-8') as f:
+        with open(self.job.path('writing_data', 'script.txt'), 'w', encoding='utf-8') as f:
             f.write(result)
         data['text'] = result
-        with open(os.path.join('dataset/mad_svc/lyrics_annotation', f'{name}_cover.json'), 'w', encoding='utf-8') as f:
+        with open(os.path.join(os.path.dirname(json_path), f'{name}_cover.json'), 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
         return Message(
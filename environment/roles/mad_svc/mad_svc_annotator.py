@@ -6,6 +6,7 @@ from environment.agents.base import BaseAgent
 import mido
 
 from environment.communication.message import Message
+from environment.utils.job_context import resolve_job
 
 
 def note_to_name(note_number):
@@ -220,12 +221,13 @@ def analyze_midi(midi_path, lyrics, output_path):
 
 
 class MadSVCAnnotator(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def process_message(self, message):
-        midi_path = message.content.get("midi")
-        lyrics_path = message.content.get("lyrics")
+        midi_path = self.job.project_path(message.content.get("midi"))
+        lyrics_path = self.job.project_path(message.content.get("lyrics"))
 
         if not midi_path.endswith('.mid'):
             return {
@@ -254,8 +256,9 @@ class MadSVCAnnotator(BaseAgent):
 
         try:
             # 确保输出目录存在
-            os.makedirs("dataset/mad_svc/lyrics_annotation", exist_ok=True)
-            output_path = "dataset/mad_svc/lyrics_annotation/" + name + ".json"
+            annotation_dir = self.job.path('writing_data', 'lyrics_annotation')
+            os.makedirs(annotation_dir, exist_ok=True)
+            output_path = os.path.join(annotation_dir, name + ".json")
             json_result = analyze_midi(midi_path, lyrics, output_path)
 
             return Message(
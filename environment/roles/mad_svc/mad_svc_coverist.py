@@ -1,78 +1,54 @@
 import os
 import sys
-import subprocess
+
+import soundfile as sf
+
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
+from environment.utils.feature_store import get_feature_store
+from environment.utils.job_context import resolve_job
+from environment.utils.model_pool import get_model_pool
+
+SVC_BATCH_SIZE = 8
+
+
+def get_seed_vc_engine():
+    """Load the seed-vc models once per process and reuse them for every conversion."""
+    def load():
+        seedvc_dir = resolve_job().project_path("tools", "seed-vc")
+        if seedvc_dir not in sys.path:
+            sys.path.append(seedvc_dir)
+        from seed_vc_engine import SeedVCEngine
+        return SeedVCEngine(f0_condition=True, feature_store=get_feature_store())
+
+    return get_model_pool().get('seed_vc', load)
 
 
 class MadSVCCoverist(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def process_message(self, message):
-        source = '../../' + message.content.get('source')
-        target = '../../' + message.content.get('target')
-        output = '../../dataset/video_edit/voice_gen'
+        source = self.job.project_path(message.content.get('source'))
+        target = self.job.project_path(message.content.get('target'))
+        output = self.job.voice_gen_dir
         print(f"Source: {source}")
         print(f"Target: {target}")
 
-        original_dir = os.getcwd()
-        original_pythonpath = os.environ.get("PYTHONPATH", "")
-
         try:
-            # 切换到 seedvc 目录
-            seedvc_dir = os.path.join("tools", "seed-vc")
-            os.chdir(seedvc_dir)
+            engine = get_seed_vc_engine()
             os.makedirs(output, exist_ok=True)
 
-            seedvc_abs_path = os.path.abspath('.')
-            os.environ["PYTHONPATH"] = seedvc_abs_path
+            # 目标音色特征按音频哈希缓存，同一歌手只计算一次
+            target_voice = engine.prepare_target(target)
+            # 长音频的各个上下文窗口批量推理
+            wave = engine.convert(engine.load_audio(source), target_voice, batch_size=SVC_BATCH_SIZE)
+            sf.write(os.path.join(output, 'gen_audio.wav'), wave, engine.sr)
 
-
-            cmd_parts = [
-                sys.executable,
-                "inference.py",
-                "--source", source,
-                "--target", target,
-                "--output", output,
-                "--f0-condition", "True"
-            ]
-
-            try:
-                process = subprocess.run(cmd_parts, capture_output=True, text=True, encoding='utf-8')
-            except UnicodeDecodeError:
-                process = subprocess.run(cmd_parts, capture_output=True, text=False)
-                stdout = process.stdout.decode('utf-8', errors='replace') if process.stdout else ""
-                stderr = process.stderr.decode('utf-8', errors='replace') if process.stderr else ""
-                process.stdout = stdout
-                process.stderr = stderr
-
-            print(f"标准输出: {process.stdout}")
-            if process.stderr:
-                print(f"错误输出: {process.stderr}")
-
-            if process.returncode == 0:
-                print("命令执行成功")
-                return Message(content={'status': 'success', 'output_dir': 'dataset/video_edit/voice_gen'})
-            else:
-                print(f"命令执行失败，返回码: {process.returncode}")
-                return Message(content={
-                    'status': 'error',
-                    'error': f"命令执行失败，返回码: {process.returncode}",
-                    'stderr': process.stderr
-                })
+            print("转换成功")
+            return Message(content={'status': 'success', 'output_dir': output})
 
         except Exception as e:
             print(f"执行过程中发生错误: {e}")
             return Message(content={'status': 'error', 'error': str(e)})
-
-        finally:
-            os.chdir(original_dir)
-
-            if original_pythonpath:
-                os.environ["PYTHONPATH"] = original_pythonpath
-            else:
-                if "PYTHONPATH" in os.environ:
-                    del os.environ["PYTHONPATH"]
-
-            print(f"已恢复工作目录: {original_dir}")
\ No newline at end of file
@@ -9,10 +9,17 @@ from environment.communication.message import Message
 from tools.DiffSinger.diff import run_diffsinger
 import librosa
 import soundfile as sf
+from environment.utils.audio_timeline import AudioTimeline
+from environment.utils.job_context import resolve_job
 
 class MadSVCSingle(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
+        # 歌声片段、标注与 DiffSinger 输入都写到任务目录，不同歌词的任务互不覆盖
+        self.cover_dir = self.job.path('voice_gen', 'cover')
+        self.annotation_dir = self.job.path('writing_data', 'lyrics_annotation')
+        self.tmp_dir = self.job.path('writing_data', 'tmp')
 
     def process_message(self, message):
         analysis = message.content.get("analyzer_result").content
@@ -108,8 +115,9 @@ class MadSVCSingle(BaseAgent):
     def _generate_audio_segments(self, name, text_list, notes_list, notes_duration_list):
         """生成完整音频并返回最终路径（精确时长控制版）"""
         new_name = f"{name}_cover"
-        cover_dir = "dataset/mad_svc/cover"
-        os.makedirs("dataset/mad_svc/lyrics_annotation", exist_ok=True)
+        cover_dir = self.cover_dir
+        os.makedirs(cover_dir, exist_ok=True)
+        os.makedirs(self.annotation_dir, exist_ok=True)
 
         # 初始化音频（统一使用44.1kHz采样率）
         combined_audio = AudioSegment.silent(duration=0, frame_rate=44100)
@@ -138,14 +146,14 @@ class MadSVCSingle(BaseAgent):
                 # 生成语音片段
                 segment = self._create_segment(i, text_list, notes_list, notes_duration_list)
                 segment_name = f"{new_name}_part_{i}"
-                inp_path = os.path.join("dataset/mad_svc/lyrics_annotation", f"{segment_name}.json")
+                inp_path = os.path.join(self.annotation_dir, f"{segment_name}.json")
 
                 with open(inp_path, 'w', encoding='utf-8') as f:
                     json.dump(segment, f, ensure_ascii=False, indent=2)
 
                 try:
                     # 调用DiffSinger生成原始音频
-                    run_diffsinger(input_dir="../../" + inp_path, save_name=segment_name)
+                    run_diffsinger(input_dir=inp_path, output_dir=cover_dir)
                     seg_audio_path = os.path.join(cover_dir, f"{segment_name}.wav")
 
                     if not os.path.exists(seg_audio_path):
@@ -241,10 +249,11 @@ class MadSVCSingle(BaseAgent):
     def _generate_audio_segments_batch(self, name, text_list, notes_list, notes_duration_list):
         """生成完整音频并返回最终路径（精确时长控制版）"""
         new_name = f"{name}_cover"
-        cover_dir = "dataset/mad_svc/cover"
-        os.makedirs("dataset/mad_svc/lyrics_annotation", exist_ok=True)
+        cover_dir = self.cover_dir
+        os.makedirs(cover_dir, exist_ok=True)
+        os.makedirs(self.annotation_dir, exist_ok=True)
 
-        tmp_dir = "dataset/mad_svc/tmp"
+        tmp_dir = self.tmp_dir
         os.makedirs(tmp_dir, exist_ok=True)
 
         # 切片
@@ -267,7 +276,7 @@ class MadSVCSingle(BaseAgent):
 
         # 按切片生成音频
         try:
-            run_diffsinger(input_dir=tmp_dir)
+            run_diffsinger(input_dir=tmp_dir, output_dir=cover_dir)
             pass
         except Exception as e:
             print(f"Error during DiffSinger execution: {e}")
@@ -278,28 +287,23 @@ class MadSVCSingle(BaseAgent):
             # for path in os.listdir(tmp_dir):
             #     os.remove(os.path.join(tmp_dir, path))
 
-        # 合并音频
-        combined_audio = AudioSegment.silent(duration=0, frame_rate=44100)
-        total_expected_duration = 0
+        # 合并音频（在同一缓冲区中按采样点拼接，最后一次性写出）
         sr = 44100
+        total_expected_duration = 0
+        timeline = AudioTimeline(sr, capacity_seconds=sum(segment['duration'] for segment in segments) + 1.0)
 
         for i, segment in enumerate(segments):
             segment_type = "AP" if segment['segment']['text'] == 'AP' else "Voice"
             target_duration_sec = segment['duration']
             total_expected_duration += target_duration_sec
+            # 以累计目标时长换算片段终点，避免逐段取整造成的误差累积
+            target_samples = int(round(total_expected_duration * sr)) - timeline.cursor
 
             if segment_type == "AP":
                 # 精确静音生成（采样点级别精确）
-                silence_samples = int(round(target_duration_sec * sr))
-                silence = AudioSegment(
-                    data=np.zeros(silence_samples, dtype=np.int16).tobytes(),
-                    sample_width=2,
-                    frame_rate=sr,
-                    channels=1
-                )
-                combined_audio += silence
+                timeline.append_silence(target_samples / sr)
                 print(f"Silence Segment {i}: target={target_duration_sec:.3f}s, "
-                      f"actual={len(silence) / 1000:.3f}s, samples={silence_samples}")
+                      f"actual={target_samples / sr:.3f}s, samples={target_samples}")
 
             else:
                 # 读取生成的音频
@@ -321,46 +325,21 @@ class MadSVCSingle(BaseAgent):
                     stretch_factor = current_duration / target_duration_sec
                     audio_array = librosa.effects.time_stretch(audio_array, rate=stretch_factor)
 
-                # 转换为AudioSegment（原始长度，不做截断）
-                audio_segment = AudioSegment(
-                    data=(np.clip(audio_array, -1.0, 1.0) * 32767).astype(np.int16).tobytes(),
-                    sample_width=2,
-                    frame_rate=sr,
-                    channels=1
-                )
-
-                # 强制时长对齐（毫秒级精确操作）
-                target_ms = int(round(target_duration_sec * 1000))
-                actual_ms = len(audio_segment)
-
-                if actual_ms != target_ms:
+                # 强制时长对齐（采样点级精确操作）
+                actual_samples = len(audio_array)
+                if actual_samples != target_samples:
                     print(f"Adjusting segment {i}: "
-                            f"target={target_ms}ms ({target_duration_sec:.3f}s), "
-                            f"actual={actual_ms}ms ({actual_ms / 1000:.3f}s)")
-
-                    if actual_ms < target_ms:
-                        # 补静音
-                        silence = AudioSegment.silent(
-                            duration=target_ms - actual_ms,
-                            frame_rate=sr
-                        )
-                        audio_segment += silence
-                    else:
-                        # 截断
-                        audio_segment = audio_segment[:target_ms]
-
-                    print(f"After adjustment: {len(audio_segment)}ms "
-                            f"(error={len(audio_segment) - target_ms}ms)")
-
-                # 最终验证
-                final_error_ms = len(audio_segment) - target_ms
-                if abs(final_error_ms) > 1:
-                    print(f"Warning: Segment {i} still has error: {final_error_ms}ms")
-
-                combined_audio += audio_segment
+                            f"target={target_samples} samples ({target_duration_sec:.3f}s), "
+                            f"actual={actual_samples} samples ({actual_samples / sr:.3f}s)")
+                    # 不足时补静音，超出时截断
+                    audio_array = audio_array[:target_samples]
+
+                start, _ = timeline.append(np.clip(audio_array, -1.0, 1.0))
+                # 补齐剩余静音，使下一段从目标位置开始
+                timeline.append_silence((start + target_samples - timeline.cursor) / sr)
 
         # 最终时长验证
-        total_actual_duration = len(combined_audio) / 1000
+        total_actual_duration = timeline.duration
         print(f"\nFinal duration check:")
         print(f"Expected: {total_expected_duration:.3f}s")
         print(f"Actual:   {total_actual_duration:.3f}s")
@@ -368,5 +347,5 @@ class MadSVCSingle(BaseAgent):
 
         # 保存结果
         final_output_path = os.path.join(cover_dir, f"{new_name}.wav")
-        combined_audio.export(final_output_path, format="wav")
+        timeline.write(final_output_path)
         return final_output_path
\ No newline at end of file
@@ -3,10 +3,12 @@ import os.path
 import time
 from pathlib import Path
 from environment.agents.base import BaseAgent
+from environment.utils.job_context import resolve_job
 
 class MadSVCTranslator(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def parse_text_to_segments(self, text, durations):
         """解析文本并生成时间段落，返回 segments 和 AP 时间段"""
@@ -53,8 +55,8 @@ class MadSVCTranslator(BaseAgent):
     def process_message(self, message):
         """处理请求的主函数"""
         name = message.content.get("name")
-        dir_path = "dataset/mad_svc/lyrics_annotation"
-        script_path = "dataset/mad_svc/script.txt"
+        dir_path = self.job.path("writing_data", "lyrics_annotation")
+        script_path = self.job.path("writing_data", "script.txt")
 
         # 加载原始数据
         timestamp_json_path = os.path.join(dir_path, f"{name}.json")
@@ -132,7 +134,7 @@ class MadSVCTranslator(BaseAgent):
             }
         }
 
-        video_gen = 'dataset/video_edit/voice_gen'
+        video_gen = self.job.voice_gen_dir
         os.makedirs(video_gen, exist_ok=True)
 
         output_path = os.path.join(video_gen, 'gen_audio_timestamps.json')
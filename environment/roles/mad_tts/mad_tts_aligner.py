@@ -1,18 +1,12 @@
 from pathlib import Path
-from openai import OpenAI
 from environment.config.llm import deepseek
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
-from environment.config.config import config
 
 
 class MadTTSAligner(BaseAgent):
     def __init__(self):
         super().__init__()
-        self.client = OpenAI(
-            api_key=config['llm']['api_key'],
-            base_url=config['llm']['base_url']
-        )
         self.max_retries = 3
 
     def process_message(self, message):
@@ -9,12 +9,14 @@ import sys
 
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
+from environment.utils.job_context import resolve_job
 
 
 
 class MadTTSInfer(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def get_audio_duration(self, wav_file_path):
         """获取音频文件的时长（秒）"""
@@ -29,26 +31,36 @@ class MadTTSInfer(BaseAgent):
             return 0
 
     def process_message(self, message):
-        audio_path = message.content.get("audio_dir")
-        speech_path = os.path.join(os.path.dirname(audio_path), 'speech.txt')
+        audio_path = self.job.project_path(message.content.get("audio_dir"))
+        speech_path = message.content.get("speech_path")
         print(speech_path)
         splits = []
         with open(speech_path, 'r', encoding='utf-8') as file:
             for line in file:
                 splits.append(line.strip())
 
-        fish_speech_path = os.path.join(os.getcwd(), "tools", "fish-speech")
+        fish_speech_path = self.job.project_path("tools", "fish-speech")
         if fish_speech_path not in sys.path:
             sys.path.append(fish_speech_path)
 
+        import numpy as np
+        from fish_speech.inference_engine.reference_store import ReferenceStore
+
+        decoder_checkpoint = os.path.join(fish_speech_path, "checkpoints", "fish-speech-1.5",
+                                          "firefly-gan-vq-fsq-8x1024-21hz-generator.pth")
+        # 与fish-speech服务端/webui共用同一个参考音频编码存储，按VQGAN权重分目录
+        reference_store = ReferenceStore(checkpoint=decoder_checkpoint)
+
         # Split copy text into paragraphs
         print(f"Total paragraphs: {len(splits)}")
 
-        current_dir = os.getcwd()
         path = Path(audio_path)
         new_dir_name = f"derivative"
         new_dir_path = path / new_dir_name
         new_dir_path.mkdir(parents=True, exist_ok=True)
+        # fish-speech 子进程以其目录为工作目录运行，文件路径一律传绝对路径；
+        # 语义codes写入本任务目录，不再共用 tools/fish-speech/temp
+        codes_dir = new_dir_path / "codes"
 
         try:
             lab_files_with_content = []
@@ -110,8 +122,6 @@ class MadTTSInfer(BaseAgent):
                 if len(combined_wav_files) > 1:
                     temp_wav_path = new_dir_path / f"temp_{filename}.wav"
 
-                    os.chdir(current_dir)
-
                     try:
                         import numpy as np
                         from scipy.io import wavfile
@@ -139,33 +149,47 @@ class MadTTSInfer(BaseAgent):
                 else:
                     combined_wav_file = combined_wav_files[0]
 
-                os.chdir(os.path.join(current_dir, "tools", "fish-speech"))
-
-                cmd1 = [
-                    sys.executable,
-                    "fish_speech/models/vqgan/inference.py",
-                    "-i", f"../../{combined_wav_file}",
-                    "--checkpoint-path", "checkpoints/fish-speech-1.5/firefly-gan-vq-fsq-8x1024-21hz-generator.pth",
-                    "--output-path", f"../../{new_dir_path}/{filename}.wav"
-                ]
+                prompt_tokens_path = new_dir_path / f"{filename}.npy"
+                with open(combined_wav_file, 'rb') as f:
+                    reference_key = reference_store.key(f.read())
+                stored = reference_store.get(reference_key)
 
-                process1 = subprocess.Popen(
-                    cmd1,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    encoding='utf-8',
-                    bufsize=0
-                )
-
-                stdout, stderr = process1.communicate()
-                print(stdout)
-                print(stderr)
-
-                if process1.returncode != 0:
-                    raise Exception(f"VQGAN inference failed with return code {process1.returncode}")
-
-                print("cmd1 complete successfully")
+                if stored is not None:
+                    # 参考音频已编码过，直接复用存储中的codes，跳过VQGAN编码
+                    np.save(prompt_tokens_path, stored[0])
+                    print("cmd1 skipped, reference codes loaded from store")
+                else:
+                    cmd1 = [
+                        sys.executable,
+                        "fish_speech/models/vqgan/inference.py",
+                        "-i", str(combined_wav_file),
+                        "--checkpoint-path", decoder_checkpoint,
+                        "--output-path", str(new_dir_path / f"{filename}.wav")
+                    ]
+
+                    process1 = subprocess.Popen(
+                        cmd1,
+                        cwd=fish_speech_path,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        encoding='utf-8',
+                        bufsize=0
+                    )
+
+                    stdout, stderr = process1.communicate()
+                    print(stdout)
+                    print(stderr)
+
+                    if process1.returncode != 0:
+                        raise Exception(f"VQGAN inference failed with return code {process1.returncode}")
+
+                    reference_store.put(
+                        reference_key,
+                        np.load(prompt_tokens_path),
+                        combined_lab_content
+                    )
+                    print("cmd1 complete successfully")
 
                 print("Starting cmd2...")
                 cmd2 = [
@@ -173,13 +197,15 @@ class MadTTSInfer(BaseAgent):
                     "fish_speech/models/text2semantic/inference.py",
                     "--text", split,
                     "--prompt-text", combined_lab_content,
-                    "--prompt-tokens", f"../../{new_dir_path}/{filename}.npy",
-                    "--checkpoint-path", "checkpoints/fish-speech-1.5",
-                    "--num-samples", "1"
+                    "--prompt-tokens", str(prompt_tokens_path),
+                    "--checkpoint-path", os.path.join(fish_speech_path, "checkpoints", "fish-speech-1.5"),
+                    "--num-samples", "1",
+                    "--output-dir", str(codes_dir)
                 ]
 
                 process2 = subprocess.Popen(
                     cmd2,
+                    cwd=fish_speech_path,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     text=True,
@@ -200,13 +226,14 @@ class MadTTSInfer(BaseAgent):
                 cmd3 = [
                     sys.executable,
                     "fish_speech/models/vqgan/inference.py",
-                    "-i", f"temp/codes_0.npy",
-                    "--checkpoint-path", "checkpoints/fish-speech-1.5/firefly-gan-vq-fsq-8x1024-21hz-generator.pth",
-                    "--output-path", f"../../{new_dir_path}/{filename}.wav"
+                    "-i", str(codes_dir / "codes_0.npy"),
+                    "--checkpoint-path", decoder_checkpoint,
+                    "--output-path", str(new_dir_path / f"{filename}.wav")
                 ]
 
                 process3 = subprocess.Popen(
                     cmd3,
+                    cwd=fish_speech_path,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     text=True,
@@ -230,7 +257,6 @@ class MadTTSInfer(BaseAgent):
                     "paragraph": split,
                     "status": "success"
                 })
-                os.chdir(current_dir)
 
                 # 清理临时文件
                 if len(combined_wav_files) > 1 and os.path.exists(str(temp_wav_path)):
@@ -7,6 +7,7 @@ from openai import OpenAI
 
 from environment.agents.base import BaseAgent
 from environment.config.config import config
+from environment.utils.tracing import span
 
 client = OpenAI(api_key='<KEY>')
 class MadTTSSubtitleV1(BaseAgent):
@@ -143,7 +144,8 @@ class MadTTSSubtitleV2(BaseAgent):
 
     def whisper_transcription(self, audio_path: str):
         """使用Whisper进行音频转录并保存时间戳分段"""
-        model = whisper.load_model("turbo")
+        with span("load:whisper-turbo", category='model_load'):
+            model = whisper.load_model("turbo")
         result = model.transcribe(str(audio_path))
         self.segments = result.get('segments', [])
 
@@ -17,6 +17,8 @@ class MadTTSWriter(BaseAgent):
     def process_message(self, message):
         reqs = message.content.get("reqs")
         lab_path = message.content.get("lab_path")
+        output_dir = message.content.get("output_dir")
+        os.makedirs(output_dir, exist_ok=True)
         slice_lab_dir = os.path.splitext(lab_path)[0]
         print(slice_lab_dir)
 
@@ -58,7 +60,7 @@ class MadTTSWriter(BaseAgent):
         except Exception as e:
             print(e)
         generated_text = response.choices[0].message.content
-        output_path = os.path.join(os.path.dirname(lab_path), 'raw_speech.txt')
+        output_path = os.path.join(output_dir, 'raw_speech.txt')
 
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(generated_text)
@@ -89,7 +91,7 @@ class MadTTSWriter(BaseAgent):
         response = deepseek(user=extract_prompt)
         extract_text = response.choices[0].message.content
 
-        output_path = os.path.join(os.path.dirname(lab_path), 'speech.txt')
+        output_path = os.path.join(output_dir, 'speech.txt')
 
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(extract_text)
@@ -1,18 +1,18 @@
-from pathlib import Path
 import os
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
+from environment.utils.job_context import resolve_job
 from environment.config.llm import claude
 
 
 class TalkShowAdapter(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
     def process_message(self, message):
         reqs = message.content.get("reqs")
         lab_path = message.content.get("lab_path")
-        path = Path(lab_path)
         with open(lab_path, 'r', encoding='utf-8') as f:
             cn_script = f.read().strip()
         user_prompt = f"""
@@ -52,7 +52,9 @@ class TalkShowAdapter(BaseAgent):
             response = claude(user=user_prompt)
             res = response.choices[0].message.content
 
-            output_path = os.path.join(path.parent, 'ts.txt')
+            # 改写稿属于本次任务，写到任务目录而不是共享的数据集目录
+            output_path = self.job.path('writing_data', 'ts.txt')
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(res)
 
@@ -1,89 +1,117 @@
 import os
 from environment.agents.base import BaseAgent
 from environment.communication.message import Message
-from cosyvoice.cli.cosyvoice import CosyVoice2
 from cosyvoice.utils.file_utils import load_wav
-import torchaudio
 import json
-from pydub import AudioSegment
-from environment.config.llm import deepseek
+from environment.config.llm import submit_prompts
+from environment.utils.audio_timeline import AudioTimeline, load_samples
+from environment.utils.model_pool import get_cosyvoice2
+from environment.utils.job_context import resolve_job
+
+TALK_SHOW_TONES = ("natural", "empathetic", "confused", "exclamatory")
 
 class TalkShowSynth(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
 
-    def concatenate_audio_files(self, base_path, cnt):
-        combined_audio = AudioSegment.silent(duration=0)
-
-        for i in range(cnt):
-            audio_file_path = os.path.join(base_path, 'exp', f'{i}.wav')
-            try:
-                audio_segment = AudioSegment.from_file(audio_file_path)
-                combined_audio += audio_segment
-                print(f"Successfully added {audio_file_path} to the combined audio.")
-            except Exception as e:
-                print(f"Error loading {audio_file_path}: {str(e)}")
-
-        output_file_dir = "../../dataset/video_edit/voice_gen"
+    def export_audio(self, timeline):
+        output_file_dir = self.job.voice_gen_dir
         output_file_path = os.path.join(output_file_dir,"gen_audio.wav")
         os.makedirs(output_file_dir, exist_ok=True)
-        combined_audio.export(output_file_path, format="wav")
+        timeline.write(output_file_path)
         abs_output_file_path = os.path.abspath(output_file_path)
         print(f"Combined audio saved to {abs_output_file_path}")
 
         return abs_output_file_path
 
+    @staticmethod
+    def _load_voice_prompts(cosyvoice, base_path):
+        """Precompute zero-shot prompt features for every available tone sample."""
+        voice_prompts = {}
+        for tone in TALK_SHOW_TONES:
+            lab_path = os.path.join(base_path, f"{tone}.lab")
+            wav_path = os.path.join(base_path, f"{tone}.wav")
+            if not (os.path.exists(lab_path) and os.path.exists(wav_path)):
+                continue
+            with open(lab_path, 'r', encoding='utf-8') as f:
+                prompt_text = f.read().strip()
+            prompt_input = cosyvoice.prepare_zero_shot_prompt(prompt_text, load_wav(wav_path, 16000))
+            voice_prompts[tone] = (prompt_text, prompt_input)
+        return voice_prompts
+
+    @staticmethod
+    def _load_reaction(reactions, reaction_path, sample_rate):
+        if reaction_path not in reactions:
+            reactions[reaction_path] = load_samples(reaction_path, sample_rate)
+        return reactions[reaction_path]
+
+    @staticmethod
+    def _analysis_prompt(line):
+        return f"""
+        Analyze the tone, text content, and atmosphere marker of the following stand-up comedy segment:
+        {line}
+
+        Output strictly in JSON format with these rules:
+        1. "tone" field must be ONLY "Natural", "Empathetic", "Confused" or "Exclamatory"
+        2. "text" field contains the segment's content
+        3. Add "reaction" field ONLY if there's atmosphere marker (i.e. [Laughter] or [Cheers]) behind the sentence, value must be "Laughter" or "Cheers"
+        4. You should not analyze the tone and atmosphere markers of the segment yourself, but instead strictly rely on whether these markers appear in the segment.
+        5. NO extra characters or explanations before/after JSON
+
+        Example 1:
+        
+        {{
+            "tone": "Empathetic",
+            "text": "..."
+        }}
+
+        Example 2:
+        {{
+            "tone": "Natural",
+            "text": "...",
+            "reaction": "Cheers"
+        }}
+
+        Ensure the output is strictly in JSON format!
+        """
+
     def process_message(self, message):
         script = message.content.get("script")
         target = message.content.get('target')
 
-        current_dir = os.getcwd()
-        os.chdir(os.path.join(current_dir, "tools", "CosyVoice"))
+        model_dir = self.job.project_path("tools", "CosyVoice", "pretrained_models", "CosyVoice2-0.5B")
         try:
-            cosyvoice = CosyVoice2('pretrained_models/CosyVoice2-0.5B', load_jit=False, load_trt=False, fp16=False)
+            # 模型在进程内共享，批量任务只加载一次
+            cosyvoice = get_cosyvoice2(model_dir)
         except Exception as e:
             print('cosyvoice issue:', e)
         cnt = 0
         results = []
         first_line = True
-        base_path = '../../' + target
+        base_path = self.job.project_path(target)
+        lines = []
         for line in script.split('\n'):
             if not line.strip():
                 continue
             if first_line:
                 first_line = False
                 continue
-            user_prompt = f"""
-            Analyze the tone, text content, and atmosphere marker of the following stand-up comedy segment:
-            {line}
-
-            Output strictly in JSON format with these rules:
-            1. "tone" field must be ONLY "Natural", "Empathetic", "Confused" or "Exclamatory"
-            2. "text" field contains the segment's content
-            3. Add "reaction" field ONLY if there's atmosphere marker (i.e. [Laughter] or [Cheers]) behind the sentence, value must be "Laughter" or "Cheers"
-            4. You should not analyze the tone and atmosphere markers of the segment yourself, but instead strictly rely on whether these markers appear in the segment.
-            5. NO extra characters or explanations before/after JSON
-
-            Example 1:
-            
-            {{
-                "tone": "Empathetic",
-                "text": "..."
-            }}
-
-            Example 2:
-            {{
-                "tone": "Natural",
-                "text": "...",
-                "reaction": "Cheers"
-            }}
-
-            Ensure the output is strictly in JSON format!
-            """
-
+            lines.append(line)
+
+        # Annotate every segment concurrently; synthesis below consumes the annotations in order,
+        # so the LLM keeps running ahead while the GPU synthesizes earlier segments
+        annotations = submit_prompts([self._analysis_prompt(line) for line in lines], use_cache=True)
+        voice_prompts = self._load_voice_prompts(cosyvoice, base_path)
+
+        # The whole show is assembled in memory and written once
+        timeline = AudioTimeline(cosyvoice.sample_rate, capacity_seconds=10.0 * max(len(lines), 1))
+        reactions = {}
+        for line, annotation in zip(lines, annotations):
+            line_start = timeline.cursor
+            result = {"text": line.strip()}
             try:
-                response = deepseek(user=user_prompt)
-                res = response.choices[0].message.content
+                res = annotation.result().choices[0].message.content
 
                 if res.startswith("```json"):
                     res = res[len("```json"):]
@@ -94,50 +122,36 @@ class TalkShowSynth(BaseAgent):
                 res = res.strip()
                 print(cnt, ":", res)
                 result = json.loads(res)
-                results.append(result)
                 tone = result['tone'].lower()
                 text = result['text'].strip()
 
-
-
-                with open(os.path.join(base_path, f"{tone}.lab"), 'r', encoding='utf-8') as f:
-                    prompt_text = f.read().strip()
-
-                os.makedirs(os.path.join(base_path, 'exp'), exist_ok=True)
-
-                prompt_speech_16k = load_wav(os.path.join(base_path, f"{tone}.wav"), 16000)
-                for i, j in enumerate(cosyvoice.inference_zero_shot(
+                prompt_text, prompt_input = voice_prompts[tone]
+                for j in cosyvoice.inference_zero_shot(
                         text,
-                        prompt_text, prompt_speech_16k, stream=False)):
-                    torchaudio.save(os.path.join(base_path, 'exp', f"{cnt}.wav"), j['tts_speech'], cosyvoice.sample_rate)
-
-                reaction_path = '../../dataset/talk_show/reaction'
+                        prompt_text, None, stream=False, prompt_input=prompt_input):
+                    timeline.append(j['tts_speech'])
 
                 if 'reaction' in result:
                     reaction = result['reaction'].lower()
-                    reaction_path = os.path.join(reaction_path, f"{reaction}.wav")
-
+                    reaction_path = self.job.project_path('dataset', 'talk_show', 'reaction', f"{reaction}.wav")
 
                     try:
-                        original_audio = AudioSegment.from_file(os.path.join(base_path, 'exp', f"{cnt}.wav"))
-                        reaction_audio = AudioSegment.from_file(reaction_path)
-
-                        combined_audio = original_audio + reaction_audio
-
-                        combined_audio.export(os.path.join(base_path, 'exp', f"{cnt}.wav"), format="wav")
+                        timeline.append(self._load_reaction(reactions, reaction_path, cosyvoice.sample_rate))
                         print(f"Successfully combined reaction audio for line {cnt}.")
                     except Exception as e:
                         print(f"Error combining reaction audio for line {cnt}: {str(e)}")
 
-                cnt += 1
             except Exception as e:
                 print(f"Error processing line: {line}. Error: {str(e)}")
-                continue
+                result['error'] = str(e)
+            # 失败的句子也保留一项（时长为已写入的音频），ct.json 与脚本逐句对齐
+            result['duration'] = (timeline.cursor - line_start) / cosyvoice.sample_rate
+            results.append(result)
+            cnt += 1
 
-        output_file_path = self.concatenate_audio_files(base_path, cnt)
+        output_file_path = self.export_audio(timeline)
         print(f"Final combined audio saved at: {output_file_path}")
-        os.chdir(current_dir)
-        with open(os.path.join(os.path.dirname(target), 'ct.json'), 'w', encoding='utf-8') as f:
+        with open(os.path.join(self.job.voice_gen_dir, 'ct.json'), 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
 
         return Message(
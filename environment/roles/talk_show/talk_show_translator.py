@@ -2,20 +2,20 @@ from openai import OpenAI
 import os
 from environment.agents.base import BaseAgent
 from environment.config.config import config
-import soundfile as sf
 import json
+from environment.utils.job_context import resolve_job
 client = OpenAI(api_key='<KEY>')
 
 
 class TalkShowTranslator(BaseAgent):
-    def __init__(self):
+    def __init__(self, job=None):
         super().__init__()
+        self.job = resolve_job(job)
         client.api_key = config['llm']['api_key']
         client.base_url = config['llm']['base_url']
 
     def process_message(self, message):
-        target = message.content.get("target")
-        script_path = os.path.join(os.path.dirname(target), 'ts.txt')
+        script_path = self.job.path('writing_data', 'ts.txt')
 
         with open(script_path, 'r', encoding='utf-8') as f:
             script = f.read()
@@ -33,24 +33,21 @@ class TalkShowTranslator(BaseAgent):
                 continue
             texts.append(text)
 
-        for idx, text in enumerate(texts):
-            wav_path = os.path.join(target, "exp", f"{idx}.wav")
-            try:
-                data, samplerate = sf.read(wav_path)
-                duration = round(len(data) / samplerate, 3)
-                end_time = current_time + duration
+        # 合成阶段在ct.json中为每句（包括失败的句子）记录时长，与脚本逐句对齐
+        ct_path = os.path.join(self.job.voice_gen_dir, 'ct.json')
+        with open(ct_path, 'r', encoding='utf-8') as f:
+            durations = [item['duration'] for item in json.load(f)]
+        if len(durations) != len(texts):
+            raise ValueError(f"{ct_path} has {len(durations)} lines but the script has {len(texts)}")
 
-                chunks.append({
-                    "id": idx + 1,
-                    "timestamp": round(end_time, 3),
-                    "content": text
-                })
-
-                current_time = end_time
-
-            except Exception as e:
-                print(f"无法读取 {wav_path}: {str(e)}")
-                continue
+        for idx, (text, duration) in enumerate(zip(texts, durations)):
+            end_time = current_time + round(duration, 3)
+            chunks.append({
+                "id": idx + 1,
+                "timestamp": round(end_time, 3),
+                "content": text
+            })
+            current_time = end_time
 
         result = {
             "sentence_data": {
@@ -59,7 +56,7 @@ class TalkShowTranslator(BaseAgent):
             }
         }
 
-        video_gen = 'dataset/video_edit/voice_gen'
+        video_gen = self.job.voice_gen_dir
         os.makedirs(video_gen, exist_ok=True)
         with open(os.path.join(video_gen, 'gen_audio_timestamps.json'), 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
@@ -2,18 +2,15 @@ import json
 import os
 import sys
 from environment.config.llm import gpt
+from environment.utils.job_context import resolve_job
 
 class VideoAdapter:
-    def __init__(self):
-        # Initialize paths
-        self.current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.project_root = os.path.abspath(os.path.join(self.current_dir, '..', '..'))
-        
+    def __init__(self, job=None):
+        self.job = resolve_job(job)
+
         # Define directory paths
-        self.dataset_dir = os.path.join(self.project_root, 'dataset')
-        self.video_edit_dir = os.path.join(self.dataset_dir, 'video_edit')
-        self.scene_output_dir = os.path.join(self.video_edit_dir, 'scene_output')
-        self.voice_gen_dir = os.path.join(self.video_edit_dir, 'voice_gen')
+        self.scene_output_dir = self.job.scene_output_dir
+        self.voice_gen_dir = self.job.voice_gen_dir
         
         # Define file paths
         self.input_file_path = os.path.join(self.voice_gen_dir, 'gen_audio_timestamps.json')
@@ -6,7 +6,7 @@ import asyncio
 import logging
 from typing import List, Dict, Any
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from environment.config.llm import gpt
+from environment.config.llm import gateway
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -93,8 +93,8 @@ class Pipeline:
             logger.info(f"Making API call with {len(messages)} messages, timeout={timeout}s")
             start_time = time.time()
             
-            # Use gpt function with full messages array
-            response = gpt(model="gpt-4o-mini", messages=messages)
+            # Await the shared gateway so the event loop is not blocked during the request
+            response = await gateway.achat("gpt-4o-mini", messages)
             
             elapsed_time = time.time() - start_time
             logger.info(f"API call completed in {elapsed_time:.2f}s")
@@ -6,12 +6,15 @@ import json
 import importlib.util
 import sys
 
+from environment.utils.job_context import resolve_job
+
 class Video_Searcher:
-    def __init__(self):
+    def __init__(self, job=None):
         # Configure logging and warnings
         warnings.filterwarnings("ignore")
         logging.getLogger("httpx").setLevel(logging.WARNING)
         self.logger = logging.getLogger(__name__)
+        self.job = resolve_job(job)
         
         # Set up paths
         self._setup_paths()
@@ -21,19 +24,13 @@ class Video_Searcher:
     
     def _setup_paths(self):
         """Set up necessary paths and directories"""
-        # Get project root based on file location
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-        
-        # Define paths
-        self.dataset_dir = os.path.join(project_root, 'dataset')
-        self.video_edit_dir = os.path.join(self.dataset_dir, 'video_edit')
-        self.scene_output_dir = os.path.join(self.video_edit_dir, 'scene_output')
+        # Define paths: the storyboard comes from this job, the index is shared and only read
+        self.scene_output_dir = self.job.scene_output_dir
         self.scene_output_path = os.path.join(self.scene_output_dir, 'video_scene.json')
-        self.working_dir = os.path.join(self.video_edit_dir, 'videosource-workdir')
+        self.working_dir = self.job.index_dir
         
         # Add tools directory to path
-        tools_dir = os.path.join(project_root, 'tools')
+        tools_dir = self.job.project_path('tools')
         if tools_dir not in sys.path:
             sys.path.append(tools_dir)
     
@@ -74,7 +71,8 @@ class Video_Searcher:
             param.wo_reference = True
             
             videoragcontent = self.VideoRAG(
-                working_dir=self.working_dir
+                working_dir=self.working_dir,
+                scene_output_dir=self.scene_output_dir
             )
             
             response = videoragcontent.query(query=query, param=param)
@@ -119,11 +117,11 @@ class Video_Searcher:
         self.logger.info("Video_Searcher completed")
         return response
 
-def video_search_main():
+def video_search_main(job=None):
     """
     Convenience function to create and run a Video_Searcher
     """
     logging.basicConfig(level=logging.INFO)
-    searcher = Video_Searcher()
+    searcher = Video_Searcher(job=job)
     return searcher.run()
 
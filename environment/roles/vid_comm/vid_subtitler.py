@@ -15,6 +15,8 @@ from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 import string
 from environment.config.llm import gpt
+from environment.utils.job_context import resolve_job
+from environment.utils.tracing import span
 
 class VideoTranscriber:
     def __init__(self, model_path=None):
@@ -39,29 +41,30 @@ class VideoTranscriber:
         # Define punctuation to remove
         self.punctuation = string.punctuation + '，。？！；：""''（）【】《》「」『』、'
         
-        # Load the model
-        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_path, 
-            torch_dtype=self.torch_dtype, 
-            low_cpu_mem_usage=True, 
-            use_safetensors=True
-        )
-        self.model.to(self.device)
-        
-        # Load the processor
-        self.processor = AutoProcessor.from_pretrained(model_path)
-        
-        # Create the pipeline
-        self.pipe = pipeline(
-            "automatic-speech-recognition",
-            model=self.model,
-            tokenizer=self.processor.tokenizer,
-            feature_extractor=self.processor.feature_extractor,
-            torch_dtype=self.torch_dtype,
-            device=self.device,
-            chunk_length_s=30,  # Process in 30-second chunks
-            return_timestamps=True  # Important for subtitles
-        )
+        with span("load:whisper-large-v3-turbo", category='model_load'):
+            # Load the model
+            self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                model_path, 
+                torch_dtype=self.torch_dtype, 
+                low_cpu_mem_usage=True, 
+                use_safetensors=True
+            )
+            self.model.to(self.device)
+        
+            # Load the processor
+            self.processor = AutoProcessor.from_pretrained(model_path)
+        
+            # Create the pipeline
+            self.pipe = pipeline(
+                "automatic-speech-recognition",
+                model=self.model,
+                tokenizer=self.processor.tokenizer,
+                feature_extractor=self.processor.feature_extractor,
+                torch_dtype=self.torch_dtype,
+                device=self.device,
+                chunk_length_s=30,  # Process in 30-second chunks
+                return_timestamps=True  # Important for subtitles
+            )
         
         print(f"Model loaded on {self.device}.")
         
@@ -411,20 +414,17 @@ class LLMClient:
             print("Using original transcription instead.")
             return transcribed_text
 
-def get_project_paths():
-    """Get standard project paths based on the file location."""
-    # Get the current file's directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Navigate up to root directory
-    project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+def get_project_paths(job=None):
+    """Get standard project paths for a job (dataset/video_edit by default)."""
+    job = resolve_job(job)
+    project_root = job.project_root
     
     # Define paths
     dataset_dir = os.path.join(project_root, 'dataset')
-    video_edit_dir = os.path.join(dataset_dir, 'video_edit')
-    video_output_dir = os.path.join(video_edit_dir, 'video_output')
-    writing_data_dir = os.path.join(video_edit_dir, 'writing_data')
-    scene_output_dir = os.path.join(video_edit_dir, 'scene_output')
+    video_edit_dir = job.workspace
+    video_output_dir = job.video_output_dir
+    writing_data_dir = job.writing_data_dir
+    scene_output_dir = job.scene_output_dir
     
     # Create directories if they don't exist
     for dir_path in [video_output_dir, writing_data_dir, scene_output_dir]:
@@ -658,10 +658,10 @@ def clean_up_temporary_files(transcript_path):
             except Exception as e:
                 print(f"Warning: Could not remove file {file_path}: {e}")
 
-def process_video(video_path=None, method="ffmpeg", clean_up=True):
+def process_video(video_path=None, method="ffmpeg", clean_up=True, job=None):
     """Process a video to add subtitles based on its audio content."""
     # Get standard project paths
-    paths = get_project_paths()
+    paths = get_project_paths(job)
     
     # Set default video path if not provided
     if video_path is None:
@@ -677,7 +677,7 @@ def process_video(video_path=None, method="ffmpeg", clean_up=True):
     
     # Define output paths
     transcript_path = os.path.join(paths['writing_data_dir'], f"{video_name}_subtitle.txt")
-    srt_path = f"{video_name}.srt"
+    srt_path = os.path.join(paths['writing_data_dir'], f"{video_name}.srt")
     output_video_path = os.path.join(paths['video_output_dir'], f"{video_name}_subtitled.mp4")
     scene_json_path = os.path.join(paths['scene_output_dir'], 'video_scene.json')
     
@@ -724,14 +724,14 @@ def process_video(video_path=None, method="ffmpeg", clean_up=True):
         "output_video_path": final_video_path
     }
 
-def subtitler_main(video_path=None, output_path=None):
+def subtitler_main(video_path=None, output_path=None, job=None):
     """Main function to process video subtitles with optional custom output path."""
     try:
         # Set environment variable to avoid ALSA errors
         os.environ["XDG_RUNTIME_DIR"] = "/tmp/runtime-dir"
         os.makedirs(os.environ["XDG_RUNTIME_DIR"], exist_ok=True)
         
-        paths = get_project_paths()
+        paths = get_project_paths(job)
         
         # If video path not provided, use the default
         if video_path is None:
@@ -742,7 +742,7 @@ def subtitler_main(video_path=None, output_path=None):
         
         # Define paths
         transcript_path = os.path.join(paths['writing_data_dir'], f"{video_name}_subtitle.txt")
-        srt_path = f"{video_name}.srt"
+        srt_path = os.path.join(paths['writing_data_dir'], f"{video_name}.srt")
         
         # Use custom output path if provided, otherwise use default
         if output_path is None:
@@ -1,18 +1,16 @@
 import sys
 import os
-import torchaudio
 import json
 import re
-import torch
 import traceback
+from environment.utils.audio_timeline import AudioTimeline
+from environment.utils.model_pool import get_cosyvoice2
+from environment.utils.job_context import resolve_job
 
 class Voice_Maker:
-    def __init__(self):
-        # Get the directory of the current script
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Navigate to the root directory (two levels up from agents)
-        self.parent_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+    def __init__(self, job=None):
+        self.job = resolve_job(job)
+        self.parent_root = self.job.project_root
         
         # Path to CosyVoice in the tools directory
         cosyvoice_dir = os.path.join(self.parent_root, 'tools', 'CosyVoice')
@@ -30,10 +28,10 @@ class Voice_Maker:
         
         # Set up paths
         self.model_path = os.path.join(self.parent_root, 'tools', 'CosyVoice', 'pretrained_models', 'CosyVoice2-0.5B')
-        self.video_edit_dir = os.path.join(self.parent_root, 'dataset', 'video_edit')
-        self.voice_data_dir = os.path.join(self.video_edit_dir, 'voice_data')
-        self.scene_output_dir = os.path.join(self.video_edit_dir, 'scene_output')
-        self.voice_gen_dir = os.path.join(self.video_edit_dir, 'voice_gen')
+        self.video_edit_dir = self.job.workspace
+        self.voice_data_dir = self.job.voice_data_dir
+        self.scene_output_dir = self.job.scene_output_dir
+        self.voice_gen_dir = self.job.voice_gen_dir
         
         
         # Initialize cosyvoice to None
@@ -146,15 +144,14 @@ class Voice_Maker:
         }
         
         current_time = 0  # Running timestamp in seconds
-        all_segment_waveforms = []
+        # All segments are assembled into one buffer; nothing is written per segment
+        timeline = AudioTimeline(self.cosyvoice.sample_rate, capacity_seconds=30.0 * max(len(segments), 1))
         all_files_to_delete = []  # Track all files for cleanup
         
         # Process each segment
         for segment in segments:
             segment_id = segment["segment_id"]
             segment_text = segment["content"]
-            segment_output_file = f"{output_dir}/segment_{segment_id}.wav"
-            all_files_to_delete.append(segment_output_file)  # Add to list for cleanup
             
             print(f"\nProcessing Segment {segment_id}:")
             # For Chinese, we display fewer characters in preview
@@ -177,7 +174,7 @@ class Voice_Maker:
             
             # Track segment start time
             segment_start_time = current_time
-            segment_waveform = None
+            segment_start = timeline.cursor
             
             # Process each sentence individually
             for i, sentence in enumerate(sentences):
@@ -202,12 +199,9 @@ class Voice_Maker:
                         # Store this chunk's waveform
                         chunk_waveform = audio_data['tts_speech']
                     
-                    # Add to segment waveform
+                    # Add to segment audio
                     if chunk_waveform is not None:
-                        if segment_waveform is None:
-                            segment_waveform = chunk_waveform
-                        else:
-                            segment_waveform = torch.cat([segment_waveform, chunk_waveform], dim=1)
+                        timeline.append(chunk_waveform)
                         print(f"    Successfully processed chunk {i+1}")
                     else:
                         print(f"    Warning: No audio generated for chunk {i+1}")
@@ -216,15 +210,13 @@ class Voice_Maker:
                     print(f"  Error processing chunk {i+1}: {str(e)}")
                     print("  Continuing to next chunk...")
             
-            # Save the complete segment audio file
-            if segment_waveform is not None:
-                torchaudio.save(segment_output_file, segment_waveform, self.cosyvoice.sample_rate)
-                
+            # Record the segment if any of its chunks produced audio
+            if timeline.cursor > segment_start:
                 # Calculate segment duration
-                segment_duration = len(segment_waveform[0]) / self.cosyvoice.sample_rate
+                segment_duration = (timeline.cursor - segment_start) / self.cosyvoice.sample_rate
                 
                 # Update the current time
-                current_time += segment_duration
+                current_time = timeline.cursor / self.cosyvoice.sample_rate
                 
                 # Add to timestamp data
                 timestamp_data["sentence_data"]["chunks"].append({
@@ -233,9 +225,6 @@ class Voice_Maker:
                     "content": segment_text
                 })
                 
-                # Store the waveform for later concatenation
-                all_segment_waveforms.append(segment_waveform)
-                
                 print(f"Successfully processed segment {segment_id} (duration: {segment_duration:.2f}s)")
             else:
                 print(f"Warning: No audio generated for segment {segment_id}")
@@ -245,31 +234,26 @@ class Voice_Maker:
         for chunk_file in chunk_files:
             all_files_to_delete.append(os.path.join(output_dir, chunk_file))
         
-        # Return timestamp data, all waveforms, and files for cleanup
-        return timestamp_data, all_segment_waveforms, self.cosyvoice.sample_rate, all_files_to_delete
+        # Return timestamp data, the assembled timeline, and files for cleanup
+        return timestamp_data, timeline, self.cosyvoice.sample_rate, all_files_to_delete
 
-    def combine_audio_files(self, all_segment_waveforms, sample_rate, timestamp_data, 
+    def combine_audio_files(self, timeline, sample_rate, timestamp_data, 
                             output_file=None, segment_files=None):
         """
-        Combine all segment waveforms into one and save as WAV file
-        Also save timestamp data to JSON and delete all intermediate files
+        Save the assembled timeline as one WAV file
+        Also save timestamp data to JSON and delete any leftover intermediate files
         """
-        if not all_segment_waveforms:
+        if timeline.num_samples == 0:
             print("No audio segments to combine")
             return None, None
         
-        # Combine all waveforms
-        combined_waveform = all_segment_waveforms[0]
-        for waveform in all_segment_waveforms[1:]:
-            combined_waveform = torch.cat([combined_waveform, waveform], dim=1)
-        
         # Export combined audio as WAV
         output_dir = os.path.dirname(output_file)
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
         # Save the combined waveform
-        torchaudio.save(output_file, combined_waveform, sample_rate)
+        timeline.write(output_file)
         print(f"Combined audio saved to: {output_file}")
         
         # Save timestamp JSON with UTF-8 encoding to preserve Chinese characters
@@ -299,7 +283,8 @@ class Voice_Maker:
         
         # Initialize CosyVoice2
         print("Loading CosyVoice2 model...")
-        self.cosyvoice = self.CosyVoice2(self.model_path, load_jit=False, load_trt=False, fp16=False)
+        # Shared across jobs; reference voice features are cached in the feature store
+        self.cosyvoice = get_cosyvoice2(self.model_path)
         
         # Check if prompt file exists, warn if not
         prompt_speech_path = os.path.join(self.voice_data_dir, 'mike_prompt_16k.wav')
@@ -336,18 +321,18 @@ class Voice_Maker:
                 return False
             
             # Generate audio with timestamp tracking
-            timestamp_data, all_segment_waveforms, sample_rate, files_to_delete = self.generate_audio_for_segments(
+            timestamp_data, timeline, sample_rate, files_to_delete = self.generate_audio_for_segments(
                 segments, output_dir=self.voice_gen_dir
             )
             
-            if not all_segment_waveforms:
+            if timeline.num_samples == 0:
                 print("No audio segments were successfully generated.")
                 return False
             
             # Combine all segments, save timestamp JSON, and delete all intermediate files
             output_audio_path = os.path.join(self.voice_gen_dir, 'gen_audio.wav')
             final_audio_path, timestamp_json_path = self.combine_audio_files(
-                all_segment_waveforms, 
+                timeline, 
                 sample_rate, 
                 timestamp_data, 
                 output_file=output_audio_path,
@@ -370,10 +355,10 @@ class Voice_Maker:
             }
 
 # Add this function to match what's imported in comm_agent.py
-def voice_main():
+def voice_main(job=None):
     """Function that's called from CommAgent to generate voice"""
     print("\n=== GENERATING VOICE ===")
-    voice_maker = Voice_Maker()
+    voice_maker = Voice_Maker(job=job)
     result = voice_maker.generate_voice()
     
     if isinstance(result, bool):
@@ -5,9 +5,11 @@ import glob
 from tqdm import tqdm
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 
+from environment.utils.job_context import resolve_job
+
 
 class transcribe_main:
-    def __init__(self, model_id=None, use_timestamps=False, chunk_length_s=30, batch_size=16, config=None):
+    def __init__(self, model_id=None, use_timestamps=False, chunk_length_s=30, batch_size=16, config=None, job=None):
         """
         Initialize the TranscribeMain class for speech recognition of videos.
         
@@ -17,29 +19,25 @@ class transcribe_main:
             chunk_length_s (int, optional): Length of audio chunks in seconds. Defaults to 30.
             batch_size (int, optional): Batch size for processing. Defaults to 16.
             config (dict, optional): Configuration dictionary that may contain custom paths. Defaults to None.
+            job (JobContext, optional): Workspace the transcripts are written to. Defaults to dataset/video_edit.
         """
         # Set up logging
         logging.basicConfig(level=logging.INFO, 
                            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         
-        # Get the directory of the current script
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Navigate to the root directory
-        self.parent_root = os.path.abspath(os.path.join(current_dir, '../../../'))
-        
         # Define paths for video source and transcribe data
-        self.video_edit_dir = os.path.join(self.parent_root, 'dataset', 'video_edit')
+        self.job = resolve_job(job)
+        self.parent_root = self.job.project_root
         
         # Set video_source_dir from config if provided, otherwise use default
         if config and "video_source_dir" in config:
             self.video_source_dir = config["video_source_dir"]
             self.logger.info(f"Using custom video source directory from config: {self.video_source_dir}")
         else:
-            self.video_source_dir = os.path.join(self.video_edit_dir, 'video_source')
+            self.video_source_dir = self.job.video_source_dir
             
-        self.transcribe_data_dir = os.path.join(self.video_edit_dir, 'writing_data')
+        self.transcribe_data_dir = self.job.writing_data_dir
         
         # Create output directory if it doesn't exist
         os.makedirs(self.transcribe_data_dir, exist_ok=True)
@@ -9,6 +9,7 @@ import tenacity
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import sys
 from environment.config.llm import gpt
+from environment.utils.job_context import resolve_job
 
 # Add the directory to the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -124,27 +125,19 @@ def count_content_sections(file_path: str) -> int:
     wait=wait_exponential(multiplier=1, min=2, max=30),
     reraise=True
 )
-async def content_main(config=None):
-    # Get the current file's directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Navigate to the Vtube root directory
-    vtube_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-    
-    # Define base directory paths
-    dataset_dir = os.path.join(vtube_root, 'dataset')
-    video_edit_dir = os.path.join(dataset_dir, 'video_edit')
-    
+async def content_main(config=None, job=None):
+    job = resolve_job(job)
+
     # Ensure required directories exist
-    scene_output_dir = os.path.join(video_edit_dir, 'scene_output')
-    writing_data_dir = os.path.join(video_edit_dir, 'writing_data')
+    scene_output_dir = job.scene_output_dir
+    writing_data_dir = job.writing_data_dir
     os.makedirs(scene_output_dir, exist_ok=True)
     os.makedirs(writing_data_dir, exist_ok=True)
     
     # Define file paths
     content_output_path = os.path.join(scene_output_dir, "video_scene.json")
-    txt_path = os.path.join(writing_data_dir, "audio_transcript.txt")
-    pre_txt_path = os.path.join(writing_data_dir, "news_present_style.txt")
+    txt_path = job.input_path('writing_data', "audio_transcript.txt")
+    pre_txt_path = job.input_path('writing_data', "news_present_style.txt")
 
     if config and 'idea' in config:
         user_idea = config['idea']
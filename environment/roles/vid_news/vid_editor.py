@@ -1,7 +1,6 @@
 import json
 import torch
 from PIL import Image
-from transformers import AutoModel, AutoTokenizer
 from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip
 from typing import List, Dict, Tuple
 import os
@@ -10,37 +9,36 @@ import tempfile
 import sys
 import re
 
+from environment.utils.job_context import resolve_job
+from environment.utils.model_pool import get_minicpm_v
+
 
 ####if occur XDG_RUNTIME_DI error, use it in terminal >>>>> export XDG_RUNTIME_DIR=/run/user/$(id -u)
 class VideoEditor:
-    def __init__(self):
-        # Get the current file's directory
-        self.current_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Navigate up 2 levels to reach the Vtube root directory
-        self.project_root = os.path.abspath(os.path.join(self.current_dir, '..', '..', '..'))
+    def __init__(self, job=None, model=None, tokenizer=None):
+        self.job = resolve_job(job)
+        self.project_root = self.job.project_root
         
-        # Define paths
-        self.dataset_dir = os.path.join(self.project_root, 'dataset')
-        self.video_edit_dir = os.path.join(self.dataset_dir, 'video_edit')
-        self.music_analysis_dir = os.path.join(self.video_edit_dir, 'music_analysis')
-        self.scene_output_dir = os.path.join(self.video_edit_dir, 'scene_output')
-        self.working_dir = os.path.join(self.video_edit_dir, 'videosource-workdir')
-        self.voice_gen_dir = os.path.join(self.video_edit_dir, 'voice_gen')
-        self.music_data_dir = os.path.join(self.video_edit_dir, 'music_data')
-        self.video_output_dir = os.path.join(self.video_edit_dir, 'video_output')
+        # Define paths: job outputs live in the job workspace, sources and the index are shared
+        self.music_analysis_dir = self.job.music_analysis_dir
+        self.scene_output_dir = self.job.scene_output_dir
+        self.working_dir = self.job.index_dir
+        self.voice_gen_dir = self.job.voice_gen_dir
+        self.music_data_dir = self.job.music_data_dir
+        self.video_output_dir = self.job.video_output_dir
         
         # Set model path to correct location in tools directory
         self.model_path = os.path.join(self.project_root, 'tools', 'MiniCPM-V-2_6-int4')
         print(f"Loading model from: {self.model_path}")
         
-        # Load model and tokenizer
-        self.model = AutoModel.from_pretrained(self.model_path, trust_remote_code=True)
-        self.model = self.model.eval()
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, trust_remote_code=True)
+        # Shared model and tokenizer from the model pool, unless the caller already has them
+        if model is None:
+            model, tokenizer = get_minicpm_v(self.model_path)
+        self.model = model
+        self.tokenizer = tokenizer
         
         # Default video directory
-        self.ROOT_VIDEO_DIR = os.path.join(self.video_edit_dir, 'video_source')
+        self.ROOT_VIDEO_DIR = self.job.video_source_dir
         
         # Define standard file paths
         self.beats_file = os.path.join(self.voice_gen_dir, "gen_news_audio_timestamps.json")
@@ -417,8 +415,8 @@ class VideoEditor:
                 pass
 
 
-def main(input_path=None, keep_original_audio=False, audio_mix_ratio=0.3, output_file="news_output_video.mp4"):
-    editor = VideoEditor()
+def main(input_path=None, keep_original_audio=False, audio_mix_ratio=0.3, output_file="news_output_video.mp4", job=None):
+    editor = VideoEditor(job=job)
     
     # Update the root video directory if provided
     if input_path:
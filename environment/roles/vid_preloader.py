@@ -4,9 +4,11 @@ import warnings
 import multiprocessing
 import sys
 
+from environment.utils.job_context import resolve_job
+
 
 class Pre_Loader:
-    def __init__(self):
+    def __init__(self, job=None):
         # Setup multiprocessing
         try:
             if multiprocessing.get_start_method(allow_none=True) != 'spawn':
@@ -19,13 +21,13 @@ class Pre_Loader:
         warnings.filterwarnings("ignore")
         logging.getLogger("httpx").setLevel(logging.WARNING)
         
-        # Get the current file's directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
+        self.job = resolve_job(job)
+        self.project_root = self.job.project_root
         
         # Add the tools directory to the path
-        tools_dir = os.path.join(self.project_root, 'tools')
-        sys.path.append(tools_dir)
+        tools_dir = self.job.project_path('tools')
+        if tools_dir not in sys.path:
+            sys.path.append(tools_dir)
         
         # Initialize directories
         self.initialize_directories()
@@ -36,36 +38,12 @@ class Pre_Loader:
         self.QueryParam = QueryParam
 
     def initialize_directories(self):
-        # Define the path to the dataset directory and ensure it exists
-        self.dataset_dir = os.path.join(self.project_root, 'dataset')
-        os.makedirs(self.dataset_dir, exist_ok=True)
-        
-        # Define and create video_edit directory
-        self.video_edit_dir = os.path.join(self.dataset_dir, 'video_edit')
-        os.makedirs(self.video_edit_dir, exist_ok=True)
-        
-        # Define and create all subdirectories
-        subdirectories = [
-            'music_analysis',
-            'music_data',
-            'scene_output',
-            'video_source',
-            'videosource-workdir',
-            'voice_data',
-            'voice_gen',
-            'writing_data',
-            'video_output',
-            'face_db'
-        ]
-        
-        # Create all subdirectories
-        for subdir in subdirectories:
-            dir_path = os.path.join(self.video_edit_dir, subdir)
-            os.makedirs(dir_path, exist_ok=True)
+        # Create the job workspace, the shared inputs and the shared VideoRAG index
+        self.job.makedirs()
         
         # Store directory paths for later use
-        self.video_source_dir = os.path.join(self.video_edit_dir, 'video_source')
-        self.working_dir = os.path.join(self.video_edit_dir, 'videosource-workdir')
+        self.video_source_dir = self.job.video_source_dir
+        self.working_dir = self.job.index_dir
 
     def preloading_video(self):
         # Check if there are any videos in the source directory
@@ -86,7 +64,9 @@ class Pre_Loader:
         for video in video_paths:
             print(f" - {os.path.basename(video)}")
 
-        # Initialize and process videos with VideoRAG
-        videoragcontent = self.VideoRAG(working_dir=self.working_dir)
-        videoragcontent.insert_video(video_path_list=video_paths)
+        # Initialize and process videos with VideoRAG; the index is shared by all jobs,
+        # so concurrent preloads take turns and already indexed videos are skipped
+        with self.job.index_lock():
+            videoragcontent = self.VideoRAG(working_dir=self.working_dir)
+            videoragcontent.insert_video(video_path_list=video_paths)
         return True
\ No newline at end of file
@@ -6,6 +6,277 @@ import json
 import librosa.display
 import os
 import glob
+import subprocess
+import soundfile as sf
+from collections import OrderedDict
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Per-file analysis cache shared by every MusicAgent instance. Keys identify
+# the audio content (path, mtime, size) and the framing parameters; values
+# hold the envelopes and beat frames computed so far so they are never
+# recomputed. Only frame-rate features are kept here (a few MB per hour of
+# audio); the spectrogram used for plots stays on the MusicAgent instance.
+_ANALYSIS_CACHE = OrderedDict()
+_ANALYSIS_CACHE_SIZE = 8
+
+DETECTION_MODES = ("rms", "onset", "beat")
+
+
+def _get_analysis_cache(audio_file, frame_length, hop_length, streaming=False):
+    """Return the (possibly empty) feature cache entry for an audio file."""
+    stat = os.stat(audio_file)
+    key = (os.path.abspath(audio_file), stat.st_mtime_ns, stat.st_size, frame_length, hop_length, streaming)
+    entry = _ANALYSIS_CACHE.get(key)
+    if entry is None:
+        entry = {"smoothed": {}}
+        _ANALYSIS_CACHE[key] = entry
+        while len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+    else:
+        _ANALYSIS_CACHE.move_to_end(key)
+    return entry
+
+
+def _smooth(envelope, smoothing_window):
+    """Moving-average smoothing with the same edge handling as np.convolve(mode='same')."""
+    if smoothing_window > 1:
+        kernel = np.ones(smoothing_window) / smoothing_window
+        return np.convolve(envelope, kernel, mode='same')
+    return envelope
+
+
+def _mask_flags(timestamps, mask_ranges):
+    """
+    Flag timestamps that fall inside any (start, end) range, bounds inclusive.
+    
+    The ranges are merged into disjoint sorted intervals so each timestamp
+    needs a single searchsorted lookup instead of a scan over all ranges.
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    if mask_ranges is None or len(mask_ranges) == 0:
+        return np.zeros(len(timestamps), dtype=bool)
+    
+    ranges = np.asarray(sorted(mask_ranges), dtype=float).reshape(-1, 2)
+    starts, ends = [ranges[0, 0]], [ranges[0, 1]]
+    for start, end in ranges[1:]:
+        if start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    
+    idx = np.searchsorted(starts, timestamps, side='right') - 1
+    return (idx >= 0) & (timestamps <= ends[np.maximum(idx, 0)])
+
+
+def _select_by_distance(positions, heights, distance):
+    """
+    Keep the highest peaks so that no two kept peaks are closer than `distance`.
+    
+    Mirrors the `distance` criterion of scipy.signal.find_peaks but works on a
+    precomputed candidate set, so one candidate search can serve many
+    threshold/interval combinations.
+    
+    Returns:
+        np.ndarray: Indices into `positions` of the kept peaks, in time order
+    """
+    keep = np.ones(len(positions), dtype=bool)
+    if distance <= 1 or len(positions) < 2:
+        return np.flatnonzero(keep)
+    
+    lo = np.searchsorted(positions, positions - distance, side='right')
+    hi = np.searchsorted(positions, positions + distance, side='left')
+    for i in np.argsort(heights, kind='stable')[::-1]:
+        if keep[i]:
+            keep[lo[i]:hi[i]] = False
+            keep[i] = True
+    return np.flatnonzero(keep)
+
+
+def _open_audio_stream(audio_file, block_duration):
+    """
+    Open an audio file for block-wise mono reading without decoding it whole.
+    
+    Formats supported by libsndfile are read with soundfile.blocks; anything
+    else (e.g. containers libsndfile cannot parse) is decoded through an
+    ffmpeg pipe at the file's native sample rate.
+    
+    Returns:
+        tuple: (sample_rate, iterator over float32 mono blocks)
+    """
+    try:
+        sr = sf.info(audio_file).samplerate
+    except RuntimeError:
+        sr = None
+    
+    if sr is None:
+        sr = librosa.get_samplerate(audio_file)
+        block_frames = max(1, int(block_duration * sr))
+        
+        def ffmpeg_blocks():
+            cmd = ["ffmpeg", "-v", "error", "-i", audio_file, "-f", "f32le", "-ac", "1", "-ar", str(sr), "-"]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+            try:
+                while True:
+                    data = proc.stdout.read(block_frames * 4)
+                    if not data:
+                        break
+                    yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+            finally:
+                proc.stdout.close()
+                proc.wait()
+        return sr, ffmpeg_blocks()
+    
+    block_frames = max(1, int(block_duration * sr))
+    
+    def blocks():
+        for block in sf.blocks(audio_file, blocksize=block_frames, dtype='float32', always_2d=True):
+            yield block.mean(axis=1)
+    return sr, blocks()
+
+
+class _StreamingFramer:
+    """Cut a sample stream into centered frames, matching librosa's center=True framing."""
+    
+    def __init__(self, frame_length, hop_length):
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.buffer = np.zeros(frame_length // 2, dtype=np.float32)
+    
+    def push(self, samples, final=False):
+        if final:
+            samples = np.concatenate([samples, np.zeros(self.frame_length // 2, dtype=np.float32)])
+        buffer = np.concatenate([self.buffer, samples])
+        if len(buffer) < self.frame_length:
+            self.buffer = buffer
+            return np.zeros((0, self.frame_length), dtype=np.float32)
+        n_frames = 1 + (len(buffer) - self.frame_length) // self.hop_length
+        frames = sliding_window_view(buffer, self.frame_length)[::self.hop_length][:n_frames]
+        self.buffer = buffer[n_frames * self.hop_length:]
+        return frames
+
+
+class _StreamingEnvelope:
+    """
+    Incremental RMS and spectral-flux envelopes over framed audio blocks.
+    
+    The flux is the mean positive difference of consecutive log-mel frames,
+    the same quantity librosa.onset.onset_strength computes, without its
+    whole-signal dB clipping.
+    """
+    
+    def __init__(self, sr, frame_length, hop_length, with_onset=True, n_mels=128):
+        self.framer = _StreamingFramer(frame_length, hop_length)
+        self.with_onset = with_onset
+        if with_onset:
+            self.window = np.hanning(frame_length + 1)[:-1].astype(np.float32)
+            self.mel_basis = librosa.filters.mel(sr=sr, n_fft=frame_length, n_mels=n_mels)
+            self.previous = None
+    
+    def push(self, samples, final=False):
+        """Return (rms, flux) for the frames completed by this block; flux is None without onset."""
+        frames = self.framer.push(samples, final=final)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        if not self.with_onset or len(frames) == 0:
+            return rms, (np.zeros(0) if self.with_onset else None)
+        
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        log_mel = librosa.power_to_db(power @ self.mel_basis.T)
+        previous = log_mel[:1] if self.previous is None else self.previous
+        diff = np.diff(np.vstack([previous, log_mel]), axis=0)
+        self.previous = log_mel[-1:]
+        return rms, np.maximum(diff, 0.0).mean(axis=1)
+
+
+class _StreamingPeakPicker:
+    """
+    Peak picker over an envelope that arrives in blocks.
+    
+    Applies the rule of scipy.signal.find_peaks(height=threshold, distance=distance):
+    peaks are taken tallest first and each suppresses the lower peaks closer
+    than `distance` frames. A candidate is committed once that outcome can no
+    longer change: every taller candidate within `distance` is decided, and
+    for a kept peak no frame within `distance` after it is still unread.
+    Candidates are committed in time order, so only the undecided ones (and a
+    smoothing margin) are held between blocks.
+    
+    The envelope is normalized by its running maximum, so the threshold is
+    judged against the loudest part heard so far.
+    """
+    
+    UNDECIDED, KEPT, SUPPRESSED = 0, 1, 2
+    
+    def __init__(self, threshold, distance, smoothing_window):
+        self.threshold = threshold
+        self.distance = distance
+        self.smoothing_window = smoothing_window
+        self.buffer = np.zeros(0)
+        self.offset = 0
+        self.decided = 0
+        self.level = 0.0
+    
+    def _decide(self, positions, heights, frontier):
+        """Greedy selection by height; a candidate stays UNDECIDED while a later frame could change it."""
+        state = np.full(len(positions), self.UNDECIDED, dtype=np.int8)
+        order = np.argsort(heights, kind='stable')[::-1]
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        lo = np.searchsorted(positions, positions - self.distance, side='right')
+        hi = np.searchsorted(positions, positions + self.distance, side='left')
+        for i in order:
+            neighbours = np.arange(lo[i], hi[i])
+            taller = state[neighbours[rank[neighbours] < rank[i]]]
+            if np.any(taller == self.KEPT):
+                state[i] = self.SUPPRESSED
+            elif np.all(taller == self.SUPPRESSED) and frontier - positions[i] >= self.distance:
+                state[i] = self.KEPT
+        return state
+    
+    def push(self, values, final=False):
+        """Add envelope frames and return the absolute frame indices of newly committed peaks."""
+        self.buffer = np.concatenate([self.buffer, values])
+        if len(values):
+            self.level = max(self.level, float(np.max(values)))
+        if self.level <= 0 or len(self.buffer) == 0:
+            return []
+        
+        smoothed = _smooth(self.buffer / self.level, self.smoothing_window)
+        valid_end = len(smoothed) if final else len(smoothed) - self.smoothing_window // 2
+        # frames from here on may still turn out to be peaks; at the end of the stream nothing is left unread
+        frontier = np.inf if final else valid_end - 1
+        
+        candidates, _ = find_peaks(smoothed[:max(valid_end, 0)])
+        candidates = candidates[candidates >= self.decided - self.offset]
+        heights = smoothed[candidates]
+        qualified = heights >= self.threshold
+        candidates, heights = candidates[qualified], heights[qualified]
+        
+        state = self._decide(candidates, heights, frontier)
+        undecided = np.flatnonzero(state == self.UNDECIDED)
+        n_committed = undecided[0] if len(undecided) else len(candidates)
+        peaks = [int(frame) + self.offset for frame in candidates[:n_committed][state[:n_committed] == self.KEPT]]
+        
+        if final:
+            self.decided = self.offset + len(smoothed)
+        elif n_committed < len(candidates):
+            self.decided = self.offset + int(candidates[n_committed])
+        else:
+            self.decided = max(self.decided, self.offset + valid_end - 1)
+        keep_from = max(0, self.decided - self.offset - self.smoothing_window - 1)
+        self.buffer = self.buffer[keep_from:]
+        self.offset += keep_from
+        return peaks
+
+
+def _downsample_envelope(values, times, max_points):
+    """Max-pool an envelope down to at most `max_points` points for plotting."""
+    factor = int(np.ceil(len(values) / max_points)) if max_points else 1
+    if factor <= 1:
+        return values, times
+    padded = np.pad(values, (0, (-len(values)) % factor), mode='edge')
+    return padded.reshape(-1, factor).max(axis=1), times[::factor]
+
 
 class MusicAgent:
     def __init__(self, frame_length=2048, hop_length=512):
@@ -21,31 +292,233 @@ class MusicAgent:
         self.audio_data = None
         self.sr = None
         self.last_analysis = None
+        self.streaming = False
+        self._features = None
+        self._spectrogram = None
     
-    def load_audio(self, audio_file):
+    def load_audio(self, audio_file, streaming=False, block_duration=30.0):
         """
         Load an audio file for analysis.
         
         Args:
             audio_file (str): Path to the audio file
+            streaming (bool): Read the file block by block and keep only its
+                              envelopes instead of the decoded waveform
+            block_duration (float): Block length in seconds for streaming mode
             
         Returns:
             bool: True if loading was successful
         """
         try:
-            self.audio_data, self.sr = librosa.load(audio_file, sr=None)
             self.audio_file_path = audio_file
             self.base_filename = os.path.splitext(os.path.basename(audio_file))[0]
+            self.streaming = streaming
+            self._spectrogram = None
+            self._features = _get_analysis_cache(audio_file, self.frame_length, self.hop_length, streaming)
+            if streaming:
+                self.audio_data = None
+                self._load_streaming_envelopes(audio_file, block_duration)
+            else:
+                self.audio_data, self.sr = librosa.load(audio_file, sr=None)
             return True
         except Exception as e:
+            self._features = None
             print(f"Error loading audio file: {e}")
             return False
     
+    def _load_streaming_envelopes(self, audio_file, block_duration):
+        """Fill the feature cache with RMS and onset envelopes computed block by block."""
+        if "rms" in self._features:
+            self.sr = self._features["sr"]
+            return
+        
+        sr, blocks = _open_audio_stream(audio_file, block_duration)
+        envelope = _StreamingEnvelope(sr, self.frame_length, self.hop_length)
+        rms_parts, onset_parts = [], []
+        for block in blocks:
+            rms, onset = envelope.push(block)
+            rms_parts.append(rms)
+            onset_parts.append(onset)
+        rms, onset = envelope.push(np.zeros(0, dtype=np.float32), final=True)
+        rms_parts.append(rms)
+        onset_parts.append(onset)
+        
+        rms = np.concatenate(rms_parts)
+        onset = np.concatenate(onset_parts)
+        self.sr = sr
+        self._features["sr"] = sr
+        self._features["rms"] = rms / max(np.max(rms), np.finfo(float).tiny)
+        self._features["onset"] = onset / max(np.max(onset), np.finfo(float).tiny)
+    
+    def stream_rhythm_points(self, audio_file,
+                             energy_threshold=0.2,
+                             min_interval=0.2,
+                             smoothing_window=5,
+                             mask_ranges=None,
+                             block_duration=30.0):
+        """
+        Detect RMS rhythm points while reading the file, yielding them as they are found.
+        
+        Memory stays bounded by one audio block regardless of track length.
+        Energy is normalized by the running maximum, so points early in the
+        track are judged against the loudest part heard so far.
+        
+        Args:
+            audio_file (str): Path to the audio file
+            energy_threshold (float): Threshold for peak detection
+            min_interval (float): Minimum time between detected points (seconds)
+            smoothing_window (int): Window size for smoothing the RMS curve
+            mask_ranges (list): List of (start, end) tuples for masking detection
+            block_duration (float): Block length in seconds
+            
+        Yields:
+            dict: Rhythm point with "id" and "timestamp"
+        """
+        sr, blocks = _open_audio_stream(audio_file, block_duration)
+        envelope = _StreamingEnvelope(sr, self.frame_length, self.hop_length, with_onset=False)
+        picker = _StreamingPeakPicker(energy_threshold,
+                                      max(1, int(min_interval * sr / self.hop_length)),
+                                      smoothing_window)
+        
+        def emit(peaks):
+            timestamps = librosa.frames_to_time(np.asarray(peaks, dtype=int), sr=sr, hop_length=self.hop_length)
+            return timestamps[~_mask_flags(timestamps, mask_ranges)]
+        
+        count = 0
+        for block in blocks:
+            rms, _ = envelope.push(block)
+            for timestamp in emit(picker.push(rms)):
+                count += 1
+                yield {"id": count, "timestamp": round(float(timestamp), 3)}
+        rms, _ = envelope.push(np.zeros(0, dtype=np.float32), final=True)
+        for timestamp in emit(picker.push(rms, final=True)):
+            count += 1
+            yield {"id": count, "timestamp": round(float(timestamp), 3)}
+    
+    def _feature(self, name):
+        """
+        Return a cached analysis feature, computing it on first use.
+        
+        Args:
+            name (str): One of "rms", "onset" or "beats"
+            
+        Returns:
+            np.ndarray: The requested feature
+        """
+        if name in self._features:
+            return self._features[name]
+        
+        if name == "rms":
+            rms = librosa.feature.rms(y=self.audio_data, 
+                                     frame_length=self.frame_length, 
+                                     hop_length=self.hop_length)[0]
+            value = rms / np.max(rms)
+        elif name == "onset":
+            # Onset strength is the positive spectral flux of the mel spectrogram
+            onset = librosa.onset.onset_strength(y=self.audio_data, sr=self.sr, hop_length=self.hop_length)
+            value = onset / np.max(onset)
+        elif name == "beats":
+            _, value = librosa.beat.beat_track(onset_envelope=self._feature("onset"), 
+                                               sr=self.sr, 
+                                               hop_length=self.hop_length)
+        else:
+            raise ValueError(f"Unknown analysis feature: {name}")
+        
+        self._features[name] = value
+        return value
+    
+    def _spectrogram_db(self):
+        """dB spectrogram for plotting, kept for this instance only (it is far larger than the envelopes)."""
+        if self.audio_data is None:
+            raise ValueError("Spectrogram is not available for audio loaded in streaming mode")
+        if self._spectrogram is None:
+            self._spectrogram = librosa.amplitude_to_db(np.abs(librosa.stft(self.audio_data)), ref=np.max)
+        return self._spectrogram
+    
+    def _envelope(self, mode, smoothing_window):
+        """Normalized, smoothed detection envelope for a mode (cached per window)."""
+        base = "onset" if mode == "onset" else "rms"
+        key = (base, smoothing_window)
+        if key not in self._features["smoothed"]:
+            self._features["smoothed"][key] = _smooth(self._feature(base), smoothing_window)
+        return self._features["smoothed"][key]
+    
+    def _candidates(self, mode, smoothing_window):
+        """Candidate peak frames and their envelope heights for a detection mode."""
+        envelope = self._envelope(mode, smoothing_window)
+        if mode == "beat":
+            frames = np.asarray(self._feature("beats"), dtype=int)
+            frames = frames[frames < len(envelope)]
+        else:
+            frames, _ = find_peaks(envelope)
+        return frames, envelope[frames]
+    
+    def _frames_to_time(self, frames):
+        return librosa.frames_to_time(frames, sr=self.sr, hop_length=self.hop_length)
+    
+    def _interval_to_frames(self, min_interval):
+        return max(1, int(min_interval * self.sr / self.hop_length))
+    
+    def sweep_rhythm_points(self,
+                            thresholds=(0.2,),
+                            intervals=(0.2,),
+                            smoothing_windows=(5,),
+                            mask_ranges=None,
+                            mode="rms"):
+        """
+        Evaluate rhythm detection over a grid of parameters in one pass.
+        
+        The envelope, candidate peaks and mask flags are computed once per
+        smoothing window; thresholds are applied to all candidates at once and
+        only the minimum-interval selection runs per grid cell.
+        
+        Args:
+            thresholds (list): Threshold values to evaluate
+            intervals (list): Minimum interval values (seconds) to evaluate
+            smoothing_windows (list): Smoothing window sizes to evaluate
+            mask_ranges (list): List of (start, end) tuples for masking detection
+            mode (str): "rms" (energy peaks), "onset" (spectral flux peaks) or "beat" (beat tracker)
+            
+        Returns:
+            list: One dict per (smoothing_window, min_interval, threshold) with
+                  the resulting timestamps and masked point count
+        """
+        if self._features is None:
+            print("No audio loaded. Please load an audio file first.")
+            return None
+        if mode not in DETECTION_MODES:
+            raise ValueError(f"Unknown detection mode '{mode}', expected one of {DETECTION_MODES}")
+        
+        thresholds = np.asarray(thresholds, dtype=float)
+        results = []
+        for smoothing_window in smoothing_windows:
+            frames, heights = self._candidates(mode, smoothing_window)
+            times = self._frames_to_time(frames)
+            masked = _mask_flags(times, mask_ranges)
+            above = heights[None, :] >= thresholds[:, None]
+            
+            for min_interval in intervals:
+                distance = self._interval_to_frames(min_interval)
+                for threshold, candidate_mask in zip(thresholds, above):
+                    candidate_idx = np.flatnonzero(candidate_mask)
+                    kept = candidate_idx[_select_by_distance(frames[candidate_idx], 
+                                                             heights[candidate_idx], 
+                                                             distance)]
+                    results.append({
+                        "smoothing_window": smoothing_window,
+                        "min_interval": min_interval,
+                        "threshold": float(threshold),
+                        "timestamps": times[kept[~masked[kept]]],
+                        "masked": int(np.count_nonzero(masked[kept]))
+                    })
+        return results
+    
     def detect_rhythm_points(self, 
                             energy_threshold=0.2, 
                             min_interval=0.2, 
                             smoothing_window=5,
-                            mask_ranges=None):
+                            mask_ranges=None,
+                            mode="rms"):
         """
         Detect rhythm points in the loaded audio.
         
@@ -54,53 +527,24 @@ class MusicAgent:
             min_interval (float): Minimum time between detected points (seconds)
             smoothing_window (int): Window size for smoothing the RMS curve
             mask_ranges (list): List of (start, end) tuples for masking detection
+            mode (str): "rms" (energy peaks), "onset" (spectral flux peaks) or "beat" (beat tracker)
             
         Returns:
             dict: Rhythm detection results
         """
-        if self.audio_data is None:
+        if self._features is None:
             print("No audio loaded. Please load an audio file first.")
             return None
         
-        # Calculate RMS energy
-        rms = librosa.feature.rms(y=self.audio_data, 
-                                 frame_length=self.frame_length, 
-                                 hop_length=self.hop_length)[0]
-        
-        # Normalize RMS
-        rms_normalized = rms / np.max(rms)
+        detection = self.sweep_rhythm_points(thresholds=[energy_threshold],
+                                             intervals=[min_interval],
+                                             smoothing_windows=[smoothing_window],
+                                             mask_ranges=mask_ranges,
+                                             mode=mode)[0]
+        timestamps = detection["timestamps"]
         
-        # Apply smoothing
-        if smoothing_window > 1:
-            kernel = np.ones(smoothing_window) / smoothing_window
-            rms_normalized = np.convolve(rms_normalized, kernel, mode='same')
-        
-        # Find peaks
-        min_samples_interval = int(min_interval * self.sr / self.hop_length)
-        peaks, _ = find_peaks(rms_normalized, height=energy_threshold, distance=min_samples_interval)
-        
-        # Convert peaks to timestamps
-        timestamps = librosa.frames_to_time(peaks, sr=self.sr, hop_length=self.hop_length)
-        
-        # Apply masking if provided
         if mask_ranges is not None and len(mask_ranges) > 0:
-            # Filter out timestamps that fall within masked ranges
-            filtered_timestamps = []
-            masked_timestamps = []
-            
-            for ts in timestamps:
-                is_masked = False
-                for start_time, end_time in mask_ranges:
-                    if start_time <= ts <= end_time:
-                        is_masked = True
-                        masked_timestamps.append(ts)
-                        break
-                
-                if not is_masked:
-                    filtered_timestamps.append(ts)
-            
-            print(f"Masked out {len(masked_timestamps)} rhythm points.")
-            timestamps = np.array(filtered_timestamps)
+            print(f"Masked out {detection['masked']} rhythm points.")
         
         # Create results dictionary
         rhythm_points = []
@@ -121,31 +565,35 @@ class MusicAgent:
         if mask_ranges is not None and len(mask_ranges) > 0:
             result["mask_ranges"] = [{"start": start, "end": end} for start, end in mask_ranges]
         
-        # Calculate times for plotting
-        times = librosa.frames_to_time(np.arange(len(rms_normalized)), 
-                                       sr=self.sr, 
-                                       hop_length=self.hop_length)
-        
         # Store analysis for later use
-        self.last_analysis = {
-            "rms_normalized": rms_normalized,
-            "times": times,
-            "timestamps": timestamps,
-            "energy_threshold": energy_threshold,
-            "mask_ranges": mask_ranges
-        }
+        self.last_analysis = self._analysis_record(detection, mode, mask_ranges)
         
         return result
     
-    def plot_rhythm_detection(self, figsize=(15, 12), show_plot=True, save_path=None, dpi=300):
+    def _analysis_record(self, detection, mode, mask_ranges):
+        """Build the `last_analysis` dict used by the plotting and saving helpers."""
+        envelope = self._envelope(mode, detection["smoothing_window"])
+        return {
+            "rms_normalized": envelope,
+            "times": self._frames_to_time(np.arange(len(envelope))),
+            "timestamps": detection["timestamps"],
+            "energy_threshold": detection["threshold"],
+            "mask_ranges": mask_ranges
+        }
+    
+    def plot_rhythm_detection(self, figsize=(15, 12), show_plot=True, save_path=None, dpi=300, max_points=4000):
         """
         Plot the rhythm detection results.
         
+        Audio loaded in streaming mode has no waveform in memory; its plot is
+        drawn from the downsampled RMS envelope and omits the spectrogram.
+        
         Args:
             figsize (tuple): Figure size
             show_plot (bool): Whether to display the plot
             save_path (str): Path to save the plot
             dpi (int): DPI for the saved plot
+            max_points (int): Maximum number of envelope points to draw
             
         Returns:
             bool: True if plotting was successful
@@ -159,12 +607,19 @@ class MusicAgent:
         timestamps = self.last_analysis["timestamps"]
         energy_threshold = self.last_analysis["energy_threshold"]
         mask_ranges = self.last_analysis["mask_ranges"]
+        rms_normalized, times = _downsample_envelope(rms_normalized, times, max_points)
+        n_rows = 2 if self.audio_data is None else 3
         
         plt.figure(figsize=figsize)
         
         # Plot waveform
-        plt.subplot(3, 1, 1)
-        librosa.display.waveshow(self.audio_data, sr=self.sr, alpha=0.6)
+        plt.subplot(n_rows, 1, 1)
+        if self.audio_data is None:
+            rms = self._feature("rms")
+            outline, outline_times = _downsample_envelope(rms, self._frames_to_time(np.arange(len(rms))), max_points)
+            plt.fill_between(outline_times, -outline, outline, alpha=0.6)
+        else:
+            librosa.display.waveshow(self.audio_data, sr=self.sr, alpha=0.6)
         plt.vlines(timestamps, -1, 1, color='r', linestyle='--', label='Rhythm Points')
         
         # Highlight masked regions if provided
@@ -177,7 +632,7 @@ class MusicAgent:
         plt.legend()
         
         # Plot RMS energy
-        plt.subplot(3, 1, 2)
+        plt.subplot(n_rows, 1, 2)
         plt.plot(times, rms_normalized, label='RMS Energy')
         plt.vlines(timestamps, 0, 1, color='r', linestyle='--', label='Rhythm Points')
         plt.axhline(y=energy_threshold, color='g', linestyle='-', label=f'Threshold ({energy_threshold})')
@@ -193,20 +648,21 @@ class MusicAgent:
         plt.legend()
         
         # Plot spectrogram
-        plt.subplot(3, 1, 3)
-        D = librosa.amplitude_to_db(np.abs(librosa.stft(self.audio_data)), ref=np.max)
-        librosa.display.specshow(D, sr=self.sr, x_axis='time', y_axis='log')
-        plt.colorbar(format='%+2.0f dB')
-        plt.vlines(timestamps, 0, self.sr/2, color='r', linestyle='--', alpha=0.7)
-        
-        # Highlight masked regions if provided
-        if mask_ranges is not None:
-            for start_time, end_time in mask_ranges:
-                plt.axvspan(start_time, end_time, color='gray', alpha=0.3)
-        
-        plt.title('Spectrogram with Rhythm Points')
-        plt.ylabel('Frequency (Hz)')
-        plt.xlabel('Time (s)')
+        if self.audio_data is not None:
+            plt.subplot(n_rows, 1, 3)
+            D = self._spectrogram_db()
+            librosa.display.specshow(D, sr=self.sr, x_axis='time', y_axis='log')
+            plt.colorbar(format='%+2.0f dB')
+            plt.vlines(timestamps, 0, self.sr/2, color='r', linestyle='--', alpha=0.7)
+            
+            # Highlight masked regions if provided
+            if mask_ranges is not None:
+                for start_time, end_time in mask_ranges:
+                    plt.axvspan(start_time, end_time, color='gray', alpha=0.3)
+            
+            plt.title('Spectrogram with Rhythm Points')
+            plt.ylabel('Frequency (Hz)')
+            plt.xlabel('Time (s)')
         
         plt.tight_layout()
         
@@ -321,38 +777,18 @@ class MusicAgent:
             output_file = f"music_analysis/{self.base_filename}_rhythm_points.json"
         
         timestamps = self.last_analysis["timestamps"]
-        mask_ranges = self.last_analysis["mask_ranges"]
-        
-        # Create results dictionary
-        rhythm_points = []
-        for i, timestamp in enumerate(timestamps):
-            rhythm_points.append({
-                "id": i + 1,
-                "timestamp": round(float(timestamp), 3)
-            })
-        
-        result = {
-            "beat_data": {
-                "count": len(rhythm_points),
-                "beats": rhythm_points
-            }
-        }
-        
-        # If masking was applied, add it to the result
-        if mask_ranges is not None and len(mask_ranges) > 0:
-            result["mask_ranges"] = [{"start": start, "end": end} for start, end in mask_ranges]
-        
-        with open(output_file, 'w') as f:
-            json.dump(result, f, indent=2)
-        print(f"Rhythm points saved to {output_file}")
-        
+        rhythm_points = [{"id": i + 1, "timestamp": round(float(timestamp), 3)}
+                         for i, timestamp in enumerate(timestamps)]
+        write_rhythm_points(output_file, rhythm_points, self.last_analysis["mask_ranges"])
         return True
     
     def generate_parameter_study(self, output_dir=None, 
                                 thresholds=[0.1, 0.2, 0.3, 0.4, 0.5],
                                 intervals=[0.1, 0.2, 0.3, 0.5],
                                 smoothing_windows=[1, 3, 5, 7],
-                                mask_ranges=None):
+                                mask_ranges=None,
+                                mode="rms",
+                                save_plots=True):
         """
         Generate a parameter study to analyze the effect of different parameters.
         
@@ -362,11 +798,13 @@ class MusicAgent:
             intervals (list): List of minimum interval values to test
             smoothing_windows (list): List of smoothing window sizes to test
             mask_ranges (list): List of (start, end) tuples for masking detection
+            mode (str): Detection mode, see detect_rhythm_points
+            save_plots (bool): Whether to render a plot for every studied value
             
         Returns:
             list: Summary of parameter study results
         """
-        if self.audio_data is None:
+        if self._features is None:
             print("No audio loaded. Please load an audio file first.")
             return None
         
@@ -375,121 +813,40 @@ class MusicAgent:
             output_dir = f"parameter_study_{self.base_filename}"
         os.makedirs(output_dir, exist_ok=True)
         
+        # Use default values for the parameters that are not being studied
+        default_threshold = 0.2
+        default_interval = 0.2
+        default_smoothing = 5
+        
+        threshold_study = self.sweep_rhythm_points(thresholds=thresholds,
+                                                   intervals=[default_interval],
+                                                   smoothing_windows=[default_smoothing],
+                                                   mask_ranges=mask_ranges,
+                                                   mode=mode)
+        interval_study = self.sweep_rhythm_points(thresholds=[default_threshold],
+                                                  intervals=intervals,
+                                                  smoothing_windows=[default_smoothing],
+                                                  mask_ranges=mask_ranges,
+                                                  mode=mode)
+        
         # Results summary
         results_summary = []
-        
-        # Study effect of threshold
-        for threshold in thresholds:
-            # Use default values for other parameters
-            min_interval = 0.2
-            smoothing_window = 5
-            
-            rms = librosa.feature.rms(y=self.audio_data, 
-                                     frame_length=self.frame_length, 
-                                     hop_length=self.hop_length)[0]
-            rms_normalized = rms / np.max(rms)
-            
-            if smoothing_window > 1:
-                kernel = np.ones(smoothing_window) / smoothing_window
-                rms_normalized = np.convolve(rms_normalized, kernel, mode='same')
-            
-            min_samples_interval = int(min_interval * self.sr / self.hop_length)
-            peaks, _ = find_peaks(rms_normalized, height=threshold, distance=min_samples_interval)
-            timestamps = librosa.frames_to_time(peaks, sr=self.sr, hop_length=self.hop_length)
-            
-            # Apply masking if provided
-            if mask_ranges is not None and len(mask_ranges) > 0:
-                filtered_timestamps = []
-                for ts in timestamps:
-                    is_masked = False
-                    for start_time, end_time in mask_ranges:
-                        if start_time <= ts <= end_time:
-                            is_masked = True
-                            break
-                    if not is_masked:
-                        filtered_timestamps.append(ts)
-                timestamps = np.array(filtered_timestamps)
-            
-            times = librosa.frames_to_time(np.arange(len(rms_normalized)), 
-                                          sr=self.sr, 
-                                          hop_length=self.hop_length)
-            
-            # Store analysis temporarily for plotting
-            temp_analysis = {
-                "rms_normalized": rms_normalized,
-                "times": times,
-                "timestamps": timestamps,
-                "energy_threshold": threshold,
-                "mask_ranges": mask_ranges
-            }
-            self.last_analysis = temp_analysis
-            
-            # Plot and save
-            plot_path = os.path.join(output_dir, f"{self.base_filename}_threshold_{threshold:.2f}.png")
-            self.plot_rhythm_detection(show_plot=False, save_path=plot_path)
-            
-            # Add to results
-            results_summary.append({
-                "parameter": "threshold",
-                "value": threshold,
-                "rhythm_points": len(timestamps)
-            })
-        
-        # Study effect of minimum interval
-        threshold = 0.2  # Use a fixed threshold
-        smoothing_window = 5  # Use a fixed smoothing window
-        
-        rms = librosa.feature.rms(y=self.audio_data, 
-                                 frame_length=self.frame_length, 
-                                 hop_length=self.hop_length)[0]
-        rms_normalized = rms / np.max(rms)
-        
-        if smoothing_window > 1:
-            kernel = np.ones(smoothing_window) / smoothing_window
-            rms_normalized = np.convolve(rms_normalized, kernel, mode='same')
-        
-        times = librosa.frames_to_time(np.arange(len(rms_normalized)), 
-                                      sr=self.sr, 
-                                      hop_length=self.hop_length)
-        
-        for min_interval in intervals:
-            min_samples_interval = int(min_interval * self.sr / self.hop_length)
-            peaks, _ = find_peaks(rms_normalized, height=threshold, distance=min_samples_interval)
-            timestamps = librosa.frames_to_time(peaks, sr=self.sr, hop_length=self.hop_length)
-            
-            # Apply masking if provided
-            if mask_ranges is not None and len(mask_ranges) > 0:
-                filtered_timestamps = []
-                for ts in timestamps:
-                    is_masked = False
-                    for start_time, end_time in mask_ranges:
-                        if start_time <= ts <= end_time:
-                            is_masked = True
-                            break
-                    if not is_masked:
-                        filtered_timestamps.append(ts)
-                timestamps = np.array(filtered_timestamps)
-            
-            # Store analysis temporarily for plotting
-            temp_analysis = {
-                "rms_normalized": rms_normalized,
-                "times": times,
-                "timestamps": timestamps,
-                "energy_threshold": threshold,
-                "mask_ranges": mask_ranges
-            }
-            self.last_analysis = temp_analysis
-            
-            # Plot and save
-            plot_path = os.path.join(output_dir, f"{self.base_filename}_interval_{min_interval:.2f}.png")
-            self.plot_rhythm_detection(show_plot=False, save_path=plot_path)
-            
-            # Add to results
-            results_summary.append({
-                "parameter": "min_interval",
-                "value": min_interval,
-                "rhythm_points": len(timestamps)
-            })
+        for parameter, value_key, study in (("threshold", "threshold", threshold_study),
+                                            ("min_interval", "min_interval", interval_study)):
+            for detection in study:
+                value = detection[value_key]
+                if save_plots:
+                    # Store analysis temporarily for plotting
+                    self.last_analysis = self._analysis_record(detection, mode, mask_ranges)
+                    suffix = "threshold" if parameter == "threshold" else "interval"
+                    plot_path = os.path.join(output_dir, f"{self.base_filename}_{suffix}_{value:.2f}.png")
+                    self.plot_rhythm_detection(show_plot=False, save_path=plot_path)
+                
+                results_summary.append({
+                    "parameter": parameter,
+                    "value": value,
+                    "rhythm_points": len(detection["timestamps"])
+                })
         
         # Save results summary
         with open(os.path.join(output_dir, f"{self.base_filename}_parameter_study.json"), 'w') as f:
@@ -531,20 +888,52 @@ class MusicAgent:
             print(f"Error loading mask file: {e}")
             return None
 
-def music_main(config=None):
+def write_rhythm_points(output_file, rhythm_points, mask_ranges=None):
+    """Write rhythm points ({"id", "timestamp"} dicts) in the rhythm_points.json format."""
+    result = {
+        "beat_data": {
+            "count": len(rhythm_points),
+            "beats": rhythm_points
+        }
+    }
+    
+    # If masking was applied, add it to the result
+    if mask_ranges is not None and len(mask_ranges) > 0:
+        result["mask_ranges"] = [{"start": start, "end": end} for start, end in mask_ranges]
+    
+    with open(output_file, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Rhythm points saved to {output_file}")
+
+
+def music_main(config=None, streaming=False, plot=False, job=None):
+    """
+    Detect rhythm points for the rhythm-edit pipeline.
+    
+    Args:
+        config (str): Audio path (absolute or relative to the project root)
+        streaming (bool): Analyze block by block. Without plots, points are
+                          picked while the file is read (stream_rhythm_points),
+                          judged against the running maximum rather than the
+                          whole track's, so they can differ from the default
+                          in-memory analysis
+        plot (bool): Render detection and distribution plots
+        job (JobContext): Workspace the analysis is written to
+        
+    Returns:
+        int: 0 on success, 1 on failure
+    """
     import os
     import glob
+    from environment.utils.job_context import resolve_job
     
-    # Get the directory of the current script
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Navigate to the parent root directory
-    parent_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
+    job = resolve_job(job)
+    parent_root = job.project_root
     
     # Define paths for music data and analysis
-    video_edit_dir = os.path.join(parent_root, 'dataset', 'video_edit')
-    music_data_dir = os.path.join(video_edit_dir, 'music_data')
-    music_analysis_dir = os.path.join(video_edit_dir, 'music_analysis')
+    music_data_dir = job.music_data_dir
+    music_analysis_dir = job.music_analysis_dir
+    os.makedirs(music_analysis_dir, exist_ok=True)
     
     print(f"Using music data from: {music_data_dir}")
     print(f"Saving analysis results to: {music_analysis_dir}")
@@ -576,34 +965,46 @@ def music_main(config=None):
     
     print(f"Analyzing music file: {os.path.basename(audio_file)}")
     
-    if not agent.load_audio(audio_file):
-        print(f"Error: Could not load audio file '{audio_file}'")
-        return 1
+    if streaming:
+        print("Using streaming analysis")
     
     # Define mask ranges - times in seconds where you don't want to detect rhythm points
     mask_ranges = [(0, 5)]
+    detection = dict(energy_threshold=0.4, min_interval=3.0, smoothing_window=5, mask_ranges=mask_ranges)
+    json_path = os.path.join(music_analysis_dir, f"rhythm_points.json")
+    
+    # Plots need the whole envelope; otherwise long tracks never hold more than one block
+    if streaming and not plot:
+        try:
+            rhythm_points = list(agent.stream_rhythm_points(audio_file, **detection))
+        except Exception as e:
+            print(f"Error: Could not analyze audio file '{audio_file}': {e}")
+            return 1
+        print(f"Detected {len(rhythm_points)} rhythm points.")
+        write_rhythm_points(json_path, rhythm_points, mask_ranges)
+        print(f"Analysis complete! Results saved to {music_analysis_dir}")
+        return 0
+    
+    if not agent.load_audio(audio_file, streaming=streaming):
+        print(f"Error: Could not load audio file '{audio_file}'")
+        return 1
     
     # Detect rhythm points
-    rhythm_data = agent.detect_rhythm_points(
-        energy_threshold=0.4,
-        min_interval=3.0,
-        smoothing_window=5,
-        mask_ranges=mask_ranges
-    )
+    rhythm_data = agent.detect_rhythm_points(**detection)
     
     # Print results
     print(f"Detected {rhythm_data['beat_data']['count']} rhythm points.")
     
-    # Plot and save results
-    plot_path = os.path.join(music_analysis_dir, f"rhythm_detection.png")
-    agent.plot_rhythm_detection(show_plot=True, save_path=plot_path, dpi=300)
-    
-    # Analyze rhythm distribution and save
-    distribution_path = os.path.join(music_analysis_dir, f"rhythm_distribution.png")
-    agent.analyze_rhythm_distribution(show_plot=True, save_path=distribution_path, dpi=300)
+    if plot:
+        # Plot and save results
+        plot_path = os.path.join(music_analysis_dir, f"rhythm_detection.png")
+        agent.plot_rhythm_detection(show_plot=True, save_path=plot_path, dpi=300)
+        
+        # Analyze rhythm distribution and save
+        distribution_path = os.path.join(music_analysis_dir, f"rhythm_distribution.png")
+        agent.analyze_rhythm_distribution(show_plot=True, save_path=distribution_path, dpi=300)
     
     # Save to JSON
-    json_path = os.path.join(music_analysis_dir, f"rhythm_points.json")
     agent.save_rhythm_points(json_path)
     
     print(f"Analysis complete! Results saved to {music_analysis_dir}")
@@ -4,6 +4,7 @@ import tenacity
 from typing import Dict, List, Any
 import math
 from environment.config.llm import gpt
+from environment.utils.job_context import resolve_job
 
 
 class VideoContentExtractionAgent:
@@ -198,15 +199,14 @@ class StoryboardAgent:
             return f"Error creating storyboard: {str(e)}"
 
 
-def story_main(use_video_content=True, user_idea=None):
+def story_main(use_video_content=True, user_idea=None, job=None):
     """Run the complete pipeline to extract video content and create a storyboard."""
 
-    current_dir = os.getcwd()
-    video_edit_dir = os.path.join(current_dir, 'dataset/video_edit')
-    
-    scene_output_dir = os.path.join(video_edit_dir, 'scene_output')
-    music_analysis_dir = os.path.join(video_edit_dir, 'music_analysis')
-    workdir = os.path.join(video_edit_dir, 'videosource-workdir')
+    job = resolve_job(job)
+    scene_output_dir = job.scene_output_dir
+    music_analysis_dir = job.music_analysis_dir
+    workdir = job.index_dir
+    os.makedirs(scene_output_dir, exist_ok=True)
     
     # Updated file paths
     video_segments_path = os.path.join(workdir, "kv_store_video_segments.json")
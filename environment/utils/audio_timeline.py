@@ -0,0 +1,193 @@
+import numpy as np
+import soundfile as sf
+
+
+def to_samples(audio, channels=None):
+    """
+    Convert a waveform to a float32 (channels, samples) array.
+
+    Accepts numpy arrays or torch tensors shaped (samples,) or (channels, samples).
+    """
+    if hasattr(audio, "detach"):
+        audio = audio.detach().cpu().numpy()
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim == 1:
+        audio = audio[None, :]
+    if channels is not None and audio.shape[0] != channels:
+        if audio.shape[0] == 1:
+            audio = np.repeat(audio, channels, axis=0)
+        elif channels == 1:
+            audio = audio.mean(axis=0, keepdims=True)
+        else:
+            raise ValueError(f"Cannot map {audio.shape[0]} channels onto {channels}")
+    return audio
+
+
+def load_samples(path, sample_rate, channels=1):
+    """Read an audio file as a (channels, samples) float32 array at `sample_rate`."""
+    data, sr = sf.read(path, dtype='float32', always_2d=True)
+    data = data.T
+    if sr != sample_rate:
+        import librosa
+        data = librosa.resample(data, orig_sr=sr, target_sr=sample_rate)
+    return to_samples(data, channels)
+
+
+class AudioTimeline:
+    """
+    Sample-accurate audio assembly in a single growable buffer.
+
+    Clips are appended at a cursor or placed at absolute positions, mixed or
+    overwritten, with optional linear crossfades. The buffer grows
+    geometrically so total copying stays linear in the output length, and the
+    result is written to disk once.
+
+    With `stream_path`, everything more than `keep_seconds` behind the cursor
+    is flushed to that file as assembly progresses, so memory stays bounded
+    for long outputs; placing audio inside the flushed region is an error.
+    """
+
+    def __init__(self, sample_rate, channels=1, capacity_seconds=60.0,
+                 stream_path=None, keep_seconds=10.0, subtype='PCM_16'):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.subtype = subtype
+        self.buffer = np.zeros((channels, max(1, int(capacity_seconds * sample_rate))), dtype=np.float32)
+        self.offset = 0      # absolute sample index of buffer[:, 0]
+        self.end = 0         # absolute sample index one past the last written sample
+        self.cursor = 0      # absolute sample index where append() places the next clip
+        self.keep_samples = int(keep_seconds * sample_rate)
+        self._stream = None
+        if stream_path is not None:
+            self._stream = sf.SoundFile(stream_path, 'w', samplerate=sample_rate,
+                                        channels=channels, subtype=subtype)
+
+    @property
+    def num_samples(self):
+        return self.end
+
+    @property
+    def duration(self):
+        return self.end / self.sample_rate
+
+    def seconds_to_samples(self, seconds):
+        return int(round(seconds * self.sample_rate))
+
+    def _reserve(self, end):
+        needed = end - self.offset
+        if needed <= self.buffer.shape[1]:
+            return
+        capacity = max(needed, 2 * self.buffer.shape[1])
+        grown = np.zeros((self.channels, capacity), dtype=np.float32)
+        grown[:, :self.end - self.offset] = self.buffer[:, :self.end - self.offset]
+        self.buffer = grown
+
+    def place(self, audio, start, mix=True, fade_in=0, fade_out=0):
+        """
+        Put a clip at an absolute sample position.
+
+        Args:
+            audio: Waveform, see to_samples
+            start (int): Absolute start sample
+            mix (bool): Add to existing content instead of overwriting it
+            fade_in (int): Linear fade-in length in samples
+            fade_out (int): Linear fade-out length in samples
+
+        Returns:
+            int: Absolute sample index one past the clip
+        """
+        audio = to_samples(audio, self.channels)
+        if start < self.offset:
+            raise ValueError("Cannot place audio before the flushed part of a streamed timeline")
+        length = audio.shape[1]
+        if fade_in or fade_out:
+            audio = audio.copy()
+            if fade_in:
+                fade_in = min(fade_in, length)
+                audio[:, :fade_in] *= np.linspace(0.0, 1.0, fade_in, endpoint=False, dtype=np.float32)
+            if fade_out:
+                fade_out = min(fade_out, length)
+                audio[:, length - fade_out:] *= np.linspace(1.0, 0.0, fade_out, endpoint=False, dtype=np.float32)
+
+        stop = start + length
+        self._reserve(stop)
+        region = self.buffer[:, start - self.offset:stop - self.offset]
+        if mix:
+            region += audio
+        else:
+            region[:] = audio
+        self.end = max(self.end, stop)
+        return stop
+
+    def append(self, audio, crossfade=0.0, gap=0.0):
+        """
+        Place a clip at the cursor and move the cursor past it.
+
+        Args:
+            audio: Waveform, see to_samples
+            crossfade (float): Seconds of overlap with the previous clip, faded linearly
+            gap (float): Seconds of silence inserted before the clip
+
+        Returns:
+            tuple: (start, end) absolute sample indices of the clip
+        """
+        start = self.cursor + self.seconds_to_samples(gap)
+        overlap = min(self.seconds_to_samples(crossfade), start - self.offset) if crossfade else 0
+        if overlap:
+            region = self.buffer[:, start - overlap - self.offset:start - self.offset]
+            region *= np.linspace(1.0, 0.0, overlap, endpoint=False, dtype=np.float32)
+            start -= overlap
+        stop = self.place(audio, start, mix=True, fade_in=overlap)
+        self.cursor = stop
+        self._flush()
+        return start, stop
+
+    def append_silence(self, seconds):
+        """Advance the cursor by `seconds` of silence."""
+        self.cursor += self.seconds_to_samples(seconds)
+        self._reserve(self.cursor)
+        self.end = max(self.end, self.cursor)
+        self._flush()
+        return self.cursor
+
+    def overlay(self, audio, at, gain=1.0):
+        """Mix a clip into the timeline at `at` seconds without moving the cursor."""
+        audio = to_samples(audio, self.channels)
+        if gain != 1.0:
+            audio = audio * gain
+        return self.place(audio, self.seconds_to_samples(at), mix=True)
+
+    def _flush(self, final=False):
+        if self._stream is None:
+            return
+        upto = self.end if final else self.cursor - self.keep_samples
+        count = upto - self.offset
+        if count <= 0:
+            return
+        self._stream.write(np.clip(self.buffer[:, :count], -1.0, 1.0).T)
+        remaining = self.end - upto
+        self.buffer[:, :remaining] = self.buffer[:, count:count + remaining]
+        self.buffer[:, remaining:] = 0.0
+        self.offset = upto
+
+    def to_array(self):
+        """Return the assembled (channels, samples) audio; not available once streaming has flushed."""
+        if self.offset:
+            raise ValueError("Streamed timeline has already been flushed to disk")
+        return self.buffer[:, :self.end]
+
+    def write(self, path=None):
+        """
+        Write the assembled audio once and return the output path.
+
+        For streamed timelines the remaining samples are flushed and the
+        stream file is closed; `path` is ignored.
+        """
+        if self._stream is not None:
+            self._flush(final=True)
+            path = self._stream.name
+            self._stream.close()
+            self._stream = None
+            return path
+        sf.write(path, np.clip(self.to_array(), -1.0, 1.0).T, self.sample_rate, subtype=self.subtype)
+        return path
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_FEATURE_DIR = os.path.join(PROJECT_ROOT, 'dataset', '.feature_cache')
+
+
+def _to_numpy(array):
+    if hasattr(array, "detach"):
+        array = array.detach().cpu().numpy()
+    return np.asarray(array)
+
+
+class FeatureStore:
+    """
+    Content-addressed cache of audio features shared by the TTS/SVC tools.
+
+    Entries are keyed by (audio content hash, feature name, parameters) and
+    persisted as `<root>/<feature>/<key[:2]>/<key>.npy`, which are opened as
+    read-only memmaps. A small in-memory LRU sits in front of the files.
+    Feature names carry the tool prefix ('cosyvoice.campplus', 'seed_vc.rmvpe')
+    and params identify the model and settings, so different extractors never
+    share entries.
+    """
+
+    def __init__(self, root=DEFAULT_FEATURE_DIR, max_memory_entries=128):
+        self.root = root
+        self.max_memory_entries = max_memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def audio_hash(audio):
+        """sha256 of the float32 samples of a waveform (numpy array or torch tensor)."""
+        samples = np.ascontiguousarray(_to_numpy(audio), dtype=np.float32)
+        return hashlib.sha256(samples.tobytes()).hexdigest()
+
+    @staticmethod
+    def key(audio_hash, feature, params=None):
+        payload = json.dumps({"audio": audio_hash, "feature": feature, "params": params or {}},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, feature, key):
+        return os.path.join(self.root, feature, key[:2], f"{key}.npy")
+
+    def _remember(self, key, array):
+        self.memory[key] = array
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, feature, key):
+        """Return the stored array for `key`, or None."""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        path = self._path(feature, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable feature cache entry {path}: {e}")
+            return None
+
+        with self.lock:
+            self._remember(key, array)
+        return array
+
+    def put(self, feature, key, array):
+        """Save an array atomically and return it."""
+        array = _to_numpy(array)
+        path = self._path(feature, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self._remember(key, array)
+        return array
+
+    def get_or_compute(self, audio, feature, compute, params=None, audio_hash=None):
+        """
+        Look up a feature of `audio`, computing and storing it on a miss.
+
+        Args:
+            audio: Waveform the feature is computed from, numpy array or torch tensor
+            feature (str): Feature name, including the extractor it comes from
+            compute (callable): Called with no arguments on a miss; returns an array or tensor
+            params (dict): Extraction parameters that change the result
+            audio_hash (str): Precomputed audio_hash(audio), to avoid hashing twice
+
+        Returns:
+            np.ndarray: The feature (a read-only memmap when loaded from disk)
+        """
+        if audio_hash is None:
+            audio_hash = self.audio_hash(audio)
+        key = self.key(audio_hash, feature, params)
+        array = self.get(feature, key)
+        if array is None:
+            array = self.put(feature, key, compute())
+        return array
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store():
+    """The process-wide FeatureStore under dataset/.feature_cache."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeatureStore()
+        return _store
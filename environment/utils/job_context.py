@@ -0,0 +1,177 @@
+import copy
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .feature_store import PROJECT_ROOT
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+SHARED_VIDEO_EDIT_DIR = os.path.join(PROJECT_ROOT, 'dataset', 'video_edit')
+DEFAULT_JOBS_DIR = os.path.join(PROJECT_ROOT, 'dataset', 'jobs')
+
+# Written by the job itself
+JOB_DIRS = ('music_analysis', 'scene_output', 'voice_gen', 'writing_data', 'video_output')
+# Inputs prepared by the user and read by every job
+SHARED_DIRS = ('music_data', 'video_source', 'voice_data', 'face_db')
+INDEX_DIR = 'videosource-workdir'
+
+_index_locks = {}
+_index_locks_lock = threading.Lock()
+
+
+class JobContext:
+    """
+    Where one agent job reads and writes its files.
+
+    A job writes its intermediate files (storyboards, rhythm points, voice
+    tracks, renders) under its own workspace, and reads user inputs and the
+    VideoRAG index from the shared dataset/video_edit directory. Roles take a
+    JobContext instead of building paths from their own location or the
+    working directory, so several jobs can run in one process or on one host.
+
+    JobContext() keeps the old layout: the workspace is dataset/video_edit itself.
+    JobContext.create() gives a fresh workspace under dataset/jobs/<job_id>.
+
+    `overrides` are merged over the agent's yml config (see apply_overrides),
+    stage graphs given the job record their stages in `stages`, and spans
+    traced while it runs land in `spans` (see utils/tracing.py).
+    """
+
+    def __init__(self, workspace=SHARED_VIDEO_EDIT_DIR, job_id=None, shared_dir=SHARED_VIDEO_EDIT_DIR,
+                 index_dir=None, overrides=None):
+        self.job_id = job_id or 'default'
+        self.project_root = PROJECT_ROOT
+        self.workspace = os.path.abspath(workspace)
+        self.shared_dir = os.path.abspath(shared_dir)
+        self.index_dir = os.path.abspath(index_dir or os.path.join(self.shared_dir, INDEX_DIR))
+        self.overrides = overrides or {}
+        self.stages = []
+        self.spans = []
+
+    @classmethod
+    def create(cls, job_id=None, jobs_dir=DEFAULT_JOBS_DIR, **kwargs):
+        """New job with its own workspace directory."""
+        job_id = job_id or uuid.uuid4().hex[:12]
+        job = cls(os.path.join(jobs_dir, job_id), job_id=job_id, **kwargs)
+        job.makedirs()
+        return job
+
+    def __repr__(self):
+        return f"JobContext(job_id={self.job_id!r}, workspace={self.workspace!r})"
+
+    def makedirs(self):
+        for name in JOB_DIRS:
+            os.makedirs(os.path.join(self.workspace, name), exist_ok=True)
+        for name in SHARED_DIRS:
+            os.makedirs(os.path.join(self.shared_dir, name), exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def path(self, name, *parts):
+        """Path of a file in one of the video_edit subdirectories, e.g. path('scene_output', 'video_scene.json')."""
+        if name == INDEX_DIR:
+            return os.path.join(self.index_dir, *parts)
+        if name in SHARED_DIRS:
+            return os.path.join(self.shared_dir, name, *parts)
+        return os.path.join(self.workspace, name, *parts)
+
+    def input_path(self, name, *parts):
+        """Like path(), but falls back to the shared copy for inputs such as writing_data/present_style.txt."""
+        path = self.path(name, *parts)
+        if os.path.exists(path):
+            return path
+        return os.path.join(self.shared_dir, name, *parts)
+
+    def project_path(self, *parts):
+        return os.path.join(self.project_root, *parts)
+
+    def apply_overrides(self, config):
+        """The agent config with this job's overrides merged in, e.g. {'rhythm_agent': {'idea': ...}}."""
+        return _merge(copy.deepcopy(config) if config else {}, self.overrides)
+
+    def record_stage(self, name, status, seconds=0.0, waited=0.0, resource=None):
+        """Called by StageGraph for every stage: 'done', 'cached', 'failed' or 'error'."""
+        self.stages.append({
+            "stage": name,
+            "status": status,
+            "seconds": round(seconds, 3),
+            "waited": round(waited, 3),
+            "resource": resource,
+            "finished_at": time.time(),
+        })
+
+    def record_span(self, span):
+        """Called by tracing.span for every finished span."""
+        self.spans.append(span)
+
+    @property
+    def music_analysis_dir(self):
+        return self.path('music_analysis')
+
+    @property
+    def scene_output_dir(self):
+        return self.path('scene_output')
+
+    @property
+    def voice_gen_dir(self):
+        return self.path('voice_gen')
+
+    @property
+    def writing_data_dir(self):
+        return self.path('writing_data')
+
+    @property
+    def video_output_dir(self):
+        return self.path('video_output')
+
+    @property
+    def music_data_dir(self):
+        return self.path('music_data')
+
+    @property
+    def video_source_dir(self):
+        return self.path('video_source')
+
+    @property
+    def voice_data_dir(self):
+        return self.path('voice_data')
+
+    @property
+    def face_db_dir(self):
+        return self.path('face_db')
+
+    @contextmanager
+    def index_lock(self):
+        """Serialize writes to the shared VideoRAG index across threads and processes."""
+        with _index_locks_lock:
+            lock = _index_locks.setdefault(self.index_dir, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, '.lock'), 'w') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge(base, overrides):
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
+
+
+def resolve_job(job=None):
+    """The given job, or the default one that uses dataset/video_edit directly."""
+    return job if job is not None else JobContext()
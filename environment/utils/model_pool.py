@@ -0,0 +1,80 @@
+import threading
+
+from .feature_store import get_feature_store
+from .job_context import resolve_job
+from .tracing import span
+
+
+class ModelPool:
+    """
+    Models loaded once per process and shared by every job.
+
+    Each model is loaded by the first caller asking for its key; concurrent
+    callers for the same key wait for that load instead of loading a second
+    copy. How many jobs use a GPU model at the same time is limited by the
+    'gpu' stage resource, not here. Loads are traced as 'model_load' spans
+    of the job that triggered them.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self.lock:
+            if key in self.models:
+                return self.models[key]
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                if key in self.models:
+                    return self.models[key]
+            with span(f"load:{key[0] if isinstance(key, tuple) else key}", category='model_load'):
+                model = loader()
+            with self.lock:
+                self.models[key] = model
+            return model
+
+    def loaded(self):
+        with self.lock:
+            return list(self.models)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool():
+    """Process-wide ModelPool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+        return _pool
+
+
+def get_cosyvoice2(model_dir=None):
+    """Shared CosyVoice2-0.5B, with speaker features cached in the feature store."""
+    model_dir = model_dir or resolve_job().project_path('tools', 'CosyVoice', 'pretrained_models', 'CosyVoice2-0.5B')
+
+    def load():
+        from cosyvoice.cli.cosyvoice import CosyVoice2
+        cosyvoice = CosyVoice2(model_dir, load_jit=False, load_trt=False, fp16=False)
+        cosyvoice.frontend.feature_store = get_feature_store()
+        return cosyvoice
+
+    return get_model_pool().get(('cosyvoice2', model_dir), load)
+
+
+def get_minicpm_v(model_path=None):
+    """Shared MiniCPM-V-2_6-int4 (model, tokenizer) used by the video editors."""
+    model_path = model_path or resolve_job().project_path('tools', 'MiniCPM-V-2_6-int4')
+
+    def load():
+        from transformers import AutoModel, AutoTokenizer
+        model = AutoModel.from_pretrained(model_path, trust_remote_code=True).eval()
+        tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+        return model, tokenizer
+
+    return get_model_pool().get(('minicpm-v', model_path), load)
@@ -0,0 +1,415 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from .feature_store import PROJECT_ROOT
+from .tracing import span, trace_job
+
+DEFAULT_STAGE_CACHE_DIR = os.path.join(PROJECT_ROOT, 'dataset', '.stage_cache')
+
+# Stages running at once per resource class, over all graphs (jobs) in the process
+DEFAULT_RESOURCE_SLOTS = {
+    'gpu': 1,  # model inference: VideoRAG indexing, TTS/SVC, separation, ASR
+    'llm': 8,  # prompt-bound stages; requests are bounded again by the LLM gateway
+    'cpu': 2,  # video encoding and other ffmpeg/moviepy work
+}
+
+_resource_slots = dict(DEFAULT_RESOURCE_SLOTS)
+_resource_semaphores = {}
+_resource_lock = threading.Lock()
+
+
+def configure_resources(**slots):
+    """Set how many stages of each resource class may run at once, e.g. configure_resources(gpu=2)."""
+    with _resource_lock:
+        for name, count in slots.items():
+            if count is None:
+                continue
+            if count < 1:
+                raise ValueError(f"Resource '{name}' needs at least one slot, got {count}")
+            _resource_slots[name] = count
+            _resource_semaphores.pop(name, None)
+
+
+def _resource_semaphore(name):
+    with _resource_lock:
+        if name not in _resource_semaphores:
+            if name not in _resource_slots:
+                raise ValueError(f"Unknown stage resource: {name}")
+            _resource_semaphores[name] = threading.BoundedSemaphore(_resource_slots[name])
+        return _resource_semaphores[name]
+
+
+class StageError(RuntimeError):
+    """A stage's check rejected its result; dependent stages were not run."""
+
+    def __init__(self, stage, result):
+        super().__init__(f"Stage '{stage}' failed with result: {result!r}")
+        self.stage = stage
+        self.result = result
+
+
+class Fingerprints:
+    """
+    Content hashes of files and directories.
+
+    Digests are remembered by (path, size, mtime) in `<root>/fingerprints.json`,
+    so unchanged files, e.g. the videos and the VideoRAG index, are only read once.
+    """
+
+    def __init__(self, root):
+        self.path = os.path.join(root, 'fingerprints.json')
+        self.lock = threading.Lock()
+        self.index = None
+        self.dirty = False
+
+    def _load(self):
+        if self.index is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+
+    def _file(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            self._load()
+            entry = self.index.get(path)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        with self.lock:
+            self.index[path] = [stat.st_size, stat.st_mtime_ns, digest]
+            self.dirty = True
+        return digest
+
+    def __call__(self, path):
+        """sha256 of a file, of a directory's (relative path, digest) list, or None if missing."""
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            return self._file(path)
+        if not os.path.isdir(path):
+            return None
+
+        digest = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                file_path = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                digest.update(self._file(file_path).encode('ascii'))
+        return digest.hexdigest()
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+class Stage:
+    """
+    One step of an agent pipeline.
+
+    Args:
+        name (str): Unique name in the graph
+        fn (callable): Called with the results of `args` stages, positionally
+        deps (list): Stages that must finish first
+        args (list): Stages whose results are passed to fn; implies deps
+        inputs (list): Files/directories the stage reads; part of the cache key by content
+        outputs (list): Files/directories the stage writes; a cache hit requires them unchanged
+        params (dict): Other values that change the result (idea, reqs, ...)
+        check (callable): Returns False for a failed result, which stops the graph
+        cache (bool): Memoize the result. Needs outputs/inputs/params to be complete
+        executor (str): 'thread' or 'process'. Process stages must be picklable
+        exclusive (bool): Run with no other stage of this graph in flight
+        resource (str): 'gpu', 'llm' or 'cpu'. Limits how many such stages run at once
+            across all graphs in the process, see configure_resources
+    """
+
+    def __init__(self, name, fn, deps=(), args=(), inputs=(), outputs=(), params=None, check=None,
+                 cache=True, executor='thread', exclusive=False, resource=None):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor for stage '{name}': {executor}")
+        if resource is not None and resource not in _resource_slots:
+            raise ValueError(f"Unknown resource for stage '{name}': {resource}")
+        self.name = name
+        self.fn = fn
+        self.args = list(args)
+        self.deps = list(dict.fromkeys(list(deps) + self.args))
+        self.inputs = [os.path.abspath(p) for p in inputs if p]
+        self.outputs = [os.path.abspath(p) for p in outputs if p]
+        self.params = params or {}
+        self.check = check
+        self.cache = cache
+        self.executor = executor
+        self.exclusive = exclusive
+        self.resource = resource
+
+    @property
+    def identity(self):
+        fn = getattr(self.fn, '__func__', self.fn)
+        return f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', repr(fn))}"
+
+
+class StageGraph:
+    """
+    Runs agent stages as a DAG: independent branches run in parallel, and
+    results are memoized by the content of the stage's inputs.
+
+    A stage's cache key covers its name, function, params, the content hash of
+    its declared inputs and the keys of the stages in `args`. The result is
+    reused when an entry exists for the key and the declared outputs still hash
+    to what the stage wrote, so changing only the idea re-runs the stages that
+    read it and skips e.g. VideoRAG indexing. Results of False/None, error
+    Messages and results rejected by `check` are never cached.
+
+    When a JobContext is given, every stage's outcome and duration is recorded
+    on it with job.record_stage, for the job manifest, and stages run as
+    tracing spans of the job (the wait for a resource slot is its own span).
+
+        graph = StageGraph(logger=self.logger)
+        graph.add("preload", self.preload_video, inputs=[video_source_dir], outputs=[working_dir])
+        graph.add("story", self.process_story, deps=["preload"], params={"idea": self.idea})
+        results = graph.run()
+    """
+
+    def __init__(self, cache_dir=DEFAULT_STAGE_CACHE_DIR, max_workers=4, logger=None, job=None):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.logger = logger or logging.getLogger(__name__)
+        self.job = job
+        self.stages = {}
+        self.fingerprint = Fingerprints(cache_dir)
+
+    def add(self, name, fn, **kwargs):
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self.stages[name] = Stage(name, fn, **kwargs)
+        return self.stages[name]
+
+    def _validate(self):
+        """Check deps exist and there are no cycles."""
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Stage cycle: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}' required by '{path[-1]}'")
+            state[name] = 'visiting'
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            state[name] = 'done'
+
+        for name in self.stages:
+            visit(name, [])
+
+    def _key(self, stage, keys):
+        if not stage.cache or any(keys[name] is None for name in stage.args):
+            return None
+        payload = {
+            "stage": stage.name,
+            "fn": stage.identity,
+            "params": stage.params,
+            "inputs": {path: self.fingerprint(path) for path in stage.inputs},
+            # jobs write to their own workspaces; a result never stands in for another job's files
+            "outputs": stage.outputs,
+            "args": [keys[name] for name in stage.args],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, stage, key):
+        return os.path.join(self.cache_dir, stage.name, f"{key}.pkl")
+
+    def _lookup(self, stage, key):
+        path = self._entry_path(stage, key)
+        if key is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable stage cache entry {path}: {e}")
+            return None
+        if any(self.fingerprint(p) != h for p, h in entry["outputs"].items()):
+            return None
+        return entry
+
+    @staticmethod
+    def _cacheable(result):
+        if result is None or result is False:
+            return False
+        # roles report failures as Message(content={"status": "error", ...})
+        content = getattr(result, 'content', None)
+        return not (isinstance(content, dict) and content.get('status') == 'error')
+
+    def _store(self, stage, key, result):
+        if key is None or not self._cacheable(result):
+            return False
+        entry = {"result": result, "outputs": {p: self.fingerprint(p) for p in stage.outputs}}
+        path = self._entry_path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            self.logger.warning(f"Stage '{stage.name}' result is not cacheable: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def _record(self, stage, status, seconds=0.0, waited=0.0):
+        if self.job is not None:
+            self.job.record_stage(stage.name, status, seconds, waited=waited, resource=stage.resource)
+
+    @staticmethod
+    def _call(stage, pool, args, timing, job=None):
+        """Run a stage once a slot of its resource is free; `timing` gets the wait and run times."""
+        with trace_job(job):
+            start = time.perf_counter()
+            semaphore = _resource_semaphore(stage.resource) if stage.resource else None
+            if semaphore is not None:
+                with span(f"wait:{stage.resource}", category='wait', stage=stage.name):
+                    semaphore.acquire()
+            try:
+                timing['waited'] = time.perf_counter() - start
+                started = time.perf_counter()
+                try:
+                    with span(stage.name, category='stage', resource=stage.resource, executor=stage.executor):
+                        if pool is None:
+                            return stage.fn(*args)
+                        # only wall time is seen here; CPU and memory are spent in the worker process
+                        return pool.submit(stage.fn, *args).result()
+                finally:
+                    timing['seconds'] = time.perf_counter() - started
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+
+    def run(self):
+        """
+        Run every stage once its deps are done.
+
+        Returns:
+            dict: stage name -> result
+
+        Raises:
+            StageError: a stage's check failed
+            Exception: the first exception raised by a stage, after in-flight stages finish
+        """
+        self._validate()
+        results, keys = {}, {}
+        pending = dict(self.stages)
+        running = {}
+        error = None
+        threads = ThreadPoolExecutor(max_workers=self.max_workers)
+        processes = None
+
+        def submit(stage):
+            nonlocal processes
+            key = self._key(stage, keys)
+            entry = self._lookup(stage, key)
+            if entry is not None:
+                self.logger.info(f"Stage '{stage.name}' is up to date, reusing cached result")
+                results[stage.name] = entry["result"]
+                keys[stage.name] = key
+                self._record(stage, 'cached')
+                return False
+
+            pool = None
+            if stage.executor == 'process':
+                if processes is None:
+                    # spawn so CUDA / the VideoRAG pools are not forked
+                    processes = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                pool = processes
+            self.logger.info(f"Stage '{stage.name}' started")
+            # the calling thread waits for the resource slot (and the worker process, if any)
+            timing = {}
+            future = threads.submit(self._call, stage, pool, [results[name] for name in stage.args], timing,
+                                    self.job)
+            running[future] = (stage, key, timing)
+            return True
+
+        try:
+            while pending or running:
+                if error is None:
+                    progressed = True
+                    while progressed:
+                        progressed = False
+                        exclusive_running = any(s.exclusive for s, _, _ in running.values())
+                        ready = [s for s in pending.values() if all(d in results for d in s.deps)]
+                        for stage in ready:
+                            if exclusive_running or (stage.exclusive and running):
+                                break
+                            del pending[stage.name]
+                            if submit(stage):
+                                exclusive_running = stage.exclusive
+                            else:
+                                # a cache hit may unblock more stages right away
+                                progressed = True
+                elif not running:
+                    break
+
+                if not running:
+                    if pending and error is None:
+                        # everything left depends on a stage that did not produce a result
+                        raise RuntimeError(f"Stages could not run: {', '.join(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key, timing = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Stage '{stage.name}' raised: {e}")
+                        self._record(stage, 'error', timing.get('seconds', 0.0), timing.get('waited', 0.0))
+                        error = error or e
+                        continue
+                    elapsed = timing['seconds']
+
+                    if stage.check is not None and not stage.check(result):
+                        self.logger.error(f"Stage '{stage.name}' failed after {elapsed:.1f}s")
+                        self._record(stage, 'failed', elapsed, timing['waited'])
+                        error = error or StageError(stage.name, result)
+                        continue
+
+                    self.logger.info(f"Stage '{stage.name}' finished in {elapsed:.1f}s")
+                    self._record(stage, 'done', elapsed, timing['waited'])
+                    results[stage.name] = result
+                    # stages taking an unmemoized result as argument are not memoized either
+                    keys[stage.name] = key if self._store(stage, key, result) else None
+        finally:
+            threads.shutdown(wait=True)
+            if processes is not None:
+                processes.shutdown(wait=True)
+            self.fingerprint.save()
+
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,321 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no child CPU time
+    resource = None
+
+# How often open spans sample RSS and CUDA memory, in seconds
+SAMPLE_INTERVAL = 0.05
+
+_MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+_current_job = contextvars.ContextVar('trace_job', default=None)
+
+
+def _rss_bytes():
+    """Resident memory of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cuda_bytes():
+    """CUDA memory allocated by torch on all devices, if torch already uses CUDA."""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return None
+    try:
+        if not torch.cuda.is_initialized():
+            return None
+        return sum(torch.cuda.memory_allocated(device) for device in range(torch.cuda.device_count()))
+    except Exception:
+        return None
+
+
+def _thread_io():
+    """Bytes this thread passed through read/write syscalls (files, pipes, sockets)."""
+    try:
+        with open('/proc/thread-self/io', 'r') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _children_cpu():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def _delta(end, start):
+    if end is None or start is None:
+        return None
+    return end - start
+
+
+class OpenSpan:
+    """A span being measured; `status` may be set to 'error' before it closes."""
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.status = 'ok'
+        self.thread = threading.get_native_id()
+        self.thread_name = threading.current_thread().name
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.start_cpu = time.thread_time()
+        self.start_children = _children_cpu()
+        self.peak_rss = _rss_bytes()
+        self.peak_cuda = _cuda_bytes()
+        # last, so the tracer's own /proc reads are not counted
+        self.start_io = _thread_io()
+
+    def sample(self, rss, cuda):
+        self.peak_rss = _max(self.peak_rss, rss)
+        self.peak_cuda = _max(self.peak_cuda, cuda)
+
+    def finish(self):
+        io = _thread_io()
+        self.sample(_rss_bytes(), _cuda_bytes())
+        read_bytes = write_bytes = None
+        if io is not None and self.start_io is not None:
+            read_bytes, write_bytes = io[0] - self.start_io[0], io[1] - self.start_io[1]
+        return {
+            "name": self.name,
+            "cat": self.category,
+            "status": self.status,
+            "start": self.start_time,
+            "seconds": round(time.perf_counter() - self.start, 6),
+            "cpu_seconds": round(time.thread_time() - self.start_cpu, 6),
+            # process-wide: subprocesses (ffmpeg, DiffSinger, ...) that exited during the span
+            "child_cpu_seconds": _delta(_children_cpu(), self.start_children),
+            # process-wide: includes whatever other jobs allocated meanwhile
+            "rss_peak_mb": None if self.peak_rss is None else round(self.peak_rss / _MB, 1),
+            "cuda_peak_mb": None if self.peak_cuda is None else round(self.peak_cuda / _MB, 1),
+            "read_bytes": read_bytes,
+            "write_bytes": write_bytes,
+            "thread": self.thread,
+            "thread_name": self.thread_name,
+            "args": self.args,
+        }
+
+
+class _Sampler:
+    """Background thread updating the memory peaks of open spans; runs only while spans are open."""
+
+    def __init__(self):
+        self.spans = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, span):
+        with self.lock:
+            self.spans.add(span)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='trace-sampler', daemon=True)
+                self.thread.start()
+
+    def remove(self, span):
+        with self.lock:
+            self.spans.discard(span)
+
+    def _run(self):
+        while True:
+            time.sleep(SAMPLE_INTERVAL)
+            with self.lock:
+                spans = list(self.spans)
+                if not spans:
+                    self.thread = None
+                    return
+            rss, cuda = _rss_bytes(), _cuda_bytes()
+            for span in spans:
+                span.sample(rss, cuda)
+
+
+_sampler = _Sampler()
+
+
+def current_job():
+    """The job spans are recorded on in this thread/task, or None."""
+    return _current_job.get()
+
+
+@contextmanager
+def trace_job(job):
+    """Record spans opened in this thread (or asyncio task) on `job` until the block exits."""
+    token = _current_job.set(job)
+    try:
+        yield job
+    finally:
+        _current_job.reset(token)
+
+
+@contextmanager
+def span(name, category='stage', **args):
+    """
+    Measure a block and record it on the current job.
+
+    Does nothing outside trace_job(). Categories used so far: 'job', 'stage',
+    'wait' (for a resource slot), 'role', 'model_load' and 'llm'.
+
+        with span("cosyvoice2", category='model_load'):
+            model = CosyVoice2(model_dir)
+    """
+    job = _current_job.get()
+    if job is None:
+        yield None
+        return
+    open_span = OpenSpan(name, category, args)
+    _sampler.add(open_span)
+    try:
+        yield open_span
+    except BaseException:
+        open_span.status = 'error'
+        raise
+    finally:
+        _sampler.remove(open_span)
+        job.record_span(open_span.finish())
+
+
+def _is_error(result):
+    content = getattr(result, 'content', result)
+    return isinstance(content, dict) and content.get('status') == 'error'
+
+
+def traced(name=None, category='role'):
+    """
+    Decorator recording every call as a span. Returning an error Message marks the span as failed.
+
+        @traced(category='model_load')
+        def initialize_model(self): ...
+    """
+
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with span(label, category) as s:
+                    result = await fn(*args, **kwargs)
+                    if s is not None and _is_error(result):
+                        s.status = 'error'
+                    return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with span(label, category) as s:
+                    result = fn(*args, **kwargs)
+                    if s is not None and _is_error(result):
+                        s.status = 'error'
+                    return result
+
+        wrapper.__traced__ = True
+        return wrapper
+
+    return decorate
+
+
+def summarize(spans):
+    """
+    Totals per category and per span name, slowest first.
+
+    Stage entries also give `load_seconds`, the time spent in model loads
+    nested in the stage, so compute time is `seconds - load_seconds`.
+    """
+    categories = {}
+    names = {}
+    loads = [s for s in spans if s["cat"] == 'model_load']
+    for s in spans:
+        categories[s["cat"]] = round(categories.get(s["cat"], 0.0) + s["seconds"], 3)
+        entry = names.setdefault(s["name"], {
+            "cat": s["cat"], "count": 0, "errors": 0, "seconds": 0.0, "cpu_seconds": 0.0,
+            "load_seconds": 0.0, "rss_peak_mb": None, "cuda_peak_mb": None, "read_bytes": 0, "write_bytes": 0,
+        })
+        entry["count"] += 1
+        entry["errors"] += s["status"] != 'ok'
+        entry["seconds"] = round(entry["seconds"] + s["seconds"], 3)
+        entry["cpu_seconds"] = round(entry["cpu_seconds"] + s["cpu_seconds"], 3)
+        entry["rss_peak_mb"] = _max(entry["rss_peak_mb"], s["rss_peak_mb"])
+        entry["cuda_peak_mb"] = _max(entry["cuda_peak_mb"], s["cuda_peak_mb"])
+        entry["read_bytes"] += s["read_bytes"] or 0
+        entry["write_bytes"] += s["write_bytes"] or 0
+        if s["cat"] != 'model_load':
+            end = s["start"] + s["seconds"]
+            nested = sum(l["seconds"] for l in loads
+                         if l["thread"] == s["thread"] and s["start"] <= l["start"] <= end)
+            entry["load_seconds"] = round(entry["load_seconds"] + nested, 3)
+
+    return {
+        "categories": categories,
+        "spans": dict(sorted(names.items(), key=lambda item: item[1]["seconds"], reverse=True)),
+    }
+
+
+def chrome_trace(spans):
+    """Spans as Chrome trace events (chrome://tracing, ui.perfetto.dev)."""
+    pid = os.getpid()
+    events, threads = [], {}
+    for s in spans:
+        threads[s["thread"]] = s["thread_name"]
+        metrics = {key: s[key] for key in ("status", "cpu_seconds", "child_cpu_seconds", "rss_peak_mb",
+                                          "cuda_peak_mb", "read_bytes", "write_bytes")}
+        events.append({
+            "name": s["name"],
+            "cat": s["cat"],
+            "ph": "X",
+            "ts": round(s["start"] * 1e6),
+            "dur": round(s["seconds"] * 1e6),
+            "pid": pid,
+            "tid": s["thread"],
+            "args": {**metrics, **s["args"]},
+        })
+    for tid, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+    return events
+
+
+def write_trace(job, path=None):
+    """
+    Write the job's spans to `<workspace>/trace.json` as a Chrome trace, with
+    the summary under "otherData".
+
+    Returns:
+        tuple: (path, summary)
+    """
+    path = path or os.path.join(job.workspace, 'trace.json')
+    spans = list(job.spans)
+    summary = summarize(spans)
+    trace = {
+        "traceEvents": chrome_trace(spans),
+        "displayTimeUnit": "ms",
+        "otherData": {"job_id": job.job_id, "summary": summary},
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, ensure_ascii=False, default=str)
+    return path, summary
@@ -1,3 +1,4 @@
+import argparse
 import logging
 import os
 import sys
@@ -8,12 +9,34 @@ logging.basicConfig(level=logging.WARNING)  # 或 logging.ERROR
 logging.getLogger("modelscope").setLevel(logging.WARNING)
 from environment.agents.multi import MultiAgent
 from environment.config.config import config
+from environment.utils.stage_graph import configure_resources
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Agentic video generation")
+    parser.add_argument('--batch', metavar='JOBS_JSONL',
+                        help="run the jobs in this JSONL file without prompting (see environment/agents/batch.py)")
+    parser.add_argument('--jobs', type=int, default=4, help="jobs running at the same time in batch mode")
+    parser.add_argument('--gpu-workers', type=int, help="stages using the GPU at the same time")
+    parser.add_argument('--llm-workers', type=int, help="LLM-bound stages running at the same time")
+    parser.add_argument('--cpu-workers', type=int, help="CPU encode/analysis stages running at the same time")
+    parser.add_argument('--manifest', help="where to write the batch manifest")
+    return parser.parse_args()
+
 
 def main():
+    args = parse_args()
+    configure_resources(gpu=args.gpu_workers, llm=args.llm_workers, cpu=args.cpu_workers)
+
     llm_api_key = config['llm']['api_key']
     llm_base_url = config['llm']['base_url']
     multi_agent = MultiAgent(llm_api_key, llm_base_url)
-    result = multi_agent.process_request()
+    if args.batch:
+        from environment.agents.batch import run_batch
+        run_batch(multi_agent, args.batch, max_jobs=args.jobs, manifest_path=args.manifest)
+    else:
+        result = multi_agent.process_request()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
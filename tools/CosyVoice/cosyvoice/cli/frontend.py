@@ -60,6 +60,11 @@ class CosyVoiceFrontEnd:
         else:
             self.spk2info = {}
         self.allowed_special = allowed_special
+        # NOTE optional shared cache with get_or_compute(audio, feature, compute, params), see environment/utils/feature_store.py
+        self.feature_store = None
+        self.feature_params = {'campplus': os.path.basename(campplus_model),
+                               'speech_tokenizer': os.path.basename(speech_tokenizer_model),
+                               'feat_extractor': getattr(feat_extractor, 'keywords', None)}
         self.use_ttsfrd = use_ttsfrd
         if self.use_ttsfrd:
             self.frd = ttsfrd.TtsFrontendEngine()
@@ -89,7 +94,19 @@ class CosyVoiceFrontEnd:
             for i in range(text_token.shape[1]):
                 yield text_token[:, i: i + 1]
 
+    def _cached_feature(self, speech, feature, compute):
+        if self.feature_store is None:
+            return compute()
+        array = self.feature_store.get_or_compute(speech, 'cosyvoice.' + feature, lambda: compute().cpu(),
+                                                  params=self.feature_params)
+        return torch.from_numpy(np.array(array)).to(self.device)
+
     def _extract_speech_token(self, speech):
+        speech_token = self._cached_feature(speech, 'speech_token', lambda: self._compute_speech_token(speech))
+        speech_token_len = torch.tensor([speech_token.shape[1]], dtype=torch.int32).to(self.device)
+        return speech_token, speech_token_len
+
+    def _compute_speech_token(self, speech):
         assert speech.shape[1] / 16000 <= 30, 'do not support extract speech token for audio longer than 30s'
         feat = whisper.log_mel_spectrogram(speech, n_mels=128)
         speech_token = self.speech_tokenizer_session.run(None,
@@ -97,11 +114,12 @@ class CosyVoiceFrontEnd:
                                                           feat.detach().cpu().numpy(),
                                                           self.speech_tokenizer_session.get_inputs()[1].name:
                                                           np.array([feat.shape[2]], dtype=np.int32)})[0].flatten().tolist()
-        speech_token = torch.tensor([speech_token], dtype=torch.int32).to(self.device)
-        speech_token_len = torch.tensor([speech_token.shape[1]], dtype=torch.int32).to(self.device)
-        return speech_token, speech_token_len
+        return torch.tensor([speech_token], dtype=torch.int32).to(self.device)
 
     def _extract_spk_embedding(self, speech):
+        return self._cached_feature(speech, 'campplus', lambda: self._compute_spk_embedding(speech))
+
+    def _compute_spk_embedding(self, speech):
         feat = kaldi.fbank(speech,
                            num_mel_bins=80,
                            dither=0,
@@ -113,11 +131,14 @@ class CosyVoiceFrontEnd:
         return embedding
 
     def _extract_speech_feat(self, speech):
-        speech_feat = self.feat_extractor(speech).squeeze(dim=0).transpose(0, 1).to(self.device)
-        speech_feat = speech_feat.unsqueeze(dim=0)
+        speech_feat = self._cached_feature(speech, 'speech_feat', lambda: self._compute_speech_feat(speech))
         speech_feat_len = torch.tensor([speech_feat.shape[1]], dtype=torch.int32).to(self.device)
         return speech_feat, speech_feat_len
 
+    def _compute_speech_feat(self, speech):
+        speech_feat = self.feat_extractor(speech).squeeze(dim=0).transpose(0, 1).to(self.device)
+        return speech_feat.unsqueeze(dim=0)
+
     def text_normalize(self, text, split=True, text_frontend=True):
         if isinstance(text, Generator):
             logging.info('get tts_text generator, will skip text_normalize!')
@@ -154,8 +175,7 @@ class CosyVoiceFrontEnd:
         model_input = {'text': tts_text_token, 'text_len': tts_text_token_len, 'llm_embedding': embedding, 'flow_embedding': embedding}
         return model_input
 
-    def frontend_zero_shot(self, tts_text, prompt_text, prompt_speech_16k, resample_rate):
-        tts_text_token, tts_text_token_len = self._extract_text_token(tts_text)
+    def frontend_zero_shot_prompt(self, prompt_text, prompt_speech_16k, resample_rate):
         prompt_text_token, prompt_text_token_len = self._extract_text_token(prompt_text)
         prompt_speech_resample = torchaudio.transforms.Resample(orig_freq=16000, new_freq=resample_rate)(prompt_speech_16k)
         speech_feat, speech_feat_len = self._extract_speech_feat(prompt_speech_resample)
@@ -166,12 +186,19 @@ class CosyVoiceFrontEnd:
             speech_feat, speech_feat_len[:] = speech_feat[:, :2 * token_len], 2 * token_len
             speech_token, speech_token_len[:] = speech_token[:, :token_len], token_len
         embedding = self._extract_spk_embedding(prompt_speech_16k)
-        model_input = {'text': tts_text_token, 'text_len': tts_text_token_len,
-                       'prompt_text': prompt_text_token, 'prompt_text_len': prompt_text_token_len,
-                       'llm_prompt_speech_token': speech_token, 'llm_prompt_speech_token_len': speech_token_len,
-                       'flow_prompt_speech_token': speech_token, 'flow_prompt_speech_token_len': speech_token_len,
-                       'prompt_speech_feat': speech_feat, 'prompt_speech_feat_len': speech_feat_len,
-                       'llm_embedding': embedding, 'flow_embedding': embedding}
+        prompt_input = {'prompt_text': prompt_text_token, 'prompt_text_len': prompt_text_token_len,
+                        'llm_prompt_speech_token': speech_token, 'llm_prompt_speech_token_len': speech_token_len,
+                        'flow_prompt_speech_token': speech_token, 'flow_prompt_speech_token_len': speech_token_len,
+                        'prompt_speech_feat': speech_feat, 'prompt_speech_feat_len': speech_feat_len,
+                        'llm_embedding': embedding, 'flow_embedding': embedding}
+        return prompt_input
+
+    def frontend_zero_shot(self, tts_text, prompt_text, prompt_speech_16k, resample_rate, prompt_input=None):
+        # NOTE prompt_input from frontend_zero_shot_prompt lets callers reuse one prompt across many texts
+        tts_text_token, tts_text_token_len = self._extract_text_token(tts_text)
+        if prompt_input is None:
+            prompt_input = self.frontend_zero_shot_prompt(prompt_text, prompt_speech_16k, resample_rate)
+        model_input = {'text': tts_text_token, 'text_len': tts_text_token_len, **prompt_input}
         return model_input
 
     def frontend_cross_lingual(self, tts_text, prompt_speech_16k, resample_rate):
@@ -19,7 +19,7 @@ from transformers import Qwen2ForCausalLM
 from torch.nn.utils.rnn import pad_sequence, unpad_sequence
 from cosyvoice.utils.common import IGNORE_ID
 from cosyvoice.transformer.label_smoothing_loss import LabelSmoothingLoss
-from cosyvoice.utils.common import th_accuracy
+from cosyvoice.utils.common import th_accuracy, DecodedTokens
 from cosyvoice.utils.file_utils import logging
 
 
@@ -202,7 +202,7 @@ class TransformerLM(torch.nn.Module):
         max_len = int((text_len - prompt_text_len) * max_token_text_ratio)
 
         # 5. step by step decode
-        out_tokens = []
+        out_tokens = DecodedTokens(device=device)
         offset = 0
         att_cache, cnn_cache = torch.zeros((0, 0, 0, 0), device=lm_input.device), torch.zeros((0, 0, 0, 0), device=lm_input.device)
         for i in range(max_len):
@@ -316,7 +316,7 @@ class Qwen2LM(TransformerLM):
         max_len = int((text_len - prompt_text_len) * max_token_text_ratio)
 
         # 5. step by step decode
-        out_tokens = []
+        out_tokens = DecodedTokens(device=device)
         cache = None
         for i in range(max_len):
             y_pred, cache = self.llm.forward_one_step(lm_input,
@@ -358,7 +358,7 @@ class Qwen2LM(TransformerLM):
         lm_input = torch.concat([sos_eos_emb], dim=1)
 
         # 2. iterate text
-        out_tokens = []
+        out_tokens = DecodedTokens(device=device)
         cache = None
         # NOTE init prompt_text as text_cache as it is basically impossible prompt_speech_token/prompt_text < 15/5
         text_cache = self.llm.model.model.embed_tokens(prompt_text)
@@ -105,30 +105,50 @@ def init_weights(m, mean=0.0, std=0.01):
         m.weight.data.normal_(mean, std)
 
 
+class DecodedTokens(list):
+    """List of decoded speech tokens that also keeps the latest ones in an on-device ring buffer.
+
+    ras_sampling reads its repetition window from the buffer, so no tensor has to be
+    built from the python list for every generated token.
+    """
+
+    def __init__(self, device, capacity=32):
+        super().__init__()
+        self.ring = torch.full((capacity,), -1, dtype=torch.long, device=device)
+        self.offsets = torch.arange(capacity, device=device)
+
+    def append(self, token):
+        super().append(token)
+        self.ring[(len(self) - 1) % self.ring.size(0)] = token
+
+    def recent(self, win_size):
+        capacity = self.ring.size(0)
+        if win_size > capacity:
+            return torch.tensor(self[-win_size:], dtype=torch.long, device=self.ring.device)
+        # slots that were never written hold -1 and match no token
+        return self.ring[(len(self) - 1 - self.offsets[:win_size]) % capacity]
+
+
 # Repetition Aware Sampling in VALL-E 2
 def ras_sampling(weighted_scores, decoded_tokens, sampling, top_p=0.8, top_k=25, win_size=10, tau_r=0.1):
     top_ids = nucleus_sampling(weighted_scores, top_p=top_p, top_k=top_k)
-    rep_num = (torch.tensor(decoded_tokens[-win_size:]).to(weighted_scores.device) == top_ids).sum().item()
+    if isinstance(decoded_tokens, DecodedTokens):
+        recent_tokens = decoded_tokens.recent(win_size)
+    else:
+        recent_tokens = torch.tensor(decoded_tokens[-win_size:], dtype=torch.long, device=weighted_scores.device)
+    rep_num = (recent_tokens == top_ids).sum()
     if rep_num >= win_size * tau_r:
         top_ids = random_sampling(weighted_scores, decoded_tokens, sampling)
     return top_ids
 
 
 def nucleus_sampling(weighted_scores, top_p=0.8, top_k=25):
-    prob, indices = [], []
-    cum_prob = 0.0
-    sorted_value, sorted_idx = weighted_scores.softmax(dim=0).sort(descending=True, stable=True)
-    for i in range(len(sorted_idx)):
-        # sampling both top-p and numbers.
-        if cum_prob < top_p and len(prob) < top_k:
-            cum_prob += sorted_value[i]
-            prob.append(sorted_value[i])
-            indices.append(sorted_idx[i])
-        else:
-            break
-    prob = torch.tensor(prob).to(weighted_scores)
-    indices = torch.tensor(indices, dtype=torch.long).to(weighted_scores.device)
-    top_ids = indices[prob.multinomial(1, replacement=True)]
+    probs = weighted_scores.softmax(dim=0)
+    sorted_value, sorted_idx = probs.topk(min(top_k, probs.size(0)))
+    # keep a token while the probability mass before it is still below top_p
+    cum_before = sorted_value.cumsum(dim=0) - sorted_value
+    sorted_value = sorted_value.masked_fill(cum_before >= top_p, 0)
+    top_ids = sorted_idx[sorted_value.multinomial(1, replacement=True)]
     return top_ids
 
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Copyright (c) 2024 Alibaba Inc (authors: Xiang Lyu)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import time
+
+import torch
+
+from cosyvoice.utils.common import DecodedTokens, nucleus_sampling, random_sampling, ras_sampling
+
+
+def loop_nucleus_sampling(weighted_scores, top_p=0.8, top_k=25):
+    # previous element-by-element implementation, kept as the baseline
+    prob, indices = [], []
+    cum_prob = 0.0
+    sorted_value, sorted_idx = weighted_scores.softmax(dim=0).sort(descending=True, stable=True)
+    for i in range(len(sorted_idx)):
+        if cum_prob < top_p and len(prob) < top_k:
+            cum_prob += sorted_value[i]
+            prob.append(sorted_value[i])
+            indices.append(sorted_idx[i])
+        else:
+            break
+    prob = torch.tensor(prob).to(weighted_scores)
+    indices = torch.tensor(indices, dtype=torch.long).to(weighted_scores.device)
+    return indices[prob.multinomial(1, replacement=True)]
+
+
+def loop_ras_sampling(weighted_scores, decoded_tokens, sampling, top_p=0.8, top_k=25, win_size=10, tau_r=0.1):
+    top_ids = loop_nucleus_sampling(weighted_scores, top_p=top_p, top_k=top_k)
+    rep_num = (torch.tensor(decoded_tokens[-win_size:]).to(weighted_scores.device) == top_ids).sum().item()
+    if rep_num >= win_size * tau_r:
+        top_ids = random_sampling(weighted_scores, decoded_tokens, sampling)
+    return top_ids
+
+
+def run(sampling_fn, scores, decoded_tokens):
+    # mimic the llm decode loop: one .item() per token to feed the next step
+    for weighted_scores in scores:
+        top_ids = sampling_fn(weighted_scores, decoded_tokens, 25).item()
+        decoded_tokens.append(top_ids)
+
+
+def main(args):
+    device = torch.device(args.device)
+    torch.manual_seed(0)
+    scores = (torch.randn(args.num_tokens, args.vocab_size, device=device) * 3).log_softmax(dim=-1)
+
+    variants = [
+        ('loop nucleus', lambda s, d, n: loop_nucleus_sampling(s), list),
+        ('vectorized nucleus', lambda s, d, n: nucleus_sampling(s), list),
+        ('loop ras', loop_ras_sampling, list),
+        ('vectorized ras + ring buffer', ras_sampling, lambda: DecodedTokens(device=device)),
+    ]
+    print('{:<32}{:>16}'.format('variant', 'us / token'))
+    for name, sampling_fn, make_tokens in variants:
+        run(sampling_fn, scores[:10], make_tokens())
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        run(sampling_fn, scores, make_tokens())
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+        cost = (time.perf_counter() - start) / args.num_tokens * 1e6
+        print('{:<32}{:>16.1f}'.format(name, cost))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--num_tokens', type=int, default=1000)
+    parser.add_argument('--vocab_size', type=int, default=6564)
+    args = parser.parse_args()
+    main(args)
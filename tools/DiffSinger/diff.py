@@ -1,46 +1,40 @@
 import argparse
 import os
+import subprocess
 import sys
 
+DIFFSINGER_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def run_diffsinger(exp_name="0228_opencpop_ds100_rel", input_dir=""):
+
+def run_diffsinger(exp_name="0228_opencpop_ds100_rel", input_dir="", output_dir=""):
     # Parse arguments
     parser = argparse.ArgumentParser(description='Run diff singer inference')
     parser.add_argument('--exp_name', default=exp_name, type=str, help='Experiment name')
     parser.add_argument('--input_dir', default=input_dir, type=str, help='audio info')
+    parser.add_argument('--output_dir', default=output_dir, type=str, help='where to save the audio')
     args = parser.parse_args([])  # Empty list to avoid reading command line arguments
 
-    # Get current working directory
-    original_dir = os.getcwd()
-    original_sys_path = sys.path.copy()  # 保存原始sys.path
-
-    try:
-        # Change to DiffSinger directory
-        diffsinger_dir = os.path.join("tools", "DiffSinger")
-        os.chdir(diffsinger_dir)
-
-        # 添加DiffSinger目录到Python路径
-        diffsinger_abs_path = os.path.abspath('.')
-        sys.path.append(diffsinger_abs_path)
-
-        # 或者直接修改PYTHONPATH环境变量
-        os.environ["PYTHONPATH"] = diffsinger_abs_path
-
-        # 使用subprocess运行
-        import subprocess
-        cmd_parts = [
-            sys.executable,
-            "inference/svs/ds_e2e.py",
-            "--exp_name", args.exp_name,
-            "--input_dir", args.input_dir,
-        ]
-
-        process = subprocess.run(cmd_parts)
-        return_code = process.returncode
-        print(f"Process returned: {return_code}")
-        return return_code
-
-    finally:
-        # 恢复原始环境
-        os.chdir(original_dir)
-        sys.path = original_sys_path  # 恢复原始sys.path
\ No newline at end of file
+    # 相对路径仍按 DiffSinger 目录解析；子进程在该目录下运行，不切换当前进程的工作目录，
+    # 多个任务可以同时调用
+    input_dir, output_dir = args.input_dir, args.output_dir
+    if input_dir and not os.path.isabs(input_dir):
+        input_dir = os.path.normpath(os.path.join(DIFFSINGER_DIR, input_dir))
+    if output_dir and not os.path.isabs(output_dir):
+        output_dir = os.path.normpath(os.path.join(DIFFSINGER_DIR, output_dir))
+
+    env = os.environ.copy()
+    env["PYTHONPATH"] = DIFFSINGER_DIR
+
+    cmd_parts = [
+        sys.executable,
+        "inference/svs/ds_e2e.py",
+        "--exp_name", args.exp_name,
+        "--input_dir", input_dir,
+    ]
+    if output_dir:
+        cmd_parts += ["--output_dir", output_dir]
+
+    process = subprocess.run(cmd_parts, cwd=DIFFSINGER_DIR, env=env)
+    return_code = process.returncode
+    print(f"Process returned: {return_code}")
+    return return_code
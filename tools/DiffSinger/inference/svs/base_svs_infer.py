@@ -238,7 +238,8 @@ class BaseSVSInfer:
     def example_run(cls):
         from utils.audio import save_wav
         set_hparams(print_hparams=False)
-        os.makedirs('../../dataset/mad_svc/cover', exist_ok=True)
+        output_dir = os.path.join('../../', hparams['output_dir'] or 'dataset/mad_svc/cover')
+        os.makedirs(output_dir, exist_ok=True)
         input_dir = os.path.join('../../', hparams['input_dir'])
         for f_name in os.listdir(input_dir):
             f_path = os.path.join(input_dir, f_name)
@@ -248,7 +249,7 @@ class BaseSVSInfer:
             out = infer_ins.infer_once(inp)
             # os.makedirs('infer_out', exist_ok=True)
             save_name = f_name.replace('.json', '.wav')
-            save_wav(out, f'../../dataset/mad_svc/cover/{save_name}', hparams['audio_sample_rate'])
+            save_wav(out, os.path.join(output_dir, save_name), hparams['audio_sample_rate'])
 
 
 
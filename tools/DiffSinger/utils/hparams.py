@@ -31,13 +31,15 @@ def set_hparams(config='', exp_name='', hparams_str='', input_dir='', save_name=
                             help='location of the data corpus')
         parser.add_argument('--input_dir', type=str, default='',
                             help='location of the input audio')
+        parser.add_argument('--output_dir', type=str, default='',
+                            help='where to save the generated audio')
         parser.add_argument('--infer', action='store_true', help='infer')
         parser.add_argument('--validate', action='store_true', help='validate')
         parser.add_argument('--reset', action='store_true', help='reset hparams')
         parser.add_argument('--debug', action='store_true', help='debug')
         args, unknown = parser.parse_known_args()
     else:
-        args = Args(config=config, exp_name=exp_name, hparams=hparams_str, input_dir=input_dir, infer=False,
+        args = Args(config=config, exp_name=exp_name, hparams=hparams_str, input_dir=input_dir, output_dir='', infer=False,
                     validate=False, reset=False, debug=False)
     args_work_dir = ''
     if args.exp_name != '':
@@ -105,6 +107,7 @@ def set_hparams(config='', exp_name='', hparams_str='', input_dir='', save_name=
     hparams_['debug'] = args.debug
     hparams_['validate'] = args.validate
     hparams_['input_dir'] = args.input_dir
+    hparams_['output_dir'] = args.output_dir
     # hparams_['save_name'] = args.save_name
 
     global global_print_hparams
@@ -9,6 +9,7 @@ from .frequency import frequency
 from .length import length
 from .loudness_norm import loudness_norm
 from .merge_short import merge_short
+from .pipeline import pipeline
 from .resample import resample
 from .separate_audio import separate
 from .slice_audio import slice_audio, slice_audio_v2
@@ -38,6 +39,7 @@ cli.add_command(resample)
 cli.add_command(transcribe)
 cli.add_command(merge_short)
 cli.add_command(merge_lab)
+cli.add_command(pipeline)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import click
@@ -8,6 +8,9 @@ from tqdm import tqdm
 
 from fish_audio_preprocess.utils.file import AUDIO_EXTENSIONS, list_files, make_dirs
 
+# Below this many files, worker processes cost more to start than they save
+PROCESS_POOL_MIN_FILES = 64
+
 
 @click.command()
 @click.argument("input_dir", type=click.Path(exists=True, file_okay=False))
@@ -74,30 +77,39 @@ def loudness_norm(
     logger.info(f"Found {len(files)} files, normalizing loudness")
 
     skipped = 0
-
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        tasks = []
-
-        for file in tqdm(files, desc="Preparing tasks"):
-            # Get relative path to input_dir
-            relative_path = file.relative_to(input_dir)
-            new_file = output_dir / relative_path
-
-            if new_file.parent.exists() is False:
-                new_file.parent.mkdir(parents=True)
-
-            if new_file.exists() and not overwrite:
-                skipped += 1
-                continue
-
-            tasks.append(
-                executor.submit(
-                    loudness_norm_file, file, new_file, peak, loudness, block_size
-                )
-            )
-
-        for i in tqdm(as_completed(tasks), total=len(tasks), desc="Processing"):
-            assert i.exception() is None, i.exception()
+    jobs = []
+
+    for file in tqdm(files, desc="Preparing tasks"):
+        # Get relative path to input_dir
+        relative_path = file.relative_to(input_dir)
+        new_file = output_dir / relative_path
+
+        if new_file.parent.exists() is False:
+            new_file.parent.mkdir(parents=True)
+
+        if new_file.exists() and not overwrite:
+            skipped += 1
+            continue
+
+        jobs.append((file, new_file, peak, loudness, block_size))
+
+    if len(jobs) <= 1 or num_workers <= 1:
+        # nothing to parallelize, skip the pool
+        for job in tqdm(jobs, desc="Processing"):
+            loudness_norm_file(*job)
+    else:
+        # files are streamed block by block and soundfile / scipy release the GIL,
+        # so threads are enough for a handful of files
+        executor_cls = (
+            ProcessPoolExecutor
+            if len(jobs) >= PROCESS_POOL_MIN_FILES
+            else ThreadPoolExecutor
+        )
+        with executor_cls(max_workers=min(num_workers, len(jobs))) as executor:
+            tasks = [executor.submit(loudness_norm_file, *job) for job in jobs]
+
+            for i in tqdm(as_completed(tasks), total=len(tasks), desc="Processing"):
+                assert i.exception() is None, i.exception()
 
     logger.info("Done!")
     logger.info(f"Total: {len(files)}, Skipped: {skipped}")
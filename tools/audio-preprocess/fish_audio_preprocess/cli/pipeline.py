@@ -0,0 +1,91 @@
+import click
+from loguru import logger
+
+from fish_audio_preprocess.utils.pipeline import STAGES
+
+
+@click.command()
+@click.argument("input_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--recursive/--no-recursive", default=False, help="Search recursively")
+@click.option(
+    "--stage",
+    "-s",
+    multiple=True,
+    type=click.Choice(STAGES),
+    default=STAGES,
+    show_default=True,
+    help="Stages to run",
+)
+@click.option(
+    "--track", "-t", multiple=True, help="Name of track to keep", default=["vocals"]
+)
+@click.option("--model", help="Name of separation model to use", default="htdemucs")
+@click.option(
+    "--shifts", help="Number of shifts, improves separation quality a bit", default=1
+)
+@click.option("--peak", help="Peak normalize audio to N dB", default=-1.0)
+@click.option("--loudness", help="Loudness normalize audio to N dB LUFS", default=-23.0)
+@click.option(
+    "--sampling-rate",
+    "-sr",
+    help="Sampling rate to resample to",
+    default=44000,
+    show_default=True,
+    type=int,
+)
+@click.option("--mono/--no-mono", default=True, help="Resample to mono (1 channel)")
+@click.option(
+    "--model-type",
+    help="ASR model type (funasr or whisper)",
+    default="funasr",
+    show_default=True,
+)
+@click.option(
+    "--model-size",
+    help="ASR model (default iic/SenseVoiceSmall for funasr, medium for whisper)",
+    default=None,
+)
+@click.option("--lang", help="language", default="zh", show_default=True)
+def pipeline(
+    input_dir: str,
+    recursive: bool,
+    stage: list[str],
+    track: list[str],
+    model: str,
+    shifts: int,
+    peak: float,
+    loudness: float,
+    sampling_rate: int,
+    mono: bool,
+    model_type: str,
+    model_size: str,
+    lang: str,
+):
+    """
+    Separate, loudness normalize, resample and transcribe audio in input_dir in place,
+    decoding and writing each file once.
+    """
+
+    from fish_audio_preprocess.utils.pipeline import PreprocessPipeline
+
+    runner = PreprocessPipeline(
+        stages=stage,
+        track=track,
+        demucs_model=model,
+        shifts=shifts,
+        peak=peak,
+        loudness=loudness,
+        sampling_rate=sampling_rate,
+        mono=mono,
+        asr_model_type=model_type,
+        asr_model_size=model_size,
+        lang=lang,
+    )
+    results = runner.process_dir(input_dir, recursive=recursive)
+
+    logger.info("Done!")
+    logger.info(f"Total: {len(results)}")
+
+
+if __name__ == "__main__":
+    pipeline()
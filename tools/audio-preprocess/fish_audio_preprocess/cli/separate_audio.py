@@ -1,6 +1,6 @@
 import multiprocessing as mp
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 import click
 from loguru import logger
@@ -21,15 +21,21 @@ def worker(
     model: str,
     shifts: int,
     device: "torch.device",
+    streaming: bool = True,
+    window: float = 60.0,
+    overlap: float = 5.0,
+    num_threads: Optional[int] = None,
     shard_idx: int = -1,
     total_shards: int = 1,
 ):
     from fish_audio_preprocess.utils.separate_audio import (
+        can_stream,
         init_model,
         load_track,
         merge_tracks,
         save_audio,
         separate_audio,
+        separate_file_streaming,
     )
 
     files = list_files(input_dir, extensions=AUDIO_EXTENSIONS, recursive=recursive)
@@ -60,6 +66,19 @@ def worker(
             skipped += 1
             continue
 
+        if streaming and can_stream(file):
+            separate_file_streaming(
+                _model,
+                file,
+                new_file,
+                track,
+                shifts=shifts,
+                window=window,
+                overlap=overlap,
+                num_threads=num_threads,
+            )
+            continue
+
         source = load_track(_model, file)
         separated = separate_audio(_model, source, shifts=shifts, num_workers=0)
         merged = merge_tracks(separated, track)
@@ -88,6 +107,27 @@ def worker(
     "--shifts", help="Number of shifts, improves separation quality a bit", default=1
 )
 @click.option("--num_workers_per_gpu", help="Number of workers per GPU", default=2)
+@click.option(
+    "--streaming/--no-streaming",
+    default=True,
+    help="Separate in overlapping windows with constant memory, "
+    "falls back to loading the whole track for formats soundfile can't read",
+)
+@click.option(
+    "--window", help="Window length in seconds (streaming)", default=60.0, type=float
+)
+@click.option(
+    "--overlap",
+    help="Overlap between windows in seconds (streaming)",
+    default=5.0,
+    type=float,
+)
+@click.option(
+    "--num-threads",
+    help="Windows separated in parallel on CPU (streaming), defaults to min(4, cores)",
+    default=None,
+    type=int,
+)
 def separate(
     input_dir: str,
     output_dir: str,
@@ -98,6 +138,10 @@ def separate(
     model: str,
     shifts: int,
     num_workers_per_gpu: int,
+    streaming: bool,
+    window: float,
+    overlap: float,
+    num_threads: Optional[int],
 ):
     """
     Separates audio in input_dir using model and saves to output_dir.
@@ -136,6 +180,10 @@ def separate(
                 args=(
                     *base_args,
                     torch.device(f"cuda:{shard_idx % torch.cuda.device_count()}"),
+                    streaming,
+                    window,
+                    overlap,
+                    num_threads,
                     shard_idx,
                     shards,
                 ),
@@ -151,6 +199,10 @@ def separate(
     worker(
         *base_args,
         torch.device("cuda" if torch.cuda.is_available() else "cpu"),
+        streaming,
+        window,
+        overlap,
+        num_threads,
     )
 
 
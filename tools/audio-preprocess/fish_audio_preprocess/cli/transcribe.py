@@ -7,7 +7,11 @@ from loguru import logger
 from tqdm import tqdm
 
 from fish_audio_preprocess.utils.file import AUDIO_EXTENSIONS, list_files, split_list
-from fish_audio_preprocess.utils.transcribe import ASRModelType, batch_transcribe
+from fish_audio_preprocess.utils.transcribe import (
+    DEFAULT_CACHE_FILE,
+    ASRModelType,
+    batch_transcribe,
+)
 
 
 def replace_lastest(string, old, new):
@@ -58,8 +62,21 @@ def replace_lastest(string, old, new):
 @click.option(
     "--batch-size",
     help="batch size (whisper only), 1 for not batched model",
-    default="float16",
+    default=1,
+    show_default=True,
+    type=int,
+)
+@click.option(
+    "--batch-size-s",
+    help="maximum seconds of audio per batch when batching short files (funasr only)",
+    default=300,
     show_default=True,
+    type=float,
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help=f"Reuse transcriptions of unchanged audio, cached in {DEFAULT_CACHE_FILE}",
 )
 def transcribe(
     input_dir: str,
@@ -70,6 +87,8 @@ def transcribe(
     model_type: ASRModelType,
     compute_type: str,
     batch_size: int,
+    batch_size_s: float,
+    cache: bool,
 ):
     """
     Transcribe audio files in a directory.
@@ -101,33 +120,38 @@ def transcribe(
         logger.error(f"No audio files found in {input_dir}.")
         return
 
-    # 按照 num workers 切块
-    chunks = split_list(audio_files, num_workers)
+    kwargs = dict(
+        model_size=model_size,
+        model_type=model_type,
+        lang=lang,
+        compute_type=compute_type,
+        batch_size=batch_size,
+        batch_size_s=batch_size_s,
+        cache_file=DEFAULT_CACHE_FILE if cache else None,
+    )
+
+    if num_workers <= 1:
+        # 单进程: 一个模型处理所有文件, 短音频分桶批量识别
+        results = batch_transcribe(files=audio_files, pos=0, **kwargs)
+    else:
+        # 按照 num workers 切块
+        chunks = split_list(audio_files, num_workers)
 
-    with ProcessPoolExecutor(mp_context=mp.get_context("spawn")) as executor:
-        tasks = []
-        for chunk in chunks:
-            tasks.append(
-                executor.submit(
-                    batch_transcribe,
-                    files=chunk,
-                    model_size=model_size,
-                    model_type=model_type,
-                    lang=lang,
-                    pos=len(tasks),
-                    compute_type=compute_type,
-                    batch_size=batch_size,
+        with ProcessPoolExecutor(mp_context=mp.get_context("spawn")) as executor:
+            tasks = []
+            for chunk in chunks:
+                tasks.append(
+                    executor.submit(
+                        batch_transcribe, files=chunk, pos=len(tasks), **kwargs
+                    )
                 )
-            )
-        results = {}
-        for task in tasks:
-            ret = task.result()
-            for res in ret.keys():
-                results[res] = ret[res]
+            results = {}
+            for task in tasks:
+                results.update(task.result())
 
-        logger.info("Output to .lab file")
-        for file in tqdm(results.keys()):
-            path = replace_lastest(file, ".wav", ".lab")
-            # logger.info(path)
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(results[file])
+    logger.info("Output to .lab file")
+    for file in tqdm(results.keys()):
+        path = replace_lastest(file, ".wav", ".lab")
+        # logger.info(path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(results[file])
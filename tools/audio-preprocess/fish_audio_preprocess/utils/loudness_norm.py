@@ -1,9 +1,205 @@
+import math
+import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Union
 
 import numpy as np
-import pyloudnorm as pyln
 import soundfile as sf
+from scipy.signal import sosfilt
+
+# BS.1770-4 channel weights (L, R, C, Ls, Rs)
+CHANNEL_WEIGHTS = (1.0, 1.0, 1.0, 1.41, 1.41)
+ABSOLUTE_GATE = -70.0
+BLOCK_OVERLAP = 0.75
+
+
+def _biquad(filter_type: str, gain: float, q: float, fc: float, rate: int) -> list:
+    """RBJ cookbook biquad as a normalized second-order section, as in pyloudnorm."""
+
+    A = 10 ** (gain / 40.0)
+    w0 = 2.0 * math.pi * (fc / rate)
+    alpha = math.sin(w0) / (2.0 * q)
+    cos_w0 = math.cos(w0)
+
+    if filter_type == "high_shelf":
+        b0 = A * ((A + 1) + (A - 1) * cos_w0 + 2 * math.sqrt(A) * alpha)
+        b1 = -2 * A * ((A - 1) + (A + 1) * cos_w0)
+        b2 = A * ((A + 1) + (A - 1) * cos_w0 - 2 * math.sqrt(A) * alpha)
+        a0 = (A + 1) - (A - 1) * cos_w0 + 2 * math.sqrt(A) * alpha
+        a1 = 2 * ((A - 1) - (A + 1) * cos_w0)
+        a2 = (A + 1) - (A - 1) * cos_w0 - 2 * math.sqrt(A) * alpha
+    elif filter_type == "high_pass":
+        b0 = (1 + cos_w0) / 2
+        b1 = -(1 + cos_w0)
+        b2 = (1 + cos_w0) / 2
+        a0 = 1 + alpha
+        a1 = -2 * cos_w0
+        a2 = 1 - alpha
+    else:
+        raise ValueError(f"Unsupported filter type: {filter_type}")
+
+    return [b0 / a0, b1 / a0, b2 / a0, 1.0, a1 / a0, a2 / a0]
+
+
+@lru_cache(maxsize=None)
+def k_weighting(rate: int) -> np.ndarray:
+    """
+    K-weighting filter (pre-filter and RLB high pass) for a sample rate
+
+    Args:
+        rate: sample rate
+
+    Returns:
+        second-order sections for scipy.signal.sosfilt
+    """
+
+    return np.array(
+        [
+            _biquad("high_shelf", 4.0, 1 / np.sqrt(2), 1500.0, rate),
+            _biquad("high_pass", 0.0, 0.5, 38.0, rate),
+        ]
+    )
+
+
+class LoudnessMeter:
+    """
+    Streaming integrated loudness meter (ITU-R BS.1770-4)
+
+    Gives the same result as pyloudnorm.Meter with K-weighting, but takes
+    the audio block by block: each block is filtered with the cached
+    K-weighting sections for all channels at once, and only the running
+    energy at the gating block boundaries is kept.
+    """
+
+    def __init__(
+        self, rate: int, channels: int, num_samples: int, block_size: float = 0.400
+    ):
+        """
+        Args:
+            rate: sample rate
+            channels: number of channels
+            num_samples: total number of samples per channel that will be fed
+            block_size: gating block size in seconds. Defaults to 0.400. (400 ms)
+        """
+
+        if channels > len(CHANNEL_WEIGHTS):
+            raise ValueError(f"Audio must have at most {len(CHANNEL_WEIGHTS)} channels.")
+        if num_samples < block_size * rate:
+            raise ValueError("Audio must have length greater than the block size.")
+
+        self.rate = rate
+        self.block_size = block_size
+        self.sos = k_weighting(rate)
+        self.zi = np.zeros((self.sos.shape[0], 2, channels))
+        self.peak = 0.0
+
+        step = 1.0 - BLOCK_OVERLAP
+        duration = num_samples / rate
+        num_blocks = int(np.round((duration - block_size) / (block_size * step))) + 1
+        j = np.arange(num_blocks)
+        self.lower = np.minimum(
+            (block_size * (j * step) * rate).astype(np.int64), num_samples
+        )
+        self.upper = np.minimum(
+            (block_size * (j * step + 1) * rate).astype(np.int64), num_samples
+        )
+
+        # cumulative energy before each block boundary
+        self.bounds = np.unique(np.concatenate([self.lower, self.upper]))
+        self.energy = np.zeros((len(self.bounds), channels))
+        self.total = np.zeros(channels)
+        self.position = 0
+        self.next_bound = 0
+
+    def update(self, block: np.ndarray) -> None:
+        """
+        Feed the next samples
+
+        Args:
+            block: (samples, channels) or (samples,) audio
+        """
+
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block[:, None]
+        if len(block) == 0:
+            return
+
+        self.peak = max(self.peak, float(np.abs(block).max()))
+        filtered, self.zi = sosfilt(self.sos, block, axis=0, zi=self.zi)
+
+        cumulative = np.empty((len(block) + 1, block.shape[1]))
+        cumulative[0] = self.total
+        np.cumsum(np.square(filtered), axis=0, out=cumulative[1:])
+        cumulative[1:] += self.total
+
+        start, stop = self.position, self.position + len(block)
+        end_bound = np.searchsorted(self.bounds, stop, side="right")
+        bounds = self.bounds[self.next_bound : end_bound]
+        self.energy[self.next_bound : end_bound] = cumulative[bounds - start]
+
+        self.next_bound = end_bound
+        self.total = cumulative[-1]
+        self.position = stop
+
+    def block_energies(self) -> np.ndarray:
+        """Mean square of each gating block, shape (channels, blocks)."""
+        lower = np.searchsorted(self.bounds, self.lower)
+        upper = np.searchsorted(self.bounds, self.upper)
+        z = (self.energy[upper] - self.energy[lower]) / (self.block_size * self.rate)
+        return z.T
+
+    def integrated_loudness(self, gain: float = 1.0) -> float:
+        """
+        Integrated loudness of everything fed so far
+
+        Args:
+            gain: linear gain applied to the audio before gating
+
+        Returns:
+            loudness in LUFS
+        """
+
+        z = self.block_energies() * gain**2
+        weights = np.array(CHANNEL_WEIGHTS[: z.shape[0]])
+
+        with np.errstate(divide="ignore"):
+            block_loudness = -0.691 + 10.0 * np.log10(weights @ z)
+
+            gated = block_loudness >= ABSOLUTE_GATE
+            if not gated.any():
+                return -np.inf
+            relative_gate = (
+                -0.691 + 10.0 * np.log10(weights @ z[:, gated].mean(axis=1)) - 10.0
+            )
+
+            gated &= block_loudness > relative_gate
+            if not gated.any():
+                return -np.inf
+            return -0.691 + 10.0 * np.log10(weights @ z[:, gated].mean(axis=1))
+
+    def normalize_gain(self, peak=-1.0, loudness=-23.0) -> float:
+        """
+        Gain of peak normalization to [peak] dB followed by loudness normalization
+
+        Args:
+            peak: peak normalize audio to N dB. Defaults to -1.0.
+            loudness: loudness normalize audio to N dB LUFS. Defaults to -23.0.
+
+        Returns:
+            linear gain, 1.0 for silent audio
+        """
+
+        if self.peak == 0:
+            return 1.0
+
+        peak_gain = 10.0 ** (peak / 20.0) / self.peak
+        measured = self.integrated_loudness(peak_gain)
+        if not np.isfinite(measured):
+            return peak_gain
+
+        return peak_gain * 10.0 ** ((loudness - measured) / 20.0)
 
 
 def loudness_norm(
@@ -23,14 +219,12 @@ def loudness_norm(
         loudness normalized audio
     """
 
-    # peak normalize audio to [peak] dB
-    audio = pyln.normalize.peak(audio, peak)
-
-    # measure the loudness first
-    meter = pyln.Meter(rate, block_size=block_size)  # create BS.1770 meter
-    _loudness = meter.integrated_loudness(audio)
+    channels = audio.shape[1] if audio.ndim > 1 else 1
+    meter = LoudnessMeter(rate, channels, audio.shape[0], block_size)
+    for start in range(0, audio.shape[0], 1 << 18):
+        meter.update(audio[start : start + (1 << 18)])
 
-    return pyln.normalize.loudness(audio, _loudness, loudness)
+    return audio * meter.normalize_gain(peak, loudness)
 
 
 def loudness_norm_file(
@@ -39,23 +233,46 @@ def loudness_norm_file(
     peak=-1.0,
     loudness=-23.0,
     block_size=0.400,
+    block_frames: int = 1 << 18,
 ) -> None:
     """
     Perform loudness normalization (ITU-R BS.1770-4) on audio files.
 
+    The file is read twice block by block, once to measure and once to
+    write the gained audio, so memory does not grow with its length.
+    input_file may be output_file.
+
     Args:
         input_file: input audio file
         output_file: output audio file
         peak: peak normalize audio to N dB. Defaults to -1.0.
         loudness: loudness normalize audio to N dB LUFS. Defaults to -23.0.
         block_size: block size for loudness measurement. Defaults to 0.400. (400 ms)
+        block_frames: frames read at a time
     """
 
     # Thanks to .against's feedback
     # https://github.com/librosa/librosa/issues/1236
 
-    input_file, output_file = str(input_file), str(output_file)
+    output_file = Path(output_file)
+    tmp_file = output_file.with_name(f".{output_file.stem}.tmp{output_file.suffix}")
+
+    with sf.SoundFile(str(input_file)) as f:
+        meter = LoudnessMeter(f.samplerate, f.channels, f.frames, block_size)
+        for block in f.blocks(blocksize=block_frames, dtype="float64", always_2d=True):
+            meter.update(block)
+        gain = meter.normalize_gain(peak, loudness)
+
+        f.seek(0)
+        try:
+            with sf.SoundFile(str(tmp_file), "w", f.samplerate, f.channels) as out:
+                for block in f.blocks(
+                    blocksize=block_frames, dtype="float64", always_2d=True
+                ):
+                    out.write(block * gain)
+        except BaseException:
+            if tmp_file.exists():
+                tmp_file.unlink()
+            raise
 
-    audio, rate = sf.read(input_file)
-    audio = loudness_norm(audio, rate, peak, loudness, block_size)
-    sf.write(output_file, audio, rate)
+    os.replace(tmp_file, output_file)
@@ -0,0 +1,471 @@
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence, Union
+
+import numpy as np
+import soundfile as sf
+from loguru import logger
+
+from fish_audio_preprocess.utils.file import AUDIO_EXTENSIONS, list_files
+from fish_audio_preprocess.utils.loudness_norm import loudness_norm
+from fish_audio_preprocess.utils.transcribe import (
+    ASR_SAMPLING_RATE,
+    DEFAULT_CACHE_FILE,
+    ASRModelType,
+    BatchTranscriber,
+)
+
+STAGES = ("separate", "loudness_norm", "resample", "transcribe")
+AUDIO_STAGES = ("separate", "loudness_norm", "resample")
+
+Slicer = Callable[[np.ndarray, int], Iterable[dict]]
+
+
+def write_audio(path: Union[str, Path], audio: np.ndarray, rate: int) -> None:
+    """
+    Write a (channels, samples) or (samples,) waveform
+
+    Args:
+        path: Output path
+        audio: The audio
+        rate: Sample rate
+    """
+
+    sf.write(str(path), audio.T if audio.ndim == 2 else audio, rate)
+
+
+class PreprocessPipeline:
+    """
+    In-memory separate -> loudness norm -> resample -> slice -> transcribe.
+
+    This is the same chain as running `fap separate`, `fap loudness-norm`,
+    `fap resample` and `fap transcribe` one after the other, but every file is
+    decoded once, each stage works on the waveform in memory and the result is
+    written once. The demucs and ASR models are loaded on first use and kept
+    by the pipeline, so they are shared by every file it processes.
+    Transcription is deferred: the 16kHz waveforms of a file's slices, or of
+    every file in a directory, are transcribed together by a BatchTranscriber
+    and the .lab files written at the end.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[str] = STAGES,
+        track: Sequence[str] = ("vocals",),
+        demucs_model: str = "htdemucs",
+        shifts: int = 1,
+        peak: float = -1.0,
+        loudness: float = -23.0,
+        block_size: float = 0.400,
+        sampling_rate: int = 44000,
+        mono: bool = True,
+        asr_model_type: ASRModelType = "funasr",
+        asr_model_size: Optional[str] = None,
+        lang: str = "zh",
+        compute_type: str = "float16",
+        transcript_cache: Optional[Union[str, Path]] = DEFAULT_CACHE_FILE,
+        max_pending_seconds: float = 1800.0,
+        device: Optional[str] = None,
+    ):
+        """
+        Args:
+            stages: Stages to run by default, a subset of STAGES
+            track: Tracks to keep after separation
+            demucs_model: Name of the demucs model
+            shifts: Number of shifts for separation
+            peak: Peak normalize audio to N dB
+            loudness: Loudness normalize audio to N dB LUFS
+            block_size: Block size for loudness measurement
+            sampling_rate: Sampling rate to resample to
+            mono: Resample to mono (1 channel)
+            asr_model_type: funasr or whisper
+            asr_model_size: ASR model, defaults to iic/SenseVoiceSmall for funasr
+                and medium for whisper
+            lang: Transcription language
+            compute_type: Compute type (whisper only)
+            transcript_cache: Transcript cache file, None to keep it in memory only
+            max_pending_seconds: Transcribe a directory's pending audio once this
+                much has accumulated, bounding the memory it holds
+            device: Device for the demucs model, defaults to cuda when available
+        """
+
+        self.stages = self._check_stages(stages)
+        self.track = list(track)
+        self.demucs_model = demucs_model
+        self.shifts = shifts
+        self.peak = peak
+        self.loudness = loudness
+        self.block_size = block_size
+        self.sampling_rate = sampling_rate
+        self.mono = mono
+        self.asr_model_type = asr_model_type
+        if asr_model_size is None:
+            asr_model_size = (
+                "iic/SenseVoiceSmall" if asr_model_type == "funasr" else "medium"
+            )
+        self.asr_model_size = asr_model_size
+        self.lang = lang
+        self.compute_type = compute_type
+        self.max_pending_seconds = max_pending_seconds
+        self.device = device
+
+        self._demucs = None
+        self._transcriber = BatchTranscriber(
+            asr_model_size,
+            asr_model_type,
+            lang,
+            compute_type=compute_type,
+            cache_file=transcript_cache,
+        )
+        self._lock = threading.Lock()
+        self._asr_lock = threading.Lock()
+
+    @staticmethod
+    def _check_stages(stages: Sequence[str]) -> tuple[str, ...]:
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)}")
+        return tuple(stages)
+
+    @property
+    def demucs(self):
+        """The separation model, loaded on first use."""
+        with self._lock:
+            if self._demucs is None:
+                import torch
+
+                from fish_audio_preprocess.utils.separate_audio import init_model
+
+                device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+                self._demucs = init_model(self.demucs_model, device)
+            return self._demucs
+
+    @property
+    def transcriber(self) -> BatchTranscriber:
+        """The batch transcriber, its model is loaded on first use."""
+        return self._transcriber
+
+    def load(self, path: Union[str, Path]) -> tuple[np.ndarray, int]:
+        """
+        Decode an audio file at its own sample rate
+
+        Args:
+            path: Audio file
+
+        Returns:
+            (channels, samples) float32 audio, sample rate
+        """
+
+        import librosa
+
+        audio, rate = librosa.load(str(path), sr=None, mono=False)
+        return np.atleast_2d(audio), rate
+
+    def separate(self, audio: np.ndarray, rate: int) -> tuple[np.ndarray, int]:
+        """
+        Keep `track` of the demucs separation
+
+        Args:
+            audio: (channels, samples) audio
+            rate: Sample rate
+
+        Returns:
+            Separated audio at the model's sample rate, sample rate
+        """
+
+        import torch
+        from demucs.audio import convert_audio, prevent_clip
+
+        from fish_audio_preprocess.utils.separate_audio import (
+            merge_tracks,
+            separate_audio,
+        )
+
+        model = self.demucs
+        wav = torch.from_numpy(np.atleast_2d(audio)).float()
+        wav = convert_audio(wav, rate, model.samplerate, model.audio_channels)
+
+        with torch.no_grad():
+            tracks = separate_audio(model, wav, shifts=self.shifts, num_workers=0)
+        merged = merge_tracks(tracks, self.track)
+
+        # same clipping as save_audio, without the round trip through a 16 bit file
+        merged = prevent_clip(merged.cpu(), mode="rescale")
+        return merged.numpy(), model.samplerate
+
+    def loudness_norm(self, audio: np.ndarray, rate: int) -> tuple[np.ndarray, int]:
+        """
+        Loudness normalize the audio (ITU-R BS.1770-4)
+
+        Args:
+            audio: (channels, samples) or (samples,) audio
+            rate: Sample rate
+
+        Returns:
+            Normalized audio, sample rate
+        """
+
+        # the meter expects (samples, channels)
+        normed = loudness_norm(audio.T, rate, self.peak, self.loudness, self.block_size)
+        return np.ascontiguousarray(normed.T, dtype=np.float32), rate
+
+    def resample(self, audio: np.ndarray, rate: int) -> tuple[np.ndarray, int]:
+        """
+        Downmix to mono and resample to `sampling_rate`, like `fap resample`
+
+        Args:
+            audio: (channels, samples) or (samples,) audio
+            rate: Sample rate
+
+        Returns:
+            Resampled audio, sample rate
+        """
+
+        import librosa
+
+        if self.mono and audio.ndim == 2:
+            audio = librosa.to_mono(audio)
+        if rate != self.sampling_rate:
+            audio = librosa.resample(
+                audio, orig_sr=rate, target_sr=self.sampling_rate
+            )
+        return audio, self.sampling_rate
+
+    @staticmethod
+    def asr_input(audio: np.ndarray, rate: int) -> np.ndarray:
+        """
+        Downmix and resample a waveform for the ASR model
+
+        Args:
+            audio: (channels, samples) or (samples,) audio
+            rate: Sample rate
+
+        Returns:
+            16kHz mono float32 audio
+        """
+
+        import librosa
+
+        if audio.ndim == 2:
+            audio = librosa.to_mono(audio)
+        if rate != ASR_SAMPLING_RATE:
+            audio = librosa.resample(audio, orig_sr=rate, target_sr=ASR_SAMPLING_RATE)
+        return np.ascontiguousarray(audio, dtype=np.float32)
+
+    def transcribe(self, audio: np.ndarray, rate: int) -> str:
+        """
+        Transcribe a waveform
+
+        Args:
+            audio: (channels, samples) or (samples,) audio
+            rate: Sample rate
+
+        Returns:
+            The transcription
+        """
+
+        audio = self.asr_input(audio, rate)
+        with self._asr_lock:
+            return self.transcriber.transcribe({"audio": audio})["audio"]
+
+    def transcribe_pending(self, pending: dict[str, np.ndarray]) -> dict[str, str]:
+        """
+        Transcribe queued waveforms in batches, write their .lab files and clear the queue
+
+        Args:
+            pending: {.lab path: 16kHz mono audio}, as filled by process_file
+
+        Returns:
+            {.lab path: transcription}
+        """
+
+        with self._asr_lock:
+            results = self.transcriber.transcribe(pending)
+
+        for lab_path, text in results.items():
+            Path(lab_path).write_text(text, encoding="utf-8")
+        pending.clear()
+        return results
+
+    def process(
+        self,
+        audio: np.ndarray,
+        rate: int,
+        stages: Optional[Sequence[str]] = None,
+    ) -> tuple[np.ndarray, int]:
+        """
+        Run the audio stages (everything but transcribe) in memory
+
+        Args:
+            audio: (channels, samples) or (samples,) audio
+            rate: Sample rate
+            stages: Stages to run, defaults to the pipeline's stages
+
+        Returns:
+            Processed audio, sample rate
+        """
+
+        stages = self.stages if stages is None else self._check_stages(stages)
+        for stage in AUDIO_STAGES:
+            if stage in stages:
+                audio, rate = getattr(self, stage)(audio, rate)
+        return audio, rate
+
+    def process_file(
+        self,
+        input_file: Union[str, Path],
+        output_file: Optional[Union[str, Path]] = None,
+        stages: Optional[Sequence[str]] = None,
+        slicer: Optional[Slicer] = None,
+        slice_dir: Optional[Union[str, Path]] = None,
+        pending: Optional[dict[str, np.ndarray]] = None,
+    ) -> dict:
+        """
+        Process one file: decode, run the stages, write the result once
+
+        The transcription is written next to the output as a .lab file. With
+        a slicer, the processed audio is also cut into slice_dir as
+        0000.wav, 0001.wav, ... with a metadata.json, and each slice is
+        transcribed from memory. The file and its slices are transcribed in
+        one batch, unless `pending` is given.
+
+        Args:
+            input_file: Audio file
+            output_file: Where to write the processed audio, defaults to overwriting input_file
+            stages: Stages to run, defaults to the pipeline's stages
+            slicer: Called with ((channels, samples) audio, rate), yields dicts with
+                "audio", "start" and "end" (seconds)
+            slice_dir: Output directory for the slices
+            pending: Queue the audio to transcribe here instead, for the caller
+                to pass to transcribe_pending later
+
+        Returns:
+            dict with "file", "lab" and "text" (None when not transcribed or
+            queued) and, when sliced, "slices"
+        """
+
+        stages = self.stages if stages is None else self._check_stages(stages)
+        input_file = Path(input_file)
+        output_file = input_file if output_file is None else Path(output_file)
+
+        audio, rate = self.load(input_file)
+        audio, rate = self.process(audio, rate, stages)
+
+        # transcribe only: the audio is unchanged, don't rewrite it in place
+        if output_file != input_file or any(s in stages for s in AUDIO_STAGES):
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            write_audio(output_file, audio, rate)
+
+        queue = {} if pending is None else pending
+        result = {"file": str(output_file), "lab": None, "text": None}
+        if "transcribe" in stages:
+            result["lab"] = str(output_file.with_suffix(".lab"))
+            queue[result["lab"]] = self.asr_input(audio, rate)
+
+        if slicer is not None:
+            result["slices"] = self.slice(audio, rate, slicer, slice_dir, stages, queue)
+
+        if pending is None and queue:
+            result["text"] = self.transcribe_pending(queue).get(result["lab"])
+
+        return result
+
+    def slice(
+        self,
+        audio: np.ndarray,
+        rate: int,
+        slicer: Slicer,
+        slice_dir: Union[str, Path],
+        stages: Optional[Sequence[str]] = None,
+        pending: Optional[dict[str, np.ndarray]] = None,
+    ) -> list[dict]:
+        """
+        Cut processed audio into slice_dir and queue each slice for transcription
+
+        Args:
+            audio: (channels, samples) or (samples,) audio
+            rate: Sample rate
+            slicer: Called with ((channels, samples) audio, rate), yields dicts with
+                "audio", "start" and "end" (seconds)
+            slice_dir: Output directory for the slices
+            stages: Transcribes the slices when it contains "transcribe"
+            pending: Queue for the slices' audio, transcribed right away when None
+
+        Returns:
+            Slice metadata, as saved to slice_dir/metadata.json
+        """
+
+        stages = self.stages if stages is None else stages
+        queue = {} if pending is None else pending
+        slice_dir = Path(slice_dir)
+        slice_dir.mkdir(parents=True, exist_ok=True)
+
+        metadata = []
+        for idx, chunk in enumerate(slicer(np.atleast_2d(audio), rate)):
+            chunk_audio = chunk["audio"]
+            path = slice_dir / f"{idx:04d}.wav"
+            write_audio(path, chunk_audio, rate)
+
+            if "transcribe" in stages:
+                queue[str(path.with_suffix(".lab"))] = self.asr_input(chunk_audio, rate)
+
+            metadata.append(
+                {
+                    "file": path.name,
+                    "start": round(chunk["start"], 3),
+                    "end": round(chunk["end"], 3),
+                    "duration": round(chunk["end"] - chunk["start"], 3),
+                    "samples": chunk_audio.shape[-1],
+                    "channels": chunk_audio.shape[0] if chunk_audio.ndim > 1 else 1,
+                }
+            )
+
+        with open(slice_dir / "metadata.json", "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        logger.info(f"Sliced into {len(metadata)} segments in {slice_dir}")
+        if pending is None and queue:
+            self.transcribe_pending(queue)
+        return metadata
+
+    def process_dir(
+        self,
+        input_dir: Union[str, Path],
+        recursive: bool = False,
+        stages: Optional[Sequence[str]] = None,
+    ) -> dict[str, Optional[str]]:
+        """
+        Process every audio file in a directory in place
+
+        Args:
+            input_dir: Directory to process
+            recursive: Search recursively
+            stages: Stages to run, defaults to the pipeline's stages
+
+        Returns:
+            {file: transcription or None}
+        """
+
+        files = list_files(input_dir, extensions=AUDIO_EXTENSIONS, recursive=recursive)
+        logger.info(f"Found {len(files)} files in {input_dir}")
+
+        results, labs, pending = {}, {}, {}
+
+        def _flush():
+            for lab_path, text in self.transcribe_pending(pending).items():
+                results[labs[lab_path]] = text
+
+        for file in files:
+            result = self.process_file(file, stages=stages, pending=pending)
+            results[result["file"]] = None
+            if result["lab"] is not None:
+                labs[result["lab"]] = result["file"]
+
+            queued = sum(len(audio) for audio in pending.values()) / ASR_SAMPLING_RATE
+            if queued > self.max_pending_seconds:
+                _flush()
+
+        if pending:
+            _flush()
+        return results
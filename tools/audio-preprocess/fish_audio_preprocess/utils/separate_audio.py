@@ -1,6 +1,12 @@
+import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 
+import numpy as np
+import soundfile as sf
 import torch
 from demucs.apply import BagOfModels, apply_model
 from demucs.audio import save_audio as _save_audio
@@ -74,6 +80,7 @@ def separate_audio(
     shifts: int = 1,
     num_workers: int = 0,
     progress: bool = False,
+    stats: Optional[tuple[float, float, float]] = None,
 ) -> dict[str, torch.Tensor]:
     """
     Separate audio into sources
@@ -84,6 +91,9 @@ def separate_audio(
         shifts: Run the model N times, larger values will increase the quality but also the time
         num_workers: Number of workers to use
         progress: Show progress bar
+        stats: (mean, std) of the mono mix and std of the audio used for normalization,
+            defaults to the statistics of `audio`. Pass the whole track's statistics
+            (see track_stats) when separating a window of a longer track.
 
     Returns:
         The separated tracks
@@ -91,8 +101,12 @@ def separate_audio(
 
     device = next(model.parameters()).device
 
-    ref = audio.mean(0)
-    audio = (audio - ref.mean()) / audio.std()
+    if stats is None:
+        ref = audio.mean(0)
+        stats = (ref.mean(), ref.std(), audio.std())
+    ref_mean, ref_std, audio_std = stats
+
+    audio = (audio - ref_mean) / audio_std
 
     sources = apply_model(
         model,
@@ -105,7 +119,7 @@ def separate_audio(
         num_workers=num_workers,
     )[0]
 
-    sources = sources * ref.std() + ref.mean()
+    sources = sources * ref_std + ref_mean
 
     return dict(zip(model.sources, sources))
 
@@ -161,6 +175,222 @@ def merge_tracks(
     return merged
 
 
+def can_stream(path: Union[str, Path]) -> bool:
+    """
+    Whether the file can be read in windows with soundfile
+
+    Args:
+        path: Path to the audio file
+
+    Returns:
+        True if soundfile can seek in the file
+    """
+
+    try:
+        info = sf.info(str(path))
+    except RuntimeError:
+        return False
+    return info.frames > 0
+
+
+def _read_block(f: sf.SoundFile, frames: int, channels: int) -> np.ndarray:
+    """Read up to `frames` frames as (frames, channels), converting channels like demucs."""
+
+    block = f.read(frames, dtype="float32", always_2d=True)
+    if block.shape[1] == channels:
+        return block
+    if channels == 1:
+        return block.mean(1, keepdims=True)
+    if block.shape[1] == 1:
+        return np.repeat(block, channels, axis=1)
+    return block[:, :channels]
+
+
+def track_stats(
+    path: Union[str, Path],
+    channels: int,
+    block_frames: int = 1 << 20,
+) -> tuple[float, float, float]:
+    """
+    Normalization statistics of a whole track, computed block by block
+
+    Args:
+        path: Path to the audio file
+        channels: Number of channels the model expects
+        block_frames: Frames read at a time
+
+    Returns:
+        (mean, std) of the mono mix and std of the audio, as used by separate_audio
+    """
+
+    n = 0
+    ref_sum = ref_sq = audio_sum = audio_sq = 0.0
+
+    with sf.SoundFile(str(path)) as f:
+        while True:
+            block = _read_block(f, block_frames, channels).astype(np.float64)
+            if len(block) == 0:
+                break
+
+            ref = block.mean(1)
+            n += len(block)
+            ref_sum += ref.sum()
+            ref_sq += np.square(ref).sum()
+            audio_sum += block.sum()
+            audio_sq += np.square(block).sum()
+
+    def _std(total, squares, count):
+        mean = total / count
+        return math.sqrt(max(squares - count * mean * mean, 0.0) / max(count - 1, 1))
+
+    return (
+        ref_sum / n,
+        _std(ref_sum, ref_sq, n),
+        _std(audio_sum, audio_sq, n * channels),
+    )
+
+
+def _window_starts(total: int, window: int, hop: int) -> Iterator[int]:
+    start = 0
+    yield start
+    while start + window < total:
+        start += hop
+        yield start
+
+
+def separate_file_streaming(
+    model: torch.nn.Module,
+    input_file: Union[str, Path],
+    output_file: Union[str, Path],
+    track: Optional[list[str]] = None,
+    shifts: int = 1,
+    window: float = 60.0,
+    overlap: float = 5.0,
+    num_threads: Optional[int] = None,
+) -> None:
+    """
+    Separate a file window by window and write the merged tracks incrementally
+
+    The track is read in windows of `window` seconds that overlap by
+    `overlap` seconds. Each window goes through the model with the whole
+    track's normalization statistics, then neighbouring windows are
+    linearly cross-faded. Only the merged `track` stems are kept, and they
+    are appended to the output as soon as a region is complete. Memory use
+    depends on the window size and the number of windows in flight, not on
+    the length of the input.
+
+    On CPU, windows are separated by a pool of `num_threads` threads that
+    share the intra-op threads, so all cores are used. Output is clipped
+    the same way as save_audio (rescaled when the peak exceeds 0 dBFS),
+    using a temporary float file next to the output. The output only
+    replaces an existing file once it is complete, so input_file may be
+    output_file.
+
+    Args:
+        model: The model
+        input_file: Audio file, must be readable by soundfile (see can_stream)
+        output_file: Path to save the merged tracks
+        track: The tracks to keep, defaults to all tracks
+        shifts: Run the model N times, larger values will increase the quality but also the time
+        window: Window length in seconds
+        overlap: Overlap between windows in seconds
+        num_threads: Windows separated in parallel, defaults to min(4, cores) on CPU and 1 on GPU
+    """
+
+    from demucs.audio import convert_audio
+
+    device = next(model.parameters()).device
+    channels, rate = model.audio_channels, model.samplerate
+    output_file = Path(output_file)
+
+    if num_threads is None:
+        num_threads = min(4, os.cpu_count() or 1) if device.type == "cpu" else 1
+
+    stats = track_stats(input_file, channels)
+
+    win, ov = int(window * rate), int(overlap * rate)
+    if not 0 < ov < win:
+        raise ValueError("overlap must be positive and shorter than window")
+    fade_in = ((np.arange(ov, dtype=np.float32) + 0.5) / ov)[None]
+    fade_out = 1 - fade_in
+
+    def _separate(wav: torch.Tensor) -> np.ndarray:
+        # grad mode is per thread
+        with torch.no_grad():
+            tracks = separate_audio(model, wav, shifts=shifts, stats=stats)
+        return merge_tracks(tracks, track).cpu().numpy()
+
+    tmp_file = output_file.with_name(f".{output_file.name}.separating")
+    out_tmp_file = output_file.with_name(f".{output_file.stem}.tmp{output_file.suffix}")
+    peak = 0.0
+
+    # split the intra-op threads between the windows only for this call; the
+    # setting is process-wide and later stages of a batch expect the default
+    previous_threads = torch.get_num_threads()
+    if device.type == "cpu" and num_threads > 1:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // num_threads))
+    try:
+        with sf.SoundFile(str(input_file)) as src, sf.SoundFile(
+            str(tmp_file), "w", rate, channels, subtype="FLOAT", format="WAV"
+        ) as tmp, ThreadPoolExecutor(num_threads) as pool:
+            src_rate = src.samplerate
+            total = math.ceil(src.frames * rate / src_rate)
+            starts = list(_window_starts(total, win, win - ov))
+
+            def _read(start: int) -> torch.Tensor:
+                length = min(win, total - start)
+                src.seek(math.floor(start * src_rate / rate))
+                frames = math.ceil(length * src_rate / rate) + (src_rate != rate)
+                wav = torch.from_numpy(_read_block(src, frames, channels).T.copy())
+                if src_rate != rate:
+                    wav = convert_audio(wav, src_rate, rate, channels)
+                wav = wav[:, :length]
+                if wav.shape[1] < length:
+                    wav = torch.nn.functional.pad(wav, (0, length - wav.shape[1]))
+                return wav
+
+            carry = None
+
+            def _write(idx: int, out: np.ndarray) -> None:
+                nonlocal carry, peak
+                last = idx == len(starts) - 1
+                if idx > 0:
+                    out[:, :ov] *= fade_in
+                    out[:, :ov] += carry
+                if not last:
+                    out[:, -ov:] *= fade_out
+                    out, carry = out[:, :-ov], out[:, -ov:].copy()
+                peak = max(peak, float(np.abs(out).max(initial=0.0)))
+                tmp.write(out.T)
+
+            pending = deque()
+            written = 0
+            for start in starts:
+                pending.append(pool.submit(_separate, _read(start)))
+                # bound the windows held in memory
+                if len(pending) > num_threads:
+                    _write(written, pending.popleft().result())
+                    written += 1
+            while pending:
+                _write(written, pending.popleft().result())
+                written += 1
+
+        # same as save_audio(clip="rescale")
+        scale = 1 / max(1.01 * peak, 1)
+        subtype = "PCM_16" if output_file.suffix.lower() in (".wav", ".flac") else None
+        with sf.SoundFile(str(tmp_file)) as tmp, sf.SoundFile(
+            str(out_tmp_file), "w", rate, channels, subtype=subtype
+        ) as out:
+            for block in tmp.blocks(blocksize=1 << 20, dtype="float32", always_2d=True):
+                out.write(block * scale)
+        os.replace(out_tmp_file, output_file)
+    finally:
+        torch.set_num_threads(previous_threads)
+        for path in (tmp_file, out_tmp_file):
+            if path.exists():
+                path.unlink()
+
+
 if __name__ == "__main__":
     model = init_model("htdemucs", device="cuda:0")
 
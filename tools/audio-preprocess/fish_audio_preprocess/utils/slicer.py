@@ -0,0 +1,407 @@
+# Vectorized version of https://github.com/openvpi/audio-slicer/blob/main/slicer2.py
+
+import math
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+
+import numpy as np
+import soundfile as sf
+
+Range = tuple[int, int]
+
+
+def frame_rms(
+    read: Callable[[int, int], np.ndarray],
+    num_samples: int,
+    win_size: int,
+    hop_size: int,
+    block_frames: int = 8192,
+) -> np.ndarray:
+    """
+    Frame RMS with the framing of librosa.feature.rms(center=True), in O(n)
+
+    Frames are computed a block at a time from a running sum of squares, so
+    only `block_frames * hop_size` samples are held at once and the input can
+    come from a file.
+
+    Args:
+        read: Called with (start, stop), returns the mono samples in [start, stop)
+        num_samples: Total number of samples
+        win_size: Frame length
+        hop_size: Hop length
+        block_frames: Frames computed per block
+
+    Returns:
+        RMS of each frame
+    """
+
+    pad = win_size // 2
+    n_frames = 1 + (num_samples + 2 * pad - win_size) // hop_size
+    rms = np.empty(max(n_frames, 0), dtype=np.float32)
+
+    # when frames are made of whole hops, sum squares per hop and add up hops
+    aligned = win_size % hop_size == 0 and pad % hop_size == 0
+    step = hop_size if aligned else 1
+
+    for f0 in range(0, n_frames, block_frames):
+        f1 = min(n_frames, f0 + block_frames)
+        start = f0 * hop_size - pad
+        stop = (f1 - 1) * hop_size - pad + win_size
+        lo, hi = max(start, 0), min(stop, num_samples)
+
+        # zero padding outside the signal, like center=True
+        block = np.zeros(stop - start, dtype=np.float32)
+        block[lo - start : hi - start] = read(lo, hi)
+        block = block.reshape(-1, step)
+
+        power = np.einsum("ij,ij->i", block, block, dtype=np.float64)
+        power = np.concatenate([[0.0], np.cumsum(power)])
+        offsets = np.arange(f1 - f0) * (hop_size // step)
+        sums = power[offsets + win_size // step] - power[offsets]
+        rms[f0:f1] = np.sqrt(np.maximum(sums, 0.0) / win_size)
+
+    return rms
+
+
+def segment_argmin(
+    values: np.ndarray, starts: np.ndarray, stops: np.ndarray
+) -> np.ndarray:
+    """
+    First index of the minimum of values[starts[i]:stops[i]] for every i
+
+    Args:
+        values: 1D array
+        starts: Segment starts
+        stops: Segment stops (exclusive), every segment must be non-empty
+
+    Returns:
+        Indices into values
+    """
+
+    starts, stops = np.asarray(starts), np.asarray(stops)
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+    gathered = values[positions]
+
+    minimums = np.minimum.reduceat(gathered, offsets)
+    hits = np.flatnonzero(gathered == np.repeat(minimums, lengths))
+    segments = np.searchsorted(offsets, hits, side="right") - 1
+    _, first = np.unique(segments, return_index=True)
+
+    return positions[hits[first]]
+
+
+def merge_short_ranges(ranges: list[Range], max_samples: float) -> list[Range]:
+    """
+    Merge consecutive slices while the merged slice spans at most max_samples
+
+    A merged slice is the span from the first slice's start to the last
+    slice's end, so it stays a view of the input.
+
+    Args:
+        ranges: Sample ranges, in order
+        max_samples: Maximum span of a merged slice
+
+    Returns:
+        Merged sample ranges
+    """
+
+    merged = []
+    for start, stop in ranges:
+        if merged and stop - merged[-1][0] <= max_samples:
+            merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def split_range(start: int, stop: int, max_samples: float) -> list[Range]:
+    """
+    Evenly split a range longer than max_samples
+
+    Args:
+        start: Range start
+        stop: Range stop (exclusive)
+        max_samples: Maximum length of each piece
+
+    Returns:
+        Sample ranges
+    """
+
+    total = stop - start
+    if total <= max_samples:
+        return [(start, stop)]
+
+    n_chunks = math.ceil(total / max_samples)
+    chunk_size = math.ceil(total / n_chunks)
+    return [(i, min(i + chunk_size, stop)) for i in range(start, stop, chunk_size)]
+
+
+class Slicer:
+    """
+    Silence slicer, equivalent to audio-slicer's slicer2
+
+    Silent runs are found by run-length encoding the thresholded frame RMS,
+    and the cut points of all runs are computed at once with segment_argmin.
+    Only the decision whether a run is far enough from the previous cut
+    depends on earlier runs, and that is a loop over the (few) long silent
+    runs rather than over every frame.
+    """
+
+    def __init__(
+        self,
+        sr: int,
+        threshold: float = -40.0,
+        min_length: int = 5000,
+        min_interval: int = 300,
+        hop_size: int = 10,
+        max_sil_kept: int = 5000,
+    ):
+        """
+        Args:
+            sr: Sample rate
+            threshold: RMS threshold in dB below which a frame is silent
+            min_length: Minimum length of a slice in ms
+            min_interval: Minimum length of a silence to cut at in ms
+            hop_size: Hop length of the RMS frames in ms
+            max_sil_kept: Maximum silence kept around a slice in ms
+        """
+
+        if not min_length >= min_interval >= hop_size:
+            raise ValueError(
+                "The following condition must be satisfied: min_length >= min_interval >= hop_size"
+            )
+
+        if not max_sil_kept >= hop_size:
+            raise ValueError(
+                "The following condition must be satisfied: max_sil_kept >= hop_size"
+            )
+
+        min_interval = sr * min_interval / 1000
+        self.sr = sr
+        self.threshold = 10 ** (threshold / 20.0)
+        self.hop_size = round(sr * hop_size / 1000)
+        self.win_size = min(round(min_interval), 4 * self.hop_size)
+        self.min_length = round(sr * min_length / 1000 / self.hop_size)
+        self.min_interval = round(min_interval / self.hop_size)
+        self.max_sil_kept = round(sr * max_sil_kept / 1000 / self.hop_size)
+
+    def rms(self, samples: np.ndarray) -> np.ndarray:
+        """Frame RMS of mono samples."""
+        return frame_rms(
+            lambda start, stop: samples[start:stop],
+            samples.shape[0],
+            self.win_size,
+            self.hop_size,
+        )
+
+    def silence_tags(self, rms: np.ndarray) -> list[Range]:
+        """
+        Silent frame ranges to remove
+
+        Args:
+            rms: Frame RMS
+
+        Returns:
+            (begin, end) frame ranges, in order
+        """
+
+        total_frames = rms.shape[0]
+        k = self.max_sil_kept
+
+        silent = rms < self.threshold
+        edges = np.diff(silent.astype(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        trailing = None
+        if len(ends) > 0 and ends[-1] == total_frames:
+            trailing = int(starts[-1])
+            starts, ends = starts[:-1], ends[:-1]
+
+        # a run can only be cut at if it is leading silence or long enough
+        leading = (starts == 0) & (ends > k)
+        long_enough = ends - starts >= self.min_interval
+        keep = leading | long_enough
+        s, i = starts[keep], ends[keep]
+        leading, long_enough = leading[keep], long_enough[keep]
+        length = i - s
+
+        tag_l = np.empty_like(s)
+        tag_r = np.empty_like(s)
+
+        # silence no longer than max_sil_kept: cut at its quietest frame
+        short = length <= k
+        pos = segment_argmin(rms, s[short], i[short] + 1)
+        tag_l[short] = np.where(s[short] == 0, 0, pos)
+        tag_r[short] = pos
+
+        # longer silence: keep up to max_sil_kept on each side
+        wide = ~short
+        ws, wi = s[wide], i[wide]
+        pos_l = segment_argmin(rms, ws, ws + k + 1)
+        pos_r = segment_argmin(rms, wi - k, wi + 1)
+        left, right = pos_l.copy(), pos_r.copy()
+
+        mid = wi - ws <= 2 * k
+        pos = segment_argmin(rms, wi[mid] - k, ws[mid] + k + 1)
+        left[mid] = np.minimum(pos_l[mid], pos)
+        right[mid] = np.maximum(pos_r[mid], pos)
+
+        head = ws == 0
+        left[head] = 0
+        right[head] = pos_r[head]
+
+        tag_l[wide] = left
+        tag_r[wide] = right
+
+        sil_tags = []
+        clip_start = 0
+        for begin, end, run_end, is_leading, is_long in zip(
+            tag_l.tolist(),
+            tag_r.tolist(),
+            i.tolist(),
+            leading.tolist(),
+            long_enough.tolist(),
+        ):
+            if is_leading or (is_long and run_end - clip_start >= self.min_length):
+                sil_tags.append((begin, end))
+                clip_start = end
+
+        # Deal with trailing silence.
+        if trailing is not None and total_frames - trailing >= self.min_interval:
+            silence_end = min(total_frames, trailing + k)
+            pos = rms[trailing : silence_end + 1].argmin() + trailing
+            sil_tags.append((int(pos), total_frames + 1))
+
+        return sil_tags
+
+    def ranges(self, rms: np.ndarray, num_samples: int) -> list[Range]:
+        """
+        Sample ranges of the slices between silences
+
+        Args:
+            rms: Frame RMS
+            num_samples: Total number of samples
+
+        Returns:
+            (start, stop) sample ranges
+        """
+
+        sil_tags = self.silence_tags(rms)
+        if len(sil_tags) == 0:
+            return [(0, num_samples)]
+
+        total_frames = rms.shape[0]
+        frames = []
+        if sil_tags[0][0] > 0:
+            frames.append((0, sil_tags[0][0]))
+        for (_, begin), (end, _) in zip(sil_tags[:-1], sil_tags[1:]):
+            frames.append((begin, end))
+        if sil_tags[-1][1] < total_frames:
+            frames.append((sil_tags[-1][1], total_frames))
+
+        return [
+            (begin * self.hop_size, min(num_samples, end * self.hop_size))
+            for begin, end in frames
+        ]
+
+    def slice_ranges(self, waveform: np.ndarray) -> list[Range]:
+        """
+        Sample ranges of the slices of a waveform
+
+        Args:
+            waveform: (samples,) or (channels, samples) audio
+
+        Returns:
+            (start, stop) sample ranges
+        """
+
+        samples = waveform.mean(axis=0) if waveform.ndim > 1 else waveform
+        if samples.shape[0] <= self.min_length * self.hop_size:
+            return [(0, samples.shape[0])]
+
+        return self.ranges(self.rms(samples), samples.shape[0])
+
+    def slice(self, waveform: np.ndarray) -> list[np.ndarray]:
+        """
+        Slice a waveform at silences
+
+        Args:
+            waveform: (samples,) or (channels, samples) audio
+
+        Returns:
+            Views of the waveform
+        """
+
+        return [waveform[..., start:stop] for start, stop in self.slice_ranges(waveform)]
+
+
+def iter_file_slices(
+    path: Union[str, Path],
+    min_duration: float = 5.0,
+    max_duration: float = 30.0,
+    min_silence_duration: float = 0.3,
+    top_db: int = -40,
+    hop_length: int = 10,
+    max_silence_kept: float = 0.5,
+    merge_short: bool = False,
+    max_samples: Optional[float] = None,
+) -> Iterator[tuple[int, int, np.ndarray, int]]:
+    """
+    Slice an audio file by silence without loading it
+
+    The frame RMS is computed block by block from the file, then each slice
+    is read on its own, so memory is bounded by the longest slice.
+
+    Args:
+        path: Audio file readable by soundfile
+        min_duration: minimum duration of each example
+        max_duration: maximum duration of each example
+        min_silence_duration: minimum duration of silence
+        top_db: threshold to detect silence
+        hop_length: hop length to detect silence
+        max_silence_kept: maximum duration of silence to be kept
+        merge_short: merge short slices automatically
+        max_samples: split slices longer than this, defaults to max_duration * rate
+
+    Returns:
+        Iterable of (start, stop, mono audio, rate)
+    """
+
+    with sf.SoundFile(str(path)) as f:
+        rate, num_samples = f.samplerate, f.frames
+        if max_samples is None:
+            max_samples = max_duration * rate
+
+        def read(start: int, stop: int) -> np.ndarray:
+            f.seek(start)
+            return f.read(stop - start, dtype="float32", always_2d=True).mean(axis=1)
+
+        if num_samples / rate < min_duration:
+            ranges = [(0, num_samples)]
+        else:
+            slicer = Slicer(
+                sr=rate,
+                threshold=top_db,
+                min_length=min_duration * 1000,
+                min_interval=min_silence_duration * 1000,
+                hop_size=hop_length,
+                max_sil_kept=max_silence_kept * 1000,
+            )
+            if num_samples <= slicer.min_length * slicer.hop_size:
+                ranges = [(0, num_samples)]
+            else:
+                rms = frame_rms(read, num_samples, slicer.win_size, slicer.hop_size)
+                ranges = slicer.ranges(rms, num_samples)
+
+        if merge_short:
+            ranges = merge_short_ranges(ranges, max_samples)
+
+        for start, stop in ranges:
+            for piece_start, piece_stop in split_range(start, stop, max_samples):
+                yield piece_start, piece_stop, read(piece_start, piece_stop), rate
@@ -1,7 +1,12 @@
+import hashlib
+import json
+import os
 import re
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional, Union
 
+import numpy as np
+import soundfile as sf
 from loguru import logger
 from tqdm import tqdm
 
@@ -13,75 +18,380 @@ PROMPT = {
 
 ASRModelType = Literal["funasr", "whisper"]
 
+ASR_SAMPLING_RATE = 16000
 
-def batch_transcribe(
-    files: list[Path],
+DEFAULT_CACHE_FILE = (
+    Path.home() / ".cache" / "fish-audio-preprocess" / "transcripts.json"
+)
+
+AudioInput = Union[str, Path, np.ndarray]
+
+
+def clean_text(text: str) -> str:
+    """Remove SenseVoice's <|...|> event and language tags"""
+
+    return re.sub(r"<\|.*?\|>", "", text)
+
+
+def audio_hash(audio: AudioInput) -> str:
+    """
+    sha256 of an audio file's bytes, or of a waveform's float32 samples
+
+    Args:
+        audio: Audio file or waveform
+
+    Returns:
+        Hex digest
+    """
+
+    digest = hashlib.sha256()
+    if isinstance(audio, np.ndarray):
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+
+    with open(audio, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def audio_duration(audio: AudioInput) -> float:
+    """
+    Duration in seconds of an audio file, or of a 16kHz waveform
+
+    Args:
+        audio: Audio file or 16kHz waveform
+
+    Returns:
+        Duration in seconds
+    """
+
+    if isinstance(audio, np.ndarray):
+        return audio.shape[-1] / ASR_SAMPLING_RATE
+
+    try:
+        return sf.info(str(audio)).duration
+    except RuntimeError:
+        import librosa
+
+        return librosa.get_duration(path=str(audio))
+
+
+class TranscriptCache:
+    """
+    Transcriptions keyed by model, language and audio hash, saved as JSON
+
+    Re-running on unchanged audio with the same model returns the cached
+    text without touching the model.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = DEFAULT_CACHE_FILE):
+        """
+        Args:
+            path: JSON file, None keeps the cache in memory only
+        """
+
+        self.path = None if path is None else Path(path)
+        self.entries = self._load()
+        self.dirty = False
+
+    def _load(self) -> dict[str, str]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable transcript cache {self.path}: {e}")
+            return {}
+
+    @staticmethod
+    def key(audio_hash: str, model_type: str, model_size: str, lang: str) -> str:
+        return f"{model_type}:{model_size}:{lang}:{audio_hash}"
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def put(self, key: str, text: str) -> None:
+        self.entries[key] = text
+        self.dirty = True
+
+    def save(self) -> None:
+        if self.path is None or not self.dirty:
+            return
+
+        # keep entries written by other workers since we loaded the file
+        self.entries = {**self._load(), **self.entries}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def load_asr_model(
     model_size: str,
     model_type: ASRModelType,
-    lang: str,
-    pos: int,
-    compute_type: str,
+    compute_type: str = "float16",
     batch_size: int = 1,
 ):
-    results = {}
+    """
+    Load an ASR model so it can be reused across files
+
+    Args:
+        model_size: Model name or path
+        model_type: funasr or whisper
+        compute_type: Compute type (whisper only)
+        batch_size: Batch size (whisper only), 1 for not batched model
+
+    Returns:
+        The model
+    """
+
+    logger.info(f"Loading {model_size} {model_type} model")
     if model_type == "whisper":
         from faster_whisper import WhisperModel
 
-        if lang == "jp":
-            lang = "ja"
-            logger.info(
-                f"Language {lang} is not supported by whisper, using ja(japenese) instead"
-            )
-
-        logger.info(f"Loading {model_size} model for {lang} transcription")
-        kwargs = {}
         if not batch_size or batch_size == 1:
-            model = WhisperModel(model_size, compute_type=compute_type)
-        else:
-            from faster_whisper.transcribe import BatchedInferencePipeline
+            return WhisperModel(model_size, compute_type=compute_type)
 
-            model = BatchedInferencePipeline(model_size)
-            kwargs["batch_size"] = batch_size
-        for file in tqdm(files, position=pos):
-            if lang in PROMPT:
-                result = model.transcribe(
-                    file, language=lang, initial_prompt=PROMPT[lang], **kwargs
-                )
-            else:
-                result = model.transcribe(file, language=lang, **kwargs)
-            result = list(result)
-            results[str(file)] = result["text"]
+        from faster_whisper.transcribe import BatchedInferencePipeline
+
+        return BatchedInferencePipeline(model_size)
     elif model_type == "funasr":
         from funasr import AutoModel
-        from funasr.utils.postprocess_utils import rich_transcription_postprocess
 
-        logger.info(f"Loading {model_size} model for {lang} transcription")
-        model = AutoModel(
+        return AutoModel(
             model=model_size,
             vad_model="fsmn-vad",
             punc_model="ct-punc" if model_size == "paraformer-zh" else None,
             log_level="ERROR",
             disable_pbar=True,
         )
-        for file in tqdm(files, position=pos):
-            if lang in PROMPT:
-                result = model.generate(
-                    input=file,
-                    batch_size_s=300,
-                    hotword=PROMPT[lang],
-                    merge_vad=True,
-                    merge_length_s=15,
+    else:
+        raise ValueError(f"Unsupported model type: {model_type}")
 
-                )
+
+def transcribe_audio(
+    model,
+    model_type: ASRModelType,
+    audio: Union[str, Path, np.ndarray],
+    lang: str,
+    batch_size: int = 1,
+) -> str:
+    """
+    Transcribe one file or waveform with a loaded model
+
+    Args:
+        model: Model returned by load_asr_model
+        model_type: funasr or whisper
+        audio: Audio file, or a 16kHz mono float32 waveform
+        lang: Language
+        batch_size: Batch size (whisper only), 1 for not batched model
+
+    Returns:
+        The transcription
+    """
+
+    if isinstance(audio, Path):
+        audio = str(audio)
+
+    if model_type == "whisper":
+        if lang == "jp":
+            lang = "ja"
+
+        kwargs = {}
+        if batch_size and batch_size != 1:
+            kwargs["batch_size"] = batch_size
+        if lang in PROMPT:
+            kwargs["initial_prompt"] = PROMPT[lang]
+
+        segments, _ = model.transcribe(audio, language=lang, **kwargs)
+        return "".join(segment.text for segment in segments)
+
+    if lang in PROMPT:
+        result = model.generate(
+            input=audio,
+            batch_size_s=300,
+            hotword=PROMPT[lang],
+            merge_vad=True,
+            merge_length_s=15,
+        )
+    else:
+        result = model.generate(input=audio, batch_size_s=300)
+
+    if isinstance(result, list):
+        return "".join([clean_text(item["text"]) for item in result])
+    return result["text"]
+
+
+class BatchTranscriber:
+    """
+    Transcribe many files or waveforms with one model, batching short ones
+
+    With funasr, inputs up to `long_audio_s` seconds skip VAD and are
+    sorted by length and packed into batches of at most `batch_size_s`
+    seconds and `max_batch_files` inputs, so slice directories with
+    hundreds of files are decoded a batch at a time. Longer inputs go
+    through the VAD model one by one, as before. Whisper has no cross-file
+    batching and transcribes one input at a time. Results are cached by
+    audio hash (see TranscriptCache).
+    """
+
+    def __init__(
+        self,
+        model_size: str,
+        model_type: ASRModelType,
+        lang: str,
+        compute_type: str = "float16",
+        batch_size: int = 1,
+        batch_size_s: float = 300,
+        max_batch_files: int = 64,
+        long_audio_s: float = 30.0,
+        cache_file: Optional[Union[str, Path]] = DEFAULT_CACHE_FILE,
+    ):
+        """
+        Args:
+            model_size: Model name or path
+            model_type: funasr or whisper
+            lang: Language
+            compute_type: Compute type (whisper only)
+            batch_size: Batch size (whisper only), 1 for not batched model
+            batch_size_s: Maximum total seconds of audio in a batch (funasr only)
+            max_batch_files: Maximum number of inputs in a batch (funasr only)
+            long_audio_s: Inputs longer than this are transcribed one by one with VAD
+            cache_file: Transcript cache, None to keep it in memory only
+        """
+
+        self.model_size = model_size
+        self.model_type = model_type
+        self.lang = lang
+        self.compute_type = compute_type
+        self.batch_size = batch_size
+        self.batch_size_s = batch_size_s
+        self.max_batch_files = max_batch_files
+        self.long_audio_s = long_audio_s
+        self.cache = TranscriptCache(cache_file)
+        self._model = None
+
+    @property
+    def model(self):
+        """The ASR model, loaded on first use."""
+        if self._model is None:
+            self._model = load_asr_model(
+                self.model_size, self.model_type, self.compute_type, self.batch_size
+            )
+        return self._model
+
+    def _buckets(self, items: list[tuple]) -> list[list[tuple]]:
+        """Pack (name, audio, key, duration) items into length-sorted batches."""
+
+        batches, batch, seconds = [], [], 0.0
+        for item in sorted(items, key=lambda item: item[3]):
+            if batch and (
+                seconds + item[3] > self.batch_size_s
+                or len(batch) >= self.max_batch_files
+            ):
+                batches.append(batch)
+                batch, seconds = [], 0.0
+            batch.append(item)
+            seconds += item[3]
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _transcribe_batch(self, audios: list[AudioInput]) -> list[str]:
+        inputs = [str(audio) if isinstance(audio, Path) else audio for audio in audios]
+        kwargs = {"hotword": PROMPT[self.lang]} if self.lang in PROMPT else {}
+
+        # AutoModel.inference runs the ASR model directly, without the VAD pass
+        result = self.model.inference(inputs, batch_size=len(inputs), **kwargs)
+        if len(result) != len(inputs):
+            return [
+                transcribe_audio(self.model, self.model_type, audio, self.lang)
+                for audio in inputs
+            ]
+        return [clean_text(item["text"]) for item in result]
+
+    def transcribe(self, inputs: dict[str, AudioInput], pos: int = 0) -> dict[str, str]:
+        """
+        Transcribe files or 16kHz mono waveforms
+
+        Args:
+            inputs: {name: audio file or 16kHz mono float32 waveform}
+            pos: Position of the progress bar
+
+        Returns:
+            {name: transcription}
+        """
+
+        results, short, long = {}, [], []
+        for name, audio in inputs.items():
+            key = self.cache.key(
+                audio_hash(audio), self.model_type, self.model_size, self.lang
+            )
+            text = self.cache.get(key)
+            if text is not None:
+                results[name] = text
+                continue
+
+            duration = audio_duration(audio)
+            item = (name, audio, key, duration)
+            if self.model_type == "funasr" and duration <= self.long_audio_s:
+                short.append(item)
             else:
-                result = model.generate(input=file, batch_size_s=300)
-            # print(result)
-            if isinstance(result, list):
-                results[str(file)] = "".join(
-                    [re.sub(r"<\|.*?\|>", "", item["text"]) for item in result]
+                long.append(item)
+
+        logger.info(
+            f"{len(results)} cached, transcribing {len(short)} short "
+            f"and {len(long)} long inputs"
+        )
+
+        try:
+            for batch in tqdm(self._buckets(short), position=pos):
+                texts = self._transcribe_batch([item[1] for item in batch])
+                for (name, _, key, _), text in zip(batch, texts):
+                    results[name] = text
+                    self.cache.put(key, text)
+
+            for name, audio, key, _ in tqdm(long, position=pos):
+                text = transcribe_audio(
+                    self.model, self.model_type, audio, self.lang, self.batch_size
                 )
-            else:
-                results[str(file)] = result["text"]
-    else:
-        raise ValueError(f"Unsupported model type: {model_type}")
-    return results
+                results[name] = text
+                self.cache.put(key, text)
+        finally:
+            self.cache.save()
+
+        return results
+
+
+def batch_transcribe(
+    files: list[Path],
+    model_size: str,
+    model_type: ASRModelType,
+    lang: str,
+    pos: int,
+    compute_type: str,
+    batch_size: int = 1,
+    batch_size_s: float = 300,
+    cache_file: Optional[Union[str, Path]] = DEFAULT_CACHE_FILE,
+):
+    if model_type == "whisper" and lang == "jp":
+        logger.info(
+            f"Language {lang} is not supported by whisper, using ja(japenese) instead"
+        )
+
+    transcriber = BatchTranscriber(
+        model_size,
+        model_type,
+        lang,
+        compute_type=compute_type,
+        batch_size=batch_size,
+        batch_size_s=batch_size_s,
+        cache_file=cache_file,
+    )
+    return transcriber.transcribe({str(file): file for file in files}, pos=pos)
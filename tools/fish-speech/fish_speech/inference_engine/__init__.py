@@ -1,5 +1,7 @@
 import gc
 import queue
+import threading
+from contextlib import nullcontext
 from typing import Generator
 
 import numpy as np
@@ -7,6 +9,7 @@ import torch
 from loguru import logger
 
 from fish_speech.inference_engine.reference_loader import ReferenceLoader
+from fish_speech.inference_engine.reference_store import ReferenceStore
 from fish_speech.inference_engine.utils import InferenceResult, wav_chunk_header
 from fish_speech.inference_engine.vq_manager import VQManager
 from fish_speech.models.text2semantic.inference import (
@@ -27,14 +30,24 @@ class TTSInferenceEngine(ReferenceLoader, VQManager):
         decoder_model: FireflyArchitecture,
         precision: torch.dtype,
         compile: bool,
+        decode_queue_size: int = 2,
+        reference_store: ReferenceStore | None = None,
     ) -> None:
 
-        super().__init__()
+        super().__init__(reference_store)
 
         self.llama_queue = llama_queue
         self.decoder_model = decoder_model
         self.precision = precision
         self.compile = compile
+        # Max decoded segments waiting for the consumer
+        self.decode_queue_size = decode_queue_size
+        # Decoding runs on its own stream so it can overlap with token generation
+        self.decode_stream = (
+            torch.cuda.Stream(device=decoder_model.device)
+            if decoder_model.device.type == "cuda"
+            else None
+        )
 
     @torch.inference_mode()
     def inference(self, req: ServeTTSRequest) -> Generator[InferenceResult, None, None]:
@@ -42,7 +55,8 @@ class TTSInferenceEngine(ReferenceLoader, VQManager):
         Main inference function:
         - Loads the reference audio and text.
         - Calls the LLAMA model for inference.
-        - Decodes the VQ tokens to audio.
+        - Decodes the VQ tokens to audio on a separate thread, so segment N
+          is decoded while the LLAMA worker generates segment N + 1.
         """
 
         ref_id: str | None = req.reference_id
@@ -79,41 +93,38 @@ class TTSInferenceEngine(ReferenceLoader, VQManager):
             )
 
         segments = []
+        decoded_queue = queue.Queue(maxsize=self.decode_queue_size)
+        stop_event = threading.Event()
+        threading.Thread(
+            target=self.decode_worker,
+            args=(response_queue, decoded_queue, stop_event),
+            daemon=True,
+        ).start()
+
+        try:
+            while True:
+                # Get the next decoded segment
+                kind, payload = decoded_queue.get()
+                if kind == "error":
+                    yield InferenceResult(code="error", audio=None, error=payload)
+                    break
+
+                if kind == "raise":
+                    raise payload
 
-        while True:
-            # Get the response from the LLAMA model
-            wrapped_result: WrappedGenerateResponse = response_queue.get()
-            if wrapped_result.status == "error":
-                yield InferenceResult(
-                    code="error",
-                    audio=None,
-                    error=(
-                        wrapped_result.response
-                        if isinstance(wrapped_result.response, Exception)
-                        else Exception("Unknown error")
-                    ),
-                )
-                break
-
-            # Check the response type
-            if not isinstance(wrapped_result.response, GenerateResponse):
-                raise TypeError(
-                    "Expected GenerateResponse, got {type(wrapped_result.response).__name__}"
-                )
-
-            result: GenerateResponse = wrapped_result.response
-            if result.action != "next":
-                segment = self.get_audio_segment(result)
+                if kind == "next":
+                    break
 
                 if req.streaming:  # Used only by the API server
                     yield InferenceResult(
                         code="segment",
-                        audio=(sample_rate, segment),
+                        audio=(sample_rate, payload),
                         error=None,
                     )
-                segments.append(segment)
-            else:
-                break
+                segments.append(payload)
+        finally:
+            # Lets the decode thread exit if the consumer stops early
+            stop_event.set()
 
         # Clean up the memory
         if torch.cuda.is_available():
@@ -174,6 +185,86 @@ class TTSInferenceEngine(ReferenceLoader, VQManager):
 
         return response_queue
 
+    @torch.inference_mode()
+    def decode_worker(
+        self,
+        response_queue: queue.Queue,
+        decoded_queue: queue.Queue,
+        stop_event: threading.Event,
+    ) -> None:
+        """
+        Second pipeline stage: decode each generated segment as soon as it arrives.
+
+        Puts ("segment", audio) for every segment, then one of ("next", None),
+        ("error", exception) or ("raise", exception) when the request ends.
+        """
+
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    decoded_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        stream_context = (
+            torch.cuda.stream(self.decode_stream)
+            if self.decode_stream is not None
+            else nullcontext()
+        )
+
+        with stream_context:
+            while True:
+                # Get the response from the LLAMA model
+                wrapped_result: WrappedGenerateResponse = response_queue.get()
+                if wrapped_result.status == "error":
+                    put(
+                        (
+                            "error",
+                            (
+                                wrapped_result.response
+                                if isinstance(wrapped_result.response, Exception)
+                                else Exception("Unknown error")
+                            ),
+                        )
+                    )
+                    return
+
+                # Check the response type
+                if not isinstance(wrapped_result.response, GenerateResponse):
+                    put(
+                        (
+                            "raise",
+                            TypeError(
+                                f"Expected GenerateResponse, got {type(wrapped_result.response).__name__}"
+                            ),
+                        )
+                    )
+                    return
+
+                result: GenerateResponse = wrapped_result.response
+                if result.action == "next":
+                    put(("next", None))
+                    return
+
+                if stop_event.is_set():
+                    # Keep draining so the request finishes, but skip decoding
+                    continue
+
+                try:
+                    if self.decode_stream is not None:
+                        # The codes were produced on the generation stream
+                        self.decode_stream.wait_stream(
+                            torch.cuda.default_stream(self.decoder_model.device)
+                        )
+                    segment = self.get_audio_segment(result)
+                except Exception as e:
+                    put(("raise", e))
+                    return
+
+                put(("segment", segment))
+
     def get_audio_segment(self, result: GenerateResponse) -> np.ndarray:
         """
         Decode the VQ tokens to audio.
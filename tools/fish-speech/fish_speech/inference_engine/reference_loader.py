@@ -7,6 +7,7 @@ import torch
 import torchaudio
 from loguru import logger
 
+from fish_speech.inference_engine.reference_store import ReferenceStore
 from fish_speech.models.vqgan.modules.firefly import FireflyArchitecture
 from fish_speech.utils.file import (
     AUDIO_EXTENSIONS,
@@ -19,13 +20,16 @@ from fish_speech.utils.schema import ServeReferenceAudio
 
 class ReferenceLoader:
 
-    def __init__(self) -> None:
+    def __init__(self, reference_store: ReferenceStore | None = None) -> None:
         """
         Component of the TTSInferenceEngine class.
         Loads and manages the cache for the reference audio and text.
+        Encoded references are kept in a content-addressed on-disk store,
+        so a reference is only run through the VQ encoder once.
         """
         self.ref_by_id: dict = {}
         self.ref_by_hash: dict = {}
+        self.reference_store = reference_store or ReferenceStore()
 
         # Make Pylance happy (attribut/method not defined...)
         self.decoder_model: FireflyArchitecture
@@ -52,19 +56,15 @@ class ReferenceLoader:
         )
 
         if use_cache == "off" or id not in self.ref_by_id:
-            # If the references are not already loaded, encode them
-            prompt_tokens = [
-                self.encode_reference(
-                    # decoder_model=self.decoder_model,
-                    reference_audio=audio_to_bytes(str(ref_audio)),
-                    enable_reference_audio=True,
-                )
-                for ref_audio in ref_audios
-            ]
+            # If the references are not already loaded, fetch or encode them
             prompt_texts = [
                 read_ref_text(str(ref_audio.with_suffix(".lab")))
                 for ref_audio in ref_audios
             ]
+            prompt_tokens = [
+                self.load_reference_tokens(audio_to_bytes(str(ref_audio)), text)
+                for ref_audio, text in zip(ref_audios, prompt_texts)
+            ]
             self.ref_by_id[id] = (prompt_tokens, prompt_texts)
 
         else:
@@ -87,26 +87,42 @@ class ReferenceLoader:
         prompt_tokens, prompt_texts = [], []
         for i, ref in enumerate(references):
             if use_cache == "off" or audio_hashes[i] not in self.ref_by_hash:
-                # If the references are not already loaded, encode them
-                prompt_tokens.append(
-                    self.encode_reference(
-                        reference_audio=ref.audio,
-                        enable_reference_audio=True,
-                    )
-                )
-                prompt_texts.append(ref.text)
-                self.ref_by_hash[audio_hashes[i]] = (prompt_tokens, prompt_texts)
+                # If the references are not already loaded, fetch or encode them
+                tokens = self.load_reference_tokens(ref.audio, ref.text, audio_hashes[i])
+                self.ref_by_hash[audio_hashes[i]] = tokens
 
             else:
                 # Reuse already encoded references
-                prompt_tokens, prompt_texts = self.ref_by_hash[audio_hashes[i]]
+                tokens = self.ref_by_hash[audio_hashes[i]]
                 cache_used = True
 
+            prompt_tokens.append(tokens)
+            prompt_texts.append(ref.text)
+
         if cache_used:
             logger.info("Use same references")
 
         return prompt_tokens, prompt_texts
 
+    def load_reference_tokens(
+        self, audio: bytes, text: str | None = None, key: str | None = None
+    ) -> torch.Tensor:
+        """
+        Return the VQ prompt tokens of a reference, encoding it only if the
+        store has never seen this audio before.
+        """
+        key = key or self.reference_store.key(audio)
+        entry = self.reference_store.get(key)
+        if entry is not None:
+            return torch.from_numpy(entry[0]).to(self.decoder_model.device)
+
+        prompt_tokens = self.encode_reference(
+            reference_audio=audio,
+            enable_reference_audio=True,
+        )
+        self.reference_store.put(key, prompt_tokens.cpu().numpy(), text)
+        return prompt_tokens
+
     def load_audio(self, reference_audio, sr):
         """
         Load the audio data from a file or bytes.
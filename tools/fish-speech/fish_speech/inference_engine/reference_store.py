@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+# Anchored at the fish-speech checkout rather than the working directory
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_STORE_DIR = PROJECT_ROOT / "references" / ".store"
+
+
+class ReferenceStore:
+    """
+    Content-addressed store of encoded reference audio.
+
+    The sha256 of the raw audio bytes maps to `<root>/<hash[:2]>/<hash>.npy`
+    (the VQ prompt codes) and an optional `<hash>.lab` (the reference text).
+    A small in-memory LRU sits in front of the files. Codes depend on the
+    VQGAN checkpoint: given `checkpoint`, entries live under a subdirectory
+    named after its path, size and mtime, so codes from a replaced
+    checkpoint are never reused.
+    """
+
+    def __init__(
+        self,
+        root: Path | str = DEFAULT_STORE_DIR,
+        max_memory_entries: int = 64,
+        checkpoint: Path | str | None = None,
+    ) -> None:
+        self.root = Path(root)
+        if checkpoint is not None:
+            self.root = self.root / self.checkpoint_tag(checkpoint)
+        self.max_memory_entries = max_memory_entries
+        self.memory: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(audio: bytes) -> str:
+        return sha256(audio).hexdigest()
+
+    @staticmethod
+    def checkpoint_tag(checkpoint: Path | str) -> str:
+        """Short id of a checkpoint file: its resolved path, size and mtime."""
+        path = Path(checkpoint).resolve()
+        try:
+            stat = path.stat()
+            fingerprint = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            fingerprint = str(path)
+        return sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def _remember(self, key: str, entry: Tuple[np.ndarray, Optional[str]]) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Optional[str]]]:
+        """
+        Look up encoded codes and text by audio hash.
+
+        Returns:
+            (codes, text) or None if the audio has not been encoded yet.
+            `text` is None when it was not stored with the codes.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        codes_path = self._path(key, ".npy")
+        if not codes_path.exists():
+            return None
+
+        try:
+            codes = np.load(codes_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable reference codes {codes_path}: {e}")
+            return None
+
+        text_path = self._path(key, ".lab")
+        text = text_path.read_text(encoding="utf-8") if text_path.exists() else None
+
+        with self.lock:
+            self._remember(key, (codes, text))
+
+        return codes, text
+
+    def put(self, key: str, codes: np.ndarray, text: Optional[str] = None) -> None:
+        """Save codes (and text) for an audio hash, atomically."""
+        codes = np.asarray(codes)
+        codes_path = self._path(key, ".npy")
+        codes_path.parent.mkdir(parents=True, exist_ok=True)
+
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path = codes_path.with_name(codes_path.name + suffix)
+        with open(tmp_path, "wb") as f:
+            np.save(f, codes)
+        os.replace(tmp_path, codes_path)
+
+        if text is not None:
+            text_path = self._path(key, ".lab")
+            tmp_path = text_path.with_name(text_path.name + suffix)
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, text_path)
+
+        with self.lock:
+            self._remember(key, (codes, text))
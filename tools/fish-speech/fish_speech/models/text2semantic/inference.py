@@ -1,9 +1,12 @@
+import hashlib
 import os
 import queue
 import threading
 import time
+from collections import OrderedDict
 from contextlib import nullcontext
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from typing import Literal, Optional, Tuple, Union
 
@@ -78,7 +81,10 @@ def logits_to_probs(
     )
     logits = logits.masked_fill(indices_to_remove, -float("Inf"))
 
-    logits = logits / max(temperature, 1e-5)
+    # Clamp on device, max() on a tensor would force a host sync
+    logits = logits / torch.clamp(
+        torch.as_tensor(temperature, device=logits.device), min=1e-5
+    )
 
     probs = torch.nn.functional.softmax(logits, dim=-1)
     return probs
@@ -117,7 +123,10 @@ def logits_to_probs_agent(
     )
     logits = logits.masked_fill(indices_to_remove, -float("Inf"))
 
-    logits = logits / max(temperature, 1e-5)
+    # Clamp on device, max() on a tensor would force a host sync
+    logits = logits / torch.clamp(
+        torch.as_tensor(temperature, device=logits.device), min=1e-5
+    )
 
     probs = torch.nn.functional.softmax(logits, dim=-1)
     return probs
@@ -246,50 +255,33 @@ def decode_one_token_naive_agent(
     return codebooks
 
 
-def decode_one_token_ar(
+def decode_fast_codebooks(
     model: DualARTransformer,
-    x: torch.Tensor,
-    input_pos: torch.Tensor,
-    semantic_ids: list,
+    hidden_states: torch.Tensor,
+    main_token: torch.Tensor,
     previous_tokens: torch.Tensor = None,
     **sampling_kwargs,
 ) -> torch.Tensor:
-    x = model.forward_generate(x, input_pos)
-
-    sampling_kwargs_main = sampling_kwargs.copy()
-    # sampling_kwargs_main["temperature"] = 0.1
-    # sampling_kwargs_main["top_p"] = 0.1
-    # sampling_kwargs_main["repetition_penalty"] = 1.0
-
-    codebooks = [
-        sample(
-            x.logits,
-            previous_tokens=(
-                previous_tokens[0] if previous_tokens is not None else None
-            ),  # Disable repetition penalty for the token codebook
-            **sampling_kwargs_main,
-        )[0]
-    ]
-
-    hidden_states = x.hidden_states
+    """
+    Run the fast transformer over the codebooks of one frame.
 
+    Returns the codes of shape (num_codebooks, 1); the first codebook is
+    derived from the sampled main token.
+    """
     # Cleanup the cache
     for layer in model.fast_layers:
         layer.attention.kv_cache.k_cache.fill_(0)
         layer.attention.kv_cache.v_cache.fill_(0)
 
-    input_pos = torch.tensor([0], device=hidden_states.device, dtype=torch.long)
-    model.forward_generate_fast(hidden_states, input_pos)
-    a = codebooks[0] - model.tokenizer.semantic_begin_id
-    a[a < 0] = 0
+    model.forward_generate_fast(hidden_states, model.fast_input_pos[:1])
+    a = (main_token - model.tokenizer.semantic_begin_id).clamp(min=0)
     hidden_states = model.fast_embeddings(a)
-    codebooks.append(a)
+    codebooks = [a]
 
     for codebook_idx in range(1, model.config.num_codebooks):
-        input_pos = torch.tensor(
-            [codebook_idx], device=hidden_states.device, dtype=torch.long
+        logits = model.forward_generate_fast(
+            hidden_states, model.fast_input_pos[codebook_idx : codebook_idx + 1]
         )
-        logits = model.forward_generate_fast(hidden_states, input_pos)
         a = sample(
             logits,
             previous_tokens=(
@@ -302,7 +294,124 @@ def decode_one_token_ar(
         hidden_states = model.fast_embeddings(a)
         codebooks.append(a)
 
-    codebooks = torch.stack(codebooks, dim=0)
+    return torch.stack(codebooks, dim=0)
+
+
+class FastCodebookGraph:
+    """
+    CUDA graph replay of `decode_fast_codebooks` for token-by-token decoding.
+
+    The codebook loop launches many tiny kernels per frame, so on GPU it is
+    bound by launch overhead. The loop is captured once with static input
+    buffers and replayed for every frame. Calls without `previous_tokens`
+    (the prefill) use the eager path.
+    """
+
+    def __init__(self, model: DualARTransformer, warmup_steps: int = 3):
+        self.model = model
+        self.warmup_steps = warmup_steps
+        self.graph = None
+        self.kv_cache = None
+        self.static_inputs = None
+        self.static_kwargs = None
+        self.static_output = None
+
+    def capture(self, inputs, sampling_kwargs):
+        device = inputs[0].device
+        self.static_inputs = [t.clone() for t in inputs]
+        self.static_kwargs = {
+            k: torch.as_tensor(v, device=device).clone()
+            for k, v in sampling_kwargs.items()
+        }
+
+        # Warm up on a side stream before capturing, as required by CUDA graphs
+        stream = torch.cuda.Stream(device=device)
+        stream.wait_stream(torch.cuda.current_stream(device))
+        with torch.cuda.stream(stream):
+            for _ in range(self.warmup_steps):
+                decode_fast_codebooks(
+                    self.model, *self.static_inputs, **self.static_kwargs
+                )
+        torch.cuda.current_stream(device).wait_stream(stream)
+
+        self.graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(self.graph):
+            self.static_output = decode_fast_codebooks(
+                self.model, *self.static_inputs, **self.static_kwargs
+            )
+        self.kv_cache = self.model.fast_layers[0].attention.kv_cache
+        logger.info("Captured CUDA graph for the fast codebook loop")
+
+    def __call__(
+        self,
+        model: DualARTransformer,
+        hidden_states: torch.Tensor,
+        main_token: torch.Tensor,
+        previous_tokens: torch.Tensor = None,
+        **sampling_kwargs,
+    ) -> torch.Tensor:
+        if previous_tokens is None:
+            return decode_fast_codebooks(
+                model, hidden_states, main_token, **sampling_kwargs
+            )
+
+        inputs = (hidden_states, main_token, previous_tokens)
+        if (
+            self.graph is None
+            # setup_caches re-allocates the fast kv cache the graph writes to
+            or self.kv_cache is not model.fast_layers[0].attention.kv_cache
+            or any(a.shape != b.shape for a, b in zip(self.static_inputs, inputs))
+            or sampling_kwargs.keys() != self.static_kwargs.keys()
+        ):
+            self.capture(inputs, sampling_kwargs)
+        else:
+            for static, value in zip(self.static_inputs, inputs):
+                static.copy_(value)
+            for k, v in sampling_kwargs.items():
+                self.static_kwargs[k].copy_(torch.as_tensor(v))
+
+        self.graph.replay()
+        return self.static_output.clone()
+
+
+def decode_one_token_ar(
+    model: DualARTransformer,
+    x: torch.Tensor,
+    input_pos: torch.Tensor,
+    semantic_ids: list,
+    previous_tokens: torch.Tensor = None,
+    fast_decoder: Optional[FastCodebookGraph] = None,
+    **sampling_kwargs,
+) -> torch.Tensor:
+    x = model.forward_generate(x, input_pos)
+
+    sampling_kwargs_main = sampling_kwargs.copy()
+    # sampling_kwargs_main["temperature"] = 0.1
+    # sampling_kwargs_main["top_p"] = 0.1
+    # sampling_kwargs_main["repetition_penalty"] = 1.0
+
+    main_token = sample(
+        x.logits,
+        previous_tokens=(
+            previous_tokens[0] if previous_tokens is not None else None
+        ),  # Disable repetition penalty for the token codebook
+        **sampling_kwargs_main,
+    )[0]
+
+    fast_decode = decode_fast_codebooks if fast_decoder is None else fast_decoder
+    codebooks = torch.cat(
+        [
+            main_token[None],
+            fast_decode(
+                model,
+                x.hidden_states,
+                main_token,
+                previous_tokens=previous_tokens,
+                **sampling_kwargs,
+            ),
+        ],
+        dim=0,
+    )
     # semantic_ids_tensor = torch.tensor(semantic_ids, device=codebooks.device)
     # codebooks[1:, :] = torch.masked_fill(
     #     codebooks[1:, :], ~torch.isin(codebooks[:1, :], semantic_ids_tensor), CODEBOOK_PAD_TOKEN_ID
@@ -355,6 +464,7 @@ def decode_n_tokens(
     num_new_tokens: int,
     semantic_ids: list,
     decode_one_token=decode_one_token_naive,
+    eos_check_interval: int = 8,
     **sampling_kwargs,
 ):
     previous_tokens = torch.zeros(
@@ -362,6 +472,9 @@ def decode_n_tokens(
         dtype=torch.int,
         device=cur_token.device,
     )
+    # EOS is tracked on device and only read back every eos_check_interval
+    # steps, so the host does not wait for the GPU after every token
+    finished = torch.zeros((), dtype=torch.bool, device=cur_token.device)
 
     for i in tqdm(range(num_new_tokens)):
         # We need to get windowed repeat penalty
@@ -393,10 +506,17 @@ def decode_n_tokens(
             model.config.num_codebooks + 1, -1
         )
 
-        if cur_token[0, 0, -1] == model.tokenizer.get_token_id(IM_END_TOKEN):
+        finished |= cur_token[0, 0, -1] == model.im_end_id
+        if (i + 1) % eos_check_interval == 0 and finished:
             break
 
-    return previous_tokens[:, : i + 1]
+    length = i + 1
+    if finished:
+        # Drop the tokens decoded after EOS while waiting for the next check
+        is_end = previous_tokens[0, :length] == model.im_end_id
+        length = int(is_end.int().argmax()) + 1
+
+    return previous_tokens[:, :length]
 
 
 @torch.no_grad()
@@ -407,18 +527,20 @@ def generate(
     prompt: torch.Tensor,
     max_new_tokens: int,
     decode_one_token=decode_one_token_naive,
+    reuse_kv_cache: bool = True,
+    eos_check_interval: int = 8,
     **sampling_kwargs,
 ) -> torch.Tensor:
     """
     Takes a conditioning sequence (prompt) as input and continues to generate as many tokens as requested.
+
+    If the kv cache already holds a prefix of the prompt (from the previous call or a restored
+    prefix snapshot) and `reuse_kv_cache` is set, only the remaining prompt tokens are prefilled.
     """
 
     # create an empty tensor of the expected final shape and fill in the current tokens
     T = prompt.size(1)
-    # semantic_id = model.tokenizer.convert_tokens_to_ids("<|semantic|>")
-    semantic_ids = [
-        model.tokenizer.get_token_id(f"<|semantic:{i}|>") for i in range(1024)
-    ]
+    semantic_ids = model.semantic_token_ids
 
     if max_new_tokens:
         if T + max_new_tokens > model.config.max_seq_len:
@@ -439,7 +561,10 @@ def generate(
     )
     empty[:, :T] = prompt
     seq = empty
-    input_pos = torch.arange(0, T, device=device)
+
+    # Positions before prefix_length already hold the keys / values of these exact tokens
+    prefix_length = model.cached_prefix_length(prompt) if reuse_kv_cache else 0
+    input_pos = torch.arange(prefix_length, T, device=device)
 
     # Use non-accelerated version for now, to avoid compilation overhead
     prefill_decode = (
@@ -450,7 +575,7 @@ def generate(
 
     next_token = prefill_decode(
         model,
-        prompt.view(1, codebook_dim, -1),
+        prompt[None, :, prefix_length:],
         input_pos,
         semantic_ids=semantic_ids,
         **sampling_kwargs,
@@ -465,12 +590,16 @@ def generate(
         max_new_tokens - 1,
         decode_one_token=decode_one_token,
         semantic_ids=semantic_ids,
+        eos_check_interval=eos_check_interval,
         **sampling_kwargs,
     )
     # x = torch.cat(generated_tokens, dim=1)
     seq = seq[:, : T + 1 + x.size(1)]
     seq[:, T + 1 :] = x
 
+    # Every token except the last sampled one has been forwarded through the model
+    model.cached_tokens = seq[:, :-1]
+
     return seq
 
 
@@ -579,6 +708,8 @@ def generate_agent(
 
     codebook_dim = 1 + model.config.num_codebooks
     input_pos = torch.arange(0, T, device=device)
+    # Batched agent decoding overwrites the kv cache without tracking its tokens
+    model.cached_tokens = None
 
     # Use non-accelerated version for now, to avoid compilation overhead
     prefill_decode = (
@@ -672,7 +803,14 @@ def encode_tokens(
     return encoded.to(device)
 
 
-def load_model(checkpoint_path, device, precision, compile=False, is_agent=False):
+def load_model(
+    checkpoint_path,
+    device,
+    precision,
+    compile=False,
+    is_agent=False,
+    fast_cuda_graph=False,
+):
     model: Union[NaiveTransformer, DualARTransformer] = BaseTransformer.from_pretrained(
         checkpoint_path, load_weights=True, is_agent=is_agent
     )
@@ -699,6 +837,16 @@ def load_model(checkpoint_path, device, precision, compile=False, is_agent=False
             backend="inductor" if torch.cuda.is_available() else "aot_eager",
             mode="reduce-overhead" if torch.cuda.is_available() else None,
         )
+    elif fast_cuda_graph:
+        if decode_one_token is not decode_one_token_ar:
+            logger.warning("CUDA graph capture only applies to DualARTransformer")
+        elif not torch.cuda.is_available():
+            logger.warning("CUDA graph capture requires CUDA, using eager decoding")
+        else:
+            logger.info("Using CUDA graph for the fast codebook loop")
+            decode_one_token = partial(
+                decode_one_token_ar, fast_decoder=FastCodebookGraph(model)
+            )
 
     return model.eval(), decode_one_token
 
@@ -710,6 +858,52 @@ class GenerateResponse:
     text: Optional[str] = None
 
 
+class PrefixCache:
+    """
+    Keeps kv cache snapshots of the system + reference prompt prefix, keyed by a hash of its tokens.
+
+    Within a request the prefix stays resident in the kv cache and is reused by `generate`
+    directly; the snapshots let later requests with the same reference audio skip its prefill
+    even after other references have been used in between.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(tokens: torch.Tensor) -> str:
+        data = tokens.cpu().numpy()
+        return hashlib.sha1(str(data.shape).encode() + data.tobytes()).hexdigest()
+
+    def restore(self, model: BaseTransformer, tokens: torch.Tensor) -> str:
+        key = self.key(tokens)
+        cached = model.cached_tokens
+        length = tokens.size(1)
+        if (
+            cached is not None
+            and cached.size(1) >= length
+            and torch.equal(cached[:, :length], tokens)
+        ):
+            return key
+
+        snapshot = self.entries.get(key)
+        if snapshot is not None:
+            self.entries.move_to_end(key)
+            model.restore_prefix(tokens, snapshot)
+            logger.info(f"Restored cached prompt prefix of {length} tokens")
+
+        return key
+
+    def store(self, model: BaseTransformer, tokens: torch.Tensor, key: str) -> None:
+        if key in self.entries:
+            return
+
+        self.entries[key] = model.snapshot_prefix(tokens.size(1))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
 def generate_long(
     *,
     model,
@@ -727,6 +921,7 @@ def generate_long(
     chunk_length: int = 150,
     prompt_text: Optional[str | list[str]] = None,
     prompt_tokens: Optional[torch.Tensor | list[torch.Tensor]] = None,
+    prefix_cache: Optional[PrefixCache] = None,
 ):
     assert 0 < top_p <= 1, "top_p must be in (0, 1]"
     assert 0 < repetition_penalty < 2, "repetition_penalty must be in (0, 2)"
@@ -795,9 +990,17 @@ def generate_long(
         repetition_penalty, device=device, dtype=torch.float
     )
 
+    # Every prompt starts with the system + reference prefix, so its kv cache is shared
+    prefix_tokens = torch.cat(encoded_prompts, dim=1) if use_prompt else None
+    prefix_key = None
+    if prefix_cache is not None and prefix_tokens is not None:
+        prefix_key = prefix_cache.restore(model, prefix_tokens)
+
     for sample_idx in range(num_samples):
+        # Only wait for this thread's stream: VQGAN decoding of earlier
+        # segments may be running concurrently on another stream
         if torch.cuda.is_available():
-            torch.cuda.synchronize()
+            torch.cuda.current_stream().synchronize()
 
         global_encoded = []
         seg_idx = 0
@@ -850,8 +1053,11 @@ def generate_long(
             if sample_idx == 0 and seg_idx == 0 and compile:
                 logger.info(f"Compilation time: {time.perf_counter() - t0:.2f} seconds")
 
+            if prefix_key is not None:
+                prefix_cache.store(model, prefix_tokens, prefix_key)
+
             if torch.cuda.is_available():
-                torch.cuda.synchronize()
+                torch.cuda.current_stream().synchronize()
 
             t = time.perf_counter() - t0
 
@@ -906,6 +1112,7 @@ def launch_thread_safe_queue(
 ):
     input_queue = queue.Queue()
     init_event = threading.Event()
+    prefix_cache = PrefixCache()
 
     def worker():
         model, decode_one_token = load_model(
@@ -929,7 +1136,10 @@ def launch_thread_safe_queue(
 
             try:
                 for chunk in generate_long(
-                    model=model, decode_one_token=decode_one_token, **kwargs
+                    model=model,
+                    decode_one_token=decode_one_token,
+                    prefix_cache=prefix_cache,
+                    **kwargs,
                 ):
                     response_queue.put(
                         WrappedGenerateResponse(status="success", response=chunk)
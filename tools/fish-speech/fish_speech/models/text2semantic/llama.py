@@ -16,7 +16,7 @@ from torch.nn.attention import SDPBackend, sdpa_kernel
 from torch.utils.checkpoint import checkpoint
 from transformers import AutoTokenizer
 
-from fish_speech.tokenizer import SEMANTIC_TOKENS, FishTokenizer
+from fish_speech.tokenizer import IM_END_TOKEN, SEMANTIC_TOKENS, FishTokenizer
 from fish_speech.utils import RankedLogger
 
 from .lora import LoraConfig, setup_lora
@@ -150,6 +150,19 @@ class KVCache(nn.Module):
 
         return k_out, v_out
 
+    def snapshot(self, length: int):
+        # Copy of the first `length` positions, used to restore a shared prompt prefix
+        return (
+            self.k_cache[:, :, :length].clone(),
+            self.v_cache[:, :, :length].clone(),
+        )
+
+    def restore(self, snapshot):
+        k_val, v_val = snapshot
+        length = k_val.size(2)
+        self.k_cache[:, :, :length] = k_val
+        self.v_cache[:, :, :length] = v_val
+
 
 @dataclass
 class TransformerForwardResult:
@@ -176,6 +189,7 @@ class BaseTransformer(nn.Module):
         self.semantic_token_ids = [
             tokenizer.get_token_id(SEMANTIC_TOKEN) for SEMANTIC_TOKEN in SEMANTIC_TOKENS
         ]
+        self.im_end_id = tokenizer.get_token_id(IM_END_TOKEN)
 
         # Slow transformer
         self.embeddings = nn.Embedding(
@@ -222,6 +236,8 @@ class BaseTransformer(nn.Module):
         # For kv cache
         self.max_batch_size = -1
         self.max_seq_len = -1
+        # Tokens whose keys / values currently sit at positions [0, n) of the slow kv cache
+        self.cached_tokens = None
 
         if init_weights:
             self.apply(self._init_weights)
@@ -236,6 +252,7 @@ class BaseTransformer(nn.Module):
         max_seq_len = find_multiple(max_seq_len, 8)
         self.max_seq_len = max_seq_len
         self.max_batch_size = max_batch_size
+        self.cached_tokens = None
 
         for b in self.layers:
             b.attention.kv_cache = KVCache(
@@ -246,6 +263,40 @@ class BaseTransformer(nn.Module):
                 dtype=dtype,
             )
 
+    def cached_prefix_length(self, prompt: Tensor) -> int:
+        """
+        Number of leading prompt tokens whose keys / values are already in the kv cache.
+
+        Args:
+            prompt: Prompt of shape (num_codebooks + 1, seq_len)
+
+        Returns:
+            Length of the common prefix of the prompt and the cached tokens,
+            capped so that at least one prompt token is left to prefill.
+        """
+        if self.cached_tokens is None:
+            return 0
+
+        length = min(self.cached_tokens.size(1), prompt.size(1) - 1)
+        if length <= 0:
+            return 0
+
+        mismatch = (self.cached_tokens[:, :length] != prompt[:, :length]).any(dim=0)
+        if not mismatch.any():
+            return length
+
+        return int(mismatch.int().argmax())
+
+    def snapshot_prefix(self, length: int):
+        """Copy the slow kv cache for positions [0, length) so it can be restored later."""
+        return [layer.attention.kv_cache.snapshot(length) for layer in self.layers]
+
+    def restore_prefix(self, tokens: Tensor, snapshot) -> None:
+        """Load a snapshot taken for `tokens` back into the slow kv cache."""
+        for layer, layer_snapshot in zip(self.layers, snapshot):
+            layer.attention.kv_cache.restore(layer_snapshot)
+        self.cached_tokens = tokens
+
     def embed(self, inp: Tensor, share_codebook_embeddings=True) -> Tensor:
         embeds = []
         semantic_token_ids_tensor = torch.tensor(
@@ -567,6 +618,12 @@ class DualARTransformer(BaseTransformer):
             ),
             persistent=False,
         )
+        # Positions of the codebook loop, sliced instead of re-created every step
+        self.register_buffer(
+            "fast_input_pos",
+            torch.arange(config.num_codebooks, dtype=torch.long),
+            persistent=False,
+        )
         self.apply(self._init_weights)
 
     def setup_caches(
@@ -0,0 +1,125 @@
+import time
+from functools import partial
+from pathlib import Path
+
+import click
+import torch
+from loguru import logger
+
+from fish_speech.models.text2semantic.inference import (
+    FastCodebookGraph,
+    decode_one_token_ar,
+    encode_tokens,
+    generate,
+    load_model,
+)
+
+
+def run_generate(model, prompt, decode_one_token, max_new_tokens, eos_check_interval):
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+    t0 = time.perf_counter()
+    y = generate(
+        model=model,
+        prompt=prompt,
+        max_new_tokens=max_new_tokens,
+        decode_one_token=decode_one_token,
+        reuse_kv_cache=False,
+        eos_check_interval=eos_check_interval,
+        temperature=torch.tensor(0.7, device=prompt.device),
+        top_p=torch.tensor(0.7, device=prompt.device),
+        repetition_penalty=torch.tensor(1.2, device=prompt.device),
+    )
+
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+    return y.size(1) - prompt.size(1), time.perf_counter() - t0
+
+
+@click.command()
+@click.option(
+    "--checkpoint-path",
+    type=click.Path(path_type=Path, exists=True),
+    default="checkpoints/fish-speech-1.5",
+)
+@click.option("--device", type=str, default="cuda")
+@click.option("--half/--no-half", default=False)
+@click.option(
+    "--text",
+    type=str,
+    default="你说的对, 但是原神是一款由米哈游自主研发的开放世界手游.",
+)
+@click.option("--max-new-tokens", type=int, default=512)
+@click.option("--runs", type=int, default=3)
+@click.option("--eos-check-interval", type=int, default=8)
+@click.option("--seed", type=int, default=42)
+def main(
+    checkpoint_path: Path,
+    device: str,
+    half: bool,
+    text: str,
+    max_new_tokens: int,
+    runs: int,
+    eos_check_interval: int,
+    seed: int,
+) -> None:
+    """
+    Compare decoding throughput of the per-token EOS check, the batched
+    on-device EOS check and the CUDA graph codebook loop.
+    """
+
+    precision = torch.half if half else torch.bfloat16
+    model, decode_one_token = load_model(checkpoint_path, device, precision)
+    with torch.device(device):
+        model.setup_caches(
+            max_batch_size=1,
+            max_seq_len=model.config.max_seq_len,
+            dtype=next(model.parameters()).dtype,
+        )
+
+    prompt = encode_tokens(
+        model.tokenizer,
+        string=text,
+        device=device,
+        num_codebooks=model.config.num_codebooks,
+    )
+
+    variants = [
+        ("sync every token", decode_one_token, 1),
+        (f"eos check every {eos_check_interval}", decode_one_token, eos_check_interval),
+    ]
+    if decode_one_token is decode_one_token_ar and torch.cuda.is_available():
+        variants.append(
+            (
+                f"eos check every {eos_check_interval} + cuda graph",
+                partial(decode_one_token_ar, fast_decoder=FastCodebookGraph(model)),
+                eos_check_interval,
+            )
+        )
+
+    results = []
+    for name, decode_fn, interval in variants:
+        torch.manual_seed(seed)
+        # Warm up kernels (and capture the graph) outside of the measurement
+        run_generate(model, prompt, decode_fn, 32, interval)
+
+        tokens, seconds = 0, 0.0
+        for _ in range(runs):
+            n, t = run_generate(model, prompt, decode_fn, max_new_tokens, interval)
+            tokens += n
+            seconds += t
+
+        results.append((name, tokens, seconds))
+        logger.info(f"{name}: {tokens / seconds:.2f} tokens/sec")
+
+    baseline = results[0][1] / results[0][2]
+    print(f"\n{'variant':<40}{'tokens':>8}{'seconds':>10}{'tokens/s':>10}{'speedup':>9}")
+    for name, tokens, seconds in results:
+        rate = tokens / seconds
+        print(f"{name:<40}{tokens:>8}{seconds:>10.2f}{rate:>10.2f}{rate / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
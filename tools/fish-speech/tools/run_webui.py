@@ -8,7 +8,7 @@ from loguru import logger
 
 pyrootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
 
-from fish_speech.inference_engine import TTSInferenceEngine
+from fish_speech.inference_engine import ReferenceStore, TTSInferenceEngine
 from fish_speech.models.text2semantic.inference import launch_thread_safe_queue
 from fish_speech.models.vqgan.inference import load_model as load_decoder_model
 from fish_speech.utils.schema import ServeTTSRequest
@@ -76,6 +76,7 @@ if __name__ == "__main__":
         decoder_model=decoder_model,
         compile=args.compile,
         precision=args.precision,
+        reference_store=ReferenceStore(checkpoint=args.decoder_checkpoint_path),
     )
 
     # Dry run to check if the model is loaded correctly and avoid the first-time latency
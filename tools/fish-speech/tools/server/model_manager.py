@@ -2,7 +2,7 @@ import torch
 from funasr import AutoModel
 from loguru import logger
 
-from fish_speech.inference_engine import TTSInferenceEngine
+from fish_speech.inference_engine import ReferenceStore, TTSInferenceEngine
 from fish_speech.models.text2semantic.inference import (
     launch_thread_safe_queue,
     launch_thread_safe_queue_agent,
@@ -58,6 +58,7 @@ class ModelManager:
             decoder_model=self.decoder_model,
             precision=self.precision,
             compile=self.compile,
+            reference_store=ReferenceStore(checkpoint=decoder_checkpoint_path),
         )
 
         # Warm up the models
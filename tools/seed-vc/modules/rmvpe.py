@@ -578,6 +578,32 @@ class RMVPE:
         # t3 = ttime()
         # print("hmvpe:%s\t%s\t%s\t%s"%(t1-t0,t2-t1,t3-t2,t3-t0))
         return f0
+
+    def infer_from_audio_chunked(self, audio, thred=0.03, chunk_frames=3200, context_frames=160):
+        """F0 of long audio with the network run on fixed-size mel chunks to bound memory.
+
+        Each chunk of `chunk_frames` (10 ms each) sees `context_frames` of extra mel on
+        both sides, which is discarded from the output.
+        """
+        if "privateuseone" in str(self.device):
+            return self.infer_from_audio(audio, thred=thred)
+        if not torch.is_tensor(audio):
+            audio = torch.from_numpy(audio)
+        mel = self.mel_extractor(
+            audio.float().to(self.device).unsqueeze(0), center=True
+        )
+        n_frames = mel.shape[-1]
+
+        hidden = []
+        for start in range(0, n_frames, chunk_frames):
+            end = min(start + chunk_frames, n_frames)
+            left = max(start - context_frames, 0)
+            right = min(end + context_frames, n_frames)
+            chunk_hidden = self.mel2hidden(mel[..., left:right])
+            hidden.append(chunk_hidden[0, start - left:end - left].float().cpu().numpy())
+        hidden = np.concatenate(hidden, axis=0)
+        return self.decode(hidden, thred=thred)
+
     def infer_from_audio_batch(self, audio, thred=0.03):
         # torch.cuda.synchronize()
         # t0 = ttime()
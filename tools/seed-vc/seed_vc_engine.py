@@ -0,0 +1,624 @@
+import argparse
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+SEED_VC_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault('HF_HUB_CACHE', os.path.join(SEED_VC_DIR, 'checkpoints', 'hf_cache'))
+
+import torch
+import torchaudio
+import librosa
+import yaml
+
+from modules.commons import build_model, load_checkpoint, recursive_munch
+import hf_utils
+
+
+SEMANTIC_WINDOW_SECONDS = 30
+SEMANTIC_OVERLAP_SECONDS = 5
+
+# Load model and configuration
+if torch.cuda.is_available():
+    device = torch.device("cuda")
+elif torch.backends.mps.is_available():
+    device = torch.device("mps")
+else:
+    device = torch.device("cpu")
+
+
+# Checkpoints and configs are resolved relative to the seed-vc directory, not the working directory
+load_custom_model_from_hf = partial(hf_utils.load_custom_model_from_hf,
+                                    cache_dir=os.path.join(SEED_VC_DIR, 'checkpoints'))
+
+
+def seed_vc_path(path):
+    return path if os.path.isabs(path) else os.path.join(SEED_VC_DIR, path)
+
+
+def load_models(args):
+    if not args.f0_condition:
+        if args.checkpoint is None:
+            dit_checkpoint_path, dit_config_path = load_custom_model_from_hf("Plachta/Seed-VC",
+                                                                            "DiT_seed_v2_uvit_whisper_small_wavenet_bigvgan_pruned.pth",
+                                                                            "config_dit_mel_seed_uvit_whisper_small_wavenet.yml")
+        else:
+            dit_checkpoint_path = seed_vc_path(args.checkpoint)
+            dit_config_path = seed_vc_path(args.config)
+        f0_fn = None
+    else:
+        if args.checkpoint is None:
+            dit_checkpoint_path, dit_config_path = load_custom_model_from_hf("Plachta/Seed-VC",
+                                                                             "DiT_seed_v2_uvit_whisper_base_f0_44k_bigvgan_pruned_ft_ema_v2.pth",
+                                                                             "config_dit_mel_seed_uvit_whisper_base_f0_44k.yml")
+        else:
+            dit_checkpoint_path = seed_vc_path(args.checkpoint)
+            dit_config_path = seed_vc_path(args.config)
+        # f0 extractor
+        from modules.rmvpe import RMVPE
+
+        model_path = load_custom_model_from_hf("lj1995/VoiceConversionWebUI", "rmvpe.pt", None)
+        f0_extractor = RMVPE(model_path, is_half=False, device=device)
+        f0_fn = f0_extractor.infer_from_audio_chunked
+
+    config = yaml.safe_load(open(dit_config_path, "r"))
+    model_params = recursive_munch(config["model_params"])
+    model_params.dit_type = 'DiT'
+    model = build_model(model_params, stage="DiT")
+    hop_length = config["preprocess_params"]["spect_params"]["hop_length"]
+    sr = config["preprocess_params"]["sr"]
+
+    # Load checkpoints
+    model, _, _, _ = load_checkpoint(
+        model,
+        None,
+        dit_checkpoint_path,
+        load_only_params=True,
+        ignore_modules=[],
+        is_distributed=False,
+    )
+    for key in model:
+        model[key].eval()
+        model[key].to(device)
+    model.cfm.estimator.setup_caches(max_batch_size=1, max_seq_length=8192)
+
+    # Load additional modules
+    from modules.campplus.DTDNN import CAMPPlus
+
+    campplus_ckpt_path = load_custom_model_from_hf(
+        "funasr/campplus", "campplus_cn_common.bin", config_filename=None
+    )
+    campplus_model = CAMPPlus(feat_dim=80, embedding_size=192)
+    campplus_model.load_state_dict(torch.load(campplus_ckpt_path, map_location="cpu"))
+    campplus_model.eval()
+    campplus_model.to(device)
+
+    vocoder_type = model_params.vocoder.type
+
+    if vocoder_type == 'bigvgan':
+        from modules.bigvgan import bigvgan
+        bigvgan_name = model_params.vocoder.name
+        bigvgan_model = bigvgan.BigVGAN.from_pretrained(bigvgan_name, use_cuda_kernel=False)
+        # remove weight norm in the model and set to eval mode
+        bigvgan_model.remove_weight_norm()
+        bigvgan_model = bigvgan_model.eval().to(device)
+        vocoder_fn = bigvgan_model
+    elif vocoder_type == 'hifigan':
+        from modules.hifigan.generator import HiFTGenerator
+        from modules.hifigan.f0_predictor import ConvRNNF0Predictor
+        hift_config = yaml.safe_load(open(seed_vc_path('configs/hifigan.yml'), 'r'))
+        hift_gen = HiFTGenerator(**hift_config['hift'], f0_predictor=ConvRNNF0Predictor(**hift_config['f0_predictor']))
+        hift_path = load_custom_model_from_hf("FunAudioLLM/CosyVoice-300M", 'hift.pt', None)
+        hift_gen.load_state_dict(torch.load(hift_path, map_location='cpu'))
+        hift_gen.eval()
+        hift_gen.to(device)
+        vocoder_fn = hift_gen
+    elif vocoder_type == "vocos":
+        vocos_config = yaml.safe_load(open(seed_vc_path(model_params.vocoder.vocos.config), 'r'))
+        vocos_path = seed_vc_path(model_params.vocoder.vocos.path)
+        vocos_model_params = recursive_munch(vocos_config['model_params'])
+        vocos = build_model(vocos_model_params, stage='mel_vocos')
+        vocos_checkpoint_path = vocos_path
+        vocos, _, _, _ = load_checkpoint(vocos, None, vocos_checkpoint_path,
+                                         load_only_params=True, ignore_modules=[], is_distributed=False)
+        _ = [vocos[key].eval().to(device) for key in vocos]
+        _ = [vocos[key].to(device) for key in vocos]
+        total_params = sum(sum(p.numel() for p in vocos[key].parameters() if p.requires_grad) for key in vocos.keys())
+        print(f"Vocoder model total parameters: {total_params / 1_000_000:.2f}M")
+        vocoder_fn = vocos.decoder
+    else:
+        raise ValueError(f"Unknown vocoder type: {vocoder_type}")
+
+    speech_tokenizer_type = model_params.speech_tokenizer.type
+    if speech_tokenizer_type == 'whisper':
+        # whisper
+        from transformers import AutoFeatureExtractor, WhisperModel
+        whisper_name = model_params.speech_tokenizer.name
+        whisper_model = WhisperModel.from_pretrained(whisper_name, torch_dtype=torch.float16).to(device)
+        del whisper_model.decoder
+        whisper_feature_extractor = AutoFeatureExtractor.from_pretrained(whisper_name)
+
+        def semantic_fn(waves_16k):
+            ori_inputs = whisper_feature_extractor([wave.cpu().numpy() for wave in waves_16k],
+                                                   return_tensors="pt",
+                                                   return_attention_mask=True)
+            ori_input_features = whisper_model._mask_input_features(
+                ori_inputs.input_features, attention_mask=ori_inputs.attention_mask).to(device)
+            with torch.no_grad():
+                ori_outputs = whisper_model.encoder(
+                    ori_input_features.to(whisper_model.encoder.dtype),
+                    head_mask=None,
+                    output_attentions=False,
+                    output_hidden_states=False,
+                    return_dict=True,
+                )
+            S_ori = ori_outputs.last_hidden_state.to(torch.float32)
+            S_ori = S_ori[:, :waves_16k.size(-1) // 320 + 1]
+            return S_ori
+    elif speech_tokenizer_type == 'cnhubert':
+        from transformers import (
+            Wav2Vec2FeatureExtractor,
+            HubertModel,
+        )
+        hubert_model_name = config['model_params']['speech_tokenizer']['name']
+        hubert_feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(hubert_model_name)
+        hubert_model = HubertModel.from_pretrained(hubert_model_name)
+        hubert_model = hubert_model.to(device)
+        hubert_model = hubert_model.eval()
+        hubert_model = hubert_model.half()
+
+        def semantic_fn(waves_16k):
+            ori_waves_16k_input_list = [
+                waves_16k[bib].cpu().numpy()
+                for bib in range(len(waves_16k))
+            ]
+            ori_inputs = hubert_feature_extractor(ori_waves_16k_input_list,
+                                                  return_tensors="pt",
+                                                  return_attention_mask=True,
+                                                  padding=True,
+                                                  sampling_rate=16000).to(device)
+            with torch.no_grad():
+                ori_outputs = hubert_model(
+                    ori_inputs.input_values.half(),
+                )
+            S_ori = ori_outputs.last_hidden_state.float()
+            return S_ori
+    elif speech_tokenizer_type == 'xlsr':
+        from transformers import (
+            Wav2Vec2FeatureExtractor,
+            Wav2Vec2Model,
+        )
+        model_name = config['model_params']['speech_tokenizer']['name']
+        output_layer = config['model_params']['speech_tokenizer']['output_layer']
+        wav2vec_feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+        wav2vec_model = Wav2Vec2Model.from_pretrained(model_name)
+        wav2vec_model.encoder.layers = wav2vec_model.encoder.layers[:output_layer]
+        wav2vec_model = wav2vec_model.to(device)
+        wav2vec_model = wav2vec_model.eval()
+        wav2vec_model = wav2vec_model.half()
+
+        def semantic_fn(waves_16k):
+            ori_waves_16k_input_list = [
+                waves_16k[bib].cpu().numpy()
+                for bib in range(len(waves_16k))
+            ]
+            ori_inputs = wav2vec_feature_extractor(ori_waves_16k_input_list,
+                                                   return_tensors="pt",
+                                                   return_attention_mask=True,
+                                                   padding=True,
+                                                   sampling_rate=16000).to(device)
+            with torch.no_grad():
+                ori_outputs = wav2vec_model(
+                    ori_inputs.input_values.half(),
+                )
+            S_ori = ori_outputs.last_hidden_state.float()
+            return S_ori
+    else:
+        raise ValueError(f"Unknown speech tokenizer type: {speech_tokenizer_type}")
+    # Generate mel spectrograms
+    mel_fn_args = {
+        "n_fft": config['preprocess_params']['spect_params']['n_fft'],
+        "win_size": config['preprocess_params']['spect_params']['win_length'],
+        "hop_size": config['preprocess_params']['spect_params']['hop_length'],
+        "num_mels": config['preprocess_params']['spect_params']['n_mels'],
+        "sampling_rate": sr,
+        "fmin": config['preprocess_params']['spect_params'].get('fmin', 0),
+        "fmax": None if config['preprocess_params']['spect_params'].get('fmax', "None") == "None" else 8000,
+        "center": False
+    }
+    from modules.audio import mel_spectrogram
+
+    to_mel = lambda x: mel_spectrogram(x, **mel_fn_args)
+
+    return (
+        model,
+        semantic_fn,
+        f0_fn,
+        vocoder_fn,
+        campplus_model,
+        to_mel,
+        mel_fn_args,
+    )
+
+
+def adjust_f0_semitones(f0_sequence, n_semitones):
+    factor = 2 ** (n_semitones / 12)
+    return f0_sequence * factor
+
+def crossfade(chunk1, chunk2, overlap):
+    fade_out = np.cos(np.linspace(0, np.pi / 2, overlap)) ** 2
+    fade_in = np.cos(np.linspace(np.pi / 2, 0, overlap)) ** 2
+    if len(chunk2) < overlap:
+        chunk2[:overlap] = chunk2[:overlap] * fade_in[:len(chunk2)] + (chunk1[-overlap:] * fade_out)[:len(chunk2)]
+    else:
+        chunk2[:overlap] = chunk2[:overlap] * fade_in + chunk1[-overlap:] * fade_out
+    return chunk2
+
+
+class TargetVoice:
+    """Features of a reference voice that do not depend on the source audio."""
+
+    def __init__(self, prompt_condition, mel2, style2, median_log_f0=None):
+        self.prompt_condition = prompt_condition
+        self.mel2 = mel2
+        self.style2 = style2
+        self.median_log_f0 = median_log_f0
+
+
+class SeedVCEngine:
+    """
+    Resident seed-vc voice conversion.
+
+    All models are loaded once. Target voices are cached by a hash of their
+    audio, so converting several sources to the same singer computes the
+    target's semantic tokens, mel, CAM++ style and F0 statistics only once.
+    Source features are cached the same way for repeated conversions of one
+    source with different targets or pitch shifts.
+    """
+
+    def __init__(self, f0_condition=True, checkpoint=None, config=None, fp16=True, max_targets=8, max_sources=4,
+                 semantic_batch_size=4, feature_store=None):
+        args = argparse.Namespace(f0_condition=f0_condition, checkpoint=checkpoint, config=config, fp16=fp16)
+        (
+            self.model,
+            self.semantic_fn,
+            self.f0_fn,
+            self.vocoder_fn,
+            self.campplus_model,
+            self.mel_fn,
+            self.mel_fn_args,
+        ) = load_models(args)
+
+        self.f0_condition = f0_condition
+        self.fp16 = fp16
+        self.load_sr = self.mel_fn_args['sampling_rate']
+        self.sr = 22050 if not f0_condition else 44100
+        self.hop_length = 256 if not f0_condition else 512
+        self.max_context_window = self.sr // self.hop_length * 30
+        self.overlap_frame_len = 16
+        self.overlap_wave_len = self.overlap_frame_len * self.hop_length
+
+        self.max_targets = max_targets
+        self.targets = OrderedDict()
+        self.max_sources = max_sources
+        self.sources = OrderedDict()
+        # the engine is shared between jobs through the model pool; guards both LRUs
+        self.cache_lock = threading.Lock()
+        self.semantic_batch_size = semantic_batch_size
+        # Optional shared store with get_or_compute(audio, feature, compute, params, audio_hash)
+        self.feature_store = feature_store
+
+    def load_audio(self, path):
+        """Load a mono waveform at the model sample rate."""
+        return librosa.load(path, sr=self.load_sr)[0]
+
+    @staticmethod
+    def audio_hash(audio):
+        return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).tobytes()).hexdigest()
+
+    def cached_feature(self, audio_hash, feature, compute, params=None):
+        """Consult the shared feature store, if any, before running `compute`."""
+        if self.feature_store is None:
+            return compute()
+        array = self.feature_store.get_or_compute(None, 'seed_vc.' + feature, compute, params=params,
+                                                  audio_hash=audio_hash)
+        return torch.from_numpy(np.array(array)).to(device)
+
+    def _lru_get(self, cache, key):
+        with self.cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _lru_put(self, cache, key, value, max_size):
+        with self.cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+
+    def compute_style(self, waves_16k):
+        feat2 = torchaudio.compliance.kaldi.fbank(waves_16k,
+                                                  num_mel_bins=80,
+                                                  dither=0,
+                                                  sample_frequency=16000)
+        feat2 = feat2 - feat2.mean(dim=0, keepdim=True)
+        return self.campplus_model(feat2.unsqueeze(0))
+
+    def compute_f0(self, waves_16k):
+        F0 = self.f0_fn(waves_16k[0], thred=0.03)
+        return torch.from_numpy(F0).to(device)[None]
+
+    @torch.no_grad()
+    def prepare_target(self, ref_audio):
+        """
+        Compute (or fetch from the cache) the target-voice features.
+
+        Args:
+            ref_audio: Reference audio path or mono waveform at the model sample rate
+
+        Returns:
+            TargetVoice
+        """
+        if isinstance(ref_audio, (str, os.PathLike)):
+            ref_audio = self.load_audio(ref_audio)
+        ref_audio = np.asarray(ref_audio, dtype=np.float32)[:self.sr * 25]
+
+        key = self.audio_hash(ref_audio)
+        cached = self._lru_get(self.targets, key)
+        if cached is not None:
+            return cached
+
+        ref_audio = torch.from_numpy(ref_audio).unsqueeze(0).float().to(device)
+        ori_waves_16k = torchaudio.functional.resample(ref_audio, self.sr, 16000)
+        S_ori = self.semantic_fn(ori_waves_16k)
+
+        mel2 = self.cached_feature(key, 'mel', lambda: self.mel_fn(ref_audio), self.mel_fn_args)
+        target2_lengths = torch.LongTensor([mel2.size(2)]).to(mel2.device)
+
+        style2 = self.cached_feature(key, 'campplus', lambda: self.compute_style(ori_waves_16k))
+
+        if self.f0_condition:
+            F0_ori = self.cached_feature(key, 'rmvpe', lambda: self.compute_f0(ori_waves_16k))
+            voiced_log_f0_ori = torch.log(F0_ori[F0_ori > 1] + 1e-5)
+            median_log_f0_ori = torch.median(voiced_log_f0_ori)
+        else:
+            F0_ori = None
+            median_log_f0_ori = None
+
+        prompt_condition, _, codes, commitment_loss, codebook_loss = self.model.length_regulator(S_ori,
+                                                                                                ylens=target2_lengths,
+                                                                                                n_quantizers=3,
+                                                                                                f0=F0_ori)
+
+        target = TargetVoice(prompt_condition, mel2, style2, median_log_f0_ori)
+        self._lru_put(self.targets, key, target, self.max_targets)
+        return target
+
+    def semantic_windows(self, num_samples):
+        """Start samples of the overlapping Whisper windows over a 16 kHz waveform."""
+        window = 16000 * SEMANTIC_WINDOW_SECONDS
+        hop = 16000 * (SEMANTIC_WINDOW_SECONDS - SEMANTIC_OVERLAP_SECONDS)
+        starts = [0]
+        while starts[-1] + window < num_samples:
+            starts.append(starts[-1] + hop)
+        return starts
+
+    @torch.no_grad()
+    def extract_semantic(self, waves_16k):
+        """
+        Semantic features of a 16 kHz waveform of any length.
+
+        Audio longer than one window is split into overlapping windows that
+        go through the speech tokenizer `semantic_batch_size` at a time; the
+        first `SEMANTIC_OVERLAP_SECONDS` of every later window only provide
+        context and are dropped.
+        """
+        window = 16000 * SEMANTIC_WINDOW_SECONDS
+        # if source audio less than 30 seconds, whisper can handle in one forward
+        if waves_16k.size(-1) <= window:
+            return self.semantic_fn(waves_16k)
+
+        starts = self.semantic_windows(waves_16k.size(-1))
+        overlap_frames = 50 * SEMANTIC_OVERLAP_SECONDS
+        S_alt_list = []
+        for b in range(0, len(starts), self.semantic_batch_size):
+            batch_starts = starts[b:b + self.semantic_batch_size]
+            chunks = [waves_16k[0, start:start + window] for start in batch_starts]
+            batch = torch.stack([torch.nn.functional.pad(chunk, (0, window - chunk.size(-1))) for chunk in chunks])
+            S_batch = self.semantic_fn(batch)
+            for i, chunk in enumerate(chunks):
+                num_frames = min(S_batch.size(1), chunk.size(-1) // 320 + 1)
+                skip = 0 if b + i == 0 else overlap_frames
+                S_alt_list.append(S_batch[i, skip:num_frames])
+        return torch.cat(S_alt_list, dim=0)[None]
+
+    @torch.no_grad()
+    def extract_source_features(self, source_wave):
+        """
+        Semantic features, F0 and mel length of the source, cached by audio hash.
+
+        The features do not depend on the target or the pitch shift, so
+        converting one source to several voices extracts them once.
+        """
+        key = self.audio_hash(source_wave)
+        cached = self._lru_get(self.sources, key)
+        if cached is not None:
+            return cached
+
+        source_audio = torch.tensor(source_wave).unsqueeze(0).float().to(device)
+        converted_waves_16k = torchaudio.functional.resample(source_audio, self.sr, 16000)
+        S_alt = self.extract_semantic(converted_waves_16k)
+
+        if self.f0_condition:
+            F0_alt = self.cached_feature(key, 'rmvpe', lambda: self.compute_f0(converted_waves_16k))
+        else:
+            F0_alt = None
+
+        mel_length = self.mel_fn(source_audio).size(2)
+
+        features = (S_alt, F0_alt, mel_length)
+        self._lru_put(self.sources, key, features, self.max_sources)
+        return features
+
+    @torch.no_grad()
+    def convert(self, source_wave, target, diffusion_steps=30, length_adjust=1.0, inference_cfg_rate=0.7,
+                auto_f0_adjust=False, pitch_shift=0, batch_size=1):
+        """
+        Convert a source waveform to the target voice in memory.
+
+        Args:
+            source_wave (np.ndarray): Mono source audio at the model sample rate
+            target: TargetVoice, reference audio path or reference waveform
+            diffusion_steps (int): Euler steps of the CFM solver
+            length_adjust (float): Output length factor
+            inference_cfg_rate (float): Classifier-free guidance rate
+            auto_f0_adjust (bool): Shift the source pitch level to the target's
+            pitch_shift (int): Extra pitch shift in semitones
+            batch_size (int): Context windows solved together; 1 converts window by window
+
+        Returns:
+            np.ndarray: Converted audio at `self.sr`
+        """
+        if not isinstance(target, TargetVoice):
+            target = self.prepare_target(target)
+        mel2, style2 = target.mel2, target.style2
+
+        S_alt, F0_alt, mel_length = self.extract_source_features(source_wave)
+        target_lengths = torch.LongTensor([int(mel_length * length_adjust)]).to(device)
+
+        if self.f0_condition:
+            voiced_F0_alt = F0_alt[F0_alt > 1]
+
+            log_f0_alt = torch.log(F0_alt + 1e-5)
+            voiced_log_f0_alt = torch.log(voiced_F0_alt + 1e-5)
+            median_log_f0_alt = torch.median(voiced_log_f0_alt)
+
+            # shift alt log f0 level to ori log f0 level
+            shifted_log_f0_alt = log_f0_alt.clone()
+            if auto_f0_adjust:
+                shifted_log_f0_alt[F0_alt > 1] = log_f0_alt[F0_alt > 1] - median_log_f0_alt + target.median_log_f0
+            shifted_f0_alt = torch.exp(shifted_log_f0_alt)
+            if pitch_shift != 0:
+                shifted_f0_alt[F0_alt > 1] = adjust_f0_semitones(shifted_f0_alt[F0_alt > 1], pitch_shift)
+        else:
+            shifted_f0_alt = None
+
+        # Length regulation
+        cond, _, codes, commitment_loss, codebook_loss = self.model.length_regulator(S_alt, ylens=target_lengths,
+                                                                                    n_quantizers=3,
+                                                                                    f0=shifted_f0_alt)
+
+        if batch_size > 1:
+            return self._convert_batched(cond, target, diffusion_steps, inference_cfg_rate, batch_size)
+        return self._convert_sequential(cond, target, diffusion_steps, inference_cfg_rate)
+
+    def _convert_sequential(self, cond, target, diffusion_steps, inference_cfg_rate):
+        prompt_condition, mel2, style2 = target.prompt_condition, target.mel2, target.style2
+        overlap_frame_len = self.overlap_frame_len
+        overlap_wave_len = self.overlap_wave_len
+        max_source_window = self.max_context_window - mel2.size(2)
+        # split source condition (cond) into chunks
+        processed_frames = 0
+        generated_wave_chunks = []
+        # generate chunk by chunk and stream the output
+        while processed_frames < cond.size(1):
+            chunk_cond = cond[:, processed_frames:processed_frames + max_source_window]
+            is_last_chunk = processed_frames + max_source_window >= cond.size(1)
+            cat_condition = torch.cat([prompt_condition, chunk_cond], dim=1)
+            with torch.autocast(device_type=device.type, dtype=torch.float16 if self.fp16 else torch.float32):
+                # Voice Conversion
+                vc_target = self.model.cfm.inference(cat_condition,
+                                                     torch.LongTensor([cat_condition.size(1)]).to(mel2.device),
+                                                     mel2, style2, None, diffusion_steps,
+                                                     inference_cfg_rate=inference_cfg_rate)
+                vc_target = vc_target[:, :, mel2.size(-1):]
+            vc_wave = self.vocoder_fn(vc_target.float()).squeeze()
+            vc_wave = vc_wave[None, :]
+            if processed_frames == 0:
+                if is_last_chunk:
+                    output_wave = vc_wave[0].cpu().numpy()
+                    generated_wave_chunks.append(output_wave)
+                    break
+                output_wave = vc_wave[0, :-overlap_wave_len].cpu().numpy()
+                generated_wave_chunks.append(output_wave)
+                previous_chunk = vc_wave[0, -overlap_wave_len:]
+                processed_frames += vc_target.size(2) - overlap_frame_len
+            elif is_last_chunk:
+                output_wave = crossfade(previous_chunk.cpu().numpy(), vc_wave[0].cpu().numpy(), overlap_wave_len)
+                generated_wave_chunks.append(output_wave)
+                processed_frames += vc_target.size(2) - overlap_frame_len
+                break
+            else:
+                output_wave = crossfade(previous_chunk.cpu().numpy(), vc_wave[0, :-overlap_wave_len].cpu().numpy(),
+                                        overlap_wave_len)
+                generated_wave_chunks.append(output_wave)
+                previous_chunk = vc_wave[0, -overlap_wave_len:]
+                processed_frames += vc_target.size(2) - overlap_frame_len
+        return np.concatenate(generated_wave_chunks).astype(np.float32)
+
+    def window_starts(self, num_frames, window):
+        """Start frames of the context windows, overlapping by `overlap_frame_len`."""
+        starts = [0]
+        while starts[-1] + window < num_frames:
+            starts.append(starts[-1] + window - self.overlap_frame_len)
+        return starts
+
+    def _convert_batched(self, cond, target, diffusion_steps, inference_cfg_rate, batch_size):
+        """
+        Solve all context windows in padded batches, vocode them together and
+        stitch them with one vectorized crossfade.
+
+        Produces the same window layout as the sequential loop, so the output
+        length and crossfade positions match.
+        """
+        prompt_condition, mel2, style2 = target.prompt_condition, target.mel2, target.style2
+        prompt_len = prompt_condition.size(1)
+        window = self.max_context_window - mel2.size(2)
+        num_frames = cond.size(1)
+        starts = self.window_starts(num_frames, window)
+        lengths = [min(window, num_frames - start) for start in starts]
+
+        waves = []
+        for b in range(0, len(starts), batch_size):
+            batch_starts = starts[b:b + batch_size]
+            batch_lengths = lengths[b:b + batch_size]
+            max_len = max(batch_lengths)
+            chunk_cond = cond.new_zeros(len(batch_starts), max_len, cond.size(2))
+            for i, (start, length) in enumerate(zip(batch_starts, batch_lengths)):
+                chunk_cond[i, :length] = cond[0, start:start + length]
+            cat_condition = torch.cat([prompt_condition.expand(len(batch_starts), -1, -1), chunk_cond], dim=1)
+            x_lens = torch.LongTensor(batch_lengths).to(mel2.device) + prompt_len
+            with torch.autocast(device_type=device.type, dtype=torch.float16 if self.fp16 else torch.float32):
+                vc_target = self.model.cfm.inference(cat_condition, x_lens, mel2,
+                                                     style2.expand(len(batch_starts), -1), None, diffusion_steps,
+                                                     inference_cfg_rate=inference_cfg_rate)
+                vc_target = vc_target[:, :, mel2.size(-1):].float()
+            # Padded frames are unconstrained, repeat the last valid frame so the vocoder sees no edge
+            for i, length in enumerate(batch_lengths):
+                if length < max_len:
+                    vc_target[i, :, length:] = vc_target[i, :, length - 1:length]
+            batch_waves = self.vocoder_fn(vc_target).reshape(len(batch_starts), -1)
+            waves.append(batch_waves[:, :window * self.hop_length])
+
+        max_wave_len = max(w.size(1) for w in waves)
+        waves = torch.cat([torch.nn.functional.pad(w, (0, max_wave_len - w.size(1))) for w in waves], dim=0)
+
+        overlap = self.overlap_wave_len
+        if len(starts) > 1:
+            # Every window but the last is full, so all tails sit at the same offset
+            full_len = window * self.hop_length
+            fade_out = torch.cos(torch.linspace(0, np.pi / 2, overlap, device=waves.device)) ** 2
+            fade_in = torch.cos(torch.linspace(np.pi / 2, 0, overlap, device=waves.device)) ** 2
+            tails = waves[:-1, full_len - overlap:full_len]
+            waves[1:, :overlap] = waves[1:, :overlap] * fade_in + tails * fade_out
+
+        wave_lengths = [length * self.hop_length for length in lengths]
+        keep = [wave_len - overlap for wave_len in wave_lengths[:-1]] + [wave_lengths[-1]]
+        output = torch.cat([waves[i, :n] for i, n in enumerate(keep)])
+        return output.cpu().numpy().astype(np.float32)
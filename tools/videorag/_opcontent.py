@@ -82,8 +82,8 @@ async def videorag_query(
     # Define paths
     dataset_dir = os.path.join(project_root, 'dataset')
     video_edit_dir = os.path.join(dataset_dir, 'video_edit')
-    scene_output_dir = os.path.join(video_edit_dir, 'scene_output')
-    working_dir = os.path.join(video_edit_dir, 'videosource-workdir')
+    scene_output_dir = global_config.get('scene_output_dir') or os.path.join(video_edit_dir, 'scene_output')
+    working_dir = global_config['working_dir']
 
     # Replace the existing file operations with these:
     with open(os.path.join(scene_output_dir, 'textual_segmentations.json'), 'w', encoding ='utf-8') as f:
@@ -62,6 +62,9 @@ class VideoRAG:
 
     # extension
     always_create_working_dir: bool = True
+    # where queries write textual_segmentations.json / visual_retrieved_segments.json,
+    # defaults to dataset/video_edit/scene_output
+    scene_output_dir: str = None
     addon_params: dict = field(default_factory=dict)
 
     def load_caption_model(self, debug=False):